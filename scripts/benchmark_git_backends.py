@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the git backends on the same duplication workloads.
+
+Builds a local template repository, then for every available backend times
+the clone, remote change and push that a duplication performs, pushing into
+fresh local bare repositories. Reports wall time and CPU time (including
+child processes) per duplication.
+
+Usage:
+    python scripts/benchmark_git_backends.py [--files 200] [--runs 20]
+"""
+
+import argparse
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator.git_backend import available_backends, get_backend
+
+
+def git(*args, cwd=None):
+    """Run a git command for workload setup."""
+    subprocess.run(
+        ["git", "-c", "user.name=Bench", "-c", "user.email=bench@example.com"]
+        + list(args),
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+def make_template(path, files, commits):
+    """Create a template repository with some files and history."""
+    git("init", "--quiet", "-b", "main", path)
+    for commit in range(commits):
+        for i in range(files):
+            with open(os.path.join(path, f"file{i}.txt"), "w") as f:
+                f.write(f"file {i} revision {commit}\n" * 50)
+        git("add", "--all", cwd=path)
+        git("commit", "--quiet", "-m", f"Revision {commit}", cwd=path)
+
+
+def cpu_seconds():
+    """CPU time used by this process and its finished children."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def duplicate(backend, template, root, run):
+    """Run the git side of one duplication."""
+    work = os.path.join(root, f"work{run}")
+    remote = os.path.join(root, f"remote{run}.git")
+    git("init", "--quiet", "--bare", remote)
+    backend.clone(template, work)
+    backend.set_remote(work, "origin", remote)
+    backend.push(work, "origin", [backend.current_branch(work)], set_upstream=True)
+    shutil.rmtree(work)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=int, default=200, help="Files per commit")
+    parser.add_argument("--commits", type=int, default=5, help="Template commits")
+    parser.add_argument("--runs", type=int, default=20, help="Duplications per backend")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="git_backend_bench_")
+    try:
+        template = os.path.join(root, "template")
+        make_template(template, args.files, args.commits)
+        print(f"Template: {args.files} files x {args.commits} commits")
+        print(f"{'backend':<12} {'median wall':>12} {'mean wall':>10} {'cpu/run':>10}")
+        for name in available_backends():
+            backend = get_backend(name)
+            scratch = os.path.join(root, name)
+            os.makedirs(scratch)
+            walls = []
+            cpu_started = cpu_seconds()
+            for run in range(args.runs):
+                started = time.perf_counter()
+                duplicate(backend, template, scratch, run)
+                walls.append(time.perf_counter() - started)
+            cpu = (cpu_seconds() - cpu_started) / args.runs
+            print(
+                f"{name:<12} {statistics.median(walls) * 1000:>10.1f}ms "
+                f"{statistics.mean(walls) * 1000:>8.1f}ms {cpu * 1000:>8.1f}ms"
+            )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark pushes from template mirrors before and after pack maintenance.
+
+For every template in ``get_default_repositories()`` (or the ones given with
+``--template``), makes a bare mirror clone, times pushing it into fresh local
+bare repositories, then runs the maintenance stage (bitmapped repack,
+commit-graph, multi-pack-index, tuned pack settings) and times the same
+pushes again. Reports wall time and CPU time (including child processes) per
+push, so the push-side savings show up for each template.
+
+Usage:
+    python scripts/benchmark_pack_maintenance.py [--pushes 5] [--template URL]
+"""
+
+import argparse
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator.cache import repo_basename
+from src.github_repo_duplicator.duplicator import get_default_repositories
+from src.github_repo_duplicator.maintenance import optimize_repository
+
+
+def git(*args, cwd=None):
+    """Run a git command for workload setup."""
+    subprocess.run(["git"] + list(args), cwd=cwd, check=True, capture_output=True)
+
+
+def cpu_seconds():
+    """CPU time used by this process and its finished children."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def time_pushes(mirror, root, pushes):
+    """Push a mirror into fresh bare repositories; return wall times and CPU."""
+    walls = []
+    cpu_started = cpu_seconds()
+    for run in range(pushes):
+        remote = os.path.join(root, f"remote{run}.git")
+        git("init", "--quiet", "--bare", remote)
+        started = time.perf_counter()
+        git("push", "--quiet", "--mirror", remote, cwd=mirror)
+        walls.append(time.perf_counter() - started)
+        shutil.rmtree(remote)
+    return walls, (cpu_seconds() - cpu_started) / pushes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pushes", type=int, default=5, help="Pushes per state")
+    parser.add_argument(
+        "--template",
+        action="append",
+        help="Template URL or path to benchmark (repeatable; default: built-ins)",
+    )
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="pack_maintenance_bench_")
+    try:
+        print(f"{'template':<45} {'state':<10} {'median wall':>12} {'cpu/push':>10}")
+        for template in args.template or get_default_repositories():
+            name = repo_basename(template)
+            mirror = os.path.join(root, f"{name}.git")
+            try:
+                git("clone", "--quiet", "--mirror", template, mirror)
+            except subprocess.CalledProcessError as e:
+                print(f"{name:<45} skipped: {e.stderr.decode().strip()}")
+                continue
+            for state in ("before", "after"):
+                if state == "after":
+                    optimize_repository(mirror, force=True)
+                walls, cpu = time_pushes(mirror, root, args.pushes)
+                print(
+                    f"{name:<45} {state:<10} "
+                    f"{statistics.median(walls) * 1000:>10.1f}ms "
+                    f"{cpu * 1000:>8.1f}ms"
+                )
+            shutil.rmtree(mirror)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -39,6 +39,9 @@ setup(
         "Topic :: Software Development :: Version Control :: Git",
     ],
     python_requires=">=3.6",
+    extras_require={
+        "dulwich": ["dulwich>=0.21.0"],
+    },
     entry_points={
         "console_scripts": [
             "github-repo-duplicator=github_repo_duplicator.cli:main",
@@ -9,7 +9,17 @@ __version__ = "1.2.6"
 __author__ = "Mostafa Rezaee"
 __license__ = "MIT"
 
+from .api import DuplicationResult, Duplicator, DuplicatorConfig, ErrorKind
 from .cli import main as cli_main
 from .duplicator import main as duplicator_main
+from .ssh_mux import SshMultiplexer
 
-__all__ = ["duplicator_main", "cli_main"]
+__all__ = [
+    "duplicator_main",
+    "cli_main",
+    "Duplicator",
+    "DuplicatorConfig",
+    "DuplicationResult",
+    "ErrorKind",
+    "SshMultiplexer",
+]
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Programmatic API for GitHub Repo Duplicator.
+
+The ``Duplicator`` class runs a complete duplication in-process without
+prompting, printing or exiting: every outcome is reported through a
+``DuplicationResult``. The interactive command-line flow is built on top of
+it, and orchestrators can call it directly at high rates.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .bundles import BundleError, find_bundle, verify_bundle
+from .destinations import Destination, DestinationResult, push_to_destinations
+from .git_backend import GitError, get_backend
+from .github_api import GitHubApiError, created_repository_metadata
+from .lfs import (
+    DEFAULT_LFS_JOBS,
+    LfsError,
+    LfsProgress,
+    LfsTransferResult,
+    duplicate_lfs_objects,
+)
+from .metrics import pack_size_bytes, record_duplication, record_transfer, time_phase
+from .mirrors import current_mirror
+from .precheck import name_error, precheck_names
+from .registry import RegistryEntry, normalize_template_url, record_entry
+from .rollback import DEFAULT_ROLLBACK_POLICY, JobTransaction, RollbackResult
+from .settings import RepoSettings, SettingResult, apply_settings
+from .submodules import (
+    DEFAULT_SUBMODULE_JOBS,
+    SubmoduleError,
+    github_owner_rewriter,
+    rewrite_submodule_urls,
+    update_submodules,
+)
+from .sync import TEMPLATE_BASE_REF
+from .verify import VerificationResult, verify_push
+from .watchdog import Cancelled, DeadlineExceeded, deadline, run_with_deadline
+from .workspace import (
+    SPACE_FACTOR,
+    WorkspaceError,
+    estimate_template_size,
+    get_workspace_manager,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorKind:
+    """Machine-readable kinds of duplication failures."""
+
+    INVALID_NAME = "invalid_name"
+    NAME_TAKEN = "name_taken"
+    GITHUB_CLI_MISSING = "github_cli_missing"
+    GIT_BACKEND_UNAVAILABLE = "git_backend_unavailable"
+    WORKSPACE_UNAVAILABLE = "workspace_unavailable"
+    BUNDLE_INVALID = "bundle_invalid"
+    CLONE_FAILED = "clone_failed"
+    SUBMODULES_FAILED = "submodules_failed"
+    CREATE_FAILED = "create_failed"
+    LOOKUP_FAILED = "lookup_failed"
+    PUSH_FAILED = "push_failed"
+    LFS_FAILED = "lfs_failed"
+    SETTINGS_FAILED = "settings_failed"
+    DESTINATION_FAILED = "destination_failed"
+    VERIFY_FAILED = "verify_failed"
+    CLONE_BACK_FAILED = "clone_back_failed"
+    TIMED_OUT = "timed_out"
+    CANCELLED = "cancelled"
+    UNEXPECTED = "unexpected"
+
+
+class DuplicationError(Exception):
+    """Raised inside a duplication to stop it with a specific error kind."""
+
+    def __init__(self, kind: str, message: str):
+        super().__init__(message)
+        self.kind = kind
+
+
+@dataclass
+class DuplicatorConfig:
+    """Settings shared by all duplications run by a ``Duplicator``."""
+
+    private: bool = True
+    description: str = ""
+    work_dir: Optional[str] = None
+    clone_back: bool = False
+    clone_back_dir: Optional[str] = None
+    lfs: bool = False
+    lfs_jobs: int = DEFAULT_LFS_JOBS
+    lfs_progress: Optional[Callable[[LfsProgress], None]] = None
+    recurse_submodules: bool = False
+    submodule_jobs: int = DEFAULT_SUBMODULE_JOBS
+    submodule_mirror_cache: bool = False
+    submodule_owner: Optional[str] = None
+    use_imported_bundles: bool = True
+    template_mirrors: bool = True
+    git_backend: Optional[str] = None
+    precheck: bool = True
+    settings: Optional[RepoSettings] = None
+    rollback: str = DEFAULT_ROLLBACK_POLICY
+    destinations: List[Destination] = field(default_factory=list)
+    verify: bool = True
+    verify_tree: bool = False
+    deadlines: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class DuplicationResult:
+    """Structured outcome of a single duplication."""
+
+    template_url: str
+    repo_name: str
+    success: bool = False
+    error_kind: Optional[str] = None
+    error: str = ""
+    repo_url: str = ""
+    ssh_url: str = ""
+    branch: str = ""
+    template_sha: str = ""
+    template_commit_time: Optional[int] = None
+    pushed_sha: str = ""
+    verification: Optional[VerificationResult] = None
+    bundle_path: Optional[str] = None
+    local_path: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    lfs: Optional[LfsTransferResult] = None
+    settings: List[SettingResult] = field(default_factory=list)
+    destinations: List[DestinationResult] = field(default_factory=list)
+    rollback: List[RollbackResult] = field(default_factory=list)
+
+
+def _git(kind: str, operation, *args, **kwargs):
+    """Call a git backend operation, raising DuplicationError on failure."""
+    try:
+        return operation(*args, **kwargs)
+    except GitError as e:
+        raise DuplicationError(kind, str(e)) from e
+
+
+def _run(args: List[str], kind: str, cwd: Optional[str] = None) -> str:
+    """Run a command and return its output, raising DuplicationError on failure."""
+    try:
+        result = run_with_deadline(
+            args, cwd=cwd, check=True, capture_output=True, text=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise DuplicationError(kind, (e.stderr or str(e)).strip()) from e
+    except OSError as e:
+        raise DuplicationError(kind, str(e)) from e
+    return result.stdout.strip()
+
+
+class Duplicator:
+    """Duplicates template repositories into new GitHub repositories."""
+
+    def __init__(self, config: Optional[DuplicatorConfig] = None):
+        self.config = config or DuplicatorConfig()
+
+    def duplicate(
+        self,
+        template: str,
+        name: str,
+        bundle_path: Optional[str] = None,
+        **overrides,
+    ) -> DuplicationResult:
+        """
+        Duplicate a template into a new repository.
+
+        Args:
+            template: The URL of the template repository. May be empty when a
+                bundle is given, in which case the bundle names the template.
+            name: The name of the new repository.
+            bundle_path: Optional template bundle to clone from.
+            overrides: ``DuplicatorConfig`` fields to change for this call.
+
+        Returns:
+            The result of the duplication. Failures are reported through
+            ``error_kind`` and ``error`` instead of being raised, including
+            phases that run past their deadline (``timed_out``); only
+            ``KeyboardInterrupt`` and ``SystemExit`` propagate, after the
+            work tree is removed. Whatever a failed duplication created is
+            rolled back according to ``config.rollback``.
+        """
+        config = replace(self.config, **overrides) if overrides else self.config
+        result = DuplicationResult(template_url=template, repo_name=name)
+        started = time.monotonic()
+        outcome = "failure"
+        work_trees: List[str] = []
+        transaction = JobTransaction(f"duplicate:{name}", config.rollback)
+        try:
+            self._run_duplication(config, result, bundle_path, work_trees, transaction)
+            result.success = True
+            outcome = "success"
+        except DuplicationError as e:
+            result.error_kind = e.kind
+            result.error = str(e)
+            logger.error(f"Duplication of {name} failed ({e.kind}): {e}")
+        except DeadlineExceeded as e:
+            result.error_kind = ErrorKind.TIMED_OUT
+            result.error = str(e)
+            outcome = "timeout"
+            logger.error(f"Duplication of {name} timed out: {e}")
+        except Cancelled as e:
+            result.error_kind = ErrorKind.CANCELLED
+            result.error = str(e)
+            outcome = "cancelled"
+        except (KeyboardInterrupt, SystemExit):
+            result.error_kind = ErrorKind.CANCELLED
+            result.error = "Operation cancelled"
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            logger.exception(f"Unexpected error while duplicating {name}")
+            result.error_kind = ErrorKind.UNEXPECTED
+            result.error = str(e)
+        finally:
+            for work_tree in work_trees:
+                get_workspace_manager(config.work_dir).release(work_tree)
+            if result.success:
+                transaction.commit()
+            else:
+                result.rollback = transaction.rollback()
+            result.timings["total"] = time.monotonic() - started
+            record_duplication(outcome)
+            self._record(config, result, outcome)
+        return result
+
+    def _record(
+        self, config: DuplicatorConfig, result: DuplicationResult, outcome: str
+    ) -> None:
+        """Add a finished duplication to the local registry."""
+        if not result.template_url:
+            return
+        record_entry(
+            RegistryEntry(
+                template_url=result.template_url,
+                repo_name=result.repo_name,
+                outcome=outcome,
+                template_sha=result.template_sha,
+                template_commit_time=result.template_commit_time,
+                repo_url=result.repo_url,
+                visibility="private" if config.private else "public",
+                error=result.error,
+                duration=result.timings["total"],
+                timings=dict(result.timings),
+            )
+        )
+
+    async def duplicate_async(
+        self,
+        template: str,
+        name: str,
+        bundle_path: Optional[str] = None,
+        **overrides,
+    ) -> DuplicationResult:
+        """
+        Duplicate a template without blocking the event loop.
+
+        Takes the same arguments as ``duplicate`` and runs it in the loop's
+        default executor.
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(
+            self.duplicate, template, name, bundle_path, **overrides
+        )
+        return await loop.run_in_executor(None, call)
+
+    @contextmanager
+    def _phase(
+        self, config: DuplicatorConfig, result: DuplicationResult, phase: str
+    ) -> Iterator[None]:
+        """Run a phase under its deadline, timing it into the result and metrics."""
+        started = time.monotonic()
+        try:
+            with deadline(phase, config.deadlines.get(phase)), time_phase(phase):
+                yield
+        finally:
+            result.timings[phase] = time.monotonic() - started
+
+    def _resolve_source(
+        self,
+        config: DuplicatorConfig,
+        result: DuplicationResult,
+        bundle_path: Optional[str],
+    ) -> str:
+        """Pick the clone source: a given bundle, an imported one or the URL."""
+        if not bundle_path and config.use_imported_bundles and result.template_url:
+            bundle_path = find_bundle(result.template_url)
+        if bundle_path:
+            try:
+                metadata = verify_bundle(bundle_path)
+            except BundleError as e:
+                raise DuplicationError(ErrorKind.BUNDLE_INVALID, str(e)) from e
+            result.template_url = result.template_url or metadata.template_url
+            result.bundle_path = os.path.abspath(bundle_path)
+            return result.bundle_path
+        if not result.template_url:
+            raise DuplicationError(ErrorKind.CLONE_FAILED, "No template given")
+        return result.template_url
+
+    def _run_duplication(
+        self,
+        config: DuplicatorConfig,
+        result: DuplicationResult,
+        bundle_path: Optional[str],
+        work_trees: List[str],
+        transaction: JobTransaction,
+    ) -> None:
+        """Run every phase of a duplication, journaling what it creates."""
+        name = result.repo_name
+        invalid = name_error(name)
+        if invalid:
+            raise DuplicationError(
+                ErrorKind.INVALID_NAME, f"Invalid repository name {name}: {invalid}"
+            )
+        if shutil.which("gh") is None:
+            raise DuplicationError(
+                ErrorKind.GITHUB_CLI_MISSING, "GitHub CLI (gh) is not installed"
+            )
+        if config.precheck:
+            # Reject a taken name before any clone or create work is spent
+            with self._phase(config, result, "precheck"):
+                (check,) = precheck_names([name])
+            if not check.ok:
+                raise DuplicationError(ErrorKind.NAME_TAKEN, check.error)
+
+        try:
+            git = get_backend(config.git_backend)
+        except GitError as e:
+            raise DuplicationError(ErrorKind.GIT_BACKEND_UNAVAILABLE, str(e)) from e
+
+        source = self._resolve_source(config, result, bundle_path)
+        try:
+            workspace = get_workspace_manager(config.work_dir).acquire(
+                name.split("/")[-1],
+                (estimate_template_size(source) or 0) * SPACE_FACTOR,
+            )
+        except WorkspaceError as e:
+            raise DuplicationError(ErrorKind.WORKSPACE_UNAVAILABLE, str(e)) from e
+        work_trees.append(workspace)
+        work_tree = os.path.join(workspace, "repo")
+
+        with self._phase(config, result, "clone"):
+            # A prewarmed mirror costs one ls-remote instead of a fetch
+            mirror = None
+            if config.template_mirrors and source == result.template_url:
+                mirror = current_mirror(normalize_template_url(source), source)
+            _git(ErrorKind.CLONE_FAILED, git.clone, mirror or source, work_tree)
+            if mirror:
+                # Relative submodule URLs resolve against the template
+                _git(
+                    ErrorKind.CLONE_FAILED, git.set_remote, work_tree, "origin", source
+                )
+        result.template_sha = _git(ErrorKind.CLONE_FAILED, git.rev_parse, work_tree)
+        result.branch = _git(ErrorKind.CLONE_FAILED, git.current_branch, work_tree)
+        result.template_commit_time = _git(
+            ErrorKind.CLONE_FAILED, git.commit_time, work_tree
+        )
+
+        if config.recurse_submodules or config.submodule_owner:
+            with self._phase(config, result, "submodules"):
+                try:
+                    update_submodules(
+                        work_tree, config.submodule_jobs, config.submodule_mirror_cache
+                    )
+                    if config.submodule_owner:
+                        rewrite_submodule_urls(
+                            work_tree, github_owner_rewriter(config.submodule_owner)
+                        )
+                except SubmoduleError as e:
+                    raise DuplicationError(ErrorKind.SUBMODULES_FAILED, str(e)) from e
+
+        with self._phase(config, result, "create"):
+            create = ["gh", "repo", "create", name]
+            create.append("--private" if config.private else "--public")
+            if config.description:
+                create += ["--description", config.description]
+            created = _run(create + ["--confirm"], ErrorKind.CREATE_FAILED)
+        transaction.created_repository(name)
+
+        # The create output names the new repository; no separate lookup
+        try:
+            with deadline("lookup", config.deadlines.get("lookup")):
+                metadata = created_repository_metadata(name, created)
+        except GitHubApiError as e:
+            raise DuplicationError(ErrorKind.LOOKUP_FAILED, str(e)) from e
+        result.ssh_url, result.repo_url = metadata.ssh_url, metadata.https_url
+
+        refspecs = [result.branch, f"{TEMPLATE_BASE_REF}:{TEMPLATE_BASE_REF}"]
+        with self._phase(config, result, "push"), ThreadPoolExecutor(1) as pool:
+            _git(
+                ErrorKind.PUSH_FAILED,
+                git.set_remote,
+                work_tree,
+                "origin",
+                result.ssh_url,
+            )
+            # Record the template commit so later syncs know the base
+            _git(
+                ErrorKind.PUSH_FAILED,
+                git.update_ref,
+                work_tree,
+                TEMPLATE_BASE_REF,
+                result.template_sha,
+            )
+            # Further destinations push from the same clone alongside GitHub
+            mirrored = None
+            if config.destinations:
+                mirrored = pool.submit(
+                    push_to_destinations,
+                    work_tree,
+                    name,
+                    config.destinations,
+                    refspecs,
+                    backend=git,
+                    private=config.private,
+                    description=config.description,
+                    transaction=transaction,
+                    verify=config.verify,
+                )
+            try:
+                _git(
+                    ErrorKind.PUSH_FAILED,
+                    git.push,
+                    work_tree,
+                    "origin",
+                    refspecs,
+                    set_upstream=True,
+                )
+            finally:
+                if mirrored:
+                    result.destinations = mirrored.result()
+        transaction.pushed(name)
+        result.pushed_sha = _git(ErrorKind.PUSH_FAILED, git.rev_parse, work_tree)
+        record_transfer("push", pack_size_bytes(work_tree))
+
+        if config.verify:
+            # Compare refs instead of cloning the new repository again
+            with self._phase(config, result, "verify"):
+                result.verification = verify_push(
+                    work_tree,
+                    result.ssh_url,
+                    refspecs,
+                    git,
+                    github_repo=metadata.full_name if config.verify_tree else None,
+                    branch=result.branch,
+                )
+            if not result.verification.ok:
+                raise DuplicationError(
+                    ErrorKind.VERIFY_FAILED, result.verification.summary()
+                )
+
+        if config.lfs:
+            with self._phase(config, result, "lfs"):
+                try:
+                    result.lfs = duplicate_lfs_objects(
+                        work_tree,
+                        result.template_url,
+                        result.ssh_url,
+                        config.lfs_jobs,
+                        on_progress=config.lfs_progress,
+                    )
+                except LfsError as e:
+                    raise DuplicationError(ErrorKind.LFS_FAILED, str(e)) from e
+            record_transfer("lfs", result.lfs.bytes_transferred)
+            if result.lfs.failed:
+                raise DuplicationError(
+                    ErrorKind.LFS_FAILED,
+                    f"{len(result.lfs.failed)} of {result.lfs.total} LFS objects failed",
+                )
+
+        if config.settings:
+            with self._phase(config, result, "settings"):
+                result.settings = apply_settings(metadata.full_name, config.settings)
+            failed = [s for s in result.settings if not s.ok]
+            if failed:
+                raise DuplicationError(
+                    ErrorKind.SETTINGS_FAILED,
+                    "; ".join(f"{s.setting}: {s.error}" for s in failed),
+                )
+
+        failed_destinations = [d for d in result.destinations if not d.success]
+        if failed_destinations:
+            raise DuplicationError(
+                ErrorKind.DESTINATION_FAILED,
+                "; ".join(f"{d.destination}: {d.error}" for d in failed_destinations),
+            )
+
+        if config.clone_back:
+            target = os.path.join(
+                config.clone_back_dir or os.getcwd(), name.split("/")[-1]
+            )
+            if not os.path.exists(target):
+                transaction.created_directory(target)
+            with self._phase(config, result, "clone_back"):
+                _run(
+                    ["gh", "repo", "clone", name, target, "--", "--quiet"],
+                    ErrorKind.CLONE_BACK_FAILED,
+                )
+            result.local_path = target
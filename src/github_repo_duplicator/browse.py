@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Template previews for GitHub Repo Duplicator.
+
+Templates are browsed without cloning them in full: a blobless partial clone
+in the cache holds every commit and tree but no file contents, so listings
+come from local trees and only the files actually printed are downloaded.
+A template that already has a mirror in the cache is browsed from it
+without any network access. Sizes of files not downloaded yet come from the
+GitHub trees API in one request.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .cache import get_cache_dir, repo_basename
+from .github_api import GitHubApiError, metadata_from_url
+from .mirrors import MIRROR_REFSPEC, TAGS_REFSPEC, current_mirror, mirror_path
+from .registry import normalize_template_url
+from .watchdog import run_with_deadline
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds a preview clone is used before its commits and trees are fetched again
+PREVIEW_TTL = 600
+
+# File inside a preview clone whose modification time is its last fetch
+FETCH_STAMP = "last-fetch"
+
+
+class PreviewError(Exception):
+    """Raised when a template cannot be browsed."""
+
+
+@dataclass
+class TreeEntry:
+    """A file, directory or submodule in a template."""
+
+    path: str
+    type: str
+    mode: str
+    sha: str
+    size: Optional[int] = None
+
+
+def format_size(size: Optional[int]) -> str:
+    """Format a byte count for listings, e.g. ``1.5K``; ``-`` if unknown."""
+    if size is None:
+        return "-"
+    if size < 1024:
+        return f"{size}B"
+    value = size / 1024
+    for unit in ("K", "M"):
+        if value < 1024:
+            return f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}G"
+
+
+def _git(args: List[str], cwd: Optional[str] = None, text: bool = True):
+    """Run a git command and return its output, raising PreviewError on failure."""
+    try:
+        return run_with_deadline(
+            ["git"] + args, cwd=cwd, check=True, capture_output=True, text=text
+        ).stdout
+    except subprocess.CalledProcessError as e:
+        stderr = (
+            e.stderr.decode(errors="replace") if e.stderr and not text else e.stderr
+        )
+        raise PreviewError((stderr or str(e)).strip()) from e
+    except OSError as e:
+        raise PreviewError(str(e)) from e
+
+
+def preview_path(url: str) -> str:
+    """Get the cache location of the preview clone of a template."""
+    digest = hashlib.sha1(url.encode()).hexdigest()[:12]
+    return os.path.join(get_cache_dir("previews"), f"{repo_basename(url)}-{digest}.git")
+
+
+def open_template(template: str, refresh: bool = False) -> str:
+    """
+    Get a local repository to browse a template from.
+
+    Args:
+        template: A template URL, or the path of a local repository.
+        refresh: Fetch new commits even if the preview clone is recent.
+
+    Returns:
+        The template itself if it is local, its cached mirror if there is
+        one, or else a blobless partial clone in the cache.
+
+    Raises:
+        PreviewError: If the template cannot be cloned or fetched.
+    """
+    if os.path.isdir(template):
+        return template
+    url = normalize_template_url(template)
+    if os.path.isdir(mirror_path(url)):
+        mirror = current_mirror(url, template) if refresh else mirror_path(url)
+        if mirror:
+            return mirror
+    path = preview_path(url)
+    lock_file = open(f"{path}.lock", "w")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        stamp = os.path.join(path, FETCH_STAMP)
+        if not os.path.isdir(path):
+            logger.info(f"Creating blobless preview clone of {template}")
+            partial = f"{path}.partial"
+            shutil.rmtree(partial, ignore_errors=True)
+            _git(
+                ["clone", "--bare", "--quiet", "--filter=blob:none", template, partial]
+            )
+            os.replace(partial, path)
+        elif refresh or time.time() - os.path.getmtime(stamp) > PREVIEW_TTL:
+            # Bare clones set no fetch refspec, so name the refs to update
+            _git(
+                ["fetch", "--quiet", "--prune", "--filter=blob:none", "origin"]
+                + [MIRROR_REFSPEC, TAGS_REFSPEC],
+                path,
+            )
+        with open(stamp, "w"):
+            pass
+    except OSError as e:
+        raise PreviewError(str(e)) from e
+    finally:
+        lock_file.close()
+    return path
+
+
+def _local_sizes(repo_dir: str) -> Dict[str, int]:
+    """Get the sizes of the blobs present locally, without fetching any."""
+    # Listing only what is stored locally never asks the promisor remote
+    output = _git(["cat-file", "--batch-check", "--batch-all-objects"], repo_dir)
+    sizes = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[1] == "blob":
+            sizes[parts[0]] = int(parts[2])
+    return sizes
+
+
+def _is_partial(repo_dir: str) -> bool:
+    """Whether a repository is a partial clone missing some objects."""
+    value = _git(["config", "--default", "", "remote.origin.promisor"], repo_dir)
+    return value.strip() == "true"
+
+
+def github_tree_sizes(template: str, tree_sha: str, recursive: bool) -> Dict[str, int]:
+    """
+    Get the sizes of the files in a tree of a GitHub template in one request.
+
+    Args:
+        template: The template URL.
+        tree_sha: The tree to list.
+        recursive: Whether to include subdirectories.
+
+    Returns:
+        The size of every file by its SHA; empty for templates not on GitHub.
+
+    Raises:
+        GitHubApiError: If the request fails.
+    """
+    metadata = metadata_from_url(normalize_template_url(template))
+    if metadata is None or "github.com" not in metadata.https_url:
+        return {}
+    endpoint = f"repos/{metadata.full_name}/git/trees/{tree_sha}"
+    if recursive:
+        endpoint += "?recursive=1"
+    try:
+        result = run_with_deadline(
+            ["gh", "api", endpoint], check=True, capture_output=True, text=True
+        )
+        tree = json.loads(result.stdout)["tree"]
+    except subprocess.CalledProcessError as e:
+        raise GitHubApiError((e.stderr or str(e)).strip()) from e
+    except (OSError, ValueError, KeyError) as e:
+        raise GitHubApiError(f"Could not list {metadata.full_name}: {e}") from e
+    return {item["sha"]: item["size"] for item in tree if item.get("type") == "blob"}
+
+
+def _batch_sizes(repo_dir: str, shas: List[str]) -> Dict[str, int]:
+    """Get the sizes of objects stored locally in one git process."""
+    if not shas:
+        return {}
+    try:
+        result = run_with_deadline(
+            ["git", "cat-file", "--batch-check"],
+            cwd=repo_dir,
+            input="\n".join(shas) + "\n",
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except (subprocess.CalledProcessError, OSError) as e:
+        raise PreviewError(str(e)) from e
+    sizes = {}
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 3:
+            sizes[parts[0]] = int(parts[2])
+    return sizes
+
+
+def list_tree(
+    template: str,
+    path: str = "",
+    rev: str = "HEAD",
+    recursive: bool = False,
+    refresh: bool = False,
+) -> List[TreeEntry]:
+    """
+    List the files and directories of a template.
+
+    Args:
+        template: A template URL, or the path of a local repository.
+        path: The directory to list; the root by default.
+        rev: The branch, tag or commit to list.
+        recursive: Whether to list subdirectories too.
+        refresh: Fetch new commits even if the preview clone is recent.
+
+    Returns:
+        The entries, with file sizes where they are known.
+
+    Raises:
+        PreviewError: If the template or the directory cannot be read.
+    """
+    repo_dir = open_template(template, refresh)
+    treeish = f"{rev}:{path.strip('/')}"
+    output = _git(
+        ["ls-tree", "-z"] + (["-r"] if recursive else []) + [treeish], repo_dir
+    )
+    entries = []
+    for record in output.split("\0"):
+        if not record:
+            continue
+        info, _, name = record.partition("\t")
+        mode, kind, sha = info.split()
+        entries.append(TreeEntry(name, kind, mode, sha))
+    if not entries:
+        return entries
+
+    if _is_partial(repo_dir):
+        sizes = _local_sizes(repo_dir)
+        missing = [e for e in entries if e.type == "blob" and e.sha not in sizes]
+        if missing:
+            try:
+                tree_sha = _git(["rev-parse", treeish], repo_dir).strip()
+                sizes.update(github_tree_sizes(template, tree_sha, recursive))
+            except (GitHubApiError, PreviewError) as e:
+                logger.warning(f"Could not look up file sizes: {e}")
+        for entry in entries:
+            entry.size = sizes.get(entry.sha)
+    else:
+        blobs = [entry for entry in entries if entry.type == "blob"]
+        sizes = _batch_sizes(repo_dir, [entry.sha for entry in blobs])
+        for entry in blobs:
+            entry.size = sizes.get(entry.sha)
+    return entries
+
+
+def read_file(
+    template: str, path: str, rev: str = "HEAD", refresh: bool = False
+) -> bytes:
+    """
+    Read one file of a template, downloading only that file if needed.
+
+    Args:
+        template: A template URL, or the path of a local repository.
+        path: The file to read.
+        rev: The branch, tag or commit to read it from.
+        refresh: Fetch new commits even if the preview clone is recent.
+
+    Returns:
+        The contents of the file.
+
+    Raises:
+        PreviewError: If the template cannot be read or the path is not a file.
+    """
+    repo_dir = open_template(template, refresh)
+    spec = f"{rev}:{path.strip('/')}"
+    kind = _git(["cat-file", "-t", spec], repo_dir).strip()
+    if kind != "blob":
+        raise PreviewError(f"{path} is a {kind}, not a file")
+    return _git(["cat-file", "blob", spec], repo_dir, text=False)
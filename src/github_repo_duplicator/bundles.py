@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Offline template bundles for GitHub Repo Duplicator.
+
+A template can be packaged into a single ``git bundle`` file together with a
+JSON metadata sidecar. Bundles are verified before use and can be imported
+into the local bundle store, so duplications can run without downloading the
+template from GitHub.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from . import __version__
+from .cache import get_cache_dir, repo_basename
+from .registry import normalize_template_url
+from .watchdog import DeadlineExceeded, deadline, run_with_deadline
+
+logger = logging.getLogger(__name__)
+
+# Version of the metadata sidecar layout
+BUNDLE_FORMAT = 1
+
+# Suffix appended to a bundle path to name its metadata sidecar
+METADATA_SUFFIX = ".json"
+
+
+class BundleError(Exception):
+    """Raised when a bundle cannot be created, verified or imported."""
+
+
+@dataclass
+class BundleMetadata:
+    """Description of a template bundle, stored next to the bundle file."""
+
+    template_url: str
+    head: str
+    refs: Dict[str, str] = field(default_factory=dict)
+    sha256: str = ""
+    size: int = 0
+    created_at: float = 0.0
+    tool_version: str = __version__
+    format: int = BUNDLE_FORMAT
+
+
+def _git(args: List[str], cwd: Optional[str] = None) -> str:
+    """Run a git command and return its stripped standard output."""
+    try:
+        result = run_with_deadline(
+            ["git"] + args, cwd=cwd, check=True, capture_output=True, text=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise BundleError((e.stderr or str(e)).strip()) from e
+    except (DeadlineExceeded, OSError) as e:
+        raise BundleError(str(e)) from e
+    return result.stdout.strip()
+
+
+def _sha256(path: str) -> str:
+    """Compute the SHA-256 checksum of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def metadata_path(bundle_path: str) -> str:
+    """Get the path of the metadata sidecar for a bundle."""
+    return bundle_path + METADATA_SUFFIX
+
+
+def read_metadata(bundle_path: str) -> BundleMetadata:
+    """
+    Read the metadata sidecar of a bundle.
+
+    Args:
+        bundle_path: The path of the bundle file.
+
+    Returns:
+        The bundle metadata.
+
+    Raises:
+        BundleError: If the sidecar is missing or malformed.
+    """
+    try:
+        with open(metadata_path(bundle_path), encoding="utf-8") as f:
+            return BundleMetadata(**json.load(f))
+    except (OSError, ValueError, TypeError) as e:
+        raise BundleError(f"Cannot read bundle metadata: {e}") from e
+
+
+def list_heads(bundle_path: str) -> Dict[str, str]:
+    """
+    List the refs contained in a bundle.
+
+    Args:
+        bundle_path: The path of the bundle file.
+
+    Returns:
+        A mapping of ref name to object SHA.
+    """
+    refs = {}
+    for line in _git(["bundle", "list-heads", bundle_path]).splitlines():
+        sha, _, ref = line.partition(" ")
+        refs[ref] = sha
+    return refs
+
+
+def verify_bundle(bundle_path: str) -> BundleMetadata:
+    """
+    Verify a bundle against its metadata and with ``git bundle verify``.
+
+    Args:
+        bundle_path: The path of the bundle file.
+
+    Returns:
+        The verified bundle metadata.
+
+    Raises:
+        BundleError: If the bundle is corrupt or does not match its metadata.
+    """
+    bundle_path = os.path.abspath(bundle_path)
+    if not os.path.isfile(bundle_path):
+        raise BundleError(f"Bundle not found: {bundle_path}")
+
+    metadata = read_metadata(bundle_path)
+    if _sha256(bundle_path) != metadata.sha256:
+        raise BundleError(f"Checksum mismatch for bundle {bundle_path}")
+
+    # git refuses to verify a bundle outside of a repository
+    scratch = tempfile.mkdtemp(prefix="bundle_verify_")
+    try:
+        with deadline("bundle"):
+            _git(["init", "--quiet", "--bare", scratch])
+            _git(["bundle", "verify", "--quiet", bundle_path], cwd=scratch)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if list_heads(bundle_path) != metadata.refs:
+        raise BundleError(f"Refs in bundle {bundle_path} do not match its metadata")
+    return metadata
+
+
+def export_bundle(template_url: str, output_path: str) -> BundleMetadata:
+    """
+    Package a template repository into a verified bundle with metadata.
+
+    Args:
+        template_url: The URL of the template repository.
+        output_path: Where to write the bundle file.
+
+    Returns:
+        The metadata written next to the bundle.
+
+    Raises:
+        BundleError: If the template cannot be fetched or bundled.
+    """
+    output_path = os.path.abspath(output_path)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    logger.info(f"Exporting {template_url} to {output_path}")
+
+    scratch = tempfile.mkdtemp(prefix="bundle_export_")
+    try:
+        git_dir = os.path.join(scratch, "template.git")
+        with deadline("bundle"):
+            _git(["clone", "--bare", "--quiet", template_url, git_dir])
+            _git(
+                [
+                    "bundle",
+                    "create",
+                    "--quiet",
+                    output_path,
+                    "HEAD",
+                    "--branches",
+                    "--tags",
+                ],
+                cwd=git_dir,
+            )
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    refs = list_heads(output_path)
+    metadata = BundleMetadata(
+        template_url=template_url,
+        head=refs.get("HEAD", ""),
+        refs=refs,
+        sha256=_sha256(output_path),
+        size=os.path.getsize(output_path),
+        created_at=time.time(),
+    )
+    with open(metadata_path(output_path), "w", encoding="utf-8") as f:
+        json.dump(asdict(metadata), f, indent=2, sort_keys=True)
+
+    return verify_bundle(output_path)
+
+
+def get_bundle_store() -> str:
+    """Get the directory holding imported bundles."""
+    return get_cache_dir("bundles")
+
+
+def store_path(template_url: str) -> str:
+    """
+    Get the location of a template's bundle in the bundle store.
+
+    Templates with the same name from different owners get different paths.
+    """
+    url = normalize_template_url(template_url)
+    digest = hashlib.sha1(url.encode()).hexdigest()[:12]
+    return os.path.join(get_bundle_store(), f"{repo_basename(url)}-{digest}.bundle")
+
+
+def import_bundle(bundle_path: str) -> str:
+    """
+    Verify a bundle and copy it into the local bundle store.
+
+    Args:
+        bundle_path: The path of the bundle file to import.
+
+    Returns:
+        The path of the imported bundle inside the store.
+
+    Raises:
+        BundleError: If the bundle fails verification.
+    """
+    metadata = verify_bundle(bundle_path)
+    target = store_path(metadata.template_url)
+    if os.path.abspath(bundle_path) != target:
+        # Copy under a temporary name so a half-written bundle is never found
+        partial = target + ".partial"
+        shutil.copyfile(bundle_path, partial)
+        shutil.copyfile(metadata_path(bundle_path), metadata_path(target))
+        os.replace(partial, target)
+    logger.info(f"Imported bundle for {metadata.template_url} to {target}")
+    return target
+
+
+def find_bundle(template_url: str) -> Optional[str]:
+    """
+    Find an imported bundle for a template.
+
+    Args:
+        template_url: The URL of the template repository.
+
+    Returns:
+        The path of the matching bundle, or None if none was imported.
+    """
+    candidate = store_path(template_url)
+    if not os.path.isfile(candidate):
+        return None
+    try:
+        imported = read_metadata(candidate).template_url
+        if normalize_template_url(imported) == normalize_template_url(template_url):
+            return candidate
+    except BundleError:
+        logger.warning(f"Ignoring bundle with unreadable metadata: {candidate}")
+    return None
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Local cache locations for GitHub Repo Duplicator.
+
+Everything the tool keeps between runs lives under a single cache directory,
+which can be moved with the ``GITHUB_REPO_DUPLICATOR_CACHE`` environment
+variable.
+"""
+
+import os
+
+# Environment variable overriding the cache directory
+CACHE_DIR_ENV = "GITHUB_REPO_DUPLICATOR_CACHE"
+
+
+def get_cache_dir(*parts: str) -> str:
+    """
+    Get a directory inside the local cache, creating it if needed.
+
+    Args:
+        parts: Optional path components below the cache root.
+
+    Returns:
+        The absolute path of the requested cache directory.
+    """
+    root = os.environ.get(CACHE_DIR_ENV) or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "github_repo_duplicator",
+    )
+    path = os.path.abspath(os.path.join(root, *parts))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def repo_basename(url: str) -> str:
+    """
+    Get the repository name from a URL or path, without the ``.git`` suffix.
+
+    Args:
+        url: A repository URL or local path.
+
+    Returns:
+        The bare repository name.
+    """
+    name = os.path.basename(url.rstrip("/"))
+    return name[: -len(".git")] if name.endswith(".git") else name
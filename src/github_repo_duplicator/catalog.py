@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Searchable template catalog for GitHub Repo Duplicator.
+
+The catalog combines the built-in templates with the template repositories
+of configured owners, cached in the cache directory so listing hundreds of
+templates costs no requests on most runs. ``TemplateIndex`` keeps prefix and
+trigram indexes over the words of every template's name, description and
+topics, so ranked results can be recomputed on every keystroke, and small
+typos still find the intended template.
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+from .cache import get_cache_dir, repo_basename
+from .github_api import GitHubApiError, list_template_repositories
+
+logger = logging.getLogger(__name__)
+
+# Environment variable overriding the catalog file location
+CATALOG_PATH_ENV = "GITHUB_REPO_DUPLICATOR_CATALOG"
+
+# How long the cached templates of an owner are used before refetching
+CATALOG_MAX_AGE = 24 * 3600
+
+# Relevance of a match in each field
+FIELD_WEIGHTS = {"name": 3.0, "topics": 2.0, "description": 1.0}
+
+# Scores of a query word that equals, starts or fuzzily matches a word
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.75
+FUZZY_SCORE = 0.6
+
+# Minimum trigram similarity of a fuzzy match
+FUZZY_THRESHOLD = 0.3
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+@dataclass
+class CatalogEntry:
+    """A template repository in the catalog."""
+
+    url: str
+    name: str = ""
+    description: str = ""
+    topics: List[str] = field(default_factory=list)
+    owner: str = ""
+
+    def __post_init__(self):
+        if not self.name:
+            self.name = repo_basename(self.url)
+
+
+@dataclass
+class SearchResult:
+    """A template matching a query, with its relevance."""
+
+    entry: CatalogEntry
+    score: float
+
+
+def default_catalog_path() -> str:
+    """Get the catalog file location from the environment or the cache."""
+    return os.environ.get(CATALOG_PATH_ENV) or os.path.join(
+        get_cache_dir(), "catalog.json"
+    )
+
+
+def _read_catalog(path: str) -> Dict:
+    """Read a catalog file, treating a missing or corrupt one as empty."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {"owners": {}, "templates": []}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable template catalog {path}: {e}")
+        return {"owners": {}, "templates": []}
+    if isinstance(data, list):
+        # A hand-written catalog may be a plain list of templates
+        data = {"templates": data}
+    data.setdefault("owners", {})
+    data.setdefault("templates", [])
+    return data
+
+
+def _write_catalog(path: str, data: Dict) -> None:
+    """Write a catalog file atomically."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _url_key(url: str) -> str:
+    """Normalise a repository URL for de-duplication."""
+    url = url.rstrip("/").lower()
+    return url[: -len(".git")] if url.endswith(".git") else url
+
+
+def load_catalog(
+    defaults: Iterable[str] = (),
+    owners: Iterable[str] = (),
+    refresh: bool = False,
+    path: Optional[str] = None,
+    max_age: float = CATALOG_MAX_AGE,
+) -> List[CatalogEntry]:
+    """
+    Load the template catalog, refetching owners whose templates are stale.
+
+    Args:
+        defaults: Template URLs that are always in the catalog.
+        owners: Users or organizations whose template repositories to list.
+        refresh: Whether to refetch every owner regardless of age.
+        path: The catalog file; defaults to the cache or the environment.
+        max_age: Seconds after which an owner's templates are refetched.
+
+    Returns:
+        The templates, defaults first, without duplicate URLs.
+    """
+    path = path or default_catalog_path()
+    data = _read_catalog(path)
+    changed = False
+    for owner in owners:
+        fetched_at = data["owners"].get(owner)
+        if not refresh and fetched_at and time.time() - fetched_at < max_age:
+            continue
+        try:
+            templates = list_template_repositories(owner)
+        except GitHubApiError as e:
+            logger.warning(f"Could not list templates of {owner}: {e}")
+            continue
+        data["templates"] = [
+            t for t in data["templates"] if t.get("owner") != owner
+        ] + [dict(t, owner=owner) for t in templates]
+        data["owners"][owner] = time.time()
+        changed = True
+        logger.debug(f"Cached {len(templates)} templates of {owner}")
+    if changed:
+        try:
+            _write_catalog(path, data)
+        except OSError as e:
+            logger.warning(f"Could not cache the template catalog: {e}")
+
+    entries = [CatalogEntry(url=url) for url in defaults]
+    for template in data["templates"]:
+        try:
+            entries.append(CatalogEntry(**template))
+        except TypeError:
+            logger.warning(f"Ignoring malformed catalog entry: {template}")
+    seen: Set[str] = set()
+    unique = []
+    for entry in entries:
+        key = _url_key(entry.url)
+        if key not in seen:
+            seen.add(key)
+            unique.append(entry)
+    return unique
+
+
+def words(text: str) -> List[str]:
+    """Split text into lowercase words."""
+    return _WORD.findall(text.lower())
+
+
+def trigrams(word: str) -> Set[str]:
+    """Get the trigrams of a word, padded so short words have some."""
+    padded = f" {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TemplateIndex:
+    """In-memory prefix and trigram index over catalog entries."""
+
+    def __init__(self, entries: List[CatalogEntry]):
+        self.entries = list(entries)
+        # Word -> entry -> weight of the best field the word occurs in
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._prefixes: Dict[str, Set[str]] = defaultdict(set)
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        for i, entry in enumerate(self.entries):
+            fields = {
+                "name": entry.name,
+                "topics": " ".join(entry.topics),
+                "description": entry.description,
+            }
+            for field_name, text in fields.items():
+                weight = FIELD_WEIGHTS[field_name]
+                for word in words(text):
+                    postings = self._postings[word]
+                    postings[i] = max(postings.get(i, 0.0), weight)
+        for word in self._postings:
+            for end in range(1, len(word) + 1):
+                self._prefixes[word[:end]].add(word)
+            for gram in trigrams(word):
+                self._trigrams[gram].add(word)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _word_scores(self, query_word: str) -> Dict[str, float]:
+        """Score every indexed word against one query word."""
+        scores = {
+            word: EXACT_SCORE if word == query_word else PREFIX_SCORE
+            for word in self._prefixes.get(query_word, ())
+        }
+        if len(query_word) < 3:
+            return scores
+        query_grams = trigrams(query_word)
+        shared = Counter(
+            word for gram in query_grams for word in self._trigrams.get(gram, ())
+        )
+        for word, count in shared.items():
+            similarity = count / (len(query_grams) + len(trigrams(word)) - count)
+            if similarity >= FUZZY_THRESHOLD:
+                scores[word] = max(scores.get(word, 0.0), FUZZY_SCORE * similarity)
+        return scores
+
+    def search(self, query: str, limit: Optional[int] = 10) -> List[SearchResult]:
+        """
+        Find the templates matching every word of a query.
+
+        Args:
+            query: Words, or beginnings of words, to look for.
+            limit: Maximum number of results, or None for all.
+
+        Returns:
+            Matches, best first. An empty query lists templates in catalog
+            order, built-in templates first.
+        """
+        query_words = words(query)
+        if not query_words:
+            return [SearchResult(entry, 0.0) for entry in self.entries[:limit]]
+
+        totals: Optional[Dict[int, float]] = None
+        for query_word in query_words:
+            best: Dict[int, float] = {}
+            for word, score in self._word_scores(query_word).items():
+                for i, weight in self._postings[word].items():
+                    best[i] = max(best.get(i, 0.0), score * weight)
+            if totals is None:
+                totals = best
+            else:
+                totals = {i: totals[i] + best[i] for i in totals if i in best}
+            if not totals:
+                return []
+        ranked = sorted(
+            totals.items(),
+            key=lambda item: (-item[1], self.entries[item[0]].name.lower()),
+        )
+        return [SearchResult(self.entries[i], score) for i, score in ranked[:limit]]
+
+    def best_match(self, query: str) -> Optional[CatalogEntry]:
+        """Get the best matching template, or None if nothing matches."""
+        results = self.search(query, limit=1)
+        return results[0].entry if results else None
@@ -6,10 +6,18 @@ Command-line interface for GitHub Repo Duplicator.
 import argparse
 import logging
 import os
+import sqlite3
 import sys
+import time
 from typing import List, Optional
 
 from . import __version__
+from .api import DuplicationResult, Duplicator, DuplicatorConfig
+from .browse import PreviewError, format_size, list_tree, read_file
+from .bundles import BundleError, export_bundle, import_bundle, verify_bundle
+from .cache import repo_basename
+from .catalog import TemplateIndex, load_catalog
+from .destinations import parse_destination
 from .duplicator import (
     Colors,
     check_github_authenticated,
@@ -27,6 +35,72 @@ from .duplicator import (
     print_warning,
     push_to_new_repository,
 )
+from .fanout import DEFAULT_MAX_WORKERS, FanOutResult, fan_out, read_names_file
+from .git_backend import BACKENDS
+from .governor import (
+    PROCESSES_PER_CORE,
+    busy_slots,
+    parse_slots,
+    set_slots,
+    slot_limit,
+)
+from .jobqueue import (
+    DEFAULT_LEASE,
+    DEFAULT_MAX_ATTEMPTS,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_WORKER_JOBS,
+    FAILED,
+    QUEUED,
+    RUNNING,
+    Job,
+    JobQueue,
+    Worker,
+)
+from .lfs import DEFAULT_LFS_JOBS
+from .metrics import record_duplication, serve_metrics, write_textfile
+from .precheck import precheck_names
+from .prewarm import (
+    DEFAULT_PREWARM_INTERVAL,
+    DEFAULT_PREWARM_JOBS,
+    DEFAULT_PREWARM_TOP,
+    DEFAULT_USAGE_WINDOW_DAYS,
+    Prewarmer,
+    PrewarmResult,
+    popular_templates,
+    prewarm,
+)
+from .registry import RegistryEntry, RegistryError, get_registry
+from .rollback import (
+    DEFAULT_CLEANUP_JOBS,
+    DEFAULT_ORPHAN_AGE,
+    DEFAULT_ROLLBACK_POLICY,
+    ROLLBACK_POLICIES,
+    RollbackResult,
+    cleanup_orphans,
+    find_orphans,
+)
+from .settings import (
+    DEFAULT_CONFIGURE_JOBS,
+    RepoSettings,
+    SettingResult,
+    SettingsError,
+    configure_repositories,
+    load_settings,
+    read_manifest_settings,
+    summarize,
+)
+from .ssh_mux import SshMultiplexer
+from .submodules import DEFAULT_SUBMODULE_JOBS
+from .sync import (
+    DEFAULT_SYNC_JOBS,
+    STRATEGIES,
+    SyncError,
+    SyncResult,
+    sync_repositories,
+)
+from .tokens import CORE, GRAPHQL, TokenError, get_pool, load_tokens, set_pool
+from .watchdog import parse_deadlines, set_deadlines
+from .workspace import install_signal_handlers
 
 
 def setup_logging(verbose: bool = False) -> None:
@@ -38,7 +112,7 @@ def setup_logging(verbose: bool = False) -> None:
     )
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(
         description="GitHub Repository Duplicator for Templates",
@@ -67,6 +141,28 @@ def parse_args() -> argparse.Namespace:
         help="Template repository URL to use (skips template selection)",
     )
 
+    parser.add_argument(
+        "-q",
+        "--template-query",
+        type=str,
+        help="Use the best template matching this search (skips template selection)",
+    )
+
+    parser.add_argument(
+        "--catalog-owner",
+        dest="catalog_owners",
+        action="append",
+        metavar="OWNER",
+        help="Also offer the template repositories of this user or organization "
+        "(repeatable; cached for a day)",
+    )
+
+    parser.add_argument(
+        "--refresh-catalog",
+        action="store_true",
+        help="Refetch the templates of --catalog-owner owners now",
+    )
+
     parser.add_argument(
         "-n", "--name", type=str, help="Name for the new repository (skips name prompt)"
     )
@@ -81,14 +177,568 @@ def parse_args() -> argparse.Namespace:
         help="Check GitHub CLI installation and authentication",
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "-b",
+        "--bundle",
+        type=str,
+        help="Template bundle to duplicate from instead of downloading the template",
+    )
+
+    parser.add_argument(
+        "--lfs",
+        action="store_true",
+        help="Copy Git LFS objects into the new repository",
+    )
+
+    parser.add_argument(
+        "--lfs-jobs",
+        type=int,
+        default=DEFAULT_LFS_JOBS,
+        help="Maximum number of LFS objects transferred at once",
+    )
+
+    parser.add_argument(
+        "--recurse-submodules",
+        action="store_true",
+        help="Check out the template's submodules recursively",
+    )
+
+    parser.add_argument(
+        "--submodule-jobs",
+        type=int,
+        default=DEFAULT_SUBMODULE_JOBS,
+        help="Maximum number of submodules fetched at once",
+    )
+
+    parser.add_argument(
+        "--submodule-mirror-cache",
+        action="store_true",
+        help="Seed submodules from the local mirror cache",
+    )
+
+    parser.add_argument(
+        "--submodule-owner",
+        type=str,
+        help="Point GitHub submodules at duplicated copies under this owner",
+    )
+
+    parser.add_argument(
+        "--settings",
+        dest="settings_file",
+        type=str,
+        help="JSON file of settings (topics, branch protection, collaborators, "
+        "labels, ...) to apply to new repositories",
+    )
+
+    parser.add_argument(
+        "--destination",
+        action="append",
+        dest="destinations",
+        type=parse_destination,
+        default=[],
+        metavar="KIND:LOCATION",
+        help="Also push new repositories to this destination, concurrently "
+        "with GitHub: github:OWNER, git:URL (with an optional {name} "
+        "placeholder) or bare:PATH; may be given multiple times",
+    )
+
+    parser.add_argument(
+        "--no-verify",
+        dest="verify",
+        action="store_false",
+        help="Do not compare the refs of new repositories with the pushed ones",
+    )
+
+    parser.add_argument(
+        "--verify-tree",
+        action="store_true",
+        help="Also compare the tree of the default branch through the GitHub API",
+    )
+
+    parser.add_argument(
+        "--rollback",
+        choices=ROLLBACK_POLICIES,
+        default=DEFAULT_ROLLBACK_POLICY,
+        help="What a failed job removes of what it created: repositories "
+        "and directories nothing was pushed to (auto), everything "
+        "(always) or nothing (never); kept leftovers are removed by 'cleanup'",
+    )
+
+    parser.add_argument(
+        "--git-backend",
+        choices=list(BACKENDS),
+        help="Git implementation used for clones and pushes "
+        "(default: $GITHUB_REPO_DUPLICATOR_GIT_BACKEND or subprocess)",
+    )
+
+    parser.add_argument(
+        "--workspace-root",
+        type=str,
+        help="Directory for temporary clones, e.g. a tmpfs "
+        "(default: $GITHUB_REPO_DUPLICATOR_WORKSPACE or the temp directory)",
+    )
+
+    parser.add_argument(
+        "--deadline",
+        dest="deadlines",
+        action="append",
+        type=parse_deadlines,
+        metavar="PHASE=SECONDS",
+        help="Kill a phase (clone, create, push, lfs, auth, ...) that runs "
+        "longer than this; repeatable, comma-separated, 0 disables "
+        "(default: $GITHUB_REPO_DUPLICATOR_DEADLINES or built-in deadlines)",
+    )
+
+    parser.add_argument(
+        "--tokens",
+        dest="tokens_file",
+        type=str,
+        metavar="FILE",
+        help="JSON list of GitHub credentials to spread API requests over by "
+        "owner and remaining quota (default: $GITHUB_REPO_DUPLICATOR_TOKENS)",
+    )
+
+    parser.add_argument(
+        "--git-slots",
+        action="append",
+        type=parse_slots,
+        metavar="KIND=COUNT",
+        help="Host-wide number of concurrent git clones, pushes and pack "
+        "operations shared by all runs, e.g. clone=4,push=8,pack=1; "
+        "repeatable, 0 lifts a limit (default: $GITHUB_REPO_DUPLICATOR_GIT_SLOTS "
+        "or sized from cores, free memory and I/O pressure)",
+    )
+
+    parser.add_argument(
+        "--no-ssh-multiplexing",
+        dest="ssh_multiplexing",
+        action="store_false",
+        help="Open a new SSH connection for every git operation instead of "
+        "sharing one per host",
+    )
+
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        help="Add this run's metrics to an OpenMetrics textfile",
+    )
+
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve OpenMetrics on this port while the command runs",
+    )
+
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    fan_out_parser = subparsers.add_parser(
+        "fan-out",
+        help="Create many repositories from one template concurrently",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    fan_out_parser.add_argument(
+        "-t",
+        "--template",
+        type=str,
+        help="Template repository URL to duplicate",
+    )
+    fan_out_parser.add_argument(
+        "-b",
+        "--bundle",
+        type=str,
+        help="Template bundle to duplicate from instead of the template URL",
+    )
+    fan_out_parser.add_argument(
+        "names", nargs="*", help="Names of the repositories to create"
+    )
+    fan_out_parser.add_argument(
+        "-f",
+        "--names-file",
+        type=str,
+        help="File with one repository name per line, or a CSV manifest "
+        "with a name column and settings columns",
+    )
+    fan_out_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Maximum number of repositories created and pushed at once",
+    )
+    fan_out_parser.add_argument(
+        "--public", action="store_true", help="Create public repositories"
+    )
+    fan_out_parser.add_argument(
+        "--lfs",
+        action="store_true",
+        help="Copy Git LFS objects into every new repository",
+    )
+    fan_out_parser.add_argument(
+        "-d", "--description", type=str, default="", help="Repository description"
+    )
+    fan_out_parser.add_argument(
+        "--no-precheck",
+        dest="precheck",
+        action="store_false",
+        help="Do not look up which names already exist before starting",
+    )
+
+    configure_parser = subparsers.add_parser(
+        "configure",
+        help="Apply --settings and manifest settings to existing repositories",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    configure_parser.add_argument(
+        "repos", nargs="*", help="Repositories to configure (owner/name or name)"
+    )
+    configure_parser.add_argument(
+        "-f",
+        "--names-file",
+        type=str,
+        help="File with one repository per line, or a manifest with settings columns",
+    )
+    configure_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=DEFAULT_CONFIGURE_JOBS,
+        help="Maximum number of repositories configured at once",
+    )
+
+    cleanup_parser = subparsers.add_parser(
+        "cleanup",
+        help="Remove repositories and directories left behind by failed jobs",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    cleanup_parser.add_argument(
+        "--min-age",
+        type=float,
+        default=DEFAULT_ORPHAN_AGE,
+        metavar="SECONDS",
+        help="Also remove leftovers of jobs that never finished, once this old",
+    )
+    cleanup_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=DEFAULT_CLEANUP_JOBS,
+        help="Maximum number of leftovers removed at once",
+    )
+    cleanup_parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="List the leftovers without removing them",
+    )
+    cleanup_parser.add_argument(
+        "--include-pushed",
+        action="store_true",
+        help="Also remove repositories that content was pushed to, which are "
+        "kept by default",
+    )
+
+    precheck_parser = subparsers.add_parser(
+        "precheck",
+        help="Check that repository names are valid and not taken yet",
+    )
+    precheck_parser.add_argument("names", nargs="*", help="Repository names")
+    precheck_parser.add_argument(
+        "-f",
+        "--names-file",
+        type=str,
+        help="File with one repository name per line",
+    )
+
+    export_parser = subparsers.add_parser(
+        "export-bundle",
+        help="Package templates into verified offline bundles",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    export_parser.add_argument(
+        "templates",
+        nargs="*",
+        help="Template URLs, or numbers from --list-templates",
+    )
+    export_parser.add_argument(
+        "-a",
+        "--all",
+        action="store_true",
+        help="Export every default template repository",
+    )
+    export_parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=str,
+        default=".",
+        help="Directory to write the bundles to",
+    )
+
+    import_parser = subparsers.add_parser(
+        "import-bundle",
+        help="Verify bundles and add them to the local bundle store",
+    )
+    import_parser.add_argument("bundles", nargs="+", help="Bundle files to import")
+
+    sync_parser = subparsers.add_parser(
+        "sync",
+        help="Propagate template updates into already-duplicated repositories",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    sync_parser.add_argument(
+        "-t",
+        "--template",
+        type=str,
+        required=True,
+        help="Template repository URL to sync from",
+    )
+    sync_parser.add_argument(
+        "repos",
+        nargs="*",
+        help="Downstream repositories (owner/name, URL or path)",
+    )
+    sync_parser.add_argument(
+        "-f",
+        "--names-file",
+        type=str,
+        help="File with one downstream repository per line",
+    )
+    sync_parser.add_argument(
+        "-s",
+        "--strategy",
+        choices=STRATEGIES,
+        default="merge",
+        help="Merge the template commit, or apply its changes as a patch",
+    )
+    sync_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=DEFAULT_SYNC_JOBS,
+        help="Maximum number of repositories synced at once",
+    )
+    sync_parser.add_argument(
+        "--base",
+        type=str,
+        help="Template commit to sync from, for repositories without a "
+        "recorded base",
+    )
+    sync_parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="Report what would change without pushing",
+    )
+
+    history_parser = subparsers.add_parser(
+        "history",
+        help="Show recorded duplications and syncs, newest first",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    history_parser.add_argument(
+        "-t", "--template", type=str, help="Only entries for this template"
+    )
+    history_parser.add_argument(
+        "-r", "--repo", type=str, help="Only entries for this repository"
+    )
+    history_parser.add_argument(
+        "-l", "--limit", type=int, default=50, help="Maximum number of entries"
+    )
+
+    inventory_parser = subparsers.add_parser(
+        "inventory",
+        help="List duplicated repositories and the template commit each is on",
+    )
+    inventory_parser.add_argument(
+        "-t", "--template", type=str, help="Only repositories from this template"
+    )
+    inventory_parser.add_argument(
+        "--older-than",
+        type=str,
+        metavar="SHA",
+        help="Only repositories based on a template commit older than SHA",
+    )
+
+    enqueue_parser = subparsers.add_parser(
+        "enqueue",
+        help="Add duplications to a job queue shared by worker processes",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    enqueue_parser.add_argument(
+        "-t",
+        "--template",
+        type=str,
+        required=True,
+        help="Template repository URL to duplicate",
+    )
+    enqueue_parser.add_argument(
+        "names", nargs="*", help="Names of the repositories to create"
+    )
+    enqueue_parser.add_argument(
+        "-f",
+        "--names-file",
+        type=str,
+        help="File with one repository name per line",
+    )
+    enqueue_parser.add_argument(
+        "--public", action="store_true", help="Create public repositories"
+    )
+    enqueue_parser.add_argument(
+        "--lfs",
+        action="store_true",
+        help="Copy Git LFS objects into every new repository",
+    )
+    enqueue_parser.add_argument(
+        "-d", "--description", type=str, default="", help="Repository description"
+    )
+    enqueue_parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=DEFAULT_MAX_ATTEMPTS,
+        help="Times a job is claimed before it fails for good",
+    )
+
+    worker_parser = subparsers.add_parser(
+        "worker",
+        help="Run duplications from a job queue until stopped",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    worker_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=DEFAULT_WORKER_JOBS,
+        help="Maximum number of jobs this worker runs at once",
+    )
+    worker_parser.add_argument(
+        "--lease",
+        type=float,
+        default=DEFAULT_LEASE,
+        help="Seconds a claimed job is held without a heartbeat",
+    )
+    worker_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help="Seconds to wait before asking an empty queue again",
+    )
+    worker_parser.add_argument(
+        "--exit-when-empty",
+        action="store_true",
+        help="Exit once no job is left instead of waiting for more",
+    )
+    worker_parser.add_argument(
+        "--worker-id", type=str, help="Name of this worker (default: host:pid)"
+    )
+    worker_parser.add_argument(
+        "--prewarm-interval",
+        type=float,
+        default=DEFAULT_PREWARM_INTERVAL,
+        help="Seconds between refreshes of the most used templates in the "
+        "background; 0 turns prewarming off",
+    )
+
+    queue_parser = subparsers.add_parser(
+        "queue", help="Show the jobs of a job queue, or retry failed ones"
+    )
+    queue_parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Queue every failed job again with fresh attempts",
+    )
+
+    prewarm_parser = subparsers.add_parser(
+        "prewarm",
+        help="Refresh local mirrors of the most used templates ahead of demand",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    prewarm_parser.add_argument(
+        "--top",
+        type=int,
+        default=DEFAULT_PREWARM_TOP,
+        help="Number of most used templates to keep warm",
+    )
+    prewarm_parser.add_argument(
+        "--window-days",
+        type=float,
+        default=DEFAULT_USAGE_WINDOW_DAYS,
+        help="Days of recorded duplications to rank templates by",
+    )
+    prewarm_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=DEFAULT_PREWARM_JOBS,
+        help="Maximum number of templates refreshed at once",
+    )
+    prewarm_parser.add_argument(
+        "--interval",
+        type=float,
+        default=0,
+        help="Keep running and refresh every this many seconds; 0 runs once, "
+        "e.g. from cron",
+    )
+    prewarm_parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="Only list the templates that would be refreshed",
+    )
+
+    inspect_parser = subparsers.add_parser(
+        "inspect",
+        help="List a template's files and their sizes without cloning it",
+    )
+    show_parser = subparsers.add_parser(
+        "show", help="Print one file of a template without cloning it"
+    )
+    for preview_command in (inspect_parser, show_parser):
+        preview_command.add_argument(
+            "template", help="Template URL, or its number in --list-templates"
+        )
+    inspect_parser.add_argument(
+        "path", nargs="?", default="", help="Directory to list (default: the root)"
+    )
+    inspect_parser.add_argument(
+        "-r", "--recursive", action="store_true", help="List subdirectories too"
+    )
+    show_parser.add_argument("path", help="File to print")
+    for preview_command in (inspect_parser, show_parser):
+        preview_command.add_argument(
+            "--rev",
+            type=str,
+            default="HEAD",
+            help="Branch, tag or commit to read (default: the default branch)",
+        )
+        preview_command.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Fetch the template's latest commits before reading",
+        )
+
+    for queue_command in (enqueue_parser, worker_parser, queue_parser):
+        queue_command.add_argument(
+            "--queue",
+            type=str,
+            help="Job queue database, on storage shared by all workers "
+            "(default: $GITHUB_REPO_DUPLICATOR_QUEUE or the cache)",
+        )
+
+    return parser.parse_args(argv)
 
 
-def list_templates_and_exit() -> None:
-    """Display available template repositories and exit."""
+def list_templates_and_exit(args: argparse.Namespace) -> None:
+    """Display available template repositories, or those matching a query, and exit."""
+    index = TemplateIndex(
+        load_catalog(
+            get_default_repositories(), args.catalog_owners or [], args.refresh_catalog
+        )
+    )
     print_header("Available Template Repositories:")
-    for i, repo in enumerate(get_default_repositories(), 1):
-        print_info(f"{i}. {repo}")
+    for i, result in enumerate(index.search(args.template_query or "", None), 1):
+        entry = result.entry
+        print_info(f"{i}. {entry.url}")
+        if entry.description:
+            print(f"   {entry.description}")
     sys.exit(0)
 
 
@@ -110,28 +760,669 @@ def check_environment_and_exit() -> None:
         print_info("Please run 'gh auth login' to authenticate")
         sys.exit(1)
 
+    slots = ", ".join(
+        f"{kind} {len(busy_slots(kind))}/{slot_limit(kind) or 'unlimited'}"
+        for kind in PROCESSES_PER_CORE
+    )
+    print_info(f"Host-wide git slots in use: {slots}")
+
+    pool = get_pool()
+    if pool:
+        print_info(f"Credential pool of {len(pool.credentials)}:")
+        for credential in pool.credentials:
+            pool.refresh_quota(credential)
+            quotas = ", ".join(
+                f"{bucket} {credential.quota(bucket).remaining}"
+                for bucket in (CORE, GRAPHQL)
+            )
+            scope = list(credential.owners)
+            if credential is pool.primary:
+                scope.append("own account")
+            owners = ", ".join(scope) or "lookups only"
+            print(f"  {credential.name}: {owners} ({quotas} remaining)")
+
     print_success("Environment is ready for GitHub Repo Duplicator")
     sys.exit(0)
 
 
-def main() -> None:
+def ensure_github_ready() -> None:
+    """Exit with an error unless GitHub CLI is installed and authenticated."""
+    if not check_github_cli_installed():
+        print_error("GitHub CLI is not installed")
+        print_info("Please install GitHub CLI: https://cli.github.com/")
+        sys.exit(1)
+    if not check_github_authenticated():
+        print_error("GitHub CLI is not authenticated")
+        print_info("Please run 'gh auth login' to authenticate")
+        sys.exit(1)
+
+
+def read_settings_args(args: argparse.Namespace):
+    """
+    Read the settings given on the command line, exiting if they are invalid.
+
+    Returns:
+        The settings for every repository and those from manifest columns.
+    """
+    try:
+        settings = (
+            load_settings(args.settings_file) if args.settings_file else RepoSettings()
+        )
+        names_file = getattr(args, "names_file", None)
+        by_name = read_manifest_settings(names_file) if names_file else {}
+    except SettingsError as e:
+        print_error(str(e))
+        sys.exit(2)
+    return settings, by_name
+
+
+def print_settings_results(results: List[SettingResult]) -> None:
+    """Print the failed settings of a repository, if any."""
+    for result in results:
+        if not result.ok:
+            print_warning(f"    {result.setting}: {result.error}")
+
+
+def print_fan_out_result(result: FanOutResult) -> None:
+    """Print the status line of a single fan-out target."""
+    if result.success:
+        line = f"✓ {result.name} ({result.duration:.1f}s) {result.remote_url}"
+        if result.settings:
+            line += f" [settings: {summarize(result.settings)}]"
+        if result.destinations:
+            line += f" [+{len(result.destinations)} destinations]"
+        print_success(line)
+    else:
+        print_error(f"✗ {result.name}: {result.error}")
+        print_settings_results(result.settings)
+        for pushed in result.destinations:
+            if not pushed.success:
+                print_warning(f"    {pushed.destination}: {pushed.error}")
+
+
+def run_fan_out(args: argparse.Namespace) -> None:
+    """Run the fan-out command and exit with its overall status."""
+    names = list(args.names)
+    if args.names_file:
+        names.extend(read_names_file(args.names_file))
+    if not names:
+        print_error("No repository names given")
+        sys.exit(2)
+
+    source = template_url = args.template
+    if args.bundle:
+        try:
+            template_url = verify_bundle(args.bundle).template_url
+        except BundleError as e:
+            print_error(f"Invalid template bundle: {e}")
+            sys.exit(1)
+        source = os.path.abspath(args.bundle)
+    if not source:
+        print_error("A template URL (--template) or bundle (--bundle) is required")
+        sys.exit(2)
+
+    settings, settings_by_name = read_settings_args(args)
+    ensure_github_ready()
+
+    print_header(f"Duplicating {source} into {len(names)} repositories")
+    results = fan_out(
+        template_url,
+        names,
+        private=not args.public,
+        description=args.description,
+        max_workers=args.jobs,
+        on_result=print_fan_out_result,
+        lfs_source_url=template_url if args.lfs else None,
+        git_backend=args.git_backend,
+        workspace_root=args.workspace_root,
+        precheck=args.precheck,
+        settings=settings,
+        settings_by_name=settings_by_name,
+        rollback=args.rollback,
+        destinations=args.destinations,
+        verify=args.verify,
+        verify_tree=args.verify_tree,
+        bundle_path=source if args.bundle else None,
+    )
+
+    failed = [result for result in results if not result.success]
+    print_header("\nFan-out Summary")
+    print_info(f"Succeeded: {len(results) - len(failed)}")
+    print_info(f"Failed: {len(failed)}")
+    for result in failed:
+        print_warning(f"{result.name}: {result.error}")
+    sys.exit(1 if failed else 0)
+
+
+def print_configure_result(repo: str, results: List[SettingResult]) -> None:
+    """Print the status line of a single configured repository."""
+    if all(result.ok for result in results):
+        print_success(f"✓ {repo}: {summarize(results) or 'nothing to apply'}")
+    else:
+        print_error(f"✗ {repo}: {summarize(results)}")
+        print_settings_results(results)
+
+
+def run_configure(args: argparse.Namespace) -> None:
+    """Run the configure command and exit with its overall status."""
+    repos = list(args.repos)
+    if args.names_file:
+        repos.extend(read_names_file(args.names_file))
+    if not repos:
+        print_error("No repositories given")
+        sys.exit(2)
+    settings, settings_by_name = read_settings_args(args)
+    if not settings and not settings_by_name:
+        print_error("No settings given (--settings or manifest columns)")
+        sys.exit(2)
+
+    ensure_github_ready()
+    print_header(f"Configuring {len(repos)} repositories")
+    results = configure_repositories(
+        repos,
+        settings,
+        settings_by_name,
+        max_workers=args.jobs,
+        on_result=print_configure_result,
+    )
+    failed = [r for r, res in results.items() if not all(s.ok for s in res)]
+    sys.exit(1 if failed else 0)
+
+
+def print_rollback_result(result: RollbackResult) -> None:
+    """Print the status line of a single removed leftover."""
+    if result.removed:
+        print_success(f"✓ Removed {result.kind} {result.target}")
+    else:
+        print_error(f"✗ {result.kind} {result.target}: {result.error}")
+
+
+def run_cleanup(args: argparse.Namespace) -> None:
+    """Run the cleanup command and exit with its overall status."""
+    try:
+        orphans = find_orphans(args.min_age)
+    except (RegistryError, sqlite3.Error) as e:
+        print_error(f"Could not read the job journal: {e}")
+        sys.exit(1)
+    if not orphans:
+        print_info("Nothing to clean up")
+        sys.exit(0)
+
+    print_header(f"{len(orphans)} leftovers of failed jobs")
+    for orphan in orphans:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(orphan.created_at))
+        pushed = "pushed" if orphan.pushed else ""
+        line = f"{when}  {orphan.kind:<10} {pushed:<6}  {orphan.target}  ({orphan.job})"
+        print(line + (f": {orphan.error}" if orphan.error else ""))
+    removable = [o for o in orphans if args.include_pushed or not o.pushed]
+    if len(removable) < len(orphans):
+        print_warning(
+            f"Repositories with pushed content are kept "
+            f"({len(orphans) - len(removable)}); pass --include-pushed to remove "
+            "them too"
+        )
+    if args.dry_run or not removable:
+        sys.exit(0)
+    if not args.yes:
+        confirmation = input(f"\nRemove {len(removable)} of these? (y/n): ").lower()
+        if confirmation != "y":
+            print_warning("Operation cancelled by user")
+            sys.exit(0)
+
+    if any(orphan.kind == "repository" for orphan in removable):
+        ensure_github_ready()
+    results = cleanup_orphans(
+        removable,
+        max_workers=args.jobs,
+        on_result=print_rollback_result,
+        include_pushed=args.include_pushed,
+    )
+    failed = [result for result in results if not result.removed]
+    print_info(f"Removed {len(results) - len(failed)} of {len(results)}")
+    sys.exit(1 if failed else 0)
+
+
+def open_queue(args: argparse.Namespace) -> JobQueue:
+    """Open the job queue given on the command line, exiting on failure."""
+    try:
+        return JobQueue(args.queue)
+    except (OSError, sqlite3.Error) as e:
+        print_error(f"Could not open the job queue: {e}")
+        sys.exit(1)
+
+
+def run_enqueue(args: argparse.Namespace) -> None:
+    """Run the enqueue command and exit with its overall status."""
+    names = list(args.names)
+    if args.names_file:
+        names.extend(read_names_file(args.names_file))
+    if not names:
+        print_error("No repository names given")
+        sys.exit(2)
+
+    queue = open_queue(args)
+    options = {"private": not args.public, "description": args.description}
+    if args.lfs:
+        options["lfs"] = True
+    ids = queue.enqueue(args.template, names, options, args.max_attempts)
+    added = sum(1 for job_id in ids if job_id is not None)
+    print_success(f"✓ Queued {added} jobs in {queue.path}")
+    if added < len(names):
+        print_warning(f"{len(names) - added} names were already in the queue")
+    sys.exit(0)
+
+
+def print_job_result(job: Job, result: DuplicationResult) -> None:
+    """Print the status line of a single job run by a worker."""
+    if result.success:
+        print_success(f"✓ {job.repo_name} {result.repo_url}")
+    elif job.state == QUEUED:
+        print_warning(f"↻ {job.repo_name}: {result.error} (will be retried)")
+    else:
+        print_error(f"✗ {job.repo_name}: {result.error}")
+
+
+def run_worker(args: argparse.Namespace) -> None:
+    """Run the worker command until stopped or the queue is empty."""
+    queue = open_queue(args)
+    settings, _ = read_settings_args(args)
+    ensure_github_ready()
+    config = DuplicatorConfig(
+        work_dir=args.workspace_root,
+        lfs=args.lfs,
+        lfs_jobs=args.lfs_jobs,
+        recurse_submodules=args.recurse_submodules,
+        submodule_jobs=args.submodule_jobs,
+        submodule_mirror_cache=args.submodule_mirror_cache,
+        submodule_owner=args.submodule_owner,
+        git_backend=args.git_backend,
+        settings=settings or None,
+        rollback=args.rollback,
+        destinations=args.destinations or [],
+        verify=args.verify,
+        verify_tree=args.verify_tree,
+    )
+    worker = Worker(
+        queue,
+        Duplicator(config),
+        worker_id=args.worker_id,
+        max_jobs=args.jobs,
+        lease=args.lease,
+        poll_interval=args.poll_interval,
+        on_result=print_job_result,
+    )
+    prewarmer = None
+    if args.prewarm_interval > 0:
+        prewarmer = Prewarmer(args.prewarm_interval)
+        prewarmer.start()
+    print_header(f"Worker {worker.worker_id} running jobs from {queue.path}")
+    try:
+        completed = worker.run(exit_when_empty=args.exit_when_empty)
+    except KeyboardInterrupt:
+        print_warning("\nStopped; unfinished jobs were returned to the queue")
+        sys.exit(130)
+    finally:
+        if prewarmer:
+            prewarmer.stop()
+    print_info(f"Ran {completed} jobs")
+    sys.exit(0)
+
+
+def run_queue(args: argparse.Namespace) -> None:
+    """Run the queue command and exit with its overall status."""
+    queue = open_queue(args)
+    if args.retry_failed:
+        print_success(f"✓ Queued {queue.retry_failed()} failed jobs again")
+    counts = queue.counts()
+    print_header(f"Jobs in {queue.path}")
+    print_info(", ".join(f"{state}: {count}" for state, count in counts.items()))
+    for job in queue.jobs([RUNNING]):
+        remaining = (job.lease_expires or 0) - time.time()
+        print(f"  running  {job.repo_name} on {job.worker} (lease {remaining:.0f}s)")
+    for job in queue.jobs([FAILED]):
+        print(f"  failed   {job.repo_name} after {job.attempts} attempts: {job.error}")
+    sys.exit(0)
+
+
+def print_prewarm_result(result: PrewarmResult) -> None:
+    """Print the status line of a single prewarmed template."""
+    if result.success:
+        print_success(
+            f"✓ {result.template_url} ({result.uses} uses, {result.duration:.1f}s)"
+        )
+    else:
+        print_error(f"✗ {result.template_url}: {result.error}")
+
+
+def run_prewarm(args: argparse.Namespace) -> None:
+    """Run the prewarm command once, or every interval until interrupted."""
+    if args.dry_run:
+        templates = popular_templates(args.top, args.window_days)
+        for url, uses in templates:
+            print(f"{uses:>6}  {url}")
+        if not templates:
+            print_info("No templates were duplicated in the usage window")
+        sys.exit(0)
+
+    while True:
+        results = prewarm(
+            args.top, args.window_days, args.jobs, on_result=print_prewarm_result
+        )
+        failed = [result for result in results if not result.success]
+        print_info(
+            f"Prewarmed {len(results) - len(failed)} of {len(results)} templates"
+        )
+        if args.interval <= 0:
+            sys.exit(1 if failed else 0)
+        try:
+            time.sleep(args.interval)
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+
+def run_precheck(args: argparse.Namespace) -> None:
+    """Run the precheck command and exit with its overall status."""
+    names = list(args.names)
+    if args.names_file:
+        names.extend(read_names_file(args.names_file))
+    if not names:
+        print_error("No repository names given")
+        sys.exit(2)
+
+    ensure_github_ready()
+    results = precheck_names(names)
+    rejected = [result for result in results if not result.ok]
+    for result in rejected:
+        print_warning(f"✗ {result.name}: {result.error}")
+    print_info(f"{len(results) - len(rejected)} of {len(results)} names available")
+    sys.exit(1 if rejected else 0)
+
+
+def resolve_template(template: str) -> str:
+    """Resolve a template given as a URL or a number from the default list."""
+    templates = get_default_repositories()
+    if template.isdigit() and 1 <= int(template) <= len(templates):
+        return templates[int(template) - 1]
+    return template
+
+
+def run_inspect(args: argparse.Namespace) -> None:
+    """Run the inspect command and exit with its overall status."""
+    template = resolve_template(args.template)
+    try:
+        entries = list_tree(template, args.path, args.rev, args.recursive, args.refresh)
+    except PreviewError as e:
+        print_error(f"Could not list {args.path or 'the root'} of {template}: {e}")
+        sys.exit(1)
+    for entry in entries:
+        if entry.type == "tree":
+            print(f"{'':>8}  {entry.path}/")
+        elif entry.type == "commit":
+            print(f"{'':>8}  {entry.path} -> submodule at {entry.sha[:12]}")
+        else:
+            print(f"{format_size(entry.size):>8}  {entry.path}")
+    files = [entry for entry in entries if entry.type == "blob"]
+    known = [entry.size for entry in files if entry.size is not None]
+    summary = f"{len(files)} files, {format_size(sum(known))}"
+    if len(known) < len(files):
+        summary += f" ({len(files) - len(known)} sizes unknown)"
+    print_info(summary)
+    sys.exit(0)
+
+
+def run_show(args: argparse.Namespace) -> None:
+    """Run the show command and exit with its overall status."""
+    template = resolve_template(args.template)
+    try:
+        content = read_file(template, args.path, args.rev, args.refresh)
+    except PreviewError as e:
+        print_error(f"Could not read {args.path} from {template}: {e}")
+        sys.exit(1)
+    sys.stdout.flush()
+    sys.stdout.buffer.write(content)
+    sys.stdout.buffer.flush()
+    sys.exit(0)
+
+
+def print_sync_result(result: SyncResult) -> None:
+    """Print the status line of a single synced repository."""
+    if result.status == "up-to-date":
+        print_info(f"= {result.target} is up to date")
+    elif result.success:
+        verb = "would update" if result.status == "would-update" else "updated"
+        print_success(
+            f"✓ {result.target} {verb} {result.base[:7]}..{result.template_sha[:7]} "
+            f"({result.duration:.1f}s)"
+        )
+    elif result.status == "conflict":
+        print_warning(f"! {result.target}: conflicts in {', '.join(result.conflicts)}")
+    else:
+        print_error(f"✗ {result.target}: {result.error}")
+
+
+def run_sync(args: argparse.Namespace) -> None:
+    """Run the sync command and exit with its overall status."""
+    targets = list(args.repos)
+    if args.names_file:
+        targets.extend(read_names_file(args.names_file))
+    if not targets:
+        print_error("No downstream repositories given")
+        sys.exit(2)
+
+    print_header(f"Syncing {len(targets)} repositories with {args.template}")
+    try:
+        results = sync_repositories(
+            args.template,
+            targets,
+            strategy=args.strategy,
+            max_workers=args.jobs,
+            base=args.base,
+            dry_run=args.dry_run,
+            on_result=print_sync_result,
+            workspace_root=args.workspace_root,
+        )
+    except SyncError as e:
+        print_error(str(e))
+        sys.exit(1)
+
+    conflicts = [r for r in results if r.status == "conflict"]
+    failed = [r for r in results if not r.success and r.status != "conflict"]
+    print_header("\nSync Summary")
+    print_info(
+        f"Updated: {sum(r.status in ('updated', 'would-update') for r in results)}"
+    )
+    print_info(f"Up to date: {sum(r.status == 'up-to-date' for r in results)}")
+    print_info(f"Conflicts: {len(conflicts)}")
+    print_info(f"Failed: {len(failed)}")
+    sys.exit(1 if conflicts or failed else 0)
+
+
+def format_entry(entry: RegistryEntry) -> str:
+    """Format a registry entry as one line."""
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.created_at))
+    line = f"{when}  {entry.kind:<9} {entry.outcome:<9} {entry.repo_name}"
+    if entry.template_sha:
+        line += f" @ {entry.template_sha[:7]}"
+    if entry.duration is not None:
+        line += f" ({entry.duration:.1f}s)"
+    if entry.error:
+        line += f": {entry.error}"
+    return line
+
+
+def run_history(args: argparse.Namespace) -> None:
+    """Run the history command and exit."""
+    entries = get_registry().history(args.template, args.repo, args.limit)
+    if not entries:
+        print_info("No duplications recorded")
+    for entry in entries:
+        print(format_entry(entry))
+    sys.exit(0)
+
+
+def run_inventory(args: argparse.Namespace) -> None:
+    """Run the inventory command and exit."""
+    try:
+        entries = get_registry().inventory(args.template, args.older_than)
+    except RegistryError as e:
+        print_error(str(e))
+        sys.exit(1)
+    template = None
+    for entry in entries:
+        if entry.template_url != template:
+            template = entry.template_url
+            print_header(template)
+        print(f"  {entry.template_sha[:7] or '-':<7}  {entry.repo_name}")
+    print_info(f"{len(entries)} repositories")
+    sys.exit(0)
+
+
+def run_export_bundle(args: argparse.Namespace) -> None:
+    """Run the export-bundle command and exit with its overall status."""
+    templates = [resolve_template(template) for template in args.templates]
+    if args.all:
+        templates.extend(get_default_repositories())
+    if not templates:
+        print_error("No templates given (pass template URLs or --all)")
+        sys.exit(2)
+
+    failed = 0
+    for template in dict.fromkeys(templates):
+        output = os.path.join(args.output_dir, f"{repo_basename(template)}.bundle")
+        print_info(f"Exporting {template}")
+        try:
+            metadata = export_bundle(template, output)
+        except BundleError as e:
+            print_error(f"Could not export {template}: {e}")
+            failed += 1
+            continue
+        print_success(
+            f"✓ {output} ({metadata.size} bytes, {len(metadata.refs)} refs, "
+            f"HEAD {metadata.head[:12]})"
+        )
+    sys.exit(1 if failed else 0)
+
+
+def run_import_bundle(args: argparse.Namespace) -> None:
+    """Run the import-bundle command and exit with its overall status."""
+    failed = 0
+    for bundle in args.bundles:
+        try:
+            target = import_bundle(bundle)
+        except BundleError as e:
+            print_error(f"Could not import {bundle}: {e}")
+            failed += 1
+            continue
+        print_success(f"✓ Imported {bundle} to {target}")
+    sys.exit(1 if failed else 0)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
     """Main entry point for the CLI."""
-    args = parse_args()
+    args = parse_args(argv)
     setup_logging(args.verbose)
+    install_signal_handlers()
+    for deadlines in args.deadlines or []:
+        set_deadlines(deadlines)
+    for slots in args.git_slots or []:
+        set_slots(slots)
+    if args.tokens_file:
+        try:
+            set_pool(load_tokens(args.tokens_file))
+        except TokenError as e:
+            print_error(str(e))
+            sys.exit(2)
+
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = serve_metrics(args.metrics_port)
+    ssh_mux = SshMultiplexer()
+    if args.ssh_multiplexing:
+        ssh_mux.start()
+    try:
+        run_command(args)
+    finally:
+        ssh_mux.stop()
+        if metrics_server:
+            metrics_server.shutdown()
+        if args.metrics_file:
+            try:
+                write_textfile(args.metrics_file)
+            except OSError as e:
+                print_warning(f"Could not write metrics to {args.metrics_file}: {e}")
+
+
+def run_command(args: argparse.Namespace) -> None:
+    """Dispatch parsed arguments to the selected command."""
+    if args.command == "fan-out":
+        run_fan_out(args)
+    elif args.command == "export-bundle":
+        run_export_bundle(args)
+    elif args.command == "import-bundle":
+        run_import_bundle(args)
+    elif args.command == "sync":
+        run_sync(args)
+    elif args.command == "precheck":
+        run_precheck(args)
+    elif args.command == "configure":
+        run_configure(args)
+    elif args.command == "cleanup":
+        run_cleanup(args)
+    elif args.command == "history":
+        run_history(args)
+    elif args.command == "inventory":
+        run_inventory(args)
+    elif args.command == "enqueue":
+        run_enqueue(args)
+    elif args.command == "worker":
+        run_worker(args)
+    elif args.command == "queue":
+        run_queue(args)
+    elif args.command == "prewarm":
+        run_prewarm(args)
+    elif args.command == "inspect":
+        run_inspect(args)
+    elif args.command == "show":
+        run_show(args)
 
     if args.check:
         check_environment_and_exit()
 
     if args.list_templates:
-        list_templates_and_exit()
+        list_templates_and_exit(args)
+
+    settings, _ = read_settings_args(args)
 
-    # Run the main program with CLI arguments
+    # Run the main program with CLI arguments; the Duplicator records the
+    # outcome of every duplication it starts
     try:
         duplicator_main(
             template_url=args.template,
             new_repo_name=args.name,
             skip_confirmations=args.yes,
+            bundle_path=args.bundle,
+            lfs=args.lfs,
+            lfs_jobs=args.lfs_jobs,
+            recurse_submodules=args.recurse_submodules,
+            submodule_jobs=args.submodule_jobs,
+            submodule_mirror_cache=args.submodule_mirror_cache,
+            submodule_owner=args.submodule_owner,
+            git_backend=args.git_backend,
+            workspace_root=args.workspace_root,
+            template_query=args.template_query,
+            catalog_owners=args.catalog_owners,
+            refresh_catalog=args.refresh_catalog,
+            settings=settings or None,
+            rollback=args.rollback,
+            destinations=args.destinations,
+            verify=args.verify,
+            verify_tree=args.verify_tree,
         )
+    except SystemExit as e:
+        # Declining the confirmation prompt exits with status 0
+        if not e.code:
+            record_duplication("cancelled")
+        raise
     except KeyboardInterrupt:
         print_warning("\nOperation cancelled by user")
         sys.exit(130)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Push destinations for GitHub Repo Duplicator.
+
+Besides the GitHub repository a duplication creates, the same fetched
+objects can be pushed to further destinations: other GitHub owners, any git
+remote (e.g. an internal Gitea) and bare repositories on a local or mounted
+path (e.g. a backup server). Each kind of destination is a driver that
+prepares the target for a repository name and returns the URL to push to;
+``push_to_destinations`` pushes to all of them concurrently and reports a
+result per destination.
+"""
+
+import logging
+import os
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from .git_backend import GitBackend, GitError, get_backend
+from .github_api import GitHubApiError, created_repository_metadata
+from .metrics import pack_size_bytes, record_transfer
+from .rollback import JobTransaction
+from .verify import VerificationResult, verify_push
+from .watchdog import Cancelled, DeadlineExceeded, deadline, run_with_deadline
+
+logger = logging.getLogger(__name__)
+
+# Destinations pushed to at the same time by default
+DEFAULT_DESTINATION_JOBS = 4
+
+
+class DestinationError(Exception):
+    """Raised when a destination cannot be prepared for a repository."""
+
+
+@dataclass
+class DestinationResult:
+    """Outcome of pushing a duplicate to one destination."""
+
+    destination: str
+    url: str = ""
+    success: bool = False
+    error: str = ""
+    duration: float = 0.0
+    verification: Optional[VerificationResult] = None
+
+
+class Destination(ABC):
+    """A place duplicates are pushed to, addressed by repository name."""
+
+    kind = ""
+
+    def __init__(self, location: str = ""):
+        self.location = location
+
+    @property
+    def label(self) -> str:
+        """The destination as written on the command line."""
+        return f"{self.kind}:{self.location}" if self.location else self.kind
+
+    @abstractmethod
+    def prepare(
+        self,
+        name: str,
+        private: bool = True,
+        description: str = "",
+        transaction: Optional[JobTransaction] = None,
+    ) -> str:
+        """
+        Create the target of a repository if needed.
+
+        Args:
+            name: The name of the new repository.
+            private: Whether a created repository is private.
+            description: The description of a created repository.
+            transaction: The job journaling what is created, if any.
+
+        Returns:
+            The URL to push to.
+
+        Raises:
+            DestinationError: If the target cannot be created.
+        """
+
+    def target(self, name: str) -> str:
+        """Get what the destination calls a repository in the job journal."""
+        return name
+
+
+class GitHubDestination(Destination):
+    """A new repository created through the GitHub CLI, optionally for an owner."""
+
+    kind = "github"
+
+    def target(self, name: str) -> str:
+        name = name.split("/")[-1]
+        return f"{self.location}/{name}" if self.location else name
+
+    def prepare(
+        self,
+        name: str,
+        private: bool = True,
+        description: str = "",
+        transaction: Optional[JobTransaction] = None,
+    ) -> str:
+        repo = self.target(name)
+        command = ["gh", "repo", "create", repo]
+        command.append("--private" if private else "--public")
+        if description:
+            command += ["--description", description]
+        try:
+            with deadline("create"):
+                created = run_with_deadline(
+                    command + ["--confirm"], check=True, capture_output=True, text=True
+                ).stdout
+        except subprocess.CalledProcessError as e:
+            raise DestinationError((e.stderr or str(e)).strip()) from e
+        except OSError as e:
+            raise DestinationError(str(e)) from e
+        if transaction:
+            transaction.created_repository(repo)
+        try:
+            with deadline("lookup"):
+                return created_repository_metadata(repo, created).ssh_url
+        except GitHubApiError as e:
+            raise DestinationError(str(e)) from e
+
+
+class GitRemoteDestination(Destination):
+    """
+    Any git remote that accepts pushes to repositories it already has or
+    creates on push, such as Gitea with push-to-create enabled.
+
+    The location is a URL with a ``{name}`` placeholder, or a base URL the
+    repository name is appended to.
+    """
+
+    kind = "git"
+
+    def prepare(
+        self,
+        name: str,
+        private: bool = True,
+        description: str = "",
+        transaction: Optional[JobTransaction] = None,
+    ) -> str:
+        name = name.split("/")[-1]
+        if "{name}" in self.location:
+            return self.location.replace("{name}", name)
+        separator = "" if self.location.endswith(("/", ":")) else "/"
+        return f"{self.location}{separator}{name}.git"
+
+
+class LocalBareDestination(Destination):
+    """Bare repositories named ``NAME.git`` in a local or mounted directory."""
+
+    kind = "bare"
+
+    def target(self, name: str) -> str:
+        return os.path.join(
+            os.path.abspath(self.location), f"{name.split('/')[-1]}.git"
+        )
+
+    def prepare(
+        self,
+        name: str,
+        private: bool = True,
+        description: str = "",
+        transaction: Optional[JobTransaction] = None,
+    ) -> str:
+        path = self.target(name)
+        if os.path.exists(path):
+            return path
+        try:
+            os.makedirs(self.location, exist_ok=True)
+            run_with_deadline(
+                ["git", "init", "--bare", "--quiet", path],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            if transaction:
+                transaction.created_directory(path)
+            if description:
+                with open(os.path.join(path, "description"), "w") as f:
+                    f.write(description + "\n")
+        except subprocess.CalledProcessError as e:
+            raise DestinationError((e.stderr or str(e)).strip()) from e
+        except OSError as e:
+            raise DestinationError(str(e)) from e
+        return path
+
+
+DRIVERS: Dict[str, type] = {
+    driver.kind: driver
+    for driver in (GitHubDestination, GitRemoteDestination, LocalBareDestination)
+}
+
+
+def parse_destination(spec: str) -> Destination:
+    """
+    Parse a destination given as ``KIND:LOCATION``.
+
+    ``github`` or ``github:OWNER`` creates repositories on GitHub,
+    ``git:URL`` pushes to a git remote and ``bare:PATH`` to bare
+    repositories under a directory. Without a kind, URLs are git remotes and
+    anything else is a directory of bare repositories.
+
+    Raises:
+        ValueError: If the location is missing.
+    """
+    kind, _, location = spec.partition(":")
+    if kind in DRIVERS:
+        if not location and kind != "github":
+            raise ValueError(f"destination {spec!r} needs a location")
+        return DRIVERS[kind](location)
+    if "://" in spec or (":" in spec and "@" in spec.split(":")[0]):
+        return GitRemoteDestination(spec)
+    if not spec:
+        raise ValueError("empty destination")
+    return LocalBareDestination(spec)
+
+
+def push_to_destinations(
+    repo_dir: str,
+    name: str,
+    destinations: List[Destination],
+    refspecs: List[str],
+    backend: Optional[GitBackend] = None,
+    private: bool = True,
+    description: str = "",
+    transaction: Optional[JobTransaction] = None,
+    max_workers: int = DEFAULT_DESTINATION_JOBS,
+    on_result: Optional[Callable[[DestinationResult], None]] = None,
+    verify: bool = False,
+) -> List[DestinationResult]:
+    """
+    Push one local repository to several destinations concurrently.
+
+    Every destination pushes from the same local object set, so nothing is
+    fetched again. A failing destination never affects the others.
+
+    Args:
+        repo_dir: The local repository holding the objects.
+        name: The name of the new repository.
+        destinations: Where to push.
+        refspecs: The refspecs pushed to every destination.
+        backend: The git backend to use; defaults to the configured one.
+        private: Whether repositories created on the way are private.
+        description: The description of repositories created on the way.
+        transaction: The job journaling what is created, if any.
+        max_workers: Maximum number of destinations pushed at once.
+        on_result: Optional callback invoked as each destination is done.
+        verify: Whether to compare each destination's refs with the pushed
+            ones afterwards.
+
+    Returns:
+        One result per destination, in the given order.
+    """
+    backend = backend or get_backend()
+
+    def push(destination: Destination) -> DestinationResult:
+        result = DestinationResult(destination=destination.label)
+        started = time.monotonic()
+        try:
+            result.url = destination.prepare(name, private, description, transaction)
+            with deadline("push"):
+                backend.push(repo_dir, result.url, refspecs)
+            if transaction:
+                transaction.pushed(destination.target(name))
+            record_transfer("push", pack_size_bytes(repo_dir))
+            if verify:
+                with deadline("verify"):
+                    result.verification = verify_push(
+                        repo_dir, result.url, refspecs, backend
+                    )
+                if not result.verification.ok:
+                    raise DestinationError(result.verification.summary())
+            result.success = True
+        except (DestinationError, GitError, DeadlineExceeded, Cancelled) as e:
+            result.error = str(e)
+        except Exception as e:
+            logger.exception(f"Unexpected error while pushing to {destination.label}")
+            result.error = str(e)
+        result.duration = time.monotonic() - started
+        if not result.success:
+            logger.warning(
+                f"Push of {name} to {destination.label} failed: {result.error}"
+            )
+        return result
+
+    results: Dict[int, DestinationResult] = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            pool.submit(push, destination): i
+            for i, destination in enumerate(destinations)
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            if on_result:
+                on_result(results[futures[future]])
+    return [results[i] for i in range(len(destinations))]
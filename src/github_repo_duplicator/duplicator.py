@@ -6,6 +6,7 @@ A tool that allows users to duplicate GitHub repositories with an interactive me
 It creates a new repository with the same content as the selected template repository.
 """
 
+import contextlib
 import logging
 import os
 import platform
@@ -13,8 +14,31 @@ import re
 import shutil
 import subprocess
 import sys
+import time
 from typing import List, Optional
 
+from .bundles import BundleError, verify_bundle
+from .catalog import TemplateIndex, load_catalog
+from .destinations import Destination, DestinationResult
+from .git_backend import GitError, get_backend
+from .github_api import GitHubApiError, repository_metadata
+from .lfs import DEFAULT_LFS_JOBS, LfsProgress
+from .metrics import time_phase
+from .registry import RegistryEntry, record_entry
+from .rollback import DEFAULT_ROLLBACK_POLICY, JobTransaction, RollbackResult
+from .settings import RepoSettings, summarize
+from .ssh_mux import ssh_command_args
+from .submodules import (
+    DEFAULT_SUBMODULE_JOBS,
+    SubmoduleError,
+    github_owner_rewriter,
+    rewrite_submodule_urls,
+    update_submodules,
+)
+from .sync import TEMPLATE_BASE_REF
+from .watchdog import DeadlineExceeded, deadline, run_with_deadline
+from .workspace import WorkspaceError, get_workspace_manager
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -61,30 +85,48 @@ def print_header(message: str) -> None:
     print(f"{Colors.HEADER}{Colors.BOLD}{message}{Colors.END}")
 
 
-def execute_command(command: str, shell_cmd: str) -> bool:
+def execute_command(
+    command: str, shell_cmd: str, timeout: Optional[float] = None
+) -> bool:
     """
     Execute a shell command with the specified shell.
 
+    The command and everything it starts are killed if it runs past its
+    deadline.
+
     Args:
         command: The command to execute.
         shell_cmd: The shell to use (bash or zsh).
+        timeout: Deadline in seconds; defaults to the deadline of the current
+            phase, or the configured ``command`` deadline outside of one.
 
     Returns:
         True if the command was successful, False otherwise.
     """
     try:
         logger.info(f"Executing command with {shell_cmd}")
-        result = subprocess.run(
-            command,
-            shell=True,
-            executable=shell_cmd,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
+        # Without a timeout, run_with_deadline applies the phase's own deadline
+        limit = (
+            contextlib.nullcontext()
+            if timeout is None
+            else deadline("command", timeout)
         )
+        with limit:
+            result = run_with_deadline(
+                command,
+                shell=True,
+                executable=shell_cmd,
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
         logger.info(f"Command output: {result.stdout}")
         return True
+    except DeadlineExceeded as e:
+        logger.error(f"Command timed out: {e}")
+        print_error(f"Command timed out: {e}")
+        return False
     except subprocess.CalledProcessError as e:
         logger.error(f"Command failed: {e}")
         logger.error(f"Error output: {e.stderr}")
@@ -147,8 +189,8 @@ def get_git_username() -> str:
         The git username if available, or empty string if not.
     """
     try:
-        result = subprocess.run(
-            "git config user.name", shell=True, capture_output=True, text=True
+        result = run_with_deadline(
+            ["git", "config", "user.name"], capture_output=True, text=True
         )
         if result.returncode == 0 and result.stdout.strip():
             return result.stdout.strip()
@@ -165,13 +207,17 @@ def check_ssh_github() -> bool:
         True if SSH is properly set up, False otherwise.
     """
     try:
-        # Try a test connection to GitHub
-        result = subprocess.run(
-            "ssh -o BatchMode=yes -o ConnectTimeout=5 -T git@github.com 2>&1",
-            shell=True,
-            capture_output=True,
-            text=True,
-        )
+        # Try a test connection to GitHub; with multiplexing active this
+        # opens the shared connection later git operations reuse
+        with deadline("ssh_check"):
+            result = run_with_deadline(
+                ssh_command_args()
+                + ["-o", "BatchMode=yes", "-o", "ConnectTimeout=5"]
+                + ["-T", "git@github.com"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+            )
         # GitHub returns error code 1 when authentication succeeds but shell access is denied
         # This is normal and expected
         if "successfully authenticated" in result.stdout:
@@ -260,10 +306,10 @@ def check_gh_cli() -> bool:
             print(
                 "\nNow setting up GitHub authentication. This will open a browser window."
             )
-            subprocess.run("gh auth login -w", shell=True)
+            run_github_login()
 
             # Verify authentication
-            auth_result = subprocess.run(
+            auth_result = run_with_deadline(
                 "gh auth status", shell=True, capture_output=True, text=True
             )
             if auth_result.returncode == 0:
@@ -284,6 +330,16 @@ def check_gh_cli() -> bool:
         return False
 
 
+def run_github_login() -> None:
+    """Run the browser-based GitHub CLI login under the auth deadline."""
+    try:
+        with deadline("auth"):
+            run_with_deadline("gh auth login -w", shell=True, interactive=True)
+    except DeadlineExceeded as e:
+        logger.error(f"GitHub authentication timed out: {e}")
+        print_error("GitHub authentication timed out")
+
+
 def check_github_cli_installed() -> bool:
     """Check if GitHub CLI is installed."""
     return shutil.which("gh") is not None
@@ -292,7 +348,7 @@ def check_github_cli_installed() -> bool:
 def check_github_authenticated() -> bool:
     """Check if the user is authenticated with GitHub CLI."""
     try:
-        result = subprocess.run(
+        result = run_with_deadline(
             ["gh", "auth", "status"], capture_output=True, text=True, check=False
         )
         return result.returncode == 0
@@ -301,7 +357,33 @@ def check_github_authenticated() -> bool:
         return False
 
 
-def duplicate_repository(original_repo: str, new_repo: str, shell_cmd: str) -> bool:
+def print_destination_result(result: DestinationResult) -> None:
+    """Print the status line of a push to one further destination."""
+    if result.success:
+        print_success(f"✓ {result.destination}: {result.url} ({result.duration:.1f}s)")
+    else:
+        print_error(f"✗ {result.destination}: {result.error}")
+
+
+def print_rollback_results(results: List[RollbackResult]) -> None:
+    """Print what a failed job rolled back and what it left behind."""
+    for rolled_back in results:
+        if rolled_back.removed:
+            print_info(f"Rolled back {rolled_back.kind} {rolled_back.target}")
+        else:
+            reason = f": {rolled_back.error}" if rolled_back.error else ""
+            print_warning(
+                f"Left {rolled_back.kind} {rolled_back.target} behind "
+                f"(remove it with 'cleanup'){reason}"
+            )
+
+
+def duplicate_repository(
+    original_repo: str,
+    new_repo: str,
+    shell_cmd: str,
+    rollback: str = DEFAULT_ROLLBACK_POLICY,
+) -> bool:
     """
     Duplicate a GitHub repository.
 
@@ -309,6 +391,7 @@ def duplicate_repository(original_repo: str, new_repo: str, shell_cmd: str) -> b
         original_repo: The URL of the original repository.
         new_repo: The name of the new repository.
         shell_cmd: The shell to use for command execution.
+        rollback: What a failed duplication removes of what it created.
 
     Returns:
         True if the duplication was successful, False otherwise.
@@ -332,26 +415,31 @@ def duplicate_repository(original_repo: str, new_repo: str, shell_cmd: str) -> b
         )
         print("Run 'gh auth login' and try again.")
         return False
+    transaction = JobTransaction(f"duplicate:{new_repo}", rollback)
+    transaction.created_repository(new_repo)
 
-    # Get username from GitHub CLI
-    result = subprocess.run(
-        "gh api user | grep login | cut -d '\"' -f 4",
-        shell=True,
-        capture_output=True,
-        text=True,
-    )
-    username = result.stdout.strip()
-    if not username:
+    # One lookup of the new repository gives its owner
+    try:
+        username = repository_metadata(new_repo).owner
+    except GitHubApiError as e:
+        logger.warning(f"Could not look up {new_repo}: {e}")
         username = get_git_username()
         if not username:
             logger.error("Could not determine GitHub username")
             print(
                 "\nCould not determine your GitHub username. Please check your git configuration."
             )
+            print_rollback_results(transaction.rollback())
             return False
 
-    # Create a temporary directory for cloning
-    tmp_dir = f"tmp_{repo_basename}"
+    # Clone into a private workspace so concurrent runs never collide
+    try:
+        workspace = get_workspace_manager().acquire(repo_basename)
+    except WorkspaceError as e:
+        print_error(str(e))
+        print_rollback_results(transaction.rollback())
+        return False
+    tmp_dir = os.path.join(workspace, repo_basename)
 
     # Check if SSH key exists and is set up with GitHub
     ssh_available = check_ssh_github()
@@ -366,26 +454,44 @@ def duplicate_repository(original_repo: str, new_repo: str, shell_cmd: str) -> b
         remote_url = f"https://github.com/{username}/{new_repo}.git"
         clone_url = remote_url
 
-    # Script to duplicate the repository
-    script = f"""
-    # Clone original repository to temporary directory
-    git clone {original_repo} {tmp_dir} &&
-    cd {tmp_dir} &&
-    # Remove original remote
-    git remote remove origin &&
-    # Add new repository as remote
-    git remote add origin {remote_url} &&
-    # Push all content to new repository
-    git push -u origin main || git push -u origin master || git push -u origin $(git branch --show-current) &&
-    # Clean up
-    cd .. &&
-    rm -rf {tmp_dir}
-    """
-
-    # Execute the script
-    success = execute_command(script, shell_cmd)
-
-    if success:
+    # Duplicate the repository through the git backend
+    git = get_backend()
+    entry = RegistryEntry(
+        template_url=original_repo,
+        repo_name=new_repo,
+        outcome="failure",
+        repo_url=f"https://github.com/{username}/{new_repo}",
+        visibility="public",
+    )
+    started = time.monotonic()
+    try:
+        git.clone(original_repo, tmp_dir)
+        entry.template_sha = git.rev_parse(tmp_dir)
+        entry.template_commit_time = git.commit_time(tmp_dir)
+        git.update_ref(tmp_dir, TEMPLATE_BASE_REF, entry.template_sha)
+        git.set_remote(tmp_dir, "origin", remote_url)
+        refspecs = [
+            git.current_branch(tmp_dir),
+            f"{TEMPLATE_BASE_REF}:{TEMPLATE_BASE_REF}",
+        ]
+        git.push(tmp_dir, "origin", refspecs, set_upstream=True)
+        transaction.pushed(new_repo)
+        success = True
+        entry.outcome = "success"
+    except GitError as e:
+        logger.error(f"Duplication failed: {e}")
+        print_error(f"Failed to duplicate the repository: {e}")
+        success = False
+        entry.error = str(e)
+    finally:
+        get_workspace_manager().release(workspace)
+        entry.duration = time.monotonic() - started
+        record_entry(entry)
+
+    if not success:
+        print_rollback_results(transaction.rollback())
+    else:
+        transaction.commit()
         print_success(f"\n✅ Repository successfully duplicated!")
         print_info(f"New repository: https://github.com/{username}/{new_repo}")
 
@@ -395,7 +501,7 @@ def duplicate_repository(original_repo: str, new_repo: str, shell_cmd: str) -> b
 
         # Check if GitHub CLI is available and authenticated
         gh_available = (
-            subprocess.run(
+            run_with_deadline(
                 "which gh >/dev/null 2>&1", shell=True, executable=shell_cmd
             ).returncode
             == 0
@@ -487,6 +593,17 @@ def duplicate_repository(original_repo: str, new_repo: str, shell_cmd: str) -> b
     return success
 
 
+def print_lfs_progress(progress: LfsProgress) -> None:
+    """Print a single updating line with the progress of an LFS transfer."""
+    end = "\n" if progress.done >= progress.total else ""
+    print(
+        f"\r{Colors.BLUE}LFS objects: {progress.done}/{progress.total} "
+        f"({progress.bytes_transferred / 1e6:.1f} MB){Colors.END}",
+        end=end,
+        flush=True,
+    )
+
+
 def get_default_repositories() -> List[str]:
     """
     Get the default list of template repositories.
@@ -507,10 +624,139 @@ def get_default_repositories() -> List[str]:
     ]
 
 
+# Templates shown at once by the template selector
+SELECTOR_RESULTS = 10
+
+
+def read_key() -> str:
+    """
+    Read a single key press from the terminal without waiting for Enter.
+
+    Returns:
+        The character typed, or ``up``, ``down``, ``enter`` or ``backspace``.
+    """
+    if platform.system() == "Windows":
+        import msvcrt
+
+        key = msvcrt.getwch()
+        if key in ("\x00", "\xe0"):
+            return {"H": "up", "P": "down"}.get(msvcrt.getwch(), "")
+    else:
+        import termios
+        import tty
+
+        fd = sys.stdin.fileno()
+        saved = termios.tcgetattr(fd)
+        try:
+            # cbreak keeps Ctrl-C working as an interrupt
+            tty.setcbreak(fd)
+            key = sys.stdin.read(1)
+            if key == "\x1b":
+                return {"[A": "up", "[B": "down"}.get(sys.stdin.read(2), "")
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+    if key in ("\r", "\n"):
+        return "enter"
+    if key in ("\x7f", "\b"):
+        return "backspace"
+    if key == "\x03":
+        raise KeyboardInterrupt
+    return key
+
+
+def select_template_as_you_type(index: TemplateIndex) -> str:
+    """
+    Let the user pick a template, updating ranked matches on every key press.
+
+    Args:
+        index: The searchable template catalog.
+
+    Returns:
+        The URL of the selected template.
+    """
+    query = ""
+    selected = 0
+    while True:
+        results = index.search(query, limit=SELECTOR_RESULTS)
+        selected = min(selected, max(len(results) - 1, 0))
+        # Redraw from the top of the screen
+        sys.stdout.write("\033[2J\033[H")
+        print_info(f"Search {len(index)} templates (arrows to move, Enter to select):")
+        print(f"> {query}")
+        if not results:
+            print_warning("No matching templates")
+        for i, result in enumerate(results):
+            line = f"{result.entry.name}  {result.entry.description}".rstrip()
+            if i == selected:
+                print(f"{Colors.BOLD}{Colors.GREEN}> {line}{Colors.END}")
+            else:
+                print(f"  {line}")
+        sys.stdout.flush()
+
+        key = read_key()
+        if key == "enter" and results:
+            return results[selected].entry.url
+        if key == "up":
+            selected = max(selected - 1, 0)
+        elif key == "down":
+            selected += 1
+        elif key == "backspace":
+            query, selected = query[:-1], 0
+        elif len(key) == 1 and key.isprintable():
+            query, selected = query + key, 0
+
+
+def select_template_by_query(index: TemplateIndex) -> str:
+    """
+    Let the user pick a template by searching line by line.
+
+    Used when there is no terminal to read single key presses from.
+
+    Args:
+        index: The searchable template catalog.
+
+    Returns:
+        The URL of the selected template.
+    """
+    results = index.search("", limit=SELECTOR_RESULTS)
+    while True:
+        if results:
+            print_info("\nAvailable template repositories:")
+            for i, result in enumerate(results, 1):
+                print(f"{i}. {result.entry.url}")
+        else:
+            print_warning("No matching templates")
+
+        choice = input(
+            "\nSelect a template (1-{}) or type to search: ".format(len(results))
+        ).strip()
+        if choice.isdigit() and 1 <= int(choice) <= len(results):
+            return results[int(choice) - 1].entry.url
+        if choice:
+            results = index.search(choice, limit=SELECTOR_RESULTS)
+
+
 def main(
     template_url: Optional[str] = None,
     new_repo_name: Optional[str] = None,
     skip_confirmations: bool = False,
+    bundle_path: Optional[str] = None,
+    lfs: bool = False,
+    lfs_jobs: int = DEFAULT_LFS_JOBS,
+    recurse_submodules: bool = False,
+    submodule_jobs: int = DEFAULT_SUBMODULE_JOBS,
+    submodule_mirror_cache: bool = False,
+    submodule_owner: Optional[str] = None,
+    git_backend: Optional[str] = None,
+    workspace_root: Optional[str] = None,
+    template_query: Optional[str] = None,
+    catalog_owners: Optional[List[str]] = None,
+    refresh_catalog: bool = False,
+    settings: Optional[RepoSettings] = None,
+    rollback: str = DEFAULT_ROLLBACK_POLICY,
+    destinations: Optional[List[Destination]] = None,
+    verify: bool = True,
+    verify_tree: bool = False,
 ) -> None:
     """
     Main function to run the GitHub Repo Duplicator.
@@ -519,6 +765,24 @@ def main(
         template_url: Optional pre-selected template URL to skip selection
         new_repo_name: Optional pre-defined new repository name to skip prompt
         skip_confirmations: Whether to skip confirmation prompts
+        bundle_path: Optional template bundle to clone from instead of the network
+        lfs: Whether to copy Git LFS objects into the new repository
+        lfs_jobs: Maximum number of LFS objects transferred concurrently
+        recurse_submodules: Whether to check out the template's submodules
+        submodule_jobs: Maximum number of submodules fetched concurrently
+        submodule_mirror_cache: Whether to seed submodules from the mirror cache
+        submodule_owner: Optional owner whose duplicated copies the submodules
+            should point at
+        git_backend: The git backend to clone and push with
+        workspace_root: Directory under which temporary clones are made
+        template_query: Optional search picking the best matching template
+        catalog_owners: Owners whose template repositories are searchable too
+        refresh_catalog: Whether to refetch the owners' templates now
+        settings: Optional settings applied to the new repository after the push
+        rollback: What a failed duplication removes of what it created
+        destinations: Further destinations the duplicate is pushed to
+        verify: Whether to compare the new repository's refs with the pushed ones
+        verify_tree: Whether to also compare the default branch's tree
     """
     print_header("\nGitHub Repository Duplicator for Templates")
 
@@ -541,37 +805,39 @@ def main(
             "GitHub CLI uses secure authentication methods like browser-based OAuth or SSH keys"
         )
         print_info("Please authenticate with GitHub")
-        subprocess.run("gh auth login -w", shell=True)
+        run_github_login()
 
         # Verify authentication was successful
         if not check_github_authenticated():
             print_error("GitHub authentication failed")
             sys.exit(1)
 
-    # Get available repository templates
-    templates = get_default_repositories()
+    # A bundle given explicitly also determines the template
+    if bundle_path:
+        try:
+            template_url = verify_bundle(bundle_path).template_url
+        except BundleError as e:
+            print_error(f"Invalid template bundle: {e}")
+            sys.exit(1)
 
     # Let user select a template if not provided
     if not template_url:
-        print_info("\nAvailable template repositories:")
-        for i, repo in enumerate(templates, 1):
-            print(f"{i}. {repo}")
-
-        while True:
-            try:
-                choice = input(
-                    "\nSelect a template repository (1-{}): ".format(len(templates))
-                )
-                index = int(choice) - 1
-                if 0 <= index < len(templates):
-                    template_url = templates[index]
-                    break
-                else:
-                    print_warning(
-                        f"Invalid selection. Please enter a number between 1 and {len(templates)}"
-                    )
-            except ValueError:
-                print_warning("Please enter a valid number")
+        index = TemplateIndex(
+            load_catalog(
+                get_default_repositories(), catalog_owners or [], refresh_catalog
+            )
+        )
+        if template_query:
+            match = index.best_match(template_query)
+            if not match:
+                print_error(f"No template matches '{template_query}'")
+                sys.exit(1)
+            template_url = match.url
+            print_info(f"Selected template {match.name} for '{template_query}'")
+        elif sys.stdin.isatty() and sys.stdout.isatty():
+            template_url = select_template_as_you_type(index)
+        else:
+            template_url = select_template_by_query(index)
 
     # Get new repository name if not provided
     if not new_repo_name:
@@ -595,164 +861,207 @@ def main(
             print_warning("Operation cancelled by user")
             sys.exit(0)
 
+    # Imported here because api imports this module (through precheck)
+    from .api import Duplicator, DuplicatorConfig, ErrorKind
+
+    config = DuplicatorConfig(
+        lfs=lfs,
+        lfs_jobs=lfs_jobs,
+        lfs_progress=print_lfs_progress,
+        recurse_submodules=recurse_submodules,
+        submodule_jobs=submodule_jobs,
+        submodule_mirror_cache=submodule_mirror_cache,
+        submodule_owner=submodule_owner,
+        git_backend=git_backend,
+        work_dir=workspace_root,
+        settings=settings,
+        rollback=rollback,
+        destinations=destinations or [],
+        verify=verify,
+        verify_tree=verify_tree,
+    )
+    print_info(f"\nDuplicating {template_url} into {new_repo_name}")
+    try:
+        result = Duplicator(config).duplicate(
+            template_url, new_repo_name, bundle_path=bundle_path
+        )
+    except KeyboardInterrupt:
+        print_warning("\nOperation cancelled by user")
+        sys.exit(1)
+
+    if result.bundle_path:
+        print_info(f"Used offline bundle {result.bundle_path} for {template_url}")
+    if result.lfs is not None:
+        print_info(
+            f"LFS objects: {result.lfs.transferred} copied, "
+            f"{result.lfs.skipped} already present"
+        )
+    if result.settings:
+        print_info(f"Repository settings: {summarize(result.settings)}")
+    if result.verification:
+        print_info(f"Verification: {result.verification.summary()}")
+    for pushed in result.destinations:
+        print_destination_result(pushed)
+    print_rollback_results(result.rollback)
+    if not result.success:
+        messages = {
+            ErrorKind.NAME_TAKEN: "A repository with this name already exists",
+            ErrorKind.CLONE_FAILED: "Failed to clone the template repository",
+            ErrorKind.SUBMODULES_FAILED: "Failed to prepare submodules",
+            ErrorKind.CREATE_FAILED: "Failed to create the new repository",
+            ErrorKind.PUSH_FAILED: "Failed to push to the new repository",
+            ErrorKind.LFS_FAILED: "Failed to copy LFS objects",
+            ErrorKind.SETTINGS_FAILED: "Failed to apply repository settings",
+            ErrorKind.DESTINATION_FAILED: "Failed to push to some destinations",
+            ErrorKind.VERIFY_FAILED: "The new repository does not match what was pushed",
+        }
+        print_error(messages.get(result.error_kind, "Repository duplication failed"))
+        if result.error:
+            print_error(result.error)
+        sys.exit(1)
+
+    print_success(f"\n✅ Repository successfully duplicated!")
+    print_info(f"New repository: {result.repo_url}")
+
     # Determine which shell to use
     shell_cmd = "/bin/bash"
     if platform.system() == "Windows":
         shell_cmd = "cmd.exe"
 
-    # Create temp directory for cloning
-    temp_dir = f"{new_repo_name}_temp"
-    if os.path.exists(temp_dir):
-        print_warning(f"Directory {temp_dir} already exists. Removing it...")
-        shutil.rmtree(temp_dir)
+    # Automatically clone the new repository
+    print_info(f"Cloning the new repository to your current directory...")
+    with deadline("clone_back"), time_phase("clone_back"):
+        clone_new_repository(new_repo_name, f"{result.repo_url}.git", shell_cmd)
 
-    try:
-        # Clone the template repository
-        print_info(f"\nCloning template repository: {template_url}")
-        if not execute_command(f"git clone {template_url} {temp_dir}", shell_cmd):
-            print_error("Failed to clone the template repository")
-            sys.exit(1)
 
-        # Create a new repository on GitHub
-        print_info(f"\nCreating new repository: {new_repo_name}")
-        if not execute_command(
-            f"gh repo create {new_repo_name} --private --confirm", shell_cmd
-        ):
-            print_error("Failed to create the new repository")
-            sys.exit(1)
+def clone_new_repository(repo_name: str, clone_url: str, shell_cmd: str) -> None:
+    """
+    Clone a newly duplicated repository into the current directory.
 
-        # Set up the new repository and push
-        print_info("\nSetting up the new repository")
-        commands = [
-            f"cd {temp_dir}",
-            "git remote remove origin",
-            f"git remote add origin $(gh repo view {new_repo_name} --json sshUrl -q .sshUrl)",
-            "git push -u origin main || git push -u origin master",
-        ]
+    Tries GitHub CLI first and falls back to git, printing help on failure.
 
-        if not execute_command(" && ".join(commands), shell_cmd):
-            print_error("Failed to push to the new repository")
-            sys.exit(1)
+    Args:
+        repo_name: The name of the new repository.
+        clone_url: The git URL of the new repository.
+        shell_cmd: The shell to use for command execution.
+    """
+    # Check if GitHub CLI is available and authenticated
+    gh_available = (
+        run_with_deadline(
+            "which gh >/dev/null 2>&1", shell=True, executable=shell_cmd
+        ).returncode
+        == 0
+    )
 
-        # Clean up
-        print_info("\nCleaning up temporary files")
-        shutil.rmtree(temp_dir)
+    if gh_available:
+        # Always try GitHub CLI first if it's available
+        print_info("Using GitHub CLI for cloning...")
+        print_info(
+            "This is the most secure method as it uses your authorized GitHub credentials"
+        )
+        clone_cmd = f"gh repo clone {repo_name}"
+        if execute_command(clone_cmd, shell_cmd):
+            print_success(f"Repository successfully cloned to {repo_name}/")
+        else:
+            print_warning(
+                f"Could not clone with GitHub CLI. Trying direct git clone..."
+            )
 
-        # Show success message
-        repo_url = subprocess.check_output(
-            f"gh repo view {new_repo_name} --json url -q .url", shell=True, text=True
-        ).strip()
+            # Set up credential helper for git
+            print_info("Setting up credential storage...")
+            execute_command("git config --global credential.helper store", shell_cmd)
 
-        print_success(f"\n✅ Repository successfully duplicated!")
-        print_info(f"New repository: {repo_url}")
+            if execute_command(f"git clone {clone_url}", shell_cmd):
+                print_success(f"Repository successfully cloned to {repo_name}/")
+            else:
+                print_warning(f"Could not automatically clone the repository.")
+                print_info(f"You can clone it manually with: git clone {clone_url}")
+                print_info(f"Or use GitHub CLI: gh repo clone {repo_name}")
 
-        # Automatically clone the new repository
-        clone_url = f"{repo_url}.git"
-        print_info(f"Cloning the new repository to your current directory...")
+                # Show authentication help
+                print_info("\nTip: To avoid authentication issues, you can:")
+                print_info(
+                    "1. Use GitHub CLI: run 'gh auth login' (recommended by GitHub for best security)"
+                )
+                print_info(
+                    "2. Set up an SSH key: https://docs.github.com/en/authentication/connecting-to-github-with-ssh"
+                )
+                print_info("3. Use a personal access token with git credential helper")
+    else:
+        # Fallback to git clone if GitHub CLI is not available
+        print_info("GitHub CLI not detected. Using git clone...")
+        print_info(
+            "Note: GitHub no longer accepts password authentication for security reasons."
+        )
+        print_info(
+            "Personal Access Tokens or SSH keys are the recommended secure alternatives."
+        )
 
-        # Check if GitHub CLI is available and authenticated
-        gh_available = (
-            subprocess.run(
-                "which gh >/dev/null 2>&1", shell=True, executable=shell_cmd
-            ).returncode
-            == 0
+        # Ask if user wants to store credentials
+        store_creds = (
+            input("\nStore GitHub credentials to avoid future prompts? (y/n): ")
+            .lower()
+            .strip()
+            == "y"
         )
 
-        if gh_available:
-            # Always try GitHub CLI first if it's available
-            print_info("Using GitHub CLI for cloning...")
+        if store_creds:
+            # Set up credential helper before clone
+            print_info("Setting up credential storage...")
             print_info(
-                "This is the most secure method as it uses your authorized GitHub credentials"
+                "This safely stores your credentials in your system's credential manager"
             )
-            clone_cmd = f"gh repo clone {new_repo_name}"
-            if execute_command(clone_cmd, shell_cmd):
-                print_success(f"Repository successfully cloned to {new_repo_name}/")
-            else:
-                print_warning(
-                    f"Could not clone with GitHub CLI. Trying direct git clone..."
-                )
-
-                # Set up credential helper for git
-                print_info("Setting up credential storage...")
-                execute_command(
-                    "git config --global credential.helper store", shell_cmd
-                )
+            execute_command("git config --global credential.helper store", shell_cmd)
+            print_info("Credentials will be saved after first entry")
 
-                if execute_command(f"git clone {clone_url}", shell_cmd):
-                    print_success(f"Repository successfully cloned to {new_repo_name}/")
-                else:
-                    print_warning(f"Could not automatically clone the repository.")
-                    print_info(f"You can clone it manually with: git clone {clone_url}")
-                    print_info(f"Or use GitHub CLI: gh repo clone {new_repo_name}")
-
-                    # Show authentication help
-                    print_info("\nTip: To avoid authentication issues, you can:")
-                    print_info(
-                        "1. Use GitHub CLI: run 'gh auth login' (recommended by GitHub for best security)"
-                    )
-                    print_info(
-                        "2. Set up an SSH key: https://docs.github.com/en/authentication/connecting-to-github-with-ssh"
-                    )
-                    print_info(
-                        "3. Use a personal access token with git credential helper"
-                    )
+        if execute_command(f"git clone {clone_url}", shell_cmd):
+            print_success(f"Repository successfully cloned to {repo_name}/")
         else:
-            # Fallback to git clone if GitHub CLI is not available
-            print_info("GitHub CLI not detected. Using git clone...")
+            print_warning(f"Could not automatically clone the repository.")
+            print_info(f"You can clone it manually with: git clone {clone_url}")
+
+            # Suggest GitHub CLI
+            print_info("\nTip: To avoid authentication issues, we recommend:")
             print_info(
-                "Note: GitHub no longer accepts password authentication for security reasons."
+                "1. Install GitHub CLI: https://cli.github.com/ (official tool maintained by GitHub)"
             )
             print_info(
-                "Personal Access Tokens or SSH keys are the recommended secure alternatives."
+                "2. Authenticate with: gh auth login (uses secure OAuth authentication)"
             )
+            print_info("3. Clone with: gh repo clone {repo_name}")
 
-            # Ask if user wants to store credentials
-            store_creds = (
-                input("\nStore GitHub credentials to avoid future prompts? (y/n): ")
-                .lower()
-                .strip()
-                == "y"
-            )
-
-            if store_creds:
-                # Set up credential helper before clone
-                print_info("Setting up credential storage...")
-                print_info(
-                    "This safely stores your credentials in your system's credential manager"
-                )
-                execute_command(
-                    "git config --global credential.helper store", shell_cmd
-                )
-                print_info("Credentials will be saved after first entry")
 
-            if execute_command(f"git clone {clone_url}", shell_cmd):
-                print_success(f"Repository successfully cloned to {new_repo_name}/")
-            else:
-                print_warning(f"Could not automatically clone the repository.")
-                print_info(f"You can clone it manually with: git clone {clone_url}")
-
-                # Suggest GitHub CLI
-                print_info("\nTip: To avoid authentication issues, we recommend:")
-                print_info(
-                    "1. Install GitHub CLI: https://cli.github.com/ (official tool maintained by GitHub)"
-                )
-                print_info(
-                    "2. Authenticate with: gh auth login (uses secure OAuth authentication)"
-                )
-                print_info("3. Clone with: gh repo clone {new_repo_name}")
+def prepare_submodules(
+    repo_dir: str,
+    jobs: int = DEFAULT_SUBMODULE_JOBS,
+    use_mirror_cache: bool = False,
+    owner: Optional[str] = None,
+) -> bool:
+    """
+    Check out the submodules of a cloned template and optionally rewrite them.
 
-    except KeyboardInterrupt:
-        print_warning("\nOperation cancelled by user")
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-        sys.exit(1)
+    Args:
+        repo_dir: The working tree of the cloned template.
+        jobs: Maximum number of submodules fetched concurrently.
+        use_mirror_cache: Whether to seed submodules from the mirror cache.
+        owner: Optional owner whose duplicated copies the submodules should
+            point at.
 
-    except Exception as e:
-        print_error(f"An unexpected error occurred: {str(e)}")
-        logger.exception("Detailed error information:")
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-        sys.exit(1)
+    Returns:
+        True if the submodules were prepared successfully, False otherwise.
+    """
+    try:
+        submodules = update_submodules(repo_dir, jobs, use_mirror_cache)
+        if submodules:
+            print_info(f"Checked out {len(submodules)} submodules")
+        if owner:
+            changed = rewrite_submodule_urls(repo_dir, github_owner_rewriter(owner))
+            for name, url in changed.items():
+                print_info(f"Submodule {name} now points at {url}")
+    except SubmoduleError as e:
+        print_error(f"Failed to prepare submodules: {e}")
+        return False
+    return True
 
 
 def cli_entry_point():
@@ -761,7 +1070,13 @@ def cli_entry_point():
 
 
 def clone_repository(
-    repo_url: str, destination: str, shell_cmd: str = "/bin/bash"
+    repo_url: str,
+    destination: str,
+    shell_cmd: str = "/bin/bash",
+    recurse_submodules: bool = False,
+    submodule_jobs: int = DEFAULT_SUBMODULE_JOBS,
+    submodule_mirror_cache: bool = False,
+    git_backend: Optional[str] = None,
 ) -> bool:
     """
     Clone a repository to a destination directory.
@@ -769,7 +1084,13 @@ def clone_repository(
     Args:
         repo_url: The URL of the repository to clone.
         destination: The directory to clone into.
-        shell_cmd: The shell to use for command execution.
+        shell_cmd: The shell to use for command execution (unused; git runs
+            through the git backend).
+        recurse_submodules: Whether to check out submodules recursively.
+        submodule_jobs: Maximum number of submodules fetched concurrently.
+        submodule_mirror_cache: Whether to seed submodules from the mirror cache.
+        git_backend: The git backend to clone with; defaults to the configured
+            one.
 
     Returns:
         True if the cloning was successful, False otherwise.
@@ -781,8 +1102,15 @@ def clone_repository(
         print_warning(f"Directory {destination} already exists. Removing it...")
         shutil.rmtree(destination)
 
-    cmd = f"git clone {repo_url} {destination}"
-    return execute_command(cmd, shell_cmd)
+    try:
+        get_backend(git_backend).clone(repo_url, destination)
+    except GitError as e:
+        logger.error(f"Clone failed: {e}")
+        print_error(f"Failed to clone {repo_url}: {e}")
+        return False
+    if recurse_submodules:
+        return prepare_submodules(destination, submodule_jobs, submodule_mirror_cache)
+    return True
 
 
 def create_new_repository(
@@ -814,7 +1142,10 @@ def create_new_repository(
 
 
 def push_to_new_repository(
-    local_dir: str, repo_name: str, shell_cmd: str = "/bin/bash"
+    local_dir: str,
+    repo_name: str,
+    shell_cmd: str = "/bin/bash",
+    git_backend: Optional[str] = None,
 ) -> bool:
     """
     Push local content to a new GitHub repository.
@@ -822,7 +1153,10 @@ def push_to_new_repository(
     Args:
         local_dir: The directory containing the local content.
         repo_name: The name of the target repository.
-        shell_cmd: The shell to use for command execution.
+        shell_cmd: The shell to use for command execution (unused; git runs
+            through the git backend).
+        git_backend: The git backend to push with; defaults to the configured
+            one.
 
     Returns:
         True if the push was successful, False otherwise.
@@ -831,28 +1165,22 @@ def push_to_new_repository(
     print_info(f"Pushing to new repository: {repo_name}")
 
     try:
-        # Get the repo URL from GitHub CLI
-        result = subprocess.run(
-            f"gh repo view {repo_name} --json sshUrl -q .sshUrl",
-            shell=True,
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        repo_url = result.stdout.strip()
-
-        # Set up git commands
-        commands = [
-            f"cd {local_dir}",
-            "git remote remove origin",
-            f"git remote add origin {repo_url}",
-            "git push -u origin main || git push -u origin master",
-        ]
-
-        return execute_command(" && ".join(commands), shell_cmd)
-    except subprocess.CalledProcessError as e:
+        # Looked up once per repository and shared with the LFS copy
+        repo_url = repository_metadata(repo_name).ssh_url
+
+        # Point origin at the new repository and push the current branch
+        git = get_backend(git_backend)
+        git.set_remote(local_dir, "origin", repo_url)
+        branch = git.current_branch(local_dir)
+        git.push(local_dir, "origin", [branch], set_upstream=True)
+        return True
+    except GitError as e:
+        logger.error(f"Push failed: {e}")
+        print_error(f"Failed to push to the new repository: {e}")
+        return False
+    except GitHubApiError as e:
         logger.error(f"Error getting repository URL: {e}")
-        print_error(f"Failed to get repository URL: {e.stderr.strip()}")
+        print_error(f"Failed to get repository URL: {e}")
         return False
     except Exception as e:
         logger.exception("Error during push operation")
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Fan-out duplication for GitHub Repo Duplicator.
+
+Fetches a template repository once and pushes the same object set to many
+new repositories concurrently, reporting a status for every target.
+"""
+
+import csv
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from .destinations import Destination, DestinationResult, push_to_destinations
+from .duplicator import create_new_repository
+from .git_backend import GitBackend, GitError, get_backend
+from .github_api import GitHubApiError, repository_metadata
+from .lfs import (
+    DEFAULT_LFS_JOBS,
+    LfsClient,
+    LfsError,
+    LfsObject,
+    LfsTransferResult,
+    get_github_token,
+    lfs_endpoint,
+    list_lfs_objects,
+    transfer_lfs_objects,
+)
+from .maintenance import optimize_repository
+from .metrics import pack_size_bytes, record_duplication, record_transfer, time_phase
+from .mirrors import current_mirror
+from .precheck import precheck_names
+from .registry import RegistryEntry, normalize_template_url, record_entry
+from .rollback import DEFAULT_ROLLBACK_POLICY, JobTransaction, RollbackResult
+from .settings import RepoSettings, SettingResult, apply_settings
+from .sync import TEMPLATE_BASE_REF
+from .verify import VerificationResult, verify_push
+from .watchdog import Cancelled, DeadlineExceeded, deadline
+from .workspace import WorkspaceError, estimate_template_size, get_workspace_manager
+
+logger = logging.getLogger(__name__)
+
+# Number of targets created and pushed at the same time by default
+DEFAULT_MAX_WORKERS = 4
+
+# Refspecs pushed to every target: all branches, all tags and the template base
+PUSH_REFSPECS = [
+    "refs/heads/*:refs/heads/*",
+    "refs/tags/*:refs/tags/*",
+    f"{TEMPLATE_BASE_REF}:{TEMPLATE_BASE_REF}",
+]
+
+
+@dataclass
+class FanOutResult:
+    """Outcome of duplicating the template into a single target repository."""
+
+    name: str
+    success: bool = False
+    remote_url: str = ""
+    error: str = ""
+    duration: float = 0.0
+    lfs: Optional[LfsTransferResult] = None
+    settings: List[SettingResult] = field(default_factory=list)
+    destinations: List[DestinationResult] = field(default_factory=list)
+    verification: Optional[VerificationResult] = None
+    rollback: List[RollbackResult] = field(default_factory=list)
+
+
+def fetch_template(
+    template_url: str, destination: str, backend: Optional[GitBackend] = None
+) -> None:
+    """
+    Fetch a template repository into a bare local repository.
+
+    Args:
+        template_url: The URL of the template repository.
+        destination: The directory to create the bare repository in.
+        backend: The git backend to use; defaults to the configured one.
+
+    Raises:
+        GitError: If the clone fails.
+    """
+    # A prewarmed mirror costs one ls-remote instead of a fetch
+    mirror = current_mirror(normalize_template_url(template_url), template_url)
+    source = mirror or template_url
+    logger.info(f"Fetching template {template_url} into {destination}")
+    (backend or get_backend()).clone(source, destination, bare=True)
+
+
+def get_remote_url(repo_name: str) -> str:
+    """
+    Look up the SSH URL of a GitHub repository.
+
+    Args:
+        repo_name: The name of the repository.
+
+    Returns:
+        The SSH URL of the repository.
+
+    Raises:
+        GitHubApiError: If the lookup fails.
+    """
+    return repository_metadata(repo_name).ssh_url
+
+
+def push_refs(
+    git_dir: str, remote_url: str, backend: Optional[GitBackend] = None
+) -> None:
+    """
+    Push all branches and tags of a local repository to a remote.
+
+    Args:
+        git_dir: The local (bare) repository holding the objects.
+        remote_url: The URL of the remote to push to.
+        backend: The git backend to use; defaults to the configured one.
+
+    Raises:
+        GitError: If the push fails.
+    """
+    (backend or get_backend()).push(git_dir, remote_url, PUSH_REFSPECS)
+
+
+def _duplicate_into(
+    git_dir: str,
+    repo_name: str,
+    private: bool,
+    description: str,
+    shell_cmd: str,
+    lfs_objects: List[LfsObject],
+    lfs_source: Optional[LfsClient],
+    backend: GitBackend,
+    settings: Optional[RepoSettings] = None,
+    rollback: str = DEFAULT_ROLLBACK_POLICY,
+    destinations: Optional[List[Destination]] = None,
+    verify: bool = True,
+    verify_tree: bool = False,
+) -> FanOutResult:
+    """Create one target repository and push the fetched template into it."""
+    result = FanOutResult(name=repo_name)
+    transaction = JobTransaction(f"fan-out:{repo_name}", rollback)
+    started = time.monotonic()
+    try:
+        with deadline("create"), time_phase("create"):
+            created = create_new_repository(repo_name, description, private, shell_cmd)
+        if not created:
+            result.error = "repository creation failed"
+            return result
+        transaction.created_repository(repo_name)
+        with deadline("push"), time_phase("push"), ThreadPoolExecutor(1) as pool:
+            # Further destinations push from the same objects alongside GitHub
+            mirrored = None
+            if destinations:
+                mirrored = pool.submit(
+                    push_to_destinations,
+                    git_dir,
+                    repo_name,
+                    destinations,
+                    PUSH_REFSPECS,
+                    backend=backend,
+                    private=private,
+                    description=description,
+                    transaction=transaction,
+                    verify=verify,
+                )
+            try:
+                result.remote_url = get_remote_url(repo_name)
+                push_refs(git_dir, result.remote_url, backend)
+            finally:
+                if mirrored:
+                    result.destinations = mirrored.result()
+        transaction.pushed(repo_name)
+        record_transfer("push", pack_size_bytes(git_dir))
+        if verify:
+            # Compare refs instead of cloning the new repository again
+            with deadline("verify"), time_phase("verify"):
+                github_repo = branch = None
+                if verify_tree:
+                    github_repo = repository_metadata(repo_name).full_name
+                    branch = backend.current_branch(git_dir)
+                result.verification = verify_push(
+                    git_dir,
+                    result.remote_url,
+                    PUSH_REFSPECS,
+                    backend,
+                    github_repo=github_repo,
+                    branch=branch,
+                )
+            if not result.verification.ok:
+                result.error = result.verification.summary()
+                return result
+        if lfs_source and lfs_objects:
+            destination = LfsClient(lfs_endpoint(result.remote_url), lfs_source.token)
+            with deadline("lfs"), time_phase("lfs"):
+                result.lfs = transfer_lfs_objects(
+                    lfs_objects, lfs_source, destination, jobs=DEFAULT_LFS_JOBS
+                )
+            record_transfer("lfs", result.lfs.bytes_transferred)
+            if not result.lfs.success:
+                result.error = f"{len(result.lfs.failed)} LFS objects failed"
+                return result
+        if settings:
+            with time_phase("settings"):
+                full_name = repository_metadata(repo_name).full_name
+                result.settings = apply_settings(full_name, settings)
+            failed = [s.setting for s in result.settings if not s.ok]
+            if failed:
+                result.error = f"settings failed: {', '.join(failed)}"
+                return result
+        failed = [d.destination for d in result.destinations if not d.success]
+        if failed:
+            result.error = f"push failed to {', '.join(failed)}"
+            return result
+        result.success = True
+    except subprocess.CalledProcessError as e:
+        result.error = (e.stderr or str(e)).strip()
+    except (GitError, GitHubApiError, DeadlineExceeded, Cancelled) as e:
+        result.error = str(e)
+    except LfsError as e:
+        result.error = f"LFS transfer failed: {e}"
+    except Exception as e:
+        logger.exception(f"Unexpected error while duplicating into {repo_name}")
+        result.error = str(e)
+    finally:
+        if result.success:
+            transaction.commit()
+        else:
+            result.rollback = transaction.rollback()
+        result.duration = time.monotonic() - started
+        record_duplication("success" if result.success else "failure")
+    return result
+
+
+def _record(
+    template_url: str,
+    result: FanOutResult,
+    private: bool,
+    template_sha: str = "",
+    template_commit_time: Optional[int] = None,
+) -> None:
+    """Add a finished target to the local registry."""
+    record_entry(
+        RegistryEntry(
+            template_url=template_url,
+            repo_name=result.name,
+            outcome="success" if result.success else "failure",
+            kind="fan-out",
+            template_sha=template_sha,
+            template_commit_time=template_commit_time,
+            repo_url=result.remote_url,
+            visibility="private" if private else "public",
+            error=result.error,
+            duration=result.duration,
+        )
+    )
+
+
+def fan_out(
+    template_url: str,
+    repo_names: List[str],
+    private: bool = True,
+    description: str = "",
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    shell_cmd: str = "/bin/bash",
+    on_result: Optional[Callable[[FanOutResult], None]] = None,
+    lfs_source_url: Optional[str] = None,
+    git_backend: Optional[str] = None,
+    workspace_root: Optional[str] = None,
+    precheck: bool = True,
+    settings: Optional[RepoSettings] = None,
+    settings_by_name: Optional[Dict[str, RepoSettings]] = None,
+    rollback: str = DEFAULT_ROLLBACK_POLICY,
+    destinations: Optional[List[Destination]] = None,
+    verify: bool = True,
+    verify_tree: bool = False,
+    bundle_path: Optional[str] = None,
+) -> List[FanOutResult]:
+    """
+    Duplicate one template into many new repositories.
+
+    The template is fetched once; every target is then created and pushed
+    from the same local object set, with at most ``max_workers`` targets in
+    flight at a time.
+
+    Args:
+        template_url: The URL of the template repository.
+        repo_names: Names of the repositories to create.
+        private: Whether the new repositories should be private.
+        description: Optional description for the new repositories.
+        max_workers: Maximum number of targets processed concurrently.
+        shell_cmd: The shell to use for command execution.
+        on_result: Optional callback invoked as each target finishes.
+        lfs_source_url: If given, Git LFS objects are copied from this
+            repository into every target after the push.
+        git_backend: The git backend to fetch and push with; defaults to the
+            configured one.
+        workspace_root: Directory under which the template is fetched;
+            defaults to the configured workspace root.
+        precheck: Whether to reject names that already exist on GitHub
+            before fetching the template. Invalid names are always rejected.
+        settings: Settings applied to every target after the push.
+        settings_by_name: Per-target settings, e.g. from manifest columns,
+            taking precedence over ``settings``.
+        rollback: What a failed target removes of what it created; see
+            ``rollback.ROLLBACK_POLICIES``.
+        destinations: Further destinations every target is pushed to,
+            concurrently with its GitHub push.
+        verify: Whether to compare every target's refs with the pushed ones
+            after the push, instead of trusting the push.
+        verify_tree: Whether to also compare the tree of the default branch
+            through the GitHub API.
+        bundle_path: Optional template bundle to fetch from instead of
+            ``template_url``, which targets are still recorded under.
+
+    Returns:
+        One result per requested name, in the order the names were given.
+    """
+    names = list(dict.fromkeys(repo_names))
+    results = {}
+    valid_names = []
+    with time_phase("precheck"):
+        checks = precheck_names(names, check_existing=precheck)
+    for check in checks:
+        if check.ok:
+            valid_names.append(check.name)
+        else:
+            results[check.name] = FanOutResult(name=check.name, error=check.error)
+            record_duplication("rejected")
+
+    if valid_names:
+        workspaces = get_workspace_manager(workspace_root)
+        tmp_root = None
+        try:
+            backend = get_backend(git_backend)
+            source = bundle_path or template_url
+            size = estimate_template_size(source) or 0
+            tmp_root = workspaces.acquire("fanout", size)
+            git_dir = os.path.join(tmp_root, "template.git")
+            with deadline("clone"), time_phase("clone"):
+                fetch_template(source, git_dir, backend)
+            template_sha = backend.rev_parse(git_dir)
+            commit_time = backend.commit_time(git_dir)
+            backend.update_ref(git_dir, TEMPLATE_BASE_REF, template_sha)
+            if len(valid_names) > 1:
+                # Pay for deltas and bitmaps once instead of on every push
+                optimize_repository(git_dir)
+        except (GitError, WorkspaceError, DeadlineExceeded, Cancelled) as e:
+            if tmp_root:
+                workspaces.release(tmp_root)
+            error = f"template fetch failed: {e}"
+            for name in valid_names:
+                results[name] = FanOutResult(name=name, error=error)
+                record_duplication("failure")
+                _record(template_url, results[name], private)
+            valid_names = []
+
+        lfs_objects = []
+        lfs_source = None
+        if valid_names and lfs_source_url:
+            try:
+                lfs_objects = list_lfs_objects(git_dir)
+                lfs_source = LfsClient(lfs_endpoint(lfs_source_url), get_github_token())
+            except LfsError as e:
+                # Pushing without the objects would leave broken LFS pointers
+                workspaces.release(tmp_root)
+                error = f"LFS object listing failed: {e}"
+                for name in valid_names:
+                    results[name] = FanOutResult(name=name, error=error)
+                    record_duplication("failure")
+                    _record(template_url, results[name], private)
+                valid_names = []
+
+        if valid_names:
+            try:
+                with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+                    futures = [
+                        pool.submit(
+                            _duplicate_into,
+                            git_dir,
+                            name,
+                            private,
+                            description,
+                            shell_cmd,
+                            lfs_objects,
+                            lfs_source,
+                            backend,
+                            (settings or RepoSettings()).merged(
+                                (settings_by_name or {}).get(name, RepoSettings())
+                            ),
+                            rollback,
+                            destinations,
+                            verify,
+                            verify_tree,
+                        )
+                        for name in valid_names
+                    ]
+                    for future in as_completed(futures):
+                        result = future.result()
+                        results[result.name] = result
+                        _record(
+                            template_url, result, private, template_sha, commit_time
+                        )
+                        if on_result:
+                            on_result(result)
+            finally:
+                workspaces.release(tmp_root)
+
+    return [results[name] for name in names]
+
+
+def read_names_file(path: str) -> List[str]:
+    """
+    Read repository names from a file, one per line.
+
+    Blank lines and lines starting with ``#`` are ignored. A file whose first
+    line is a CSV header starting with ``name`` is a manifest: names are read
+    from its first column, and the other columns hold per-repository settings
+    (see ``settings.read_manifest_settings``).
+
+    Args:
+        path: The path of the names file.
+
+    Returns:
+        The repository names listed in the file.
+    """
+    with open(path, encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        names = [line for line in lines if line and not line.startswith("#")]
+    if names and names[0].lower().startswith("name,"):
+        return [row[0].strip() for row in csv.reader(names[1:]) if row and row[0]]
+    return names
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Git backends for GitHub Repo Duplicator.
+
+All clones, remote changes and pushes of a duplication go through a
+``GitBackend``. The default backend runs the ``git`` executable; the optional
+dulwich backend performs the same operations in-process, which avoids a fork
+per operation when many repositories are duplicated in one run.
+
+The backend is chosen with ``--git-backend`` or the
+``GITHUB_REPO_DUPLICATOR_GIT_BACKEND`` environment variable.
+"""
+
+import fnmatch
+import io
+import logging
+import os
+import subprocess
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Type
+
+from .governor import slot
+from .watchdog import run_with_deadline
+
+logger = logging.getLogger(__name__)
+
+# Environment variable naming the backend used when none is given explicitly
+GIT_BACKEND_ENV = "GITHUB_REPO_DUPLICATOR_GIT_BACKEND"
+
+DEFAULT_GIT_BACKEND = "subprocess"
+
+# Identity of the commits the tool makes on hosts without a git identity
+FALLBACK_IDENTITY = {
+    "user.name": "GitHub Repo Duplicator",
+    "user.email": "github-repo-duplicator@users.noreply.github.com",
+}
+
+
+class GitError(Exception):
+    """Raised when a git operation fails or a backend is unavailable."""
+
+
+class GitBackend(ABC):
+    """The git operations a duplication needs."""
+
+    name = ""
+
+    @abstractmethod
+    def clone(self, url: str, destination: str, bare: bool = False) -> None:
+        """
+        Clone a repository.
+
+        Args:
+            url: The URL or path of the repository to clone.
+            destination: The directory to clone into.
+            bare: Whether to create a bare repository without a work tree.
+        """
+
+    @abstractmethod
+    def set_remote(self, repo_dir: str, name: str, url: str) -> None:
+        """
+        Point a remote at a URL, replacing any existing remote of that name.
+
+        Args:
+            repo_dir: The local repository.
+            name: The name of the remote.
+            url: The URL of the remote.
+        """
+
+    @abstractmethod
+    def push(
+        self,
+        repo_dir: str,
+        remote: str,
+        refspecs: List[str],
+        set_upstream: bool = False,
+    ) -> None:
+        """
+        Push refs to a remote.
+
+        Args:
+            repo_dir: The local repository.
+            remote: The name or URL of the remote.
+            refspecs: The refspecs to push; ``*`` globs are allowed.
+            set_upstream: Whether pushed branches should track the remote.
+        """
+
+    @abstractmethod
+    def rev_parse(self, repo_dir: str, rev: str = "HEAD") -> str:
+        """Resolve a revision to a commit SHA."""
+
+    @abstractmethod
+    def commit_time(self, repo_dir: str, rev: str = "HEAD") -> int:
+        """Get the committer timestamp of a commit."""
+
+    @abstractmethod
+    def update_ref(self, repo_dir: str, ref: str, sha: str) -> None:
+        """Create or move a ref to point at a commit."""
+
+    @abstractmethod
+    def current_branch(self, repo_dir: str) -> str:
+        """Get the short name of the branch HEAD points at."""
+
+    @abstractmethod
+    def tree_sha(self, repo_dir: str, rev: str = "HEAD") -> str:
+        """Get the SHA of the tree of a commit."""
+
+    @abstractmethod
+    def list_refs(self, repo_dir: str) -> Dict[str, str]:
+        """Map every ref of a local repository to the object it points at."""
+
+    @abstractmethod
+    def ls_remote(self, url: str) -> Dict[str, str]:
+        """
+        Map every ref of a remote to the object it points at, without fetching.
+
+        Annotated tags map to the tag object, as pushed; ``HEAD`` and peeled
+        entries are left out.
+        """
+
+
+def expand_refspecs(refs: List[str], refspecs: List[str]) -> List[str]:
+    """
+    Expand refspecs into exact ``[+]source:target`` pairs.
+
+    Short branch names become ``refs/heads/`` refs and ``*`` globs are
+    matched against the given local refs.
+
+    Args:
+        refs: The full names of the local refs.
+        refspecs: The refspecs to expand.
+
+    Returns:
+        The exact refspecs, in order.
+    """
+    expanded = []
+    refs = sorted(ref for ref in refs if ref != "HEAD")
+    for refspec in refspecs:
+        force = refspec.startswith("+")
+        source, _, target = refspec.lstrip("+").partition(":")
+        target = target or source
+        if "*" not in source:
+            if not source.startswith("refs/"):
+                source = f"refs/heads/{source}"
+                target = f"refs/heads/{target}"
+            expanded.append(f"{'+' if force else ''}{source}:{target}")
+            continue
+        prefix, _, suffix = source.partition("*")
+        for ref in fnmatch.filter(refs, source):
+            match = ref[len(prefix) : len(ref) - len(suffix)]
+            spec = f"{ref}:{target.replace('*', match)}"
+            expanded.append(f"+{spec}" if force else spec)
+    return expanded
+
+
+def identity_args(repo_dir: str) -> List[str]:
+    """
+    Get ``-c`` options giving commits an identity where git has none.
+
+    An identity configured for the user or the repository is kept, so only
+    hosts without one commit as ``FALLBACK_IDENTITY``.
+
+    Args:
+        repo_dir: The repository the commit is made in.
+
+    Returns:
+        Options to put before the git subcommand; empty if git has an identity.
+    """
+    args = []
+    for key, value in FALLBACK_IDENTITY.items():
+        try:
+            configured = run_with_deadline(
+                ["git", "config", "--get", key],
+                cwd=repo_dir,
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+        except OSError:
+            configured = ""
+        if not configured:
+            args += ["-c", f"{key}={value}"]
+    return args
+
+
+class SubprocessBackend(GitBackend):
+    """Runs every operation with the ``git`` executable."""
+
+    name = "subprocess"
+
+    def _git(self, args: List[str], cwd: Optional[str] = None) -> str:
+        """Run a git command and return its stripped output."""
+        try:
+            result = run_with_deadline(
+                ["git"] + args, cwd=cwd, check=True, capture_output=True, text=True
+            )
+        except subprocess.CalledProcessError as e:
+            raise GitError((e.stderr or str(e)).strip()) from e
+        except OSError as e:
+            raise GitError(str(e)) from e
+        return result.stdout.strip()
+
+    def clone(self, url: str, destination: str, bare: bool = False) -> None:
+        args = ["clone", "--quiet"] + (["--bare"] if bare else [])
+        self._git(args + [url, destination])
+
+    def set_remote(self, repo_dir: str, name: str, url: str) -> None:
+        remotes = self._git(["remote"], repo_dir).splitlines()
+        if name in remotes:
+            self._git(["remote", "remove", name], repo_dir)
+        self._git(["remote", "add", name, url], repo_dir)
+
+    def push(
+        self,
+        repo_dir: str,
+        remote: str,
+        refspecs: List[str],
+        set_upstream: bool = False,
+    ) -> None:
+        args = ["push", "--quiet"] + (["-u"] if set_upstream else [])
+        self._git(args + [remote] + refspecs, repo_dir)
+
+    def rev_parse(self, repo_dir: str, rev: str = "HEAD") -> str:
+        return self._git(["rev-parse", f"{rev}^{{commit}}"], repo_dir)
+
+    def commit_time(self, repo_dir: str, rev: str = "HEAD") -> int:
+        return int(self._git(["show", "-s", "--format=%ct", rev], repo_dir))
+
+    def update_ref(self, repo_dir: str, ref: str, sha: str) -> None:
+        self._git(["update-ref", ref, sha], repo_dir)
+
+    def current_branch(self, repo_dir: str) -> str:
+        return self._git(["symbolic-ref", "--short", "HEAD"], repo_dir)
+
+    def tree_sha(self, repo_dir: str, rev: str = "HEAD") -> str:
+        return self._git(["rev-parse", f"{rev}^{{tree}}"], repo_dir)
+
+    def list_refs(self, repo_dir: str) -> Dict[str, str]:
+        output = self._git(
+            ["for-each-ref", "--format=%(refname) %(objectname)"], repo_dir
+        )
+        return dict(line.split(" ", 1) for line in output.splitlines())
+
+    def ls_remote(self, url: str) -> Dict[str, str]:
+        refs = {}
+        for line in self._git(["ls-remote", url]).splitlines():
+            sha, _, ref = line.partition("\t")
+            if ref.startswith("refs/") and not ref.endswith("^{}"):
+                refs[ref] = sha
+        return refs
+
+
+class DulwichBackend(GitBackend):
+    """
+    Performs every operation in-process with dulwich.
+
+    SSH remotes are still reached through the ``ssh`` executable, but no
+    ``git`` process is started.
+    """
+
+    name = "dulwich"
+
+    def __init__(self):
+        try:
+            from dulwich import porcelain
+            from dulwich.errors import (
+                GitProtocolError,
+                HangupException,
+                NotGitRepository,
+            )
+            from dulwich.repo import Repo
+        except ImportError as e:
+            raise GitError(
+                "The dulwich git backend requires the dulwich package "
+                "(pip install dulwich)"
+            ) from e
+        self._porcelain = porcelain
+        self._repo_class = Repo
+        self._errors = (
+            GitProtocolError,
+            HangupException,
+            NotGitRepository,
+            # Rejected pushes (DivergedBranches) and other porcelain failures
+            porcelain.Error,
+            KeyError,
+            OSError,
+        )
+
+    def _call(self, func, *args, **kwargs):
+        """Call a dulwich function, turning its errors into GitError."""
+        try:
+            return func(*args, **kwargs)
+        except self._errors as e:
+            raise GitError(str(e) or type(e).__name__) from e
+
+    def _open(self, repo_dir: str):
+        """Open a local repository, raising GitError if it is not one."""
+        return self._call(self._repo_class, repo_dir)
+
+    def clone(self, url: str, destination: str, bare: bool = False) -> None:
+        with slot("clone"):
+            repo = self._call(
+                self._porcelain.clone,
+                url,
+                destination,
+                bare=bare,
+                checkout=not bare,
+                errstream=io.BytesIO(),
+            )
+        repo.close()
+
+    def set_remote(self, repo_dir: str, name: str, url: str) -> None:
+        def write(repo):
+            config = repo.get_config()
+            section = (b"remote", name.encode())
+            if config.has_section(section):
+                del config[section]
+            config.set(section, b"url", url.encode())
+            config.set(
+                section, b"fetch", f"+refs/heads/*:refs/remotes/{name}/*".encode()
+            )
+            config.write_to_path()
+
+        with self._open(repo_dir) as repo:
+            self._call(write, repo)
+
+    def _expand_refspecs(self, repo, refspecs: List[str]) -> List[bytes]:
+        """Expand ``*`` refspecs against local refs, as dulwich needs them exact."""
+        refs = [ref.decode() for ref in repo.get_refs()]
+        return [spec.encode() for spec in expand_refspecs(refs, refspecs)]
+
+    def push(
+        self,
+        repo_dir: str,
+        remote: str,
+        refspecs: List[str],
+        set_upstream: bool = False,
+    ) -> None:
+        with self._open(repo_dir) as repo:
+            expanded = self._call(self._expand_refspecs, repo, refspecs)
+            if not expanded:
+                return
+            with slot("push"):
+                self._call(
+                    self._porcelain.push,
+                    repo,
+                    remote,
+                    expanded,
+                    outstream=io.BytesIO(),
+                    errstream=io.BytesIO(),
+                )
+            if set_upstream:
+                self._call(self._track, repo, remote, expanded)
+
+    def _track(self, repo, remote: str, expanded: List[bytes]) -> None:
+        """Make pushed branches track their remote counterparts."""
+        config = repo.get_config()
+        for spec in expanded:
+            source, _, target = spec.lstrip(b"+").partition(b":")
+            if source.startswith(b"refs/heads/"):
+                section = (b"branch", source[len(b"refs/heads/") :])
+                config.set(section, b"remote", remote.encode())
+                config.set(section, b"merge", target)
+        config.write_to_path()
+
+    def rev_parse(self, repo_dir: str, rev: str = "HEAD") -> str:
+        from dulwich.objectspec import parse_commit
+
+        with self._open(repo_dir) as repo:
+            return self._call(parse_commit, repo, rev.encode()).id.decode()
+
+    def commit_time(self, repo_dir: str, rev: str = "HEAD") -> int:
+        from dulwich.objectspec import parse_commit
+
+        with self._open(repo_dir) as repo:
+            return self._call(parse_commit, repo, rev.encode()).commit_time
+
+    def update_ref(self, repo_dir: str, ref: str, sha: str) -> None:
+        with self._open(repo_dir) as repo:
+            self._call(repo.refs.__setitem__, ref.encode(), sha.encode())
+
+    def current_branch(self, repo_dir: str) -> str:
+        with self._open(repo_dir) as repo:
+            return self._call(self._porcelain.active_branch, repo).decode()
+
+    def tree_sha(self, repo_dir: str, rev: str = "HEAD") -> str:
+        from dulwich.objectspec import parse_commit
+
+        with self._open(repo_dir) as repo:
+            return self._call(parse_commit, repo, rev.encode()).tree.decode()
+
+    def list_refs(self, repo_dir: str) -> Dict[str, str]:
+        with self._open(repo_dir) as repo:
+            return {
+                ref.decode(): sha.decode()
+                for ref, sha in self._call(repo.get_refs).items()
+                if ref.startswith(b"refs/")
+            }
+
+    def ls_remote(self, url: str) -> Dict[str, str]:
+        result = self._call(self._porcelain.ls_remote, url)
+        # Older dulwich versions return the refs themselves
+        refs = getattr(result, "refs", result)
+        return {
+            ref.decode(): sha.decode()
+            for ref, sha in refs.items()
+            if ref.startswith(b"refs/") and not ref.endswith(b"^{}")
+        }
+
+
+BACKENDS: Dict[str, Type[GitBackend]] = {
+    SubprocessBackend.name: SubprocessBackend,
+    DulwichBackend.name: DulwichBackend,
+}
+
+_instances: Dict[str, GitBackend] = {}
+
+
+def get_backend(name: Optional[str] = None) -> GitBackend:
+    """
+    Get a git backend by name.
+
+    Args:
+        name: The backend name. Defaults to the backend named by
+            ``GITHUB_REPO_DUPLICATOR_GIT_BACKEND``, or ``subprocess``.
+
+    Returns:
+        A shared instance of the backend.
+
+    Raises:
+        GitError: If the backend is unknown or its dependencies are missing.
+    """
+    name = name or os.environ.get(GIT_BACKEND_ENV) or DEFAULT_GIT_BACKEND
+    if name not in BACKENDS:
+        raise GitError(
+            f"Unknown git backend {name!r}; choose from {', '.join(BACKENDS)}"
+        )
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+        logger.debug(f"Using the {name} git backend")
+    return _instances[name]
+
+
+def available_backends() -> List[str]:
+    """List the backends whose dependencies are installed."""
+    available = []
+    for name in BACKENDS:
+        try:
+            get_backend(name)
+        except GitError:
+            continue
+        available.append(name)
+    return available
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+GitHub API access for GitHub Repo Duplicator.
+
+Queries go through the GitHub CLI's ``gh api graphql`` so they use the same
+authentication as every other ``gh`` call. Lookups that would otherwise take
+one request per repository are batched into a few aliased GraphQL queries,
+and everything a job needs to know about a repository (owner, URLs, default
+branch) comes from a single cached query.
+"""
+
+import functools
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from .metrics import record_rate_limit_wait, record_retry
+from .watchdog import run_with_deadline
+
+logger = logging.getLogger(__name__)
+
+# Repositories looked up per GraphQL query
+DEFAULT_BATCH_SIZE = 100
+
+# Times a rate-limited query is sent again, and the first wait in seconds,
+# doubled on every retry
+MAX_RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BACKOFF = 15.0
+
+# How rate limit errors read in gh's output, primary and secondary
+_RATE_LIMITED = re.compile(r"RATE_LIMITED|rate limit", re.IGNORECASE)
+
+# Repository fields fetched in every metadata lookup
+_REPOSITORY_FIELDS = "name owner { login } sshUrl url defaultBranchRef { name }"
+
+# Web URL of a repository, as printed by ``gh repo create``
+_REPO_URL = re.compile(
+    r"https://(?P<host>[^/\s]+)/(?P<owner>[^/\s]+)/(?P<name>[^/\s]+)"
+)
+
+
+class GitHubApiError(Exception):
+    """Raised when a GitHub API request fails."""
+
+
+@dataclass(frozen=True)
+class RepoMetadata:
+    """Where a GitHub repository lives and how to reach it."""
+
+    owner: str
+    name: str
+    ssh_url: str
+    https_url: str
+    default_branch: str = ""
+
+    @property
+    def full_name(self) -> str:
+        """The repository as ``owner/name``."""
+        return f"{self.owner}/{self.name}"
+
+
+def graphql(query: str) -> Dict:
+    """
+    Run a GraphQL query through the GitHub CLI.
+
+    Args:
+        query: The GraphQL query.
+
+    Returns:
+        The ``data`` of the response. Fields that could not be resolved (for
+        example repositories that do not exist) are ``None``.
+
+    Raises:
+        GitHubApiError: If the request fails or returns no data, or is still
+            rate limited after the last retry.
+    """
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        try:
+            # gh exits non-zero when the response carries any error, even if
+            # it also carries data, so the output is inspected instead
+            result = run_with_deadline(
+                ["gh", "api", "graphql", "-f", f"query={query}"],
+                capture_output=True,
+                text=True,
+            )
+        except OSError as e:
+            raise GitHubApiError(f"Could not run the GitHub CLI: {e}") from e
+        try:
+            data = json.loads(result.stdout).get("data")
+        except ValueError:
+            data = None
+        if data:
+            return data
+        message = (result.stderr or result.stdout).strip() or "empty response"
+        if not _RATE_LIMITED.search(message) or attempt == MAX_RATE_LIMIT_RETRIES:
+            raise GitHubApiError(message)
+        wait = RATE_LIMIT_BACKOFF * 2**attempt
+        logger.info(f"GraphQL query rate limited; waiting {wait:.0f}s")
+        record_rate_limit_wait(wait)
+        record_retry("graphql")
+        time.sleep(wait)
+
+
+@functools.lru_cache(maxsize=None)
+def viewer_login() -> str:
+    """
+    Get the login of the authenticated GitHub user.
+
+    Raises:
+        GitHubApiError: If the user cannot be looked up.
+    """
+    return graphql("query { viewer { login } }")["viewer"]["login"]
+
+
+def metadata_from_url(url: str) -> Optional[RepoMetadata]:
+    """
+    Derive repository metadata from its web URL without a request.
+
+    Used on the output of ``gh repo create``, which prints the URL of the new
+    (still empty, so branchless) repository.
+
+    Args:
+        url: Text containing the repository's web URL.
+
+    Returns:
+        The metadata, or None if no repository URL was found.
+    """
+    match = _REPO_URL.search(url)
+    if not match:
+        return None
+    host, owner = match.group("host"), match.group("owner")
+    name = match.group("name")
+    name = name[: -len(".git")] if name.endswith(".git") else name
+    return RepoMetadata(
+        owner=owner,
+        name=name,
+        ssh_url=f"git@{host}:{owner}/{name}.git",
+        https_url=f"https://{host}/{owner}/{name}",
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def repository_metadata(repo: str) -> RepoMetadata:
+    """
+    Look up a repository's owner, URLs and default branch in one query.
+
+    Results are cached, so every step of a job shares a single lookup.
+
+    Args:
+        repo: The repository as ``owner/name``, or ``name`` for a repository
+            of the authenticated user.
+
+    Returns:
+        The repository's metadata.
+
+    Raises:
+        GitHubApiError: If the repository cannot be looked up.
+    """
+    owner, _, name = repo.rpartition("/")
+    if owner:
+        data = graphql(
+            f"query {{ repository(owner: {_literal(owner)}, "
+            f"name: {_literal(name)}) {{ {_REPOSITORY_FIELDS} }} }}"
+        )["repository"]
+    else:
+        # The viewer's own repository needs no separate login lookup
+        data = graphql(
+            f"query {{ viewer {{ repository(name: {_literal(name)}) "
+            f"{{ {_REPOSITORY_FIELDS} }} }} }}"
+        )["viewer"]["repository"]
+    if not data:
+        raise GitHubApiError(f"Repository {repo} not found")
+    return RepoMetadata(
+        owner=data["owner"]["login"],
+        name=data["name"],
+        ssh_url=data["sshUrl"],
+        https_url=data["url"],
+        default_branch=(data.get("defaultBranchRef") or {}).get("name", ""),
+    )
+
+
+def branch_tree(repo: str, branch: str) -> Optional[str]:
+    """
+    Get the SHA of the tree at the tip of a branch, as GitHub has it.
+
+    Args:
+        repo: The repository as ``owner/name``.
+        branch: The name of the branch.
+
+    Returns:
+        The tree SHA, or None if the branch does not exist.
+
+    Raises:
+        GitHubApiError: If the repository cannot be looked up.
+    """
+    owner, _, name = repo.partition("/")
+    data = graphql(
+        f"query {{ repository(owner: {_literal(owner)}, name: {_literal(name)}) "
+        f"{{ ref(qualifiedName: {_literal('refs/heads/' + branch)}) "
+        "{ target { ... on Commit { tree { oid } } } } } }"
+    )["repository"]
+    if not data:
+        raise GitHubApiError(f"Repository {repo} not found")
+    ref = data.get("ref")
+    return ref["target"]["tree"]["oid"] if ref else None
+
+
+def created_repository_metadata(repo: str, create_output: str) -> RepoMetadata:
+    """
+    Get the metadata of a repository that ``gh repo create`` just created.
+
+    The URL printed by the create command is used directly; only when it is
+    missing is the repository looked up.
+
+    Args:
+        repo: The name the repository was created with.
+        create_output: What ``gh repo create`` printed.
+
+    Returns:
+        The repository's metadata.
+
+    Raises:
+        GitHubApiError: If the output has no URL and the lookup fails.
+    """
+    return metadata_from_url(create_output) or repository_metadata(repo)
+
+
+def _literal(value: str) -> str:
+    """Quote a string as a GraphQL string literal."""
+    return json.dumps(value)
+
+
+def find_existing_repositories(
+    full_names: List[str], batch_size: int = DEFAULT_BATCH_SIZE
+) -> Set[str]:
+    """
+    Find which repositories already exist, in batched queries.
+
+    Args:
+        full_names: Repositories as ``owner/name``.
+        batch_size: Maximum number of repositories per query.
+
+    Returns:
+        The given names of the repositories that exist.
+
+    Raises:
+        GitHubApiError: If a query fails.
+    """
+    existing = set()
+    for start in range(0, len(full_names), batch_size):
+        batch = full_names[start : start + batch_size]
+        fields = []
+        for i, full_name in enumerate(batch):
+            owner, name = full_name.split("/", 1)
+            fields.append(
+                f"r{i}: repository(owner: {_literal(owner)}, "
+                f"name: {_literal(name)}) {{ id }}"
+            )
+        data = graphql("query { " + " ".join(fields) + " }")
+        existing.update(
+            full_name for i, full_name in enumerate(batch) if data.get(f"r{i}")
+        )
+        logger.debug(f"Checked {len(batch)} repository names in one query")
+    return existing
+
+
+def list_template_repositories(owner: str) -> List[Dict]:
+    """
+    List the template repositories of a user or organization.
+
+    Args:
+        owner: The user or organization login.
+
+    Returns:
+        One dict per template with ``name``, ``url``, ``description`` and
+        ``topics``.
+
+    Raises:
+        GitHubApiError: If the owner cannot be found or a query fails.
+    """
+    templates = []
+    cursor = None
+    while True:
+        after = f", after: {_literal(cursor)}" if cursor else ""
+        owner_data = graphql(
+            f"query {{ repositoryOwner(login: {_literal(owner)}) {{ "
+            f"repositories(first: 100{after}) {{ "
+            "nodes { name url description isTemplate "
+            "repositoryTopics(first: 20) { nodes { topic { name } } } } "
+            "pageInfo { hasNextPage endCursor } } } }"
+        )["repositoryOwner"]
+        if not owner_data:
+            raise GitHubApiError(f"Owner {owner} not found")
+        page = owner_data["repositories"]
+        for node in page["nodes"]:
+            if not node or not node.get("isTemplate"):
+                continue
+            topics = (node.get("repositoryTopics") or {}).get("nodes") or []
+            templates.append(
+                {
+                    "name": node["name"],
+                    "url": f"{node['url']}.git",
+                    "description": node.get("description") or "",
+                    "topics": [t["topic"]["name"] for t in topics],
+                }
+            )
+        if not page["pageInfo"]["hasNextPage"]:
+            return templates
+        cursor = page["pageInfo"]["endCursor"]
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Host-wide budget of git processes for GitHub Repo Duplicator.
+
+Every duplicator process on a host draws its clones, pushes and pack
+operations from a shared pool of slots, so several runs side by side stop
+saturating CPU, memory, disk and network. A slot is an exclusive ``flock``
+on one of N lock files in a shared directory: the kernel releases it when a
+process dies, so no slot is ever leaked. The number of slots of each kind
+follows the cores, available memory and I/O pressure of the host, and the
+time spent waiting for a slot is exported as a metric.
+"""
+
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from .cache import get_cache_dir
+from .metrics import record_queue_wait
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Environment variable overriding the directory holding the slot lock files
+GOVERNOR_DIR_ENV = "GITHUB_REPO_DUPLICATOR_GOVERNOR_DIR"
+
+# Environment variable with slot overrides, e.g. "clone=4,push=8,pack=1"
+SLOTS_ENV = "GITHUB_REPO_DUPLICATOR_GIT_SLOTS"
+
+# Git subcommands governed by each kind of slot
+COMMAND_KINDS = {
+    "clone": "clone",
+    "fetch": "clone",
+    "pull": "clone",
+    "submodule": "clone",
+    "push": "push",
+    "repack": "pack",
+    "gc": "pack",
+    "commit-graph": "pack",
+    "multi-pack-index": "pack",
+    "bundle": "pack",
+}
+
+# Concurrent processes of each kind per core; pack operations are
+# multi-threaded themselves
+PROCESSES_PER_CORE = {"clone": 1.0, "push": 2.0, "pack": 0.25}
+
+# Memory a single process of each kind is budgeted
+MEMORY_PER_PROCESS = {"clone": 256 << 20, "push": 128 << 20, "pack": 1 << 30}
+
+# How long a computed budget is used before the host is measured again
+BUDGET_TTL = 5.0
+
+# Bounds of the polling interval while waiting for a slot
+MIN_POLL_INTERVAL = 0.02
+MAX_POLL_INTERVAL = 0.25
+
+# Waits longer than this are logged
+REPORTED_WAIT = 1.0
+
+_overrides: Dict[str, int] = {}
+_budget: Dict[str, int] = {}
+_budget_time = 0.0
+_budget_lock = threading.Lock()
+
+
+class SlotTimeout(TimeoutError):
+    """Raised when no slot frees up within the time given."""
+
+
+def parse_slots(spec: str) -> Dict[str, int]:
+    """
+    Parse slot overrides such as ``clone=4,push=8,pack=1``.
+
+    A count of 0 lifts the limit of that kind.
+
+    Raises:
+        ValueError: If an entry is malformed or names an unknown kind.
+    """
+    slots = {}
+    for item in spec.replace(" ", "").split(","):
+        if not item:
+            continue
+        kind, sep, count = item.partition("=")
+        if not sep or kind not in PROCESSES_PER_CORE:
+            raise ValueError(
+                f"Expected KIND=COUNT with KIND one of "
+                f"{', '.join(PROCESSES_PER_CORE)}, got {item!r}"
+            )
+        slots[kind] = int(count)
+    return slots
+
+
+def set_slots(slots: Dict[str, int]) -> None:
+    """Override slot counts for the rest of the process."""
+    _overrides.update(slots)
+
+
+def governor_dir() -> str:
+    """Get the directory of the slot lock files shared by all processes."""
+    path = os.environ.get(GOVERNOR_DIR_ENV)
+    if not path:
+        return get_cache_dir("governor")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def available_memory() -> Optional[int]:
+    """Get the memory available for new processes in bytes, if known."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def io_headroom() -> float:
+    """
+    Get the share of time the disks are not stalling tasks, from 0 to 1.
+
+    Read from the kernel's I/O pressure stall information; 1.0 where it is
+    unavailable.
+    """
+    try:
+        with open("/proc/pressure/io") as f:
+            match = re.search(r"^some avg10=([\d.]+)", f.read(), re.MULTILINE)
+    except OSError:
+        return 1.0
+    if not match:
+        return 1.0
+    return max(0.0, 1.0 - float(match.group(1)) / 100.0)
+
+
+def host_budget() -> Dict[str, int]:
+    """
+    Compute the number of slots of each kind this host can afford now.
+
+    Each kind gets slots for its share of the cores, capped by the available
+    memory and scaled down by I/O pressure, but never less than one.
+    """
+    cores = os.cpu_count() or 1
+    memory = available_memory()
+    headroom = max(io_headroom(), 0.25)
+    budget = {}
+    for kind, per_core in PROCESSES_PER_CORE.items():
+        count = cores * per_core
+        if memory is not None:
+            count = min(count, memory / MEMORY_PER_PROCESS[kind])
+        budget[kind] = max(1, int(count * headroom))
+    return budget
+
+
+def slot_limit(kind: str) -> int:
+    """Get the number of slots of a kind, or 0 if it is unlimited."""
+    global _budget, _budget_time
+    overrides = {}
+    spec = os.environ.get(SLOTS_ENV)
+    if spec:
+        try:
+            overrides.update(parse_slots(spec))
+        except ValueError as e:
+            logger.warning(f"Ignoring invalid {SLOTS_ENV}: {e}")
+    overrides.update(_overrides)
+    if kind in overrides:
+        return max(0, overrides[kind])
+    with _budget_lock:
+        if time.monotonic() - _budget_time > BUDGET_TTL:
+            _budget, _budget_time = host_budget(), time.monotonic()
+        return _budget.get(kind, 0)
+
+
+def command_kind(args) -> Optional[str]:
+    """Get the kind of slot a command needs, or None if it is not governed."""
+    if isinstance(args, str) or not args:
+        return None
+    if os.path.basename(str(args[0])) not in ("git", "git.exe"):
+        return None
+    rest = [str(arg) for arg in args[1:]]
+    while rest and rest[0].startswith("-"):
+        # Global options, some of which take a value
+        option = rest.pop(0)
+        if option in ("-C", "-c", "--git-dir", "--work-tree") and rest:
+            rest.pop(0)
+    return COMMAND_KINDS.get(rest[0]) if rest else None
+
+
+def _try_lock(path: str) -> Optional[int]:
+    """Take an exclusive lock on a file without waiting."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _acquire(
+    kind: str,
+    limit: int,
+    timeout: Optional[float],
+    cancelled: Optional[threading.Event],
+) -> int:
+    """Wait for a free slot of a kind and return its locked descriptor."""
+    directory = governor_dir()
+    expires = time.monotonic() + timeout if timeout is not None else None
+    interval = MIN_POLL_INTERVAL
+    while True:
+        # Start at a random slot so waiters do not all contend for slot 0
+        first = random.randrange(limit)
+        for i in range(limit):
+            fd = _try_lock(os.path.join(directory, f"{kind}.{(first + i) % limit}"))
+            if fd is not None:
+                return fd
+        wait = interval
+        if expires is not None:
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                raise SlotTimeout(f"No {kind} slot became free within {timeout:g}s")
+            wait = min(wait, remaining)
+        if cancelled is not None:
+            if cancelled.wait(wait):
+                raise SlotTimeout(f"Cancelled while waiting for a {kind} slot")
+        else:
+            time.sleep(wait)
+        interval = min(interval * 2, MAX_POLL_INTERVAL)
+        limit = slot_limit(kind) or limit
+
+
+@contextmanager
+def slot(
+    kind: Optional[str],
+    timeout: Optional[float] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> Iterator[None]:
+    """
+    Hold a host-wide slot of a kind while the block runs.
+
+    Without a kind, with an unlimited kind or where file locks are not
+    available, the block runs right away.
+
+    Args:
+        kind: "clone", "push" or "pack", or None.
+        timeout: Maximum seconds to wait for a slot, or None to wait forever.
+        cancelled: An event that aborts the wait when set.
+
+    Raises:
+        SlotTimeout: If no slot freed up in time or the wait was cancelled.
+    """
+    limit = slot_limit(kind) if kind and fcntl is not None else 0
+    if not limit:
+        yield
+        return
+    started = time.monotonic()
+    fd = _acquire(kind, limit, timeout, cancelled)
+    waited = time.monotonic() - started
+    record_queue_wait(kind, waited)
+    if waited > REPORTED_WAIT:
+        logger.info(f"Waited {waited:.1f}s for a free {kind} slot")
+    try:
+        yield
+    finally:
+        os.close(fd)
+
+
+def busy_slots(kind: str) -> List[int]:
+    """List the slots of a kind currently held by any process."""
+    if fcntl is None:
+        return []
+    directory = governor_dir()
+    busy = []
+    for i in range(slot_limit(kind)):
+        fd = _try_lock(os.path.join(directory, f"{kind}.{i}"))
+        if fd is None:
+            busy.append(i)
+        else:
+            os.close(fd)
+    return busy
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Durable job queue for GitHub Repo Duplicator.
+
+Large batches are enqueued into a SQLite database that every participating
+host can reach, and any number of ``worker`` processes claim jobs from it.
+A claim is a lease: the worker heartbeats while the duplication runs, and a
+job whose lease expires, because its worker crashed or lost the storage, is
+handed to the next worker that asks. Every update a worker makes is fenced
+by the token of its lease, so a worker that lost its job can no longer
+record an outcome for it, and a job is recorded as done exactly once.
+
+On shared storage the database needs working POSIX locks, which NFSv4 and
+SMB mounts with locking enabled provide.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .api import DuplicationResult, Duplicator, ErrorKind
+from .cache import get_cache_dir
+from .metrics import record_retry
+
+logger = logging.getLogger(__name__)
+
+# Environment variable overriding the queue database location
+QUEUE_PATH_ENV = "GITHUB_REPO_DUPLICATOR_QUEUE"
+
+# Seconds a claim is valid without a heartbeat
+DEFAULT_LEASE = 300.0
+
+# Times a job is claimed before it fails for good
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Seconds an idle worker waits before asking for a job again
+DEFAULT_POLL_INTERVAL = 5.0
+
+# Jobs run at once by one worker process
+DEFAULT_WORKER_JOBS = 4
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+STATES = (QUEUED, RUNNING, SUCCEEDED, FAILED)
+
+# Per-job ``DuplicatorConfig`` fields a job may set
+JOB_OPTIONS = (
+    "private",
+    "description",
+    "lfs",
+    "recurse_submodules",
+    "submodule_owner",
+)
+
+# Failures that may pass when the job runs again, possibly on another host
+RETRYABLE_ERRORS = (
+    ErrorKind.CLONE_FAILED,
+    ErrorKind.LOOKUP_FAILED,
+    ErrorKind.PUSH_FAILED,
+    ErrorKind.WORKSPACE_UNAVAILABLE,
+    ErrorKind.TIMED_OUT,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    template_url TEXT NOT NULL,
+    repo_name TEXT NOT NULL UNIQUE,
+    options TEXT NOT NULL DEFAULT '{}',
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT NOT NULL DEFAULT '',
+    lease_token TEXT NOT NULL DEFAULT '',
+    lease_expires REAL,
+    finished_at REAL,
+    error TEXT NOT NULL DEFAULT '',
+    result TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state
+    ON jobs (state, lease_expires, id);
+"""
+
+
+class QueueError(Exception):
+    """Raised when jobs cannot be added to the queue."""
+
+
+@dataclass
+class Job:
+    """A duplication in the queue."""
+
+    template_url: str
+    repo_name: str
+    options: Dict[str, Any] = field(default_factory=dict)
+    state: str = QUEUED
+    attempts: int = 0
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    worker: str = ""
+    lease_token: str = ""
+    lease_expires: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: str = ""
+    result: Dict[str, Any] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    id: Optional[int] = None
+
+
+def default_queue_path() -> str:
+    """Get the queue location from the environment or the cache."""
+    return os.environ.get(QUEUE_PATH_ENV) or os.path.join(
+        get_cache_dir(), "queue.sqlite3"
+    )
+
+
+def default_worker_id() -> str:
+    """Get a worker name unique across hosts: the host name and process id."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """A SQLite job queue with leases, safe to share between hosts."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.abspath(path or default_queue_path())
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Use this thread's connection inside a transaction."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=60)
+            db.row_factory = sqlite3.Row
+            # WAL needs shared memory between the writers, which hosts
+            # sharing a network file system do not have
+            db.execute("PRAGMA journal_mode=DELETE")
+            db.execute("PRAGMA synchronous=FULL")
+            self._local.db = db
+        with db:
+            yield db
+
+    def enqueue(
+        self,
+        template_url: str,
+        names: List[str],
+        options: Optional[Dict[str, Any]] = None,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ) -> List[Optional[int]]:
+        """
+        Add duplications of a template to the queue.
+
+        A name is queued at most once, so enqueueing the same batch again
+        does not duplicate anything twice.
+
+        Args:
+            template_url: The template to duplicate.
+            names: The repositories to create.
+            options: ``DuplicatorConfig`` fields for these jobs, from
+                ``JOB_OPTIONS``.
+            max_attempts: Times a job is claimed before it fails for good.
+
+        Returns:
+            The id of every new job, or None for names already in the queue.
+
+        Raises:
+            QueueError: If an option is not one a job may set.
+        """
+        options = options or {}
+        unknown = sorted(set(options) - set(JOB_OPTIONS))
+        if unknown:
+            raise QueueError(f"Jobs cannot set {', '.join(unknown)}")
+        ids: List[Optional[int]] = []
+        now = time.time()
+        with self._connection() as db:
+            for name in names:
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO jobs (created_at, template_url,"
+                    " repo_name, options, state, max_attempts)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        now,
+                        template_url,
+                        name,
+                        json.dumps(options, sort_keys=True),
+                        QUEUED,
+                        max_attempts,
+                    ),
+                )
+                ids.append(cursor.lastrowid if cursor.rowcount else None)
+        return ids
+
+    def claim(self, worker: str, lease: float = DEFAULT_LEASE) -> Optional[Job]:
+        """
+        Take the oldest job that is queued or whose lease has expired.
+
+        Jobs whose lease expired on their last attempt are failed instead.
+
+        Args:
+            worker: The name of the claiming worker.
+            lease: Seconds the claim is valid without a heartbeat.
+
+        Returns:
+            The claimed job with its lease token, or None if there is none.
+        """
+        while True:
+            now = time.time()
+            with self._connection() as db:
+                db.execute(
+                    "UPDATE jobs SET state = ?, finished_at = ?, lease_token = '',"
+                    " lease_expires = NULL, error = 'lease of the last attempt"
+                    " expired' WHERE state = ? AND lease_expires < ?"
+                    " AND attempts >= max_attempts",
+                    (FAILED, now, RUNNING, now),
+                )
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE state = ?"
+                    " OR (state = ? AND lease_expires < ?) ORDER BY id LIMIT 1",
+                    (QUEUED, RUNNING, now),
+                ).fetchone()
+                if row is None:
+                    return None
+                token = uuid.uuid4().hex
+                # Only take the job if no other worker did in the meantime
+                cursor = db.execute(
+                    "UPDATE jobs SET state = ?, worker = ?, lease_token = ?,"
+                    " lease_expires = ?, attempts = attempts + 1"
+                    " WHERE id = ? AND lease_token = ?",
+                    (
+                        RUNNING,
+                        worker,
+                        token,
+                        now + lease,
+                        row["id"],
+                        row["lease_token"],
+                    ),
+                )
+                if cursor.rowcount:
+                    job = _job(row)
+                    if job.state == RUNNING:
+                        logger.warning(
+                            f"Reclaiming {job.repo_name} from {job.worker},"
+                            " whose lease expired"
+                        )
+                    job.state, job.worker, job.lease_token = RUNNING, worker, token
+                    job.lease_expires = now + lease
+                    job.attempts += 1
+                    return job
+
+    def heartbeat(self, job: Job, lease: float = DEFAULT_LEASE) -> bool:
+        """
+        Extend the lease of a claimed job.
+
+        Returns:
+            False if the job is no longer held under this lease.
+        """
+        expires = time.time() + lease
+        with self._connection() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_expires = ?"
+                " WHERE id = ? AND lease_token = ? AND state = ?",
+                (expires, job.id, job.lease_token, RUNNING),
+            )
+        if cursor.rowcount:
+            job.lease_expires = expires
+        return bool(cursor.rowcount)
+
+    def finish(
+        self,
+        job: Job,
+        success: bool,
+        error: str = "",
+        result: Optional[Dict[str, Any]] = None,
+        retry: bool = False,
+    ) -> bool:
+        """
+        Record the outcome of a claimed job.
+
+        Args:
+            job: The claimed job.
+            success: Whether the duplication succeeded.
+            error: Why it failed.
+            result: Details of the outcome to keep with the job.
+            retry: Queue a failed job again if it has attempts left.
+
+        Returns:
+            False if the job is no longer held under this lease, in which
+            case nothing is recorded.
+        """
+        if success:
+            state = SUCCEEDED
+        elif retry and job.attempts < job.max_attempts:
+            state = QUEUED
+        else:
+            state = FAILED
+        finished = time.time() if state != QUEUED else None
+        with self._connection() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, error = ?, result = ?,"
+                " lease_token = '', lease_expires = NULL"
+                " WHERE id = ? AND lease_token = ? AND state = ?",
+                (
+                    state,
+                    finished,
+                    error,
+                    json.dumps(result or {}, sort_keys=True),
+                    job.id,
+                    job.lease_token,
+                    RUNNING,
+                ),
+            )
+        if cursor.rowcount:
+            job.state, job.error, job.finished_at = state, error, finished
+            if state == QUEUED:
+                record_retry("job")
+        return bool(cursor.rowcount)
+
+    def release(self, job: Job) -> bool:
+        """
+        Return a claimed job to the queue without counting the attempt.
+
+        Returns:
+            False if the job is no longer held under this lease.
+        """
+        with self._connection() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET state = ?, worker = '', lease_token = '',"
+                " lease_expires = NULL, attempts = attempts - 1"
+                " WHERE id = ? AND lease_token = ? AND state = ?",
+                (QUEUED, job.id, job.lease_token, RUNNING),
+            )
+        if cursor.rowcount:
+            job.state = QUEUED
+        return bool(cursor.rowcount)
+
+    def retry_failed(self) -> int:
+        """Queue every failed job again with fresh attempts; returns how many."""
+        with self._connection() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, worker = '', error = '',"
+                " finished_at = NULL WHERE state = ?",
+                (QUEUED, FAILED),
+            )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Count the jobs in every state."""
+        counts = dict.fromkeys(STATES, 0)
+        with self._connection() as db:
+            for state, count in db.execute(
+                "SELECT state, COUNT(*) FROM jobs GROUP BY state"
+            ):
+                counts[state] = count
+        return counts
+
+    def jobs(self, states: Optional[List[str]] = None, limit: int = 50) -> List[Job]:
+        """
+        List jobs, oldest first.
+
+        Args:
+            states: Only jobs in these states.
+            limit: Maximum number of jobs.
+        """
+        query = "SELECT * FROM jobs"
+        params: list = []
+        if states:
+            query += f" WHERE state IN ({', '.join('?' * len(states))})"
+            params.extend(states)
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        with self._connection() as db:
+            return [_job(row) for row in db.execute(query, params)]
+
+
+def _job(row: sqlite3.Row) -> Job:
+    """Build a job from a database row."""
+    return Job(
+        id=row["id"],
+        created_at=row["created_at"],
+        template_url=row["template_url"],
+        repo_name=row["repo_name"],
+        options=json.loads(row["options"] or "{}"),
+        state=row["state"],
+        attempts=row["attempts"],
+        max_attempts=row["max_attempts"],
+        worker=row["worker"],
+        lease_token=row["lease_token"],
+        lease_expires=row["lease_expires"],
+        finished_at=row["finished_at"],
+        error=row["error"],
+        result=json.loads(row["result"] or "{}"),
+    )
+
+
+def _result_details(result: DuplicationResult) -> Dict[str, Any]:
+    """Summarize a duplication result for the queue."""
+    details: Dict[str, Any] = {
+        "repo_url": result.repo_url,
+        "template_sha": result.template_sha,
+        "pushed_sha": result.pushed_sha,
+        "error_kind": result.error_kind,
+        "duration": round(result.timings.get("total", 0.0), 3),
+    }
+    if result.verification is not None:
+        details["verification"] = result.verification.summary()
+    return details
+
+
+class Worker:
+    """Claims jobs from a queue and runs them through a ``Duplicator``."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        duplicator: Optional[Duplicator] = None,
+        worker_id: Optional[str] = None,
+        max_jobs: int = DEFAULT_WORKER_JOBS,
+        lease: float = DEFAULT_LEASE,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        on_result: Optional[Callable[[Job, DuplicationResult], None]] = None,
+    ):
+        self.queue = queue
+        self.duplicator = duplicator or Duplicator()
+        self.worker_id = worker_id or default_worker_id()
+        self.max_jobs = max(1, max_jobs)
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.on_result = on_result
+        self.completed = 0
+        self._stopped = threading.Event()
+        self._done = threading.Event()
+        self._active: Dict[int, Job] = {}
+        self._lock = threading.Lock()
+
+    def stop(self) -> None:
+        """Stop claiming jobs; running jobs are finished first."""
+        self._stopped.set()
+
+    def run(self, exit_when_empty: bool = False) -> int:
+        """
+        Run jobs until stopped, or until the queue is empty if asked to.
+
+        Args:
+            exit_when_empty: Return once no job is left to claim, instead of
+                waiting for more.
+
+        Returns:
+            The number of jobs this worker recorded an outcome for.
+        """
+        logger.info(f"Worker {self.worker_id} started with {self.max_jobs} slots")
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        threads = [
+            threading.Thread(target=self._loop, args=(exit_when_empty,), daemon=True)
+            for _ in range(self.max_jobs)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                # Join with a timeout so Ctrl-C reaches the main thread
+                while thread.is_alive():
+                    thread.join(1.0)
+        finally:
+            self._stopped.set()
+            for thread in threads:
+                thread.join()
+            self._done.set()
+            heartbeat.join()
+        return self.completed
+
+    def _loop(self, exit_when_empty: bool) -> None:
+        """Claim and run jobs one at a time until there is nothing left."""
+        while not self._stopped.is_set():
+            try:
+                job = self.queue.claim(self.worker_id, self.lease)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not claim a job: {e}")
+                job = None
+            if job is None:
+                if exit_when_empty:
+                    return
+                self._stopped.wait(self.poll_interval)
+                continue
+            with self._lock:
+                self._active[job.id] = job
+            try:
+                self._run_job(job)
+            finally:
+                with self._lock:
+                    self._active.pop(job.id, None)
+
+    def _run_job(self, job: Job) -> None:
+        """Run one claimed job and record its outcome."""
+        logger.info(f"Running {job.repo_name} (job {job.id}, attempt {job.attempts})")
+        try:
+            result = self.duplicator.duplicate(
+                job.template_url, job.repo_name, **job.options
+            )
+        except BaseException:
+            # Interrupted: let another worker have the job right away
+            self.queue.release(job)
+            raise
+        if result.error_kind == ErrorKind.CANCELLED:
+            self.queue.release(job)
+            return
+        recorded = self.queue.finish(
+            job,
+            result.success,
+            result.error,
+            _result_details(result),
+            retry=result.error_kind in RETRYABLE_ERRORS,
+        )
+        if not recorded:
+            logger.warning(
+                f"Lost the lease of {job.repo_name} while it ran;"
+                " its outcome was not recorded"
+            )
+            return
+        with self._lock:
+            self.completed += 1
+        if self.on_result:
+            self.on_result(job, result)
+
+    def _heartbeat(self) -> None:
+        """Extend the leases of running jobs until the worker stops."""
+        while not self._done.wait(self.lease / 3):
+            with self._lock:
+                jobs = list(self._active.values())
+            for job in jobs:
+                try:
+                    if not self.queue.heartbeat(job, self.lease):
+                        logger.warning(f"Lost the lease of {job.repo_name}")
+                except sqlite3.Error as e:
+                    logger.warning(
+                        f"Could not extend the lease of {job.repo_name}: {e}"
+                    )
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Git LFS support for GitHub Repo Duplicator.
+
+A plain ``git push`` only sends LFS pointer files. This module finds the LFS
+objects a repository refers to, asks the destination which of them it is
+missing through the LFS batch API, and copies only those with a pool of
+worker threads. Downloaded objects are kept in a local object store, so
+fanning one template out to many repositories downloads each object once.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from .cache import get_cache_dir
+from .watchdog import run_with_deadline
+
+logger = logging.getLogger(__name__)
+
+# Number of LFS objects transferred at the same time by default
+DEFAULT_LFS_JOBS = 8
+
+# LFS batch requests are limited to this many objects each
+BATCH_SIZE = 100
+
+# Pointer files are tiny; larger blobs are never read
+MAX_POINTER_SIZE = 1024
+
+LFS_MEDIA_TYPE = "application/vnd.git-lfs+json"
+
+_POINTER_RE = re.compile(
+    rb"^version https://git-lfs\.github\.com/spec/v1\n"
+    rb"oid sha256:(?P<oid>[0-9a-f]{64})\n"
+    rb"size (?P<size>[0-9]+)\n"
+)
+
+
+class LfsError(Exception):
+    """Raised when LFS objects cannot be listed or transferred."""
+
+
+@dataclass
+class LfsObject:
+    """An LFS object referenced by a pointer file."""
+
+    oid: str
+    size: int
+
+
+@dataclass
+class LfsProgress:
+    """Snapshot of an LFS transfer, passed to progress callbacks."""
+
+    total: int
+    done: int
+    skipped: int
+    bytes_transferred: int
+
+
+@dataclass
+class LfsTransferResult:
+    """Outcome of copying LFS objects to a destination."""
+
+    total: int = 0
+    skipped: int = 0
+    transferred: int = 0
+    bytes_transferred: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def success(self) -> bool:
+        """Whether every object is now present at the destination."""
+        return not self.failed
+
+
+def parse_pointer(data: bytes) -> Optional[LfsObject]:
+    """
+    Parse the content of an LFS pointer file.
+
+    Args:
+        data: The raw blob content.
+
+    Returns:
+        The referenced object, or None if the blob is not a pointer.
+    """
+    match = _POINTER_RE.match(data)
+    if not match:
+        return None
+    return LfsObject(oid=match.group("oid").decode(), size=int(match.group("size")))
+
+
+def list_lfs_objects(repo_dir: str) -> List[LfsObject]:
+    """
+    List the LFS objects referenced from any branch or tag of a repository.
+
+    Args:
+        repo_dir: A local clone (bare or not) of the repository.
+
+    Returns:
+        The referenced objects, each listed once.
+
+    Raises:
+        LfsError: If the repository cannot be read.
+    """
+    try:
+        rev_list = run_with_deadline(
+            ["git", "rev-list", "--objects", "--all"],
+            cwd=repo_dir,
+            check=True,
+            capture_output=True,
+        )
+        object_ids = b"\n".join(
+            line.split(b" ", 1)[0] for line in rev_list.stdout.splitlines()
+        )
+        check = run_with_deadline(
+            [
+                "git",
+                "cat-file",
+                "--batch-check=%(objectname) %(objecttype) %(objectsize)",
+            ],
+            cwd=repo_dir,
+            input=object_ids + b"\n",
+            check=True,
+            capture_output=True,
+        )
+        candidates = []
+        for line in check.stdout.splitlines():
+            sha, kind, size = line.split(b" ")
+            if kind == b"blob" and int(size) <= MAX_POINTER_SIZE:
+                candidates.append(sha)
+        if not candidates:
+            return []
+        batch = run_with_deadline(
+            ["git", "cat-file", "--batch"],
+            cwd=repo_dir,
+            input=b"\n".join(candidates) + b"\n",
+            check=True,
+            capture_output=True,
+        )
+    except subprocess.CalledProcessError as e:
+        raise LfsError(e.stderr.decode(errors="replace").strip()) from e
+
+    objects = {}
+    output = batch.stdout
+    offset = 0
+    while offset < len(output):
+        header_end = output.index(b"\n", offset)
+        size = int(output[offset:header_end].split(b" ")[2])
+        content = output[header_end + 1 : header_end + 1 + size]
+        offset = header_end + 1 + size + 1
+        pointer = parse_pointer(content)
+        if pointer:
+            objects[pointer.oid] = pointer
+    return list(objects.values())
+
+
+def lfs_endpoint(remote_url: str) -> str:
+    """
+    Derive the LFS API endpoint of a GitHub repository from its git URL.
+
+    Args:
+        remote_url: An SSH or HTTPS git URL.
+
+    Returns:
+        The LFS endpoint URL.
+    """
+    ssh_match = re.match(r"^(?:ssh://)?git@([^:/]+)[:/](.+)$", remote_url)
+    if ssh_match:
+        remote_url = f"https://{ssh_match.group(1)}/{ssh_match.group(2)}"
+    remote_url = remote_url.rstrip("/")
+    if not remote_url.endswith(".git"):
+        remote_url += ".git"
+    return f"{remote_url}/info/lfs"
+
+
+def get_github_token() -> str:
+    """
+    Get the GitHub token of the authenticated GitHub CLI user.
+
+    Returns:
+        The token, or an empty string if none is available.
+    """
+    token = os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN")
+    if token:
+        return token
+    try:
+        result = run_with_deadline(
+            ["gh", "auth", "token"], capture_output=True, text=True
+        )
+        return result.stdout.strip() if result.returncode == 0 else ""
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+class LfsClient:
+    """Minimal client for the Git LFS batch API."""
+
+    def __init__(self, endpoint: str, token: str = "", timeout: float = 60.0):
+        self.endpoint = endpoint.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Accept": LFS_MEDIA_TYPE, "Content-Type": LFS_MEDIA_TYPE}
+        if self.token:
+            credentials = base64.b64encode(f"x-access-token:{self.token}".encode())
+            headers["Authorization"] = f"Basic {credentials.decode()}"
+        return headers
+
+    def batch(self, operation: str, objects: List[LfsObject]) -> List[dict]:
+        """
+        Send batch requests for the given objects.
+
+        Args:
+            operation: Either ``"download"`` or ``"upload"``.
+            objects: The objects to ask about.
+
+        Returns:
+            The object entries of the batch responses.
+
+        Raises:
+            LfsError: If the server rejects a request.
+        """
+        entries = []
+        for start in range(0, len(objects), BATCH_SIZE):
+            chunk = objects[start : start + BATCH_SIZE]
+            body = json.dumps(
+                {
+                    "operation": operation,
+                    "transfers": ["basic"],
+                    "objects": [{"oid": o.oid, "size": o.size} for o in chunk],
+                }
+            ).encode()
+            request = urllib.request.Request(
+                f"{self.endpoint}/objects/batch",
+                data=body,
+                headers=self._headers(),
+                method="POST",
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    entries.extend(json.load(response).get("objects", []))
+            except (urllib.error.URLError, ValueError) as e:
+                raise LfsError(f"LFS {operation} batch request failed: {e}") from e
+        return entries
+
+
+def _action_request(action: dict, method: str, data=None) -> urllib.request.Request:
+    """Build a request for an upload, download or verify action."""
+    return urllib.request.Request(
+        action["href"], data=data, headers=action.get("header", {}), method=method
+    )
+
+
+def _store_path(store: str, oid: str) -> str:
+    """Get the path of an object inside a local object store."""
+    return os.path.join(store, oid[0:2], oid[2:4], oid)
+
+
+def _download(action: dict, obj: LfsObject, store: str, timeout: float) -> str:
+    """Download an object into the local store, verifying its checksum."""
+    target = _store_path(store, obj.oid)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    digest = hashlib.sha256()
+    fd, partial = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".partial")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            request = _action_request(action, "GET")
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                for chunk in iter(lambda: response.read(1024 * 1024), b""):
+                    digest.update(chunk)
+                    out.write(chunk)
+        if digest.hexdigest() != obj.oid:
+            raise LfsError(f"Checksum mismatch for LFS object {obj.oid}")
+        os.replace(partial, target)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return target
+
+
+def _upload(entry: dict, path: str, obj: LfsObject, timeout: float) -> None:
+    """Upload an object from a local file and verify it if the server asks to."""
+    actions = entry["actions"]
+    with open(path, "rb") as f:
+        request = _action_request(actions["upload"], "PUT", data=f)
+        request.add_header("Content-Length", str(obj.size))
+        request.add_header("Content-Type", "application/octet-stream")
+        urllib.request.urlopen(request, timeout=timeout).close()
+    if "verify" in actions:
+        body = json.dumps({"oid": obj.oid, "size": obj.size}).encode()
+        request = _action_request(actions["verify"], "POST", data=body)
+        request.add_header("Content-Type", LFS_MEDIA_TYPE)
+        urllib.request.urlopen(request, timeout=timeout).close()
+
+
+def transfer_lfs_objects(
+    objects: List[LfsObject],
+    source: LfsClient,
+    destination: LfsClient,
+    jobs: int = DEFAULT_LFS_JOBS,
+    local_dirs: Optional[List[str]] = None,
+    store: Optional[str] = None,
+    on_progress: Optional[Callable[[LfsProgress], None]] = None,
+) -> LfsTransferResult:
+    """
+    Copy the LFS objects a destination is missing from a source.
+
+    Objects the destination already has are skipped. Missing objects are taken
+    from the local object store or ``local_dirs`` when present there and
+    downloaded from the source otherwise.
+
+    Args:
+        objects: The objects the destination should have.
+        source: Client for the source LFS endpoint.
+        destination: Client for the destination LFS endpoint.
+        jobs: Maximum number of objects transferred concurrently.
+        local_dirs: Optional LFS object directories to read objects from.
+        store: Local object store, defaulting to the shared cache.
+        on_progress: Optional callback invoked after every object.
+
+    Returns:
+        The transfer result.
+
+    Raises:
+        LfsError: If the batch requests fail.
+    """
+    result = LfsTransferResult(total=len(objects))
+    if not objects:
+        return result
+    store = store or get_cache_dir("lfs", "objects")
+
+    needed = {}
+    for entry in destination.batch("upload", objects):
+        if "error" in entry:
+            result.failed[entry["oid"]] = entry["error"].get("message", "error")
+        elif "upload" in entry.get("actions", {}):
+            needed[entry["oid"]] = entry
+    result.skipped = len(objects) - len(needed) - len(result.failed)
+    by_oid = {o.oid: o for o in objects}
+
+    def local_copy(oid: str) -> Optional[str]:
+        for directory in [store] + list(local_dirs or []):
+            path = _store_path(directory, oid)
+            if os.path.isfile(path) and os.path.getsize(path) == by_oid[oid].size:
+                return path
+        return None
+
+    to_download = [by_oid[oid] for oid in needed if not local_copy(oid)]
+    downloads = {}
+    if to_download:
+        for entry in source.batch("download", to_download):
+            if "download" in entry.get("actions", {}):
+                downloads[entry["oid"]] = entry["actions"]["download"]
+            else:
+                message = entry.get("error", {}).get("message", "not available")
+                result.failed[entry["oid"]] = f"source: {message}"
+
+    def copy(oid: str) -> int:
+        obj = by_oid[oid]
+        path = local_copy(oid)
+        if not path:
+            path = _download(downloads[oid], obj, store, source.timeout)
+        _upload(needed[oid], path, obj, destination.timeout)
+        return obj.size
+
+    pending = [oid for oid in needed if oid not in result.failed]
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {pool.submit(copy, oid): oid for oid in pending}
+        for finished, future in enumerate(as_completed(futures), 1):
+            oid = futures[future]
+            try:
+                result.bytes_transferred += future.result()
+                result.transferred += 1
+            except (OSError, LfsError, KeyError) as e:
+                logger.error(f"Failed to transfer LFS object {oid}: {e}")
+                result.failed[oid] = str(e)
+            if on_progress:
+                on_progress(
+                    LfsProgress(
+                        total=len(pending),
+                        done=finished,
+                        skipped=result.skipped,
+                        bytes_transferred=result.bytes_transferred,
+                    )
+                )
+    return result
+
+
+def duplicate_lfs_objects(
+    repo_dir: str,
+    source_url: str,
+    destination_url: str,
+    jobs: int = DEFAULT_LFS_JOBS,
+    token: Optional[str] = None,
+    on_progress: Optional[Callable[[LfsProgress], None]] = None,
+) -> LfsTransferResult:
+    """
+    Copy the LFS objects of a pushed repository from its template.
+
+    Args:
+        repo_dir: The local clone that was pushed.
+        source_url: Git URL of the template repository.
+        destination_url: Git URL of the new repository.
+        jobs: Maximum number of objects transferred concurrently.
+        token: GitHub token, looked up through GitHub CLI if not given.
+        on_progress: Optional callback invoked after every object.
+
+    Returns:
+        The transfer result.
+
+    Raises:
+        LfsError: If the objects cannot be listed or the batch requests fail.
+    """
+    objects = list_lfs_objects(repo_dir)
+    if not objects:
+        return LfsTransferResult()
+    logger.info(f"Found {len(objects)} LFS objects to duplicate")
+    token = get_github_token() if token is None else token
+
+    git_dir = os.path.join(repo_dir, ".git")
+    local_dirs = [
+        os.path.join(git_dir if os.path.isdir(git_dir) else repo_dir, "lfs", "objects")
+    ]
+    return transfer_lfs_objects(
+        objects,
+        LfsClient(lfs_endpoint(source_url), token),
+        LfsClient(lfs_endpoint(destination_url), token),
+        jobs=jobs,
+        local_dirs=local_dirs,
+        on_progress=on_progress,
+    )
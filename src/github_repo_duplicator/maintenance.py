@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Pack maintenance for local template repositories.
+
+A template that is pushed again and again (from the mirror cache or to every
+fan-out target) should not have its objects enumerated and deltified from
+scratch on each push. After a fetch, the local repository is repacked into a
+single pack with a reachability bitmap, and a commit-graph and
+multi-pack-index are written, so every later push can reuse the stored
+deltas and answer reachability from the bitmap.
+"""
+
+import glob
+import logging
+import os
+import subprocess
+from typing import Dict, Optional
+
+from .metrics import time_phase
+from .watchdog import Cancelled, DeadlineExceeded, deadline, run_with_deadline
+
+logger = logging.getLogger(__name__)
+
+# Delta search window and depth used when repacking; deltas are computed once
+# here and reused by every push
+REPACK_WINDOW = 50
+REPACK_DEPTH = 50
+
+
+def maintenance_config(threads: Optional[int] = None) -> Dict[str, str]:
+    """
+    Get the git settings applied to maintained repositories.
+
+    Args:
+        threads: Threads used for delta compression; defaults to one per CPU.
+    """
+    return {
+        "pack.threads": str(threads or os.cpu_count() or 1),
+        "pack.useBitmaps": "true",
+        "pack.useSparse": "true",
+        "pack.writeBitmapHashCache": "true",
+        "repack.writeBitmaps": "true",
+        "core.commitGraph": "true",
+        "fetch.writeCommitGraph": "true",
+    }
+
+
+def _git_dir(repo_dir: str) -> str:
+    """Get the git directory of a bare repository or a work tree."""
+    dot_git = os.path.join(repo_dir, ".git")
+    return dot_git if os.path.isdir(dot_git) else repo_dir
+
+
+def _git(args, repo_dir: str) -> str:
+    """Run a git command in a repository and return its output."""
+    return run_with_deadline(
+        ["git"] + args, cwd=repo_dir, check=True, capture_output=True, text=True
+    ).stdout
+
+
+def needs_maintenance(repo_dir: str) -> bool:
+    """
+    Check whether a repository would benefit from maintenance.
+
+    True when objects are spread over several packs or loose files, or the
+    bitmap, commit-graph or multi-pack-index is missing.
+    """
+    objects = os.path.join(_git_dir(repo_dir), "objects")
+    packs = glob.glob(os.path.join(objects, "pack", "*.pack"))
+    loose = any(
+        os.listdir(path)
+        for path in glob.glob(os.path.join(objects, "[0-9a-f][0-9a-f]"))
+    )
+    commit_graph = os.path.exists(
+        os.path.join(objects, "info", "commit-graph")
+    ) or os.path.isdir(os.path.join(objects, "info", "commit-graphs"))
+    return (
+        len(packs) != 1
+        or loose
+        or not glob.glob(os.path.join(objects, "pack", "*.bitmap"))
+        or not commit_graph
+        or not os.path.exists(os.path.join(objects, "pack", "multi-pack-index"))
+    )
+
+
+def configure_repository(repo_dir: str, threads: Optional[int] = None) -> None:
+    """Apply the maintenance settings that differ from the current ones."""
+    current = {}
+    for line in _git(["config", "--local", "--list"], repo_dir).splitlines():
+        key, _, value = line.partition("=")
+        current[key.lower()] = value
+    for key, value in maintenance_config(threads).items():
+        if current.get(key.lower()) != value:
+            _git(["config", key, value], repo_dir)
+
+
+def optimize_repository(
+    repo_dir: str, force: bool = False, threads: Optional[int] = None
+) -> bool:
+    """
+    Repack a repository for fast repeated pushes.
+
+    Maintenance never fails the caller: errors are logged and the repository
+    is left usable as it was.
+
+    Args:
+        repo_dir: A bare repository or a work tree.
+        force: Whether to repack even if the repository looks maintained.
+        threads: Threads used for delta compression; defaults to one per CPU.
+
+    Returns:
+        True if the repository was repacked.
+    """
+    try:
+        configure_repository(repo_dir, threads)
+        if not (force or needs_maintenance(repo_dir)):
+            return False
+        with deadline("maintenance"), time_phase("maintenance"):
+            _git(
+                ["repack", "-a", "-d", "-b", "-q"]
+                + [f"--window={REPACK_WINDOW}", f"--depth={REPACK_DEPTH}"],
+                repo_dir,
+            )
+            _git(["commit-graph", "write", "--reachable"], repo_dir)
+            _git(["multi-pack-index", "write"], repo_dir)
+    except (subprocess.CalledProcessError, OSError, DeadlineExceeded) as e:
+        message = e.stderr.strip() if getattr(e, "stderr", None) else str(e)
+        logger.warning(f"Could not optimize {repo_dir}: {message}")
+        return False
+    except Cancelled:
+        return False
+    logger.debug(f"Optimized packs of {repo_dir}")
+    return True
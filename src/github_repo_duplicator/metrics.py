@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Metrics for GitHub Repo Duplicator.
+
+Counts duplications by outcome and records per-phase latency, bytes
+transferred, retries and rate-limit waits. Metrics are rendered in the
+OpenMetrics text format, either into a textfile (for the node exporter
+textfile collector) after a CLI run or over HTTP while a long-running
+command is active.
+"""
+
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "github_repo_duplicator_"
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Phase latencies range from sub-second API calls to multi-minute pushes
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+_SAMPLE_RE = re.compile(
+    r"^(?P<key>[a-zA-Z_:][a-zA-Z0-9_:]*(?:\{.*\})?) (?P<value>\S+)$"
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra=()) -> str:
+    """Format a label set as ``{name="value",...}``."""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value, dropping the fraction of whole numbers."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """A monotonically increasing counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter for a label set."""
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Get the current value for a label set."""
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def samples(self) -> List[Tuple[str, float]]:
+        """Get the samples of this counter as ``(key, value)`` pairs."""
+        with self._lock:
+            return [
+                (f"{self.name}_total{_format_labels(self.label_names, key)}", value)
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Histogram:
+    """A histogram of observations with cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record an observation for a label set."""
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        """Get the number of observations for a label set."""
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            return self._counts.get(key, [0])[-1]
+
+    def samples(self) -> List[Tuple[str, float]]:
+        """Get the samples of this histogram as ``(key, value)`` pairs."""
+        samples = []
+        with self._lock:
+            for key, counts in sorted(self._counts.items()):
+                bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, counts):
+                    labels = _format_labels(self.label_names, key, [("le", bound)])
+                    samples.append((f"{self.name}_bucket{labels}", count))
+                labels = _format_labels(self.label_names, key)
+                samples.append((f"{self.name}_count{labels}", counts[-1]))
+                samples.append((f"{self.name}_sum{labels}", self._sums[key]))
+        return samples
+
+
+class Registry:
+    """A collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """Add a metric to the registry and return it."""
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, previous: Optional[Dict[str, float]] = None) -> str:
+        """
+        Render all metrics in the OpenMetrics text format.
+
+        Args:
+            previous: Optional sample values to add to the current ones, as
+                read back from an earlier textfile.
+
+        Returns:
+            The exposition text.
+        """
+        previous = previous or {}
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            current = dict(metric.samples())
+            prefix = (f"{metric.name}_total", f"{metric.name}_bucket")
+            prefix += (f"{metric.name}_count", f"{metric.name}_sum")
+            for key, value in previous.items():
+                if key.split("{", 1)[0] in prefix:
+                    current[key] = current.get(key, 0.0) + value
+            for key in sorted(current, key=_sample_sort_key):
+                lines.append(f"{key} {_format_value(current[key])}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _sample_sort_key(key: str) -> Tuple[str, float, str]:
+    """Order samples by label set, then by numeric bucket bound."""
+    match = re.search(r'le="([^"]+)"', key)
+    bound = float(match.group(1)) if match else float("inf")
+    base = re.sub(r',?le="[^"]+"', "", key)
+    return (base.split("{", 1)[-1], bound, key)
+
+
+def parse_samples(text: str) -> Dict[str, float]:
+    """
+    Parse the samples of an OpenMetrics exposition.
+
+    Args:
+        text: The exposition text.
+
+    Returns:
+        A mapping of sample key (name with labels) to value.
+    """
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE_RE.match(line)
+        if match and not line.startswith("#"):
+            samples[match.group("key")] = float(match.group("value"))
+    return samples
+
+
+REGISTRY = Registry()
+
+DUPLICATIONS = REGISTRY.register(
+    Counter(
+        f"{METRIC_PREFIX}duplications",
+        "Duplications by outcome.",
+        ["outcome"],
+    )
+)
+PHASE_DURATION = REGISTRY.register(
+    Histogram(
+        f"{METRIC_PREFIX}phase_duration_seconds",
+        "Latency of each duplication phase.",
+        ["phase"],
+    )
+)
+TRANSFER_BYTES = REGISTRY.register(
+    Counter(
+        f"{METRIC_PREFIX}transfer_bytes",
+        "Bytes transferred, by kind of transfer.",
+        ["kind"],
+    )
+)
+RETRIES = REGISTRY.register(
+    Counter(f"{METRIC_PREFIX}retries", "Retried operations by phase.", ["phase"])
+)
+RATE_LIMIT_WAIT = REGISTRY.register(
+    Counter(
+        f"{METRIC_PREFIX}rate_limit_wait_seconds",
+        "Time spent waiting for API rate limits to reset.",
+    )
+)
+QUEUE_WAIT = REGISTRY.register(
+    Histogram(
+        f"{METRIC_PREFIX}git_slot_wait_seconds",
+        "Time git processes queued for a host-wide slot, by kind of slot.",
+        ["kind"],
+    )
+)
+
+
+def record_duplication(outcome: str) -> None:
+    """Count a finished duplication with its outcome."""
+    DUPLICATIONS.inc(outcome=outcome)
+
+
+def record_transfer(kind: str, num_bytes: int) -> None:
+    """Count bytes transferred by one kind of transfer."""
+    TRANSFER_BYTES.inc(num_bytes, kind=kind)
+
+
+def record_retry(phase: str) -> None:
+    """Count a retried operation."""
+    RETRIES.inc(phase=phase)
+
+
+def record_rate_limit_wait(seconds: float) -> None:
+    """Count time spent waiting for a rate limit to reset."""
+    RATE_LIMIT_WAIT.inc(seconds)
+
+
+def record_queue_wait(kind: str, seconds: float) -> None:
+    """Record how long a git process waited for a host-wide slot."""
+    QUEUE_WAIT.observe(seconds, kind=kind)
+
+
+@contextmanager
+def time_phase(phase: str) -> Iterator[None]:
+    """Record the duration of a duplication phase, whether or not it fails."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        PHASE_DURATION.observe(time.monotonic() - started, phase=phase)
+
+
+def pack_size_bytes(repo_dir: str) -> int:
+    """
+    Get the size of the packed objects of a repository.
+
+    This is what a push of all refs into an empty repository transfers, so it
+    is recorded as the byte count of pushes.
+
+    Args:
+        repo_dir: A local repository (bare or not).
+
+    Returns:
+        The pack size in bytes, or 0 if it cannot be determined.
+    """
+    # Imported here because the watchdog's governor imports this module
+    from .watchdog import run_with_deadline
+
+    try:
+        result = run_with_deadline(
+            ["git", "count-objects", "-v"],
+            cwd=repo_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return 0
+    sizes = dict(line.split(": ", 1) for line in result.stdout.splitlines())
+    return (int(sizes.get("size", 0)) + int(sizes.get("size-pack", 0))) * 1024
+
+
+def write_textfile(path: str, registry: Registry = REGISTRY) -> None:
+    """
+    Add the metrics of this run to an OpenMetrics textfile.
+
+    Values already in the file are added to, so the file accumulates totals
+    across CLI runs. The file is replaced atomically and concurrent writers
+    are serialised with a lock file.
+
+    Args:
+        path: The textfile to update.
+        registry: The registry to export.
+    """
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        previous = {}
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                previous = parse_samples(f.read())
+        fd, partial = tempfile.mkstemp(dir=directory, suffix=".partial")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(registry.render(previous))
+        os.chmod(partial, 0o644)
+        os.replace(partial, path)
+    logger.info(f"Wrote metrics to {path}")
+
+
+def serve_metrics(
+    port: int, address: str = "127.0.0.1", registry: Registry = REGISTRY
+) -> ThreadingHTTPServer:
+    """
+    Serve metrics over HTTP from a background thread.
+
+    Args:
+        port: The port to listen on (0 picks a free port).
+        address: The address to bind to.
+        registry: The registry to export.
+
+    Returns:
+        The running server; call ``shutdown()`` to stop it.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"Metrics request: {format % args}")
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info(f"Serving metrics on http://{address}:{server.server_port}/metrics")
+    return server
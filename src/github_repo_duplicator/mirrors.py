@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Local mirror cache for GitHub Repo Duplicator.
+
+Repositories that are cloned often (templates, submodules) are kept as bare
+mirrors in the local cache. Later clones borrow objects from the mirror, so
+only the changes since the last fetch cross the network, and mirrors are
+repacked after fetches so pushes from them stay cheap.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .cache import get_cache_dir, repo_basename
+from .maintenance import optimize_repository
+from .watchdog import run_with_deadline
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Mirrors track branches and tags only, not pull request refs
+MIRROR_REFSPEC = "+refs/heads/*:refs/heads/*"
+TAGS_REFSPEC = "+refs/tags/*:refs/tags/*"
+
+# File inside a mirror whose modification time is its last refresh
+REFRESH_STAMP = "last-refresh"
+
+
+class MirrorError(Exception):
+    """Raised when a mirror cannot be created or refreshed."""
+
+
+def mirror_path(url: str) -> str:
+    """
+    Get the cache location of the mirror for a repository URL.
+
+    Args:
+        url: The repository URL.
+
+    Returns:
+        The path of the bare mirror, whether or not it exists yet.
+    """
+    digest = hashlib.sha1(url.encode()).hexdigest()[:12]
+    return os.path.join(get_cache_dir("mirrors"), f"{repo_basename(url)}-{digest}.git")
+
+
+@contextmanager
+def _mirror_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on a mirror across processes."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _git(args, cwd=None) -> str:
+    """Run a git command and return its output, raising MirrorError on failure."""
+    try:
+        return run_with_deadline(
+            ["git"] + args, cwd=cwd, check=True, capture_output=True, text=True
+        ).stdout
+    except (subprocess.CalledProcessError, OSError) as e:
+        raise MirrorError((getattr(e, "stderr", None) or str(e)).strip()) from e
+
+
+def _refs(output: str) -> Dict[str, str]:
+    """Parse ``<sha> <ref>`` lines into a mapping of refs to objects."""
+    refs = {}
+    for line in output.splitlines():
+        parts = line.split()
+        # Peeled tags are listed by ls-remote only
+        if len(parts) == 2 and not parts[1].endswith("^{}"):
+            refs[parts[1]] = parts[0]
+    return refs
+
+
+def mirror_age(url: str) -> Optional[float]:
+    """Get the seconds since the mirror of a repository was refreshed, if any."""
+    try:
+        return time.time() - os.path.getmtime(
+            os.path.join(mirror_path(url), REFRESH_STAMP)
+        )
+    except OSError:
+        return None
+
+
+def ensure_mirror(
+    url: str, refresh: bool = True, fetch_url: Optional[str] = None
+) -> str:
+    """
+    Create or update the cached mirror of a repository.
+
+    Args:
+        url: The repository URL, naming the mirror.
+        refresh: Whether to fetch updates into an existing mirror.
+        fetch_url: The URL to clone and fetch from, if the mirror is named
+            by a normalized spelling (e.g. HTTPS for an SSH-only template).
+
+    Returns:
+        The path of the bare mirror.
+
+    Raises:
+        MirrorError: If the mirror cannot be cloned or fetched.
+    """
+    path = mirror_path(url)
+    with _mirror_lock(path):
+        if not os.path.isdir(path):
+            logger.info(f"Creating mirror of {url} at {path}")
+            # Clone next to the final location so a crash never leaves a
+            # half-written mirror behind under the real name
+            partial = f"{path}.partial"
+            shutil.rmtree(partial, ignore_errors=True)
+            _git(["clone", "--bare", "--quiet", fetch_url or url, partial])
+            _git(["config", "remote.origin.fetch", MIRROR_REFSPEC], cwd=partial)
+            os.replace(partial, path)
+        elif refresh:
+            logger.info(f"Refreshing mirror of {url}")
+            _git(
+                ["fetch", "--quiet", "--prune", fetch_url or "origin"]
+                + [MIRROR_REFSPEC, TAGS_REFSPEC],
+                cwd=path,
+            )
+        with open(os.path.join(path, REFRESH_STAMP), "w"):
+            pass
+        optimize_repository(path)
+    return path
+
+
+def current_mirror(url: str, fetch_url: Optional[str] = None) -> Optional[str]:
+    """
+    Get the cached mirror of a repository, brought up to date, if there is one.
+
+    The branches and tags of the mirror are compared with the upstream ones,
+    which costs one ``ls-remote`` round trip; only if they differ is the
+    mirror fetched, so a mirror kept warm in the background is used without
+    any object transfer. Mirrors are never created here.
+
+    Args:
+        url: The repository URL, naming the mirror.
+        fetch_url: The URL to compare with and fetch from, if it differs.
+
+    Returns:
+        The path of the up-to-date mirror, or None if there is no mirror or
+        it could not be brought up to date.
+    """
+    path = mirror_path(url)
+    if not os.path.isdir(path):
+        return None
+    try:
+        upstream = _refs(_git(["ls-remote", "--heads", "--tags", fetch_url or url]))
+        cached = _refs(
+            _git(
+                ["for-each-ref", "--format=%(objectname) %(refname)"]
+                + ["refs/heads", "refs/tags"],
+                cwd=path,
+            )
+        )
+        if upstream != cached:
+            ensure_mirror(url, fetch_url=fetch_url)
+    except MirrorError as e:
+        logger.warning(f"Not using the mirror of {url}: {e}")
+        return None
+    return path
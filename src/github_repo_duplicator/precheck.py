@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Name pre-check for GitHub Repo Duplicator.
+
+Before any template is cloned or any repository created, every target name
+is validated locally and the names that already exist on GitHub are found
+in a few batched API queries, so doomed jobs are rejected up front instead
+of failing at ``gh repo create``.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .duplicator import validate_repo_name
+from .github_api import GitHubApiError, find_existing_repositories, viewer_login
+
+logger = logging.getLogger(__name__)
+
+# GitHub limits on owner (user or organization) and repository names
+MAX_OWNER_LENGTH = 39
+MAX_NAME_LENGTH = 100
+OWNER_PATTERN = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9-]*[A-Za-z0-9])?$")
+
+
+@dataclass
+class PrecheckResult:
+    """Outcome of pre-checking one target name."""
+
+    name: str
+    full_name: str = ""
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        """Whether the target can be created."""
+        return not self.error
+
+
+def name_error(name: str) -> Optional[str]:
+    """
+    Check a target name (``name`` or ``owner/name``) without the network.
+
+    Args:
+        name: The target name.
+
+    Returns:
+        Why the name is invalid, or None if it is valid.
+    """
+    owner, _, repo = name.rpartition("/")
+    if "/" in name and not OWNER_PATTERN.match(owner):
+        return f"invalid owner {owner!r}"
+    if len(owner) > MAX_OWNER_LENGTH:
+        return f"owner longer than {MAX_OWNER_LENGTH} characters"
+    if not validate_repo_name(repo) or repo in (".", ".."):
+        return "invalid repository name"
+    if len(repo) > MAX_NAME_LENGTH:
+        return f"name longer than {MAX_NAME_LENGTH} characters"
+    return None
+
+
+def precheck_names(
+    names: List[str], check_existing: bool = True
+) -> List[PrecheckResult]:
+    """
+    Find the target names that cannot be created.
+
+    Names are validated locally, duplicates (GitHub names are
+    case-insensitive) are rejected, and the remaining names are looked up on
+    GitHub in batches. If GitHub cannot be asked, the lookup is skipped with a
+    warning; creation still fails safely on a taken name.
+
+    Args:
+        names: The target names, as ``name`` (under the authenticated user)
+            or ``owner/name``.
+        check_existing: Whether to look up existing repositories on GitHub.
+
+    Returns:
+        One result per name, in the order the names were given.
+    """
+    results = [PrecheckResult(name=name) for name in names]
+    seen = set()
+    for result in results:
+        result.error = name_error(result.name) or ""
+        if not result.error:
+            key = result.name.lower()
+            if key in seen:
+                result.error = "duplicate name"
+            seen.add(key)
+
+    pending = [result for result in results if result.ok]
+    if not (check_existing and pending):
+        return results
+    try:
+        if any("/" not in result.name for result in pending):
+            login = viewer_login()
+        for result in pending:
+            result.full_name = (
+                result.name if "/" in result.name else f"{login}/{result.name}"
+            )
+        existing = find_existing_repositories([r.full_name for r in pending])
+    except GitHubApiError as e:
+        logger.warning(f"Could not check for existing repositories: {e}")
+        return results
+    for result in pending:
+        if result.full_name in existing:
+            result.error = f"{result.full_name} already exists"
+    return results
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Usage-driven template prewarming for GitHub Repo Duplicator.
+
+The templates duplicated most often, as recorded in the registry, are kept
+as refreshed mirrors in the local cache. Duplications clone from a mirror
+once a single ``ls-remote`` has confirmed it is current, so refreshing the
+popular ones ahead of demand, from cron or a background thread of a
+long-running worker, takes the template fetch off the path of interactive
+runs.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from .mirrors import MirrorError, ensure_mirror, mirror_age
+from .registry import Registry, get_registry, normalize_template_url
+from .watchdog import Cancelled, DeadlineExceeded, deadline
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two prewarming rounds
+DEFAULT_PREWARM_INTERVAL = 900.0
+
+# Number of most used templates kept warm
+DEFAULT_PREWARM_TOP = 10
+
+# Days of registry history used to rank templates
+DEFAULT_USAGE_WINDOW_DAYS = 30
+
+# Templates refreshed at once
+DEFAULT_PREWARM_JOBS = 4
+
+
+@dataclass
+class PrewarmResult:
+    """Outcome of refreshing the mirror of one template."""
+
+    template_url: str
+    uses: int
+    success: bool = False
+    error: str = ""
+    duration: float = 0.0
+    age: Optional[float] = None
+
+
+def popular_templates(
+    top: int = DEFAULT_PREWARM_TOP,
+    window_days: float = DEFAULT_USAGE_WINDOW_DAYS,
+    registry: Optional[Registry] = None,
+) -> List[Tuple[str, int]]:
+    """
+    Rank the templates worth keeping warm.
+
+    Args:
+        top: Maximum number of templates.
+        window_days: Days of history to count duplications over.
+        registry: The registry to read; defaults to the shared one.
+
+    Returns:
+        Pairs of template URL and recent duplications, most used first.
+        Each template is given as it was last spelled, which is the URL it
+        is fetched from. Local paths and bundles are left out, as they need
+        no fetch.
+    """
+    since = time.time() - window_days * 86400
+    usage = (registry or get_registry()).template_usage(since)
+    remote = [(url, uses) for url, uses in usage if "://" in url or "@" in url]
+    return remote[:top]
+
+
+def _refresh(template_url: str, uses: int) -> PrewarmResult:
+    """Refresh the mirror of one template, never raising."""
+    key = normalize_template_url(template_url)
+    result = PrewarmResult(template_url, uses, age=mirror_age(key))
+    started = time.monotonic()
+    try:
+        with deadline("prewarm"):
+            ensure_mirror(key, fetch_url=template_url)
+        result.success = True
+    except (MirrorError, DeadlineExceeded, Cancelled) as e:
+        result.error = str(e)
+        logger.warning(f"Could not prewarm {template_url}: {e}")
+    result.duration = time.monotonic() - started
+    return result
+
+
+def prewarm(
+    top: int = DEFAULT_PREWARM_TOP,
+    window_days: float = DEFAULT_USAGE_WINDOW_DAYS,
+    max_workers: int = DEFAULT_PREWARM_JOBS,
+    on_result: Optional[Callable[[PrewarmResult], None]] = None,
+    registry: Optional[Registry] = None,
+) -> List[PrewarmResult]:
+    """
+    Refresh the mirrors of the most used templates concurrently.
+
+    Mirrors are created for templates that have none yet.
+
+    Args:
+        top: Maximum number of templates.
+        window_days: Days of history to rank templates by.
+        max_workers: Maximum number of templates refreshed at once.
+        on_result: Called with each result as soon as it is available.
+        registry: The registry to read; defaults to the shared one.
+
+    Returns:
+        One result per template, most used first.
+    """
+    templates = popular_templates(top, window_days, registry)
+    if not templates:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = [pool.submit(_refresh, url, uses) for url, uses in templates]
+        results = []
+        for future in futures:
+            result = future.result()
+            if on_result:
+                on_result(result)
+            results.append(result)
+    return results
+
+
+class Prewarmer:
+    """Prewarms the most used templates in a background thread."""
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_PREWARM_INTERVAL,
+        top: int = DEFAULT_PREWARM_TOP,
+        window_days: float = DEFAULT_USAGE_WINDOW_DAYS,
+        max_workers: int = DEFAULT_PREWARM_JOBS,
+    ):
+        self.interval = interval
+        self.top = top
+        self.window_days = window_days
+        self.max_workers = max_workers
+        self.rounds = 0
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start prewarming now and then every interval."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop after the round in progress, if any."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        """Run rounds until stopped."""
+        while not self._stopped.is_set():
+            try:
+                results = prewarm(self.top, self.window_days, self.max_workers)
+                warm = sum(1 for result in results if result.success)
+                logger.info(f"Prewarmed {warm} of {len(results)} templates")
+            except Exception as e:
+                # A broken registry must not end a long-running process
+                logger.warning(f"Prewarming failed: {e}")
+            self.rounds += 1
+            self._stopped.wait(self.interval)
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Local registry of duplications for GitHub Repo Duplicator.
+
+Every duplication and sync is recorded in a SQLite database in the cache
+directory: which template and template commit a repository came from, its
+visibility, timings and outcome. Indexes keep inventory queries such as
+"every repository from template X based on a commit older than Y" local and
+fast, without asking GitHub about each repository.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .cache import get_cache_dir
+from .github_api import metadata_from_url
+from .mirrors import mirror_path
+from .watchdog import run_with_deadline
+
+logger = logging.getLogger(__name__)
+
+# Environment variable overriding the registry database location
+REGISTRY_PATH_ENV = "GITHUB_REPO_DUPLICATOR_REGISTRY"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS duplications (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    template_url TEXT NOT NULL,
+    source_url TEXT NOT NULL DEFAULT '',
+    template_sha TEXT NOT NULL DEFAULT '',
+    template_commit_time INTEGER,
+    repo_name TEXT NOT NULL,
+    repo_url TEXT NOT NULL DEFAULT '',
+    visibility TEXT NOT NULL DEFAULT '',
+    outcome TEXT NOT NULL,
+    error TEXT NOT NULL DEFAULT '',
+    duration REAL,
+    timings TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS duplications_by_template
+    ON duplications (template_url, template_commit_time);
+CREATE INDEX IF NOT EXISTS duplications_by_repo
+    ON duplications (repo_name, outcome, id);
+CREATE INDEX IF NOT EXISTS duplications_by_sha
+    ON duplications (template_sha);
+CREATE INDEX IF NOT EXISTS duplications_by_time
+    ON duplications (created_at);
+CREATE TABLE IF NOT EXISTS resources (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    job TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    target TEXT NOT NULL,
+    pushed INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    error TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS resources_by_state
+    ON resources (state, created_at);
+"""
+
+# Columns added after the first release, for registries created before them
+MIGRATIONS = {
+    "duplications": {"source_url": "TEXT NOT NULL DEFAULT ''"},
+}
+
+# The latest successful duplication or sync of every repository
+_LATEST = """
+SELECT d.* FROM duplications AS d
+JOIN (
+    SELECT repo_name, MAX(id) AS id FROM duplications
+    WHERE outcome = 'success' GROUP BY repo_name
+) AS latest ON d.id = latest.id
+"""
+
+
+class RegistryError(Exception):
+    """Raised when a registry query cannot be answered."""
+
+
+@dataclass
+class RegistryEntry:
+    """A recorded duplication or sync of one repository."""
+
+    template_url: str
+    repo_name: str
+    outcome: str
+    kind: str = "duplicate"
+    template_sha: str = ""
+    template_commit_time: Optional[int] = None
+    repo_url: str = ""
+    visibility: str = ""
+    error: str = ""
+    duration: Optional[float] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    id: Optional[int] = None
+
+
+@dataclass
+class CreatedResource:
+    """A repository or directory created by a job, journaled for rollback."""
+
+    job: str
+    kind: str
+    target: str
+    state: str
+    pushed: bool = False
+    error: str = ""
+    created_at: float = field(default_factory=time.time)
+    id: Optional[int] = None
+
+
+def normalize_template_url(url: str) -> str:
+    """Normalize a template URL so different spellings match."""
+    url = url.strip().rstrip("/")
+    if url.startswith("git@github.com:"):
+        url = "https://github.com/" + url[len("git@github.com:") :]
+    return url[: -len(".git")] if url.endswith(".git") else url
+
+
+def normalize_repo_name(repo: str, url: str = "") -> str:
+    """
+    Name a repository as ``owner/name`` so every record of it matches.
+
+    Args:
+        repo: The repository as given: a name, ``owner/name``, URL or path.
+        url: Its GitHub URL, if known, for names without an owner.
+
+    Returns:
+        ``owner/name`` for GitHub repositories, else the repository as given.
+    """
+    for candidate in (repo, url):
+        metadata = metadata_from_url(normalize_template_url(candidate))
+        if metadata:
+            return metadata.full_name
+    return repo
+
+
+def default_registry_path() -> str:
+    """Get the registry location from the environment or the cache."""
+    return os.environ.get(REGISTRY_PATH_ENV) or os.path.join(
+        get_cache_dir(), "registry.sqlite3"
+    )
+
+
+class Registry:
+    """A SQLite registry of duplications, safe to share between threads."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.abspath(path or default_registry_path())
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as db:
+            db.executescript(SCHEMA)
+            for table, columns in MIGRATIONS.items():
+                present = {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+                for column, definition in columns.items():
+                    if column not in present:
+                        db.execute(
+                            f"ALTER TABLE {table} ADD COLUMN {column} {definition}"
+                        )
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Use this thread's connection inside a transaction."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.row_factory = sqlite3.Row
+            # WAL lets concurrent runs write while others read
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        with db:
+            yield db
+
+    def record(self, entry: RegistryEntry) -> int:
+        """
+        Add an entry to the registry.
+
+        Args:
+            entry: The duplication or sync to record.
+
+        Returns:
+            The id of the new entry.
+        """
+        with self._connection() as db:
+            cursor = db.execute(
+                "INSERT INTO duplications (created_at, kind, template_url,"
+                " source_url, template_sha, template_commit_time, repo_name,"
+                " repo_url, visibility, outcome, error, duration, timings)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry.created_at,
+                    entry.kind,
+                    normalize_template_url(entry.template_url),
+                    entry.template_url.strip(),
+                    entry.template_sha,
+                    entry.template_commit_time,
+                    normalize_repo_name(entry.repo_name, entry.repo_url),
+                    entry.repo_url,
+                    entry.visibility,
+                    entry.outcome,
+                    entry.error,
+                    entry.duration,
+                    json.dumps(entry.timings, sort_keys=True),
+                ),
+            )
+            return cursor.lastrowid
+
+    def history(
+        self,
+        template_url: Optional[str] = None,
+        repo_name: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[RegistryEntry]:
+        """
+        List recorded duplications and syncs, newest first.
+
+        Args:
+            template_url: Only entries for this template.
+            repo_name: Only entries for this repository, as ``owner/name``
+                or just its name.
+            limit: Maximum number of entries.
+
+        Returns:
+            The matching entries.
+        """
+        query = "SELECT * FROM duplications WHERE 1 = 1"
+        params: list = []
+        if template_url:
+            query += " AND template_url = ?"
+            params.append(normalize_template_url(template_url))
+        if repo_name:
+            query += (
+                " AND ? IN (repo_name, substr(repo_name, instr(repo_name, '/') + 1))"
+            )
+            params.append(repo_name)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._connection() as db:
+            return [_entry(row) for row in db.execute(query, params)]
+
+    def commit_time(self, sha: str) -> Optional[int]:
+        """Get the recorded commit time of a template commit (or SHA prefix)."""
+        with self._connection() as db:
+            row = db.execute(
+                "SELECT template_commit_time FROM duplications"
+                " WHERE template_sha >= ? AND template_sha < ?"
+                " AND template_commit_time IS NOT NULL LIMIT 1",
+                (sha, sha + "g"),
+            ).fetchone()
+        return row[0] if row else None
+
+    def inventory(
+        self,
+        template_url: Optional[str] = None,
+        older_than: Optional[str] = None,
+    ) -> List[RegistryEntry]:
+        """
+        List every repository with the template commit it is based on now.
+
+        Args:
+            template_url: Only repositories from this template.
+            older_than: Only repositories based on a template commit older
+                than this one (a SHA or SHA prefix seen in the registry or
+                in the template's cached mirror).
+
+        Returns:
+            The latest successful entry of every matching repository, ordered
+            by template and template commit time.
+
+        Raises:
+            RegistryError: If ``older_than`` is not a known template commit.
+        """
+        query = f"SELECT * FROM ({_LATEST}) WHERE 1 = 1"
+        params: list = []
+        if template_url:
+            query += " AND template_url = ?"
+            params.append(normalize_template_url(template_url))
+        if older_than:
+            cutoff = self.commit_time(older_than)
+            if cutoff is None and template_url:
+                cutoff = _mirror_commit_time(template_url, older_than)
+            if cutoff is None:
+                raise RegistryError(f"Unknown template commit {older_than}")
+            query += " AND template_commit_time < ?"
+            params.append(cutoff)
+        query += " ORDER BY template_url, template_commit_time, repo_name"
+        with self._connection() as db:
+            return [_entry(row) for row in db.execute(query, params)]
+
+    def template_usage(
+        self, since: Optional[float] = None, limit: Optional[int] = None
+    ) -> List[Tuple[str, int]]:
+        """
+        Rank templates by how often they were duplicated.
+
+        Args:
+            since: Only count duplications started after this Unix time.
+            limit: Maximum number of templates.
+
+        Returns:
+            Pairs of template URL and number of duplications, most used first.
+            Spellings of one template are counted together, and the URL is
+            the one it was last given as, so it can be fetched the same way.
+        """
+        query = (
+            "SELECT COALESCE(NULLIF(("
+            "SELECT s.source_url FROM duplications AS s"
+            " WHERE s.template_url = d.template_url"
+            " ORDER BY s.created_at DESC, s.id DESC LIMIT 1"
+            "), ''), template_url), COUNT(*) AS uses FROM duplications AS d"
+            " WHERE kind = 'duplicate' AND created_at >= ?"
+            " GROUP BY template_url ORDER BY uses DESC, MAX(created_at) DESC"
+        )
+        params: list = [since or 0]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._connection() as db:
+            return [(row[0], row[1]) for row in db.execute(query, params)]
+
+    def add_resource(self, resource: CreatedResource) -> int:
+        """
+        Journal a resource a job has created.
+
+        Returns:
+            The id of the journal entry.
+        """
+        with self._connection() as db:
+            cursor = db.execute(
+                "INSERT INTO resources (created_at, job, kind, target, pushed,"
+                " state, error) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    resource.created_at,
+                    resource.job,
+                    resource.kind,
+                    resource.target,
+                    int(resource.pushed),
+                    resource.state,
+                    resource.error,
+                ),
+            )
+            return cursor.lastrowid
+
+    def update_resource(self, resource: CreatedResource) -> None:
+        """Save the state, push flag and error of a journaled resource."""
+        with self._connection() as db:
+            db.execute(
+                "UPDATE resources SET pushed = ?, state = ?, error = ? WHERE id = ?",
+                (int(resource.pushed), resource.state, resource.error, resource.id),
+            )
+
+    def resources(
+        self, states: List[str], created_before: Optional[float] = None
+    ) -> List[CreatedResource]:
+        """
+        List journaled resources in some states, oldest first.
+
+        Args:
+            states: The states to list.
+            created_before: Only resources created before this time.
+        """
+        query = (
+            "SELECT * FROM resources WHERE state IN "
+            f"({', '.join('?' for _ in states)})"
+        )
+        params: list = list(states)
+        if created_before is not None:
+            query += " AND created_at < ?"
+            params.append(created_before)
+        query += " ORDER BY id"
+        with self._connection() as db:
+            return [
+                CreatedResource(**dict(row, pushed=bool(row["pushed"])))
+                for row in db.execute(query, params)
+            ]
+
+
+def _mirror_commit_time(template_url: str, sha: str) -> Optional[int]:
+    """Look up a commit's time in the template's cached mirror, if any."""
+    mirror = mirror_path(normalize_template_url(template_url))
+    if not os.path.isdir(mirror):
+        return None
+    try:
+        result = run_with_deadline(
+            ["git", "show", "-s", "--format=%ct", f"{sha}^{{commit}}"],
+            cwd=mirror,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return int(result.stdout.strip())
+
+
+def _entry(row: sqlite3.Row) -> RegistryEntry:
+    """Build an entry from a database row."""
+    values = dict(row)
+    # Only kept to fetch templates the way they were given
+    values.pop("source_url", None)
+    values["timings"] = json.loads(values["timings"] or "{}")
+    return RegistryEntry(**values)
+
+
+_registries: Dict[str, Registry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(path: Optional[str] = None) -> Registry:
+    """Get the shared registry for a database path."""
+    path = os.path.abspath(path or default_registry_path())
+    with _registries_lock:
+        if path not in _registries:
+            _registries[path] = Registry(path)
+        return _registries[path]
+
+
+def record_entry(entry: RegistryEntry) -> None:
+    """
+    Record an entry in the default registry without ever failing the caller.
+
+    Args:
+        entry: The duplication or sync to record.
+    """
+    try:
+        get_registry().record(entry)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Could not record {entry.repo_name} in the registry: {e}")
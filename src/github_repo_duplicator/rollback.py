@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Transactional rollback of duplication jobs for GitHub Repo Duplicator.
+
+A job journals every repository and directory it creates in the registry
+database before moving on. If the job fails, what it created is rolled back
+according to a policy, so a failed push no longer leaves an empty
+repository behind that blocks the next attempt with the same name. What
+cannot be rolled back (or is kept on purpose) stays journaled as an orphan,
+and ``cleanup_orphans`` removes orphans of earlier runs concurrently.
+"""
+
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from .registry import CreatedResource, Registry, get_registry
+from .watchdog import Cancelled, DeadlineExceeded, deadline, run_with_deadline
+
+logger = logging.getLogger(__name__)
+
+# What a failed job removes: "auto" removes repositories and directories
+# nothing was pushed to yet, "always" everything it created, "never" nothing
+ROLLBACK_POLICIES = ("auto", "always", "never")
+DEFAULT_ROLLBACK_POLICY = "auto"
+
+# Kinds of created resources
+REPOSITORY = "repository"
+DIRECTORY = "directory"
+
+# Journal states of a created resource
+PENDING = "pending"
+COMMITTED = "committed"
+ROLLED_BACK = "rolled_back"
+ORPHANED = "orphaned"
+
+# Pending resources older than this belong to runs that died mid-job
+DEFAULT_ORPHAN_AGE = 6 * 3600
+
+# Orphans removed at the same time by default
+DEFAULT_CLEANUP_JOBS = 8
+
+
+class RollbackError(Exception):
+    """Raised when a created resource cannot be removed."""
+
+
+@dataclass
+class RollbackResult:
+    """Outcome of removing one created resource."""
+
+    kind: str
+    target: str
+    removed: bool
+    error: str = ""
+
+
+def delete_repository(name: str) -> None:
+    """
+    Delete a GitHub repository.
+
+    Raises:
+        RollbackError: If the repository cannot be deleted, e.g. because the
+            token lacks the ``delete_repo`` scope.
+    """
+    try:
+        with deadline("rollback"):
+            run_with_deadline(
+                ["gh", "repo", "delete", name, "--yes"],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+    except subprocess.CalledProcessError as e:
+        message = (e.stderr or str(e)).strip()
+        if "delete_repo" in message:
+            message += " (run 'gh auth refresh -s delete_repo')"
+        raise RollbackError(message) from e
+    except (OSError, DeadlineExceeded, Cancelled) as e:
+        raise RollbackError(str(e)) from e
+
+
+def remove_resource(resource: CreatedResource) -> None:
+    """
+    Remove a created repository or directory; missing directories are fine.
+
+    Raises:
+        RollbackError: If it cannot be removed.
+    """
+    if resource.kind == REPOSITORY:
+        delete_repository(resource.target)
+    else:
+        try:
+            shutil.rmtree(resource.target)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            raise RollbackError(str(e)) from e
+
+
+class JobTransaction:
+    """
+    The resources created by one job, rolled back if the job fails.
+
+    Journal writes never fail the job: if the registry is unavailable the
+    transaction still rolls back from memory.
+    """
+
+    def __init__(
+        self,
+        job: str,
+        policy: str = DEFAULT_ROLLBACK_POLICY,
+        registry: Optional[Registry] = None,
+    ):
+        if policy not in ROLLBACK_POLICIES:
+            raise ValueError(f"Unknown rollback policy {policy!r}")
+        self.job = job
+        self.policy = policy
+        self.registry = registry
+        self.resources: List[CreatedResource] = []
+
+    def _journal(self, resource: CreatedResource) -> None:
+        """Save a resource to the journal without ever failing the job."""
+        try:
+            registry = self.registry or get_registry()
+            if resource.id is None:
+                resource.id = registry.add_resource(resource)
+            else:
+                registry.update_resource(resource)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Could not journal {resource.target}: {e}")
+
+    def _add(self, kind: str, target: str) -> None:
+        resource = CreatedResource(
+            job=self.job, kind=kind, target=target, state=PENDING
+        )
+        self.resources.append(resource)
+        self._journal(resource)
+
+    def created_repository(self, name: str) -> None:
+        """Record that the job created a GitHub repository."""
+        self._add(REPOSITORY, name)
+
+    def created_directory(self, path: str) -> None:
+        """Record that the job created a local directory."""
+        self._add(DIRECTORY, os.path.abspath(path))
+
+    def pushed(self, name: str) -> None:
+        """Record that content was pushed to a created repository or bare one."""
+        for resource in self.resources:
+            target = name if resource.kind == REPOSITORY else os.path.abspath(name)
+            if resource.target == target:
+                resource.pushed = True
+                self._journal(resource)
+
+    def commit(self) -> None:
+        """Keep everything the job created."""
+        for resource in self.resources:
+            if resource.state == PENDING:
+                resource.state = COMMITTED
+                self._journal(resource)
+
+    def _should_remove(self, resource: CreatedResource) -> bool:
+        if self.policy == "never":
+            return False
+        if self.policy == "always":
+            return True
+        return not resource.pushed
+
+    def rollback(self) -> List[RollbackResult]:
+        """
+        Remove what the job created, newest first, as the policy allows.
+
+        Resources that are kept or cannot be removed are journaled as
+        orphans for ``cleanup_orphans``.
+
+        Returns:
+            One result per resource created by the job.
+        """
+        results = []
+        for resource in reversed(self.resources):
+            if resource.state != PENDING:
+                continue
+            result = RollbackResult(resource.kind, resource.target, removed=False)
+            if self._should_remove(resource):
+                try:
+                    remove_resource(resource)
+                    result.removed = True
+                except RollbackError as e:
+                    result.error = str(e)
+                    logger.warning(f"Could not roll back {resource.target}: {e}")
+            resource.state = ROLLED_BACK if result.removed else ORPHANED
+            resource.error = result.error
+            self._journal(resource)
+            results.append(result)
+        return results
+
+
+def find_orphans(
+    min_age: float = DEFAULT_ORPHAN_AGE, registry: Optional[Registry] = None
+) -> List[CreatedResource]:
+    """
+    Find resources left behind by failed or interrupted jobs.
+
+    Args:
+        min_age: Seconds after which a resource still pending belongs to a
+            job that died; younger ones may belong to a job still running.
+        registry: The registry to search; defaults to the shared one.
+
+    Returns:
+        Orphaned resources and stale pending ones, oldest first.
+    """
+    registry = registry or get_registry()
+    orphans = registry.resources([ORPHANED])
+    stale = registry.resources([PENDING], created_before=time.time() - min_age)
+    return sorted(orphans + stale, key=lambda resource: resource.id)
+
+
+def cleanup_orphans(
+    orphans: List[CreatedResource],
+    max_workers: int = DEFAULT_CLEANUP_JOBS,
+    on_result: Optional[Callable[[RollbackResult], None]] = None,
+    registry: Optional[Registry] = None,
+    include_pushed: bool = False,
+) -> List[RollbackResult]:
+    """
+    Remove orphaned resources concurrently and update the journal.
+
+    Repositories that content was pushed to were kept on purpose by the
+    ``auto`` policy and are skipped unless ``include_pushed`` is set.
+
+    Args:
+        orphans: Resources found by ``find_orphans``.
+        max_workers: Maximum number of resources removed at once.
+        on_result: Optional callback invoked as each resource is done.
+        registry: The registry holding the journal; defaults to the shared one.
+        include_pushed: Whether to remove repositories with pushed content too.
+
+    Returns:
+        One result per removed (or failed) orphan, in the given order.
+    """
+    registry = registry or get_registry()
+    orphans = [o for o in orphans if include_pushed or not o.pushed]
+
+    def remove(resource: CreatedResource) -> RollbackResult:
+        result = RollbackResult(resource.kind, resource.target, removed=False)
+        try:
+            remove_resource(resource)
+            result.removed = True
+            resource.state, resource.error = ROLLED_BACK, ""
+        except RollbackError as e:
+            result.error = resource.error = str(e)
+            resource.state = ORPHANED
+        try:
+            registry.update_resource(resource)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Could not journal {resource.target}: {e}")
+        return result
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            pool.submit(remove, resource): i for i, resource in enumerate(orphans)
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            if on_result:
+                on_result(results[futures[future]])
+    return [results[i] for i in range(len(orphans))]
@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""
+Declarative post-create settings for GitHub Repo Duplicator.
+
+``gh repo create`` only sets visibility and description. Topics, default
+branch and merge options, branch protection, collaborators and labels are
+described once in a settings file (or per repository in manifest columns)
+and applied to every new repository after the push. Each setting reads the
+current state first and only writes what differs, so applying the same
+settings again is harmless, and all settings of a repository are applied
+concurrently over a shared pool of keep-alive HTTPS connections to the
+GitHub REST API.
+"""
+
+import csv
+import http.client
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .github_api import GitHubApiError, repository_metadata
+from .lfs import get_github_token
+from .metrics import record_rate_limit_wait, record_retry
+from .tokens import CORE, Credential, get_pool
+
+logger = logging.getLogger(__name__)
+
+# Environment variable with the REST API root, e.g. for GitHub Enterprise
+API_URL_ENV = "GITHUB_API_URL"
+DEFAULT_API_URL = "https://api.github.com"
+
+# Settings requests of one repository in flight at the same time by default
+DEFAULT_SETTINGS_JOBS = 8
+
+# Existing repositories configured at the same time by default
+DEFAULT_CONFIGURE_JOBS = 4
+
+# Rate-limited requests are retried this often, waiting at most this long
+MAX_RATE_LIMIT_RETRIES = 3
+MAX_RATE_LIMIT_WAIT = 60.0
+
+# Outcomes of a single setting
+UNCHANGED = "unchanged"
+UPDATED = "updated"
+CREATED = "created"
+FAILED = "failed"
+
+# Collaborator permissions as reported back by the permission endpoint
+_ROLE_NAMES = {"pull": "read", "push": "write"}
+
+# Branch protection settings that are off unless a rule turns them on; the
+# required ones (status checks, admins, reviews, restrictions) are null
+_PROTECTION_REQUIRED = (
+    "required_status_checks",
+    "enforce_admins",
+    "required_pull_request_reviews",
+    "restrictions",
+)
+_PROTECTION_FLAGS = (
+    "required_linear_history",
+    "allow_force_pushes",
+    "allow_deletions",
+    "block_creations",
+    "required_conversation_resolution",
+    "lock_branch",
+    "allow_fork_syncing",
+)
+
+# Manifest columns holding space-separated lists
+_LIST_COLUMNS = ("topics", "collaborators", "labels")
+
+
+class SettingsError(Exception):
+    """Raised when settings cannot be read or the API cannot be reached."""
+
+
+@dataclass
+class RepoSettings:
+    """Settings to apply to a repository after it is created."""
+
+    # Fields of the repository itself (default_branch, homepage, has_wiki,
+    # delete_branch_on_merge, ...), as accepted by ``PATCH /repos/{repo}``
+    repository: Dict[str, object] = field(default_factory=dict)
+    topics: Optional[List[str]] = None
+    # Branch name -> protection, as accepted by the branch protection API
+    branch_protection: Dict[str, Dict] = field(default_factory=dict)
+    # Login -> permission (pull, triage, push, maintain or admin)
+    collaborators: Dict[str, str] = field(default_factory=dict)
+    # Labels with ``name`` and optional ``color`` and ``description``
+    labels: List[Dict[str, str]] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RepoSettings":
+        """
+        Build settings from parsed JSON.
+
+        Raises:
+            SettingsError: If a key is unknown or a value has the wrong type.
+        """
+        unknown = set(data) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise SettingsError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        try:
+            settings = cls(**data)
+        except TypeError as e:
+            raise SettingsError(str(e)) from e
+        for label in settings.labels:
+            if not isinstance(label, dict) or not label.get("name"):
+                raise SettingsError(f"Labels need a name: {label!r}")
+        return settings
+
+    def merged(self, override: "RepoSettings") -> "RepoSettings":
+        """Get these settings with another set's values taking precedence."""
+        labels = {label["name"]: label for label in self.labels}
+        labels.update((label["name"], label) for label in override.labels)
+        return RepoSettings(
+            repository={**self.repository, **override.repository},
+            topics=override.topics if override.topics is not None else self.topics,
+            branch_protection={**self.branch_protection, **override.branch_protection},
+            collaborators={**self.collaborators, **override.collaborators},
+            labels=list(labels.values()),
+        )
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.repository
+            or self.topics is not None
+            or self.branch_protection
+            or self.collaborators
+            or self.labels
+        )
+
+
+@dataclass
+class SettingResult:
+    """Outcome of applying one setting."""
+
+    setting: str
+    status: str
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        """Whether the setting is now in place."""
+        return self.status != FAILED
+
+
+def load_settings(path: str) -> RepoSettings:
+    """
+    Read settings from a JSON file.
+
+    Raises:
+        SettingsError: If the file cannot be read or is not valid settings.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SettingsError(f"Could not read settings from {path}: {e}") from e
+    if not isinstance(data, dict):
+        raise SettingsError(f"Settings in {path} must be a JSON object")
+    return RepoSettings.from_dict(data)
+
+
+def read_manifest_settings(path: str) -> Dict[str, RepoSettings]:
+    """
+    Read per-repository settings from the columns of a CSV manifest.
+
+    A manifest is a names file whose first line is a header starting with
+    ``name``. Recognised columns are ``description``, ``homepage`` and
+    ``default_branch``, and the space-separated lists ``topics``,
+    ``collaborators`` (``login`` or ``login:permission``) and ``labels``.
+    Empty cells leave the setting alone. Plain names files have no settings.
+
+    Returns:
+        Settings by repository name.
+
+    Raises:
+        SettingsError: If the manifest cannot be read.
+    """
+    try:
+        with open(path, encoding="utf-8", newline="") as f:
+            lines = [line for line in f if not line.lstrip().startswith("#")]
+    except OSError as e:
+        raise SettingsError(f"Could not read manifest {path}: {e}") from e
+    if not lines or not lines[0].lower().startswith("name,"):
+        return {}
+    lines[0] = lines[0].lower()
+
+    manifest = {}
+    for row in csv.DictReader(lines):
+        name = (row.pop("name", "") or "").strip()
+        if not name:
+            continue
+        settings = RepoSettings()
+        for column, value in row.items():
+            value = (value or "").strip()
+            if not value or not column:
+                continue
+            column = column.strip().lower()
+            if column in _LIST_COLUMNS:
+                items = value.split()
+                if column == "topics":
+                    settings.topics = items
+                elif column == "labels":
+                    settings.labels = [{"name": item} for item in items]
+                else:
+                    for item in items:
+                        login, _, permission = item.partition(":")
+                        settings.collaborators[login] = permission or "push"
+            elif column in ("description", "homepage", "default_branch"):
+                settings.repository[column] = value
+            else:
+                logger.warning(f"Ignoring unknown manifest column {column}")
+        manifest[name] = settings
+    return manifest
+
+
+class ApiClient:
+    """GitHub REST client reusing a pool of keep-alive HTTPS connections."""
+
+    def __init__(
+        self,
+        token: str = "",
+        base_url: str = "",
+        timeout: float = 30.0,
+        credential: Optional[Credential] = None,
+    ):
+        parsed = urllib.parse.urlsplit(
+            base_url or os.environ.get(API_URL_ENV) or DEFAULT_API_URL
+        )
+        self.host = parsed.netloc
+        self.prefix = parsed.path.rstrip("/")
+        self.secure = parsed.scheme != "http"
+        self.token = token
+        self.timeout = timeout
+        self.credential = credential
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {
+            "Accept": "application/vnd.github+json",
+            "Content-Type": "application/json",
+            "User-Agent": "github-repo-duplicator",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
+        token = self.credential.get_token() if self.credential else self.token
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        return headers
+
+    def _connect(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """Take an idle connection, or open one; also tell which it was."""
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            factory = (
+                http.client.HTTPSConnection
+                if self.secure
+                else http.client.HTTPConnection
+            )
+            return factory(self.host, timeout=self.timeout), False
+
+    def _send(self, method: str, path: str, body: Optional[bytes]):
+        """Send one request, retrying once if a pooled connection went stale."""
+        for attempt in range(2):
+            connection, reused = self._connect()
+            try:
+                connection.request(
+                    method, self.prefix + path, body=body, headers=self._headers()
+                )
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise SettingsError(f"{method} {path} failed: {e}") from e
+            if response.will_close:
+                connection.close()
+            else:
+                self._idle.put(connection)
+            return response, data
+
+    def request(
+        self, method: str, path: str, body: Optional[Dict] = None
+    ) -> Tuple[int, object]:
+        """
+        Send a request, waiting out rate limits.
+
+        Args:
+            method: The HTTP method.
+            path: The path below the API root, e.g. ``/repos/o/r``.
+            body: Optional JSON body.
+
+        Returns:
+            The status code and the decoded JSON response (None if empty).
+
+        Raises:
+            SettingsError: If the API cannot be reached.
+        """
+        payload = json.dumps(body).encode() if body is not None else None
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            response, data = self._send(method, path, payload)
+            if self.credential:
+                self.credential.observe(
+                    CORE,
+                    response.getheader("X-RateLimit-Remaining"),
+                    response.getheader("X-RateLimit-Reset"),
+                    response.getheader("X-RateLimit-Limit"),
+                )
+            wait = _rate_limit_wait(response)
+            if wait is None or attempt == MAX_RATE_LIMIT_RETRIES:
+                break
+            logger.info(f"Rate limited on {method} {path}; waiting {wait:.0f}s")
+            record_rate_limit_wait(wait)
+            record_retry("settings")
+            time.sleep(wait)
+        try:
+            decoded = json.loads(data) if data else None
+        except ValueError:
+            decoded = data.decode(errors="replace")
+        return response.status, decoded
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _rate_limit_wait(response: http.client.HTTPResponse) -> Optional[float]:
+    """Get how long to wait before retrying a rate-limited response, if it is one."""
+    if response.status not in (403, 429):
+        return None
+    retry_after = response.getheader("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), MAX_RATE_LIMIT_WAIT)
+    if response.getheader("X-RateLimit-Remaining") == "0":
+        reset = float(response.getheader("X-RateLimit-Reset") or 0)
+        return min(max(reset - time.time(), 1.0), MAX_RATE_LIMIT_WAIT)
+    return None
+
+
+_clients: Dict[str, ApiClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_api_client(repo: Optional[str] = None) -> ApiClient:
+    """
+    Get the client shared by every settings stage of this process.
+
+    With a credential pool there is one client per credential, and the one
+    for ``repo`` (``owner/name``) acts through a credential of its owner.
+    """
+    base_url = os.environ.get(API_URL_ENV) or DEFAULT_API_URL
+    pool = get_pool()
+    credential = None
+    if pool is not None:
+        owner, sep, _ = (repo or "").rpartition("/")
+        credential = pool.choose(owner if sep else None)
+    key = f"{base_url} {credential.name}" if credential else base_url
+    with _clients_lock:
+        if key not in _clients:
+            if credential:
+                _clients[key] = ApiClient(base_url=base_url, credential=credential)
+            else:
+                _clients[key] = ApiClient(get_github_token(), base_url)
+        return _clients[key]
+
+
+def _error(status: int, data: object) -> str:
+    """Describe a failed API response."""
+    message = data.get("message") if isinstance(data, dict) else data
+    return f"HTTP {status}: {message or 'request failed'}"
+
+
+def _apply_repository(client: ApiClient, repo: str, fields: Dict) -> str:
+    status, current = client.request("GET", f"/repos/{repo}")
+    if status != 200:
+        raise SettingsError(_error(status, current))
+    changed = {k: v for k, v in fields.items() if current.get(k) != v}
+    if not changed:
+        return UNCHANGED
+    status, data = client.request("PATCH", f"/repos/{repo}", changed)
+    if status != 200:
+        raise SettingsError(_error(status, data))
+    return UPDATED
+
+
+def _apply_topics(client: ApiClient, repo: str, topics: List[str]) -> str:
+    wanted = sorted({topic.lower() for topic in topics})
+    status, current = client.request("GET", f"/repos/{repo}/topics")
+    if status != 200:
+        raise SettingsError(_error(status, current))
+    if sorted(current.get("names", [])) == wanted:
+        return UNCHANGED
+    status, data = client.request("PUT", f"/repos/{repo}/topics", {"names": wanted})
+    if status != 200:
+        raise SettingsError(_error(status, data))
+    return UPDATED
+
+
+def _same_protection(current: object, wanted: object) -> bool:
+    """
+    Compare protection as read back with the rules that would be written.
+
+    Reads wrap flags as ``{"enabled": ...}`` and list users, teams and apps
+    as objects, where writes give booleans and logins or slugs.
+    """
+    if isinstance(wanted, bool):
+        if isinstance(current, dict):
+            current = current.get("enabled")
+        return bool(current) == wanted
+    if wanted is None:
+        return not current
+    if isinstance(wanted, dict):
+        return isinstance(current, dict) and all(
+            _same_protection(current.get(key), value) for key, value in wanted.items()
+        )
+    if isinstance(wanted, list):
+        current = current if isinstance(current, list) else []
+        if any(isinstance(item, dict) for item in wanted):
+            return len(current) == len(wanted) and all(
+                any(_same_protection(item, rule) for item in current) for rule in wanted
+            )
+        names = [
+            item.get("login") or item.get("slug") if isinstance(item, dict) else item
+            for item in current
+        ]
+        return sorted(map(str, names)) == sorted(map(str, wanted))
+    return current == wanted
+
+
+def _apply_protection(client: ApiClient, repo: str, branch: str, rules: Dict) -> str:
+    path = f"/repos/{repo}/branches/{urllib.parse.quote(branch, safe='')}/protection"
+    status, current = client.request("GET", path)
+    if status == 200:
+        # Protection is replaced as a whole, so settings the rules leave out
+        # are compared with what writing the rules would reset them to
+        wanted = {key: None for key in _PROTECTION_REQUIRED}
+        wanted.update({key: False for key in _PROTECTION_FLAGS})
+        wanted.update(rules)
+        if _same_protection(current, wanted):
+            return UNCHANGED
+    elif status != 404:
+        raise SettingsError(_error(status, current))
+    status, data = client.request("PUT", path, rules)
+    if status != 200:
+        raise SettingsError(_error(status, data))
+    return UPDATED
+
+
+def _apply_collaborator(
+    client: ApiClient, repo: str, login: str, permission: str
+) -> str:
+    path = f"/repos/{repo}/collaborators/{urllib.parse.quote(login)}"
+    # Anyone has read permission on a public repository, so the permission
+    # only counts for users who are collaborators
+    status, data = client.request("GET", path)
+    if status == 204:
+        status, current = client.request("GET", f"{path}/permission")
+        if status == 200 and current.get("role_name") == _ROLE_NAMES.get(
+            permission, permission
+        ):
+            return UNCHANGED
+    elif status != 404:
+        raise SettingsError(_error(status, data))
+    status, data = client.request("PUT", path, {"permission": permission})
+    if status == 201:
+        return CREATED
+    if status != 204:
+        raise SettingsError(_error(status, data))
+    return UPDATED
+
+
+def _apply_label(client: ApiClient, repo: str, label: Dict[str, str]) -> str:
+    path = f"/repos/{repo}/labels/{urllib.parse.quote(label['name'], safe='')}"
+    status, current = client.request("GET", path)
+    if status == 404:
+        status, data = client.request("POST", f"/repos/{repo}/labels", label)
+        if status != 201:
+            raise SettingsError(_error(status, data))
+        return CREATED
+    if status != 200:
+        raise SettingsError(_error(status, current))
+    changed = {
+        k: v
+        for k, v in label.items()
+        if k != "name" and str(current.get(k, "")).lower() != str(v).lower()
+    }
+    if not changed:
+        return UNCHANGED
+    status, data = client.request("PATCH", path, changed)
+    if status != 200:
+        raise SettingsError(_error(status, data))
+    return UPDATED
+
+
+def apply_settings(
+    repo: str,
+    settings: RepoSettings,
+    client: Optional[ApiClient] = None,
+    jobs: int = DEFAULT_SETTINGS_JOBS,
+) -> List[SettingResult]:
+    """
+    Apply settings to a repository, all at once.
+
+    Every setting is applied independently: one failing does not stop the
+    others.
+
+    Args:
+        repo: The repository as ``owner/name``.
+        settings: The settings to apply.
+        client: The API client; defaults to the shared pooled one.
+        jobs: Maximum number of settings applied concurrently.
+
+    Returns:
+        One result per setting, in a stable order.
+    """
+    client = client or get_api_client(repo)
+    tasks: List[Tuple[str, Callable[[], str]]] = []
+    if settings.repository:
+        fields = dict(settings.repository)
+        tasks.append(("repository", lambda: _apply_repository(client, repo, fields)))
+    if settings.topics is not None:
+        topics = list(settings.topics)
+        tasks.append(("topics", lambda: _apply_topics(client, repo, topics)))
+    for branch, rules in settings.branch_protection.items():
+        tasks.append(
+            (
+                f"branch_protection:{branch}",
+                lambda b=branch, r=rules: _apply_protection(client, repo, b, r),
+            )
+        )
+    for login, permission in settings.collaborators.items():
+        tasks.append(
+            (
+                f"collaborator:{login}",
+                lambda l=login, p=permission: _apply_collaborator(client, repo, l, p),
+            )
+        )
+    for label in settings.labels:
+        tasks.append(
+            (f"label:{label['name']}", lambda l=label: _apply_label(client, repo, l))
+        )
+
+    def run(name: str, apply: Callable[[], str]) -> SettingResult:
+        try:
+            return SettingResult(name, apply())
+        except SettingsError as e:
+            return SettingResult(name, FAILED, str(e))
+
+    if not tasks:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(tasks)))) as pool:
+        futures = [pool.submit(run, name, apply) for name, apply in tasks]
+        results = [future.result() for future in futures]
+    for result in results:
+        if not result.ok:
+            logger.warning(f"{repo}: {result.setting} failed: {result.error}")
+    return results
+
+
+def configure_repositories(
+    repos: List[str],
+    settings: RepoSettings,
+    settings_by_name: Optional[Dict[str, RepoSettings]] = None,
+    max_workers: int = DEFAULT_CONFIGURE_JOBS,
+    on_result: Optional[Callable[[str, List[SettingResult]], None]] = None,
+) -> Dict[str, List[SettingResult]]:
+    """
+    Apply settings to existing repositories concurrently.
+
+    Args:
+        repos: Repositories as ``owner/name``, or ``name`` for the
+            authenticated user's.
+        settings: Settings applied to every repository.
+        settings_by_name: Per-repository settings taking precedence.
+        max_workers: Maximum number of repositories configured at once.
+        on_result: Optional callback invoked as each repository finishes.
+
+    Returns:
+        The setting results of every repository, by the given name.
+    """
+
+    def configure(repo: str) -> List[SettingResult]:
+        merged = settings.merged((settings_by_name or {}).get(repo, RepoSettings()))
+        try:
+            full_name = repository_metadata(repo).full_name
+        except GitHubApiError as e:
+            return [SettingResult("repository", FAILED, str(e))]
+        return apply_settings(full_name, merged)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(configure, repo): repo for repo in repos}
+        for future in as_completed(futures):
+            repo = futures[future]
+            results[repo] = future.result()
+            if on_result:
+                on_result(repo, results[repo])
+    return results
+
+
+def summarize(results: List[SettingResult]) -> str:
+    """Describe setting results in one line, e.g. ``3 updated, 1 failed``."""
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    return ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
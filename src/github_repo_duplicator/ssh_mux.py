@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+SSH connection multiplexing for GitHub Repo Duplicator.
+
+Every SSH clone, push and connection check in a run shares one OpenSSH
+ControlMaster connection per host. The control socket lives in a private
+directory owned by the tool, git picks it up through ``GIT_SSH_COMMAND``,
+and the master connection is closed and the directory removed when the run
+(or a long-running service) ends.
+"""
+
+import logging
+import os
+import platform
+import shlex
+import shutil
+import subprocess
+import tempfile
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# How long an idle master connection stays open between operations
+DEFAULT_CONTROL_PERSIST = "10m"
+
+# Hosts whose master connections are closed when multiplexing stops
+DEFAULT_HOSTS = ("git@github.com",)
+
+
+def multiplexing_supported() -> bool:
+    """Check whether the local ssh supports connection multiplexing."""
+    return platform.system() != "Windows" and shutil.which("ssh") is not None
+
+
+class SshMultiplexer:
+    """
+    Shares SSH connections across all git operations while active.
+
+    Use as a context manager, or call ``start`` and ``stop``. While active,
+    ``GIT_SSH_COMMAND`` points git at the shared control socket; any ssh
+    command already configured there is kept and extended.
+    """
+
+    def __init__(
+        self,
+        control_persist: str = DEFAULT_CONTROL_PERSIST,
+        hosts=DEFAULT_HOSTS,
+    ):
+        self.control_persist = control_persist
+        self.hosts = tuple(hosts)
+        self.control_dir: Optional[str] = None
+        self._previous_command: Optional[str] = None
+        self._base_command = "ssh"
+
+    @property
+    def active(self) -> bool:
+        """Whether multiplexing is currently enabled."""
+        return self.control_dir is not None
+
+    def ssh_options(self) -> List[str]:
+        """
+        Get the ssh options that attach to the shared connection.
+
+        Returns:
+            The options, or an empty list when multiplexing is not active.
+        """
+        if not self.active:
+            return []
+        # %C is a hash of the connection, which keeps the socket path short
+        control_path = os.path.join(self.control_dir, "%C")
+        return [
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPersist={self.control_persist}",
+            "-o",
+            f"ControlPath={control_path}",
+        ]
+
+    def ssh_command(self) -> str:
+        """Get the ssh command line git should use."""
+        return " ".join(
+            [self._base_command] + [shlex.quote(o) for o in self.ssh_options()]
+        )
+
+    def start(self) -> None:
+        """Create the control directory and point git at it."""
+        if self.active:
+            return
+        if not multiplexing_supported():
+            logger.debug("SSH multiplexing is not supported on this system")
+            return
+        # Sockets live in a short private path; long paths exceed the limit
+        # on Unix socket names
+        self.control_dir = tempfile.mkdtemp(prefix="ghrd-ssh-", dir="/tmp")
+        os.chmod(self.control_dir, 0o700)
+        self._previous_command = os.environ.get("GIT_SSH_COMMAND")
+        self._base_command = self._previous_command or "ssh"
+        os.environ["GIT_SSH_COMMAND"] = self.ssh_command()
+        logger.debug(f"SSH multiplexing through {self.control_dir}")
+
+    def stop(self) -> None:
+        """Close the master connections and restore the environment."""
+        if not self.active:
+            return
+        for host in self.hosts:
+            try:
+                subprocess.run(
+                    shlex.split(self._base_command)
+                    + self.ssh_options()
+                    + ["-O", "exit", host],
+                    capture_output=True,
+                    timeout=10,
+                )
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.debug(f"Could not close SSH master for {host}: {e}")
+        if self._previous_command is None:
+            os.environ.pop("GIT_SSH_COMMAND", None)
+        else:
+            os.environ["GIT_SSH_COMMAND"] = self._previous_command
+        shutil.rmtree(self.control_dir, ignore_errors=True)
+        self.control_dir = None
+
+    def __enter__(self) -> "SshMultiplexer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def ssh_command_args() -> List[str]:
+    """
+    Get the ssh command git would use, for running ssh directly.
+
+    Returns:
+        The command from ``GIT_SSH_COMMAND`` (including any multiplexing
+        options) split into arguments, or ``["ssh"]``.
+    """
+    return shlex.split(os.environ.get("GIT_SSH_COMMAND") or "ssh")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Submodule support for GitHub Repo Duplicator.
+
+Templates that use submodules are checked out recursively with parallel
+fetches. Submodules can optionally be seeded from the local mirror cache,
+and their URLs can be rewritten to point at duplicated copies.
+"""
+
+import logging
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from .git_backend import identity_args
+from .mirrors import MirrorError, ensure_mirror
+from .watchdog import run_with_deadline
+
+logger = logging.getLogger(__name__)
+
+# Number of submodules fetched at the same time by default
+DEFAULT_SUBMODULE_JOBS = 8
+
+
+class SubmoduleError(Exception):
+    """Raised when submodules cannot be checked out or rewritten."""
+
+
+@dataclass
+class Submodule:
+    """A submodule declared in ``.gitmodules``."""
+
+    name: str
+    path: str
+    url: str
+
+
+def _git(args: List[str], cwd: str) -> str:
+    """Run a git command and return its stripped output."""
+    try:
+        result = run_with_deadline(
+            ["git"] + args, cwd=cwd, check=True, capture_output=True, text=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise SubmoduleError((e.stderr or str(e)).strip()) from e
+    return result.stdout.strip()
+
+
+def list_submodules(repo_dir: str) -> List[Submodule]:
+    """
+    List the submodules declared in a working tree's ``.gitmodules``.
+
+    Args:
+        repo_dir: The working tree of the repository.
+
+    Returns:
+        The declared submodules, with relative URLs resolved against origin.
+    """
+    if not os.path.isfile(os.path.join(repo_dir, ".gitmodules")):
+        return []
+    pattern = r"^submodule\..*\.(path|url)$"
+    output = _git(["config", "-f", ".gitmodules", "--get-regexp", pattern], repo_dir)
+    entries: Dict[str, Dict[str, str]] = {}
+    for line in output.splitlines():
+        key, _, value = line.partition(" ")
+        name, _, field = key[len("submodule.") :].rpartition(".")
+        entries.setdefault(name, {})[field] = value
+
+    submodules = []
+    for name, entry in entries.items():
+        url = entry.get("url", "")
+        if url.startswith(("./", "../")):
+            url = _resolve_relative_url(repo_dir, url)
+        submodules.append(Submodule(name=name, path=entry.get("path", name), url=url))
+    return submodules
+
+
+def _resolve_relative_url(repo_dir: str, url: str) -> str:
+    """Resolve a relative submodule URL against the superproject's origin."""
+    base = _git(["remote", "get-url", "origin"], repo_dir).rstrip("/")
+    for part in url.split("/"):
+        if part == "..":
+            base = re.split(r"[/:](?=[^/:]*$)", base)[0]
+        elif part not in (".", ""):
+            base = f"{base}/{part}"
+    return base
+
+
+def update_submodules(
+    repo_dir: str,
+    jobs: int = DEFAULT_SUBMODULE_JOBS,
+    use_mirror_cache: bool = False,
+) -> List[Submodule]:
+    """
+    Check out all submodules of a working tree recursively and in parallel.
+
+    With ``use_mirror_cache`` every top-level submodule is first brought up to
+    date in the local mirror cache (concurrently) and checked out from there;
+    afterwards the submodules point at their real URLs again.
+
+    Args:
+        repo_dir: The working tree of the repository.
+        jobs: Maximum number of submodules fetched concurrently.
+        use_mirror_cache: Whether to seed submodules from the mirror cache.
+
+    Returns:
+        The top-level submodules that were checked out.
+
+    Raises:
+        SubmoduleError: If a submodule cannot be checked out.
+    """
+    submodules = list_submodules(repo_dir)
+    if not submodules:
+        return []
+
+    jobs = max(1, jobs)
+    _git(["submodule", "init"], repo_dir)
+    if use_mirror_cache:
+        try:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                mirrors = list(pool.map(lambda s: ensure_mirror(s.url), submodules))
+        except MirrorError as e:
+            raise SubmoduleError(f"Could not mirror submodule: {e}") from e
+
+        for submodule, mirror in zip(submodules, mirrors):
+            _git(["config", f"submodule.{submodule.name}.url", mirror], repo_dir)
+        try:
+            # Mirrors are local paths, which git only allows when asked to
+            update = ["-c", "protocol.file.allow=always", "submodule", "update"]
+            _git(update + ["--jobs", str(jobs)], repo_dir)
+        finally:
+            for submodule in submodules:
+                _git(
+                    ["config", f"submodule.{submodule.name}.url", submodule.url],
+                    repo_dir,
+                )
+        for submodule in submodules:
+            _git(
+                ["remote", "set-url", "origin", submodule.url],
+                os.path.join(repo_dir, submodule.path),
+            )
+
+    # Nested submodules resolve against the real URLs restored above
+    _git(
+        ["submodule", "update", "--init", "--recursive", "--jobs", str(jobs)], repo_dir
+    )
+    return submodules
+
+
+def github_owner_rewriter(owner: str) -> Callable[[str], Optional[str]]:
+    """
+    Build a URL rewriter that moves GitHub submodules to another owner.
+
+    Args:
+        owner: The user or organization holding the duplicated copies.
+
+    Returns:
+        A function mapping a submodule URL to its duplicate's URL, or to None
+        for URLs that are not on GitHub.
+    """
+
+    def rewrite(url: str) -> Optional[str]:
+        match = re.match(r"^(?:https://github\.com/|git@github\.com:)[^/]+/(.+)$", url)
+        if not match:
+            return None
+        name = match.group(1)
+        if not name.endswith(".git"):
+            name += ".git"
+        return f"https://github.com/{owner}/{name}"
+
+    return rewrite
+
+
+def rewrite_submodule_urls(
+    repo_dir: str, rewrite: Callable[[str], Optional[str]]
+) -> Dict[str, str]:
+    """
+    Point submodules at duplicated copies and commit the change.
+
+    Args:
+        repo_dir: The working tree of the repository.
+        rewrite: Maps a submodule URL to its new URL, or None to keep it.
+
+    Returns:
+        A mapping of submodule name to new URL for every rewritten submodule.
+
+    Raises:
+        SubmoduleError: If ``.gitmodules`` cannot be updated or committed.
+    """
+    changed = {}
+    for submodule in list_submodules(repo_dir):
+        new_url = rewrite(submodule.url)
+        if new_url and new_url != submodule.url:
+            _git(
+                [
+                    "config",
+                    "-f",
+                    ".gitmodules",
+                    f"submodule.{submodule.name}.url",
+                    new_url,
+                ],
+                repo_dir,
+            )
+            changed[submodule.name] = new_url
+    if changed:
+        _git(["submodule", "sync", "--recursive"], repo_dir)
+        _git(["add", ".gitmodules"], repo_dir)
+        _git(
+            identity_args(repo_dir)
+            + ["commit", "--quiet", "-m", "Point submodules at duplicated copies"],
+            repo_dir,
+        )
+        logger.info(f"Rewrote URLs of {len(changed)} submodules")
+    return changed
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Downstream template sync for GitHub Repo Duplicator.
+
+Every duplicate records the template commit it was created from in the ref
+``refs/duplicator/template-base``. Syncing fetches the template once (into
+the local mirror cache), then for each downstream repository applies only
+the changes the template made since that commit, either as a merge or as a
+patch, moves the recorded base forward and pushes both in one atomic push.
+Repositories are synced concurrently and conflicts are reported per
+repository without touching it.
+"""
+
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from .git_backend import identity_args
+from .github_api import GitHubApiError, repository_metadata
+from .metrics import time_phase
+from .mirrors import MirrorError, ensure_mirror
+from .registry import RegistryEntry, normalize_template_url, record_entry
+from .watchdog import Cancelled, DeadlineExceeded, deadline, run_with_deadline
+from .workspace import WorkspaceError, get_workspace_manager
+
+logger = logging.getLogger(__name__)
+
+# Ref in every duplicate holding the template commit it is based on
+TEMPLATE_BASE_REF = "refs/duplicator/template-base"
+
+# Number of downstream repositories synced at the same time by default
+DEFAULT_SYNC_JOBS = 4
+
+STRATEGIES = ("merge", "patch")
+
+
+class SyncError(Exception):
+    """Raised when a downstream repository cannot be synced."""
+
+
+@dataclass
+class SyncResult:
+    """Outcome of syncing a single downstream repository."""
+
+    target: str
+    remote_url: str = ""
+    status: str = "failed"
+    base: str = ""
+    template_sha: str = ""
+    commit: str = ""
+    conflicts: List[str] = field(default_factory=list)
+    error: str = ""
+    duration: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        """Whether the repository is now (or would be) in sync."""
+        return self.status in ("updated", "up-to-date", "would-update")
+
+
+def _git(
+    args: List[str],
+    cwd: Optional[str] = None,
+    input: Optional[str] = None,
+    strip: bool = True,
+):
+    """Run a git command and return its output, stripped unless told not to."""
+    try:
+        result = run_with_deadline(
+            ["git"] + args,
+            cwd=cwd,
+            input=input,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except subprocess.CalledProcessError as e:
+        raise SyncError((e.stderr or e.stdout or str(e)).strip()) from e
+    return result.stdout.strip() if strip else result.stdout
+
+
+def resolve_remote(target: str) -> str:
+    """
+    Get the git URL of a downstream repository.
+
+    Args:
+        target: A git URL, a local path, or an ``owner/name`` on GitHub.
+
+    Returns:
+        The URL to clone and push.
+
+    Raises:
+        SyncError: If a GitHub repository cannot be looked up.
+    """
+    if os.path.exists(target) or "://" in target or target.startswith("git@"):
+        return target
+    try:
+        return repository_metadata(target).ssh_url
+    except GitHubApiError as e:
+        raise SyncError(f"Could not look up {target}: {e}") from e
+
+
+def _conflicted_files(repo_dir: str) -> List[str]:
+    """List the paths with unresolved conflicts in a work tree."""
+    output = _git(["diff", "--name-only", "--diff-filter=U"], repo_dir)
+    return output.splitlines()
+
+
+def _apply_merge(repo_dir: str, template_sha: str, result: SyncResult) -> bool:
+    """Merge the template commit; returns False on conflicts."""
+    try:
+        _git(
+            identity_args(repo_dir)
+            + ["merge", "--no-edit", "-m", f"Sync with template {template_sha[:12]}"]
+            + [template_sha],
+            repo_dir,
+        )
+    except SyncError:
+        result.conflicts = _conflicted_files(repo_dir)
+        if not result.conflicts:
+            raise
+        _git(["merge", "--abort"], repo_dir)
+        return False
+    return True
+
+
+def _apply_patch(repo_dir: str, template_sha: str, result: SyncResult) -> bool:
+    """Apply the template's diff since the base; returns False on conflicts."""
+    # Stripping would cut trailing context lines off the last hunk
+    patch = _git(["diff", "--binary", result.base, template_sha], repo_dir, strip=False)
+    if not patch:
+        return True
+    try:
+        _git(["apply", "--3way", "--index", "-"], repo_dir, input=patch)
+    except SyncError as e:
+        result.conflicts = _conflicted_files(repo_dir) or [str(e)]
+        return False
+    _git(
+        identity_args(repo_dir)
+        + ["commit", "--quiet", "-m"]
+        + [f"Apply template changes {result.base[:12]}..{template_sha[:12]}"],
+        repo_dir,
+    )
+    return True
+
+
+def sync_repository(
+    template_dir: str,
+    template_sha: str,
+    target: str,
+    work_dir: str,
+    strategy: str = "merge",
+    base: Optional[str] = None,
+    dry_run: bool = False,
+) -> SyncResult:
+    """
+    Bring one downstream repository up to date with its template.
+
+    Args:
+        template_dir: A local repository holding the template's objects.
+        template_sha: The template commit to sync to.
+        target: The downstream repository (URL, path or ``owner/name``).
+        work_dir: An empty directory to clone the downstream repository into.
+        strategy: ``merge`` to merge the template commit, or ``patch`` to
+            apply the template's diff since the base as one commit.
+        base: The template commit the repository is based on; defaults to
+            the one recorded in the repository.
+        dry_run: Whether to stop before pushing.
+
+    Returns:
+        The result of the sync. Failures are reported, not raised.
+    """
+    result = SyncResult(target=target, template_sha=template_sha)
+    started = time.monotonic()
+    try:
+        result.remote_url = remote = resolve_remote(target)
+        repo_dir = os.path.join(work_dir, "repo")
+        # Borrow the template's objects so only downstream changes are fetched
+        _git(["clone", "--quiet", "--reference", template_dir, remote, repo_dir])
+        if base is None:
+            try:
+                _git(
+                    ["fetch", "--quiet", "origin"]
+                    + [f"+{TEMPLATE_BASE_REF}:{TEMPLATE_BASE_REF}"],
+                    repo_dir,
+                )
+            except SyncError:
+                raise SyncError(
+                    "no template base recorded; pass a base commit"
+                ) from None
+            base = TEMPLATE_BASE_REF
+        result.base = _git(["rev-parse", "--verify", f"{base}^{{commit}}"], repo_dir)
+        if result.base == template_sha:
+            result.status = "up-to-date"
+            return result
+
+        if strategy == "patch":
+            applied = _apply_patch(repo_dir, template_sha, result)
+        else:
+            applied = _apply_merge(repo_dir, template_sha, result)
+        if not applied:
+            result.status = "conflict"
+            return result
+        result.commit = _git(["rev-parse", "HEAD"], repo_dir)
+
+        if dry_run:
+            result.status = "would-update"
+            return result
+        branch = _git(["symbolic-ref", "--short", "HEAD"], repo_dir)
+        _git(
+            ["push", "--quiet", "--atomic", "origin", f"HEAD:refs/heads/{branch}"]
+            + [f"{template_sha}:{TEMPLATE_BASE_REF}"],
+            repo_dir,
+        )
+        result.status = "updated"
+    except (SyncError, DeadlineExceeded, Cancelled) as e:
+        result.error = str(e)
+    except Exception as e:
+        logger.exception(f"Unexpected error while syncing {target}")
+        result.error = str(e)
+    finally:
+        result.duration = time.monotonic() - started
+    return result
+
+
+def _record(template_url: str, commit_time: int, result: SyncResult) -> None:
+    """Add a finished sync to the local registry."""
+    record_entry(
+        RegistryEntry(
+            template_url=template_url,
+            repo_name=result.target,
+            repo_url=result.remote_url,
+            # A synced repository is now based on the template commit
+            outcome="success" if result.success else result.status,
+            kind="sync",
+            template_sha=result.template_sha,
+            template_commit_time=commit_time,
+            error=result.error or ", ".join(result.conflicts),
+            duration=result.duration,
+        )
+    )
+
+
+def sync_repositories(
+    template_url: str,
+    targets: List[str],
+    strategy: str = "merge",
+    max_workers: int = DEFAULT_SYNC_JOBS,
+    base: Optional[str] = None,
+    dry_run: bool = False,
+    on_result: Optional[Callable[[SyncResult], None]] = None,
+    workspace_root: Optional[str] = None,
+) -> List[SyncResult]:
+    """
+    Propagate template updates into many downstream repositories.
+
+    The template is fetched once into the mirror cache and shared by every
+    downstream clone; at most ``max_workers`` repositories are synced at a
+    time.
+
+    Args:
+        template_url: The URL of the template repository.
+        targets: The downstream repositories (URLs, paths or ``owner/name``).
+        strategy: ``merge`` or ``patch``.
+        max_workers: Maximum number of repositories synced concurrently.
+        base: Optional template commit to use as the base of every
+            repository instead of the recorded one.
+        dry_run: Whether to report what would change without pushing.
+        on_result: Optional callback invoked as each repository finishes.
+        workspace_root: Directory under which downstream repositories are
+            cloned; defaults to the configured workspace root.
+
+    Returns:
+        One result per target, in the order the targets were given.
+
+    Raises:
+        SyncError: If the strategy is unknown or the template cannot be
+            fetched.
+    """
+    if strategy not in STRATEGIES:
+        raise SyncError(f"Unknown sync strategy {strategy!r}")
+    targets = list(dict.fromkeys(targets))
+    try:
+        with deadline("clone"), time_phase("clone"):
+            key = normalize_template_url(template_url)
+            template_dir = ensure_mirror(key, fetch_url=template_url)
+    except (MirrorError, DeadlineExceeded, Cancelled) as e:
+        raise SyncError(f"Could not fetch template: {e}") from e
+    template_sha = _git(["rev-parse", "HEAD^{commit}"], template_dir)
+    commit_time = int(_git(["show", "-s", "--format=%ct", template_sha], template_dir))
+    logger.info(f"Syncing {len(targets)} repositories to {template_sha}")
+
+    workspaces = get_workspace_manager(workspace_root)
+
+    def sync_one(target: str) -> SyncResult:
+        try:
+            with workspaces.workspace("sync") as work_dir:
+                with deadline("sync"), time_phase("sync"):
+                    return sync_repository(
+                        template_dir,
+                        template_sha,
+                        target,
+                        work_dir,
+                        strategy,
+                        base,
+                        dry_run,
+                    )
+        except WorkspaceError as e:
+            return SyncResult(target=target, template_sha=template_sha, error=str(e))
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = [pool.submit(sync_one, target) for target in targets]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result.target] = result
+            if not dry_run:
+                _record(template_url, commit_time, result)
+            if on_result:
+                on_result(result)
+    return [results[target] for target in targets]
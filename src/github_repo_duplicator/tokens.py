@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+GitHub credential pool for GitHub Repo Duplicator.
+
+A single account caps how many API requests a batch can make per hour. With
+a token pool, every ``gh`` command and REST request is sent with one of
+several credentials (machine-user tokens, or GitHub App installation tokens
+minted by a command) instead of the GitHub CLI's own login. The target of
+each request decides which credentials may serve it: operations on
+``owner/name`` go through a credential that lists ``owner``, operations on
+the authenticated account's own repositories through the first credential,
+and lookups that touch no repository through any. Among the eligible ones
+the credential with the most remaining quota is picked.
+
+The pool is read from a JSON file (``--tokens`` or
+``GITHUB_REPO_DUPLICATOR_TOKENS``) holding a list of credentials::
+
+    [
+      {"name": "bot-a", "token_env": "BOT_A_TOKEN", "owners": ["org-a"]},
+      {"name": "app-b", "token_command": "mint-token org-b", "owners": ["org-b"]}
+    ]
+
+Each credential gives exactly one of ``token``, ``token_env`` or
+``token_command``.
+"""
+
+import json
+import logging
+import os
+import re
+import shlex
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Environment variable naming the credential pool file
+TOKENS_FILE_ENV = "GITHUB_REPO_DUPLICATOR_TOKENS"
+
+# Seconds a credential's quota is trusted before it is looked up again
+QUOTA_TTL = 60.0
+
+# Seconds a token printed by a token command is reused; installation
+# tokens are valid for an hour
+COMMAND_TOKEN_TTL = 3000.0
+
+# Seconds allowed for quota lookups and token commands
+CREDENTIAL_TIMEOUT = 30.0
+
+# Rate limit buckets
+CORE = "core"
+GRAPHQL = "graphql"
+
+# Own account of the authenticated credential, as opposed to any account
+OWN_ACCOUNT = ""
+
+# ``gh repo`` subcommands whose first argument names the repository
+_REPO_COMMANDS = ("create", "delete", "view", "edit", "clone", "rename", "archive")
+
+# REST paths naming an account
+_REST_OWNER = re.compile(r"^/?(?:repos|orgs|users)/([^/?]+)")
+
+# GraphQL fields naming an account
+_GRAPHQL_OWNER = re.compile(
+    r"(?:repository\(owner|organization\(login|user\(login):\s*\"([^\"]+)\""
+)
+
+
+class TokenError(Exception):
+    """Raised when the credential pool is invalid or a token is unavailable."""
+
+
+@dataclass
+class Quota:
+    """Remaining requests of one rate limit bucket of a credential."""
+
+    remaining: Optional[int] = None
+    limit: Optional[int] = None
+    reset: float = 0.0
+    checked: float = 0.0
+
+
+@dataclass
+class Credential:
+    """One token of the pool and the accounts it may act on."""
+
+    name: str
+    token: str = ""
+    token_env: str = ""
+    token_command: str = ""
+    owners: List[str] = field(default_factory=list)
+    quotas: Dict[str, Quota] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._minted = ""
+        self._minted_at = 0.0
+
+    def owns(self, owner: str) -> bool:
+        """Whether the credential may act on an account's repositories."""
+        return owner.lower() in (o.lower() for o in self.owners)
+
+    def get_token(self) -> str:
+        """
+        Get the token, running the token command if its last token is old.
+
+        Raises:
+            TokenError: If the token is not available.
+        """
+        if self.token:
+            return self.token
+        if self.token_env:
+            token = os.environ.get(self.token_env, "")
+            if not token:
+                raise TokenError(f"{self.token_env} is not set for {self.name}")
+            return token
+        with self._lock:
+            if self._minted and time.time() - self._minted_at < COMMAND_TOKEN_TTL:
+                return self._minted
+            try:
+                result = subprocess.run(
+                    shlex.split(self.token_command),
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    timeout=CREDENTIAL_TIMEOUT,
+                )
+            except (OSError, subprocess.SubprocessError) as e:
+                raise TokenError(f"Token command of {self.name} failed: {e}") from e
+            self._minted, self._minted_at = result.stdout.strip(), time.time()
+            return self._minted
+
+    def quota(self, bucket: str) -> Quota:
+        """Get the quota of a rate limit bucket."""
+        return self.quotas.setdefault(bucket, Quota())
+
+    def observe(
+        self,
+        bucket: str,
+        remaining: Optional[str],
+        reset: Optional[str],
+        limit: Optional[str] = None,
+    ) -> None:
+        """Update a quota from ``X-RateLimit-*`` response headers."""
+        if remaining is None or not remaining.isdigit():
+            return
+        with self._lock:
+            quota = self.quota(bucket)
+            quota.remaining = int(remaining)
+            quota.reset = float(reset or 0)
+            if limit and limit.isdigit():
+                quota.limit = int(limit)
+            quota.checked = time.time()
+
+
+def target_owner(args) -> Optional[str]:
+    """
+    Work out which account a ``gh`` command acts on.
+
+    Returns:
+        The owner named by the command, ``OWN_ACCOUNT`` for the
+        authenticated account, or None if any credential may run it.
+    """
+    args = [str(arg) for arg in args]
+    rest = args[1:]
+    if rest[:1] == ["auth"]:
+        return OWN_ACCOUNT
+    if rest[:1] == ["repo"] and len(rest) > 2 and rest[1] in _REPO_COMMANDS:
+        owner, sep, _ = rest[2].rpartition("/")
+        return owner if sep else OWN_ACCOUNT
+    if rest[:1] == ["api"]:
+        for arg in rest[1:]:
+            match = _REST_OWNER.match(arg)
+            if match:
+                return match.group(1)
+            if arg.startswith("query="):
+                if "viewer" in arg:
+                    return OWN_ACCOUNT
+                match = _GRAPHQL_OWNER.search(arg)
+                return match.group(1) if match else None
+    return None
+
+
+def _is_gh(args) -> bool:
+    """Whether a command runs the GitHub CLI."""
+    if isinstance(args, str) or not args:
+        return False
+    return os.path.basename(str(args[0])) in ("gh", "gh.exe")
+
+
+class TokenPool:
+    """Spreads GitHub requests across credentials by owner and quota."""
+
+    def __init__(self, credentials: List[Credential]):
+        if not credentials:
+            raise TokenError("The token pool has no credentials")
+        self.credentials = credentials
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> Credential:
+        """The credential acting on the authenticated account's own repositories."""
+        return self.credentials[0]
+
+    def refresh_quota(self, credential: Credential) -> None:
+        """Look up the remaining quota of a credential; the lookup is free."""
+        env = dict(os.environ, GH_TOKEN=credential.get_token())
+        try:
+            result = subprocess.run(
+                ["gh", "api", "rate_limit"],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=CREDENTIAL_TIMEOUT,
+            )
+            resources = json.loads(result.stdout)["resources"]
+        except (OSError, subprocess.SubprocessError, ValueError, KeyError) as e:
+            logger.warning(f"Could not look up the quota of {credential.name}: {e}")
+            # Do not ask again for every request
+            for bucket in (CORE, GRAPHQL):
+                credential.quota(bucket).checked = time.time()
+            return
+        for bucket in (CORE, GRAPHQL):
+            data = resources.get(bucket) or {}
+            credential.observe(
+                bucket,
+                str(data.get("remaining", "")),
+                str(data.get("reset", 0)),
+                str(data.get("limit", "")),
+            )
+
+    def eligible(self, owner: Optional[str]) -> List[Credential]:
+        """List the credentials that may act on an account."""
+        if owner is None:
+            return list(self.credentials)
+        if owner == OWN_ACCOUNT:
+            return [self.primary]
+        owning = [c for c in self.credentials if c.owns(owner)]
+        if not owning:
+            logger.debug(f"No credential lists {owner}; using {self.primary.name}")
+        return owning or [self.primary]
+
+    def choose(self, owner: Optional[str] = None, bucket: str = CORE) -> Credential:
+        """
+        Pick the credential for a request, counting the request against it.
+
+        Args:
+            owner: The account the request acts on, ``OWN_ACCOUNT``, or None
+                for any.
+            bucket: The rate limit bucket the request draws from.
+
+        Returns:
+            The eligible credential with the most remaining quota; if all
+            are exhausted, the one whose quota resets first.
+        """
+        candidates = self.eligible(owner)
+        now = time.time()
+        for credential in candidates:
+            quota = credential.quota(bucket)
+            if now - quota.checked > QUOTA_TTL or (
+                quota.remaining == 0 and now > quota.reset
+            ):
+                self.refresh_quota(credential)
+        with self._lock:
+            available = [
+                c for c in candidates if c.quota(bucket).remaining != 0
+            ] or sorted(candidates, key=lambda c: c.quota(bucket).reset)[:1]
+            chosen = max(
+                available,
+                key=lambda c: (
+                    c.quota(bucket).remaining
+                    if c.quota(bucket).remaining is not None
+                    else -1
+                ),
+            )
+            quota = chosen.quota(bucket)
+            if quota.remaining == 0:
+                logger.warning(
+                    f"Every credential for {owner or 'this request'} is out of "
+                    f"{bucket} quota; {chosen.name} resets first"
+                )
+            elif quota.remaining is not None:
+                quota.remaining -= 1
+        return chosen
+
+    def route(self, args) -> Credential:
+        """Pick the credential for a ``gh`` command."""
+        bucket = GRAPHQL if "graphql" in [str(arg) for arg in args[:3]] else CORE
+        return self.choose(target_owner(args), bucket)
+
+
+_pool: Optional[TokenPool] = None
+_pool_loaded = False
+_pool_lock = threading.Lock()
+
+
+def load_tokens(path: str) -> TokenPool:
+    """
+    Read a credential pool from a JSON file.
+
+    Raises:
+        TokenError: If the file cannot be read or a credential is invalid.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise TokenError(f"Could not read tokens from {path}: {e}") from e
+    if not isinstance(data, list):
+        raise TokenError(f"Tokens in {path} must be a JSON list")
+    credentials = []
+    for i, item in enumerate(data, 1):
+        if not isinstance(item, dict):
+            raise TokenError(f"Credential {i} in {path} must be a JSON object")
+        sources = [k for k in ("token", "token_env", "token_command") if item.get(k)]
+        if len(sources) != 1:
+            raise TokenError(
+                f"Credential {i} in {path} needs exactly one of token, "
+                "token_env or token_command"
+            )
+        credentials.append(
+            Credential(
+                name=str(item.get("name") or f"token-{i}"),
+                token=item.get("token", ""),
+                token_env=item.get("token_env", ""),
+                token_command=item.get("token_command", ""),
+                owners=[str(owner) for owner in item.get("owners", [])],
+            )
+        )
+    return TokenPool(credentials)
+
+
+def set_pool(pool: Optional[TokenPool]) -> None:
+    """Use a credential pool for the rest of the process, or none."""
+    global _pool, _pool_loaded
+    with _pool_lock:
+        _pool, _pool_loaded = pool, True
+
+
+def get_pool() -> Optional[TokenPool]:
+    """Get the credential pool, reading it from the environment once."""
+    global _pool, _pool_loaded
+    with _pool_lock:
+        if not _pool_loaded:
+            _pool_loaded = True
+            path = os.environ.get(TOKENS_FILE_ENV)
+            if path:
+                try:
+                    _pool = load_tokens(path)
+                except TokenError as e:
+                    logger.warning(f"Ignoring {TOKENS_FILE_ENV}: {e}")
+        return _pool
+
+
+def gh_env(args, env: Optional[Dict[str, str]] = None) -> Optional[Dict[str, str]]:
+    """
+    Get the environment to run a command with its pool credential.
+
+    Args:
+        args: The command.
+        env: The environment the command would otherwise get.
+
+    Returns:
+        The environment with ``GH_TOKEN`` set, or None if the command is not
+        a ``gh`` command or there is no pool.
+    """
+    pool = get_pool() if _is_gh(args) else None
+    if pool is None:
+        return None
+    credential = pool.route(args)
+    try:
+        token = credential.get_token()
+    except TokenError as e:
+        logger.warning(str(e))
+        return None
+    return dict(os.environ if env is None else env, GH_TOKEN=token)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Post-push verification for GitHub Repo Duplicator.
+
+Instead of cloning a new repository again to prove it is complete, the refs
+the push was meant to create are compared with what the destination
+advertises, which costs a single ``ls-remote`` round trip and no object
+transfer. Optionally the tree at the tip of the default branch is also
+compared through the GitHub API, confirming that GitHub resolves the pushed
+commit to the same content.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .git_backend import GitBackend, GitError, expand_refspecs, get_backend
+from .github_api import GitHubApiError, branch_tree
+
+logger = logging.getLogger(__name__)
+
+# Mismatched refs named in a summary before the rest are only counted
+SUMMARY_REFS = 3
+
+
+@dataclass
+class RefMismatch:
+    """A pushed ref the destination does not have, or has elsewhere."""
+
+    ref: str
+    expected: str
+    actual: str = ""
+
+
+@dataclass
+class VerificationResult:
+    """Outcome of comparing pushed refs with a destination."""
+
+    remote: str
+    refs_checked: int = 0
+    mismatches: List[RefMismatch] = field(default_factory=list)
+    branch: str = ""
+    tree_sha: str = ""
+    remote_tree_sha: str = ""
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        """Whether every ref, and the tree if checked, matched."""
+        return (
+            not self.error
+            and not self.mismatches
+            and self.tree_sha == self.remote_tree_sha
+        )
+
+    def summary(self) -> str:
+        """Describe the outcome in one line."""
+        if self.error:
+            return f"verification failed: {self.error}"
+        if self.mismatches:
+            names = ", ".join(
+                f"{m.ref} ({'missing' if not m.actual else 'differs'})"
+                for m in self.mismatches[:SUMMARY_REFS]
+            )
+            more = len(self.mismatches) - SUMMARY_REFS
+            if more > 0:
+                names += f" and {more} more"
+            return f"{len(self.mismatches)} of {self.refs_checked} refs differ: {names}"
+        if self.tree_sha != self.remote_tree_sha:
+            return (
+                f"tree of {self.branch} differs: {self.remote_tree_sha or 'missing'} "
+                f"instead of {self.tree_sha}"
+            )
+        tree = f", tree of {self.branch} matches" if self.tree_sha else ""
+        return f"{self.refs_checked} refs match{tree}"
+
+
+def pushed_refs(
+    repo_dir: str, refspecs: List[str], backend: Optional[GitBackend] = None
+) -> Dict[str, str]:
+    """
+    Work out which refs a push creates on the remote, and their objects.
+
+    Args:
+        repo_dir: The local repository that was pushed.
+        refspecs: The refspecs it was pushed with.
+        backend: The git backend to use; defaults to the configured one.
+
+    Returns:
+        A mapping of remote ref names to the objects they should point at.
+
+    Raises:
+        GitError: If the local refs cannot be listed.
+    """
+    local = (backend or get_backend()).list_refs(repo_dir)
+    expected = {}
+    for spec in expand_refspecs(list(local), refspecs):
+        source, _, target = spec.lstrip("+").partition(":")
+        if source in local:
+            expected[target] = local[source]
+    return expected
+
+
+def verify_push(
+    repo_dir: str,
+    remote_url: str,
+    refspecs: List[str],
+    backend: Optional[GitBackend] = None,
+    github_repo: Optional[str] = None,
+    branch: Optional[str] = None,
+) -> VerificationResult:
+    """
+    Check that a remote has every ref a push was meant to create.
+
+    Never raises: failures to list refs are reported in the result.
+
+    Args:
+        repo_dir: The local repository that was pushed.
+        remote_url: The URL the repository was pushed to.
+        refspecs: The refspecs it was pushed with.
+        backend: The git backend to use; defaults to the configured one.
+        github_repo: If given with ``branch``, the ``owner/name`` of the
+            GitHub repository whose branch tree is compared as well.
+        branch: The branch whose tree is compared.
+
+    Returns:
+        The outcome of the comparison.
+    """
+    backend = backend or get_backend()
+    result = VerificationResult(remote=remote_url)
+    try:
+        expected = pushed_refs(repo_dir, refspecs, backend)
+        actual = backend.ls_remote(remote_url)
+        if github_repo and branch:
+            result.branch = branch
+            result.tree_sha = backend.tree_sha(repo_dir, f"refs/heads/{branch}")
+            result.remote_tree_sha = branch_tree(github_repo, branch) or ""
+    except (GitError, GitHubApiError) as e:
+        result.error = str(e)
+        logger.warning(f"Could not verify the push to {remote_url}: {e}")
+        return result
+    result.refs_checked = len(expected)
+    for ref, sha in sorted(expected.items()):
+        if actual.get(ref) != sha:
+            result.mismatches.append(RefMismatch(ref, sha, actual.get(ref, "")))
+    if not result.ok:
+        logger.warning(f"Push to {remote_url} is incomplete: {result.summary()}")
+    return result
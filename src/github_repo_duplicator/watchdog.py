@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Per-phase deadlines for GitHub Repo Duplicator.
+
+Every phase of a job (clone, create, push, ...) runs under a deadline, and
+every external command started inside it (git, gh, ssh) runs in its own
+process group under the time left. When a deadline expires, or the run is
+interrupted or shut down, the whole process group is terminated, so a hung
+``git push`` or a ``gh auth login`` waiting on a browser cannot take a
+worker, or the helpers it started, down with it.
+"""
+
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .governor import SlotTimeout, command_kind, slot
+from .tokens import gh_env
+
+logger = logging.getLogger(__name__)
+
+# Environment variable with deadline overrides, e.g. "push=600,clone=900"
+DEADLINES_ENV = "GITHUB_REPO_DUPLICATOR_DEADLINES"
+
+# Default deadline of each phase in seconds; "command" applies to commands
+# run outside of any phase
+DEFAULT_DEADLINES: Dict[str, float] = {
+    "auth": 300,
+    "ssh_check": 30,
+    "precheck": 120,
+    "clone": 1800,
+    "submodules": 1800,
+    "create": 120,
+    "lookup": 120,
+    "push": 1800,
+    "verify": 300,
+    "lfs": 3600,
+    "clone_back": 1800,
+    "sync": 1800,
+    "maintenance": 1800,
+    "prewarm": 1800,
+    "bundle": 1800,
+    "rollback": 120,
+    "command": 600,
+}
+
+# How long a terminated process group gets to exit before it is killed
+KILL_GRACE_SECONDS = 5.0
+
+
+class DeadlineExceeded(subprocess.TimeoutExpired):
+    """Raised when a phase runs past its deadline."""
+
+    def __init__(self, phase: str, timeout: float, cmd=None):
+        super().__init__(cmd, timeout)
+        self.phase = phase
+
+    def __str__(self) -> str:
+        return f"{self.phase} did not finish within {self.timeout:g}s"
+
+
+class Cancelled(Exception):
+    """Raised when a command is started after the run was cancelled."""
+
+
+_overrides: Dict[str, float] = {}
+_local = threading.local()
+# Running commands, and whether each leads its own process group
+_processes: Dict[subprocess.Popen, bool] = {}
+_processes_lock = threading.Lock()
+_cancelled = threading.Event()
+
+
+def parse_deadlines(spec: str) -> Dict[str, float]:
+    """
+    Parse deadline overrides such as ``push=600,clone=900``.
+
+    A deadline of 0 disables the deadline of that phase.
+
+    Raises:
+        ValueError: If an entry is malformed.
+    """
+    deadlines = {}
+    for item in spec.replace(" ", "").split(","):
+        if not item:
+            continue
+        phase, sep, seconds = item.partition("=")
+        if not sep or not phase:
+            raise ValueError(f"Expected PHASE=SECONDS, got {item!r}")
+        deadlines[phase] = float(seconds)
+    return deadlines
+
+
+def set_deadlines(deadlines: Dict[str, float]) -> None:
+    """Override phase deadlines for the rest of the process."""
+    _overrides.update(deadlines)
+
+
+def phase_deadline(phase: str) -> Optional[float]:
+    """
+    Get the configured deadline of a phase.
+
+    Returns:
+        The deadline in seconds, or None if the phase has no deadline.
+    """
+    deadlines = dict(DEFAULT_DEADLINES)
+    spec = os.environ.get(DEADLINES_ENV)
+    if spec:
+        try:
+            deadlines.update(parse_deadlines(spec))
+        except ValueError as e:
+            logger.warning(f"Ignoring invalid {DEADLINES_ENV}: {e}")
+    deadlines.update(_overrides)
+    seconds = deadlines.get(phase, deadlines["command"])
+    return seconds if seconds and seconds > 0 else None
+
+
+def _stack() -> List[Tuple[str, Optional[float], Optional[float]]]:
+    """Get this thread's stack of (phase, deadline, expiry time)."""
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+@contextmanager
+def deadline(phase: str, seconds: Optional[float] = None) -> Iterator[None]:
+    """
+    Run a phase under a deadline.
+
+    Commands started by ``run_with_deadline`` inside the block are killed
+    when the deadline expires. Nested deadlines never outlive the enclosing
+    one.
+
+    Args:
+        phase: The name of the phase.
+        seconds: The deadline; defaults to the configured one of the phase.
+    """
+    if seconds is None:
+        seconds = phase_deadline(phase)
+    stack = _stack()
+    expires = time.monotonic() + seconds if seconds else None
+    if stack and stack[-1][2] is not None:
+        outer = stack[-1]
+        if expires is None or outer[2] < expires:
+            phase, seconds, expires = outer
+    stack.append((phase, seconds, expires))
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def time_left() -> Tuple[str, Optional[float], Optional[float]]:
+    """
+    Get the current phase, its deadline and the time left in it.
+
+    Outside of any phase the ``command`` deadline applies to each command.
+    """
+    stack = _stack()
+    if not stack:
+        seconds = phase_deadline("command")
+        return "command", seconds, seconds
+    phase, seconds, expires = stack[-1]
+    if expires is None:
+        return phase, None, None
+    return phase, seconds, expires - time.monotonic()
+
+
+def kill_process_group(process: subprocess.Popen, group: bool = True) -> None:
+    """Terminate a process and everything it started, then reap it."""
+    if os.name != "posix" or not group:
+        process.kill()
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                process.wait(KILL_GRACE_SECONDS)
+            except subprocess.TimeoutExpired:
+                pass
+            # Helpers such as ssh may outlive the leader; finish the group
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    process.wait()
+    for stream in (process.stdin, process.stdout, process.stderr):
+        if stream:
+            stream.close()
+
+
+def run_with_deadline(
+    args,
+    check: bool = False,
+    input=None,
+    capture_output: bool = False,
+    interactive: bool = False,
+    **kwargs,
+) -> subprocess.CompletedProcess:
+    """
+    Run a command like ``subprocess.run`` under the current deadline.
+
+    The command runs in its own process group, which is terminated when the
+    deadline expires or the caller is interrupted. Interactive commands stay
+    in the terminal's process group so they can prompt (and receive Ctrl-C
+    themselves); only the command is killed when they expire. Git clones,
+    pushes and pack operations first wait for a host-wide slot; the wait
+    counts against the deadline. ``gh`` commands get the token the
+    credential pool routes them to, if there is a pool.
+
+    Args:
+        args: The command, as for ``subprocess.run``.
+        check: Whether to raise on a non-zero exit status.
+        input: Data to send to the command's standard input.
+        capture_output: Whether to capture standard output and error.
+        interactive: Whether the command talks to the terminal.
+        kwargs: Other ``subprocess.Popen`` arguments.
+
+    Returns:
+        The completed process.
+
+    Raises:
+        DeadlineExceeded: If the deadline expired.
+        Cancelled: If the run has been cancelled.
+        subprocess.CalledProcessError: If ``check`` is set and it failed.
+    """
+    if _cancelled.is_set():
+        raise Cancelled("Operation cancelled")
+    phase, seconds, remaining = time_left()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded(phase, seconds, args)
+    env = gh_env(args, kwargs.get("env"))
+    if env is not None:
+        kwargs["env"] = env
+    try:
+        with slot(command_kind(args), remaining, _cancelled):
+            return _run_process(args, check, input, capture_output, interactive, kwargs)
+    except SlotTimeout:
+        if _cancelled.is_set():
+            raise Cancelled("Operation cancelled") from None
+        raise DeadlineExceeded(phase, seconds, args) from None
+
+
+def _run_process(
+    args, check: bool, input, capture_output: bool, interactive: bool, kwargs
+) -> subprocess.CompletedProcess:
+    """Run a command for ``run_with_deadline`` in the time left."""
+    phase, seconds, remaining = time_left()
+    if _cancelled.is_set():
+        raise Cancelled("Operation cancelled")
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded(phase, seconds, args)
+    if capture_output:
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+
+    group = os.name == "posix" and not interactive
+    process = subprocess.Popen(args, start_new_session=group, **kwargs)
+    with _processes_lock:
+        _processes[process] = group
+    try:
+        stdout, stderr = process.communicate(input, timeout=remaining)
+    except subprocess.TimeoutExpired:
+        logger.warning(f"Killing {phase} command after {seconds:g}s: {args}")
+        kill_process_group(process, group)
+        raise DeadlineExceeded(phase, seconds, args) from None
+    except BaseException:
+        kill_process_group(process, group)
+        raise
+    finally:
+        with _processes_lock:
+            _processes.pop(process, None)
+
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, args, stdout, stderr)
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+
+def cancel_all() -> None:
+    """
+    Terminate every running command and refuse to start new ones.
+
+    Used on interrupt and shutdown so worker threads stop promptly.
+    """
+    _cancelled.set()
+    with _processes_lock:
+        processes = list(_processes.items())
+    for process, group in processes:
+        try:
+            if group:
+                os.killpg(process.pid, signal.SIGTERM)
+            else:
+                process.terminate()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def reset_cancellation() -> None:
+    """Allow commands to start again after ``cancel_all``."""
+    _cancelled.clear()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Workspaces for GitHub Repo Duplicator.
+
+Every duplication clones into its own collision-free directory under a
+workspace root, so concurrent runs on the same template never share or
+delete each other's work trees. The root defaults to the system temporary
+directory and can be pointed at a faster disk such as a tmpfs with
+``--workspace-root`` or the ``GITHUB_REPO_DUPLICATOR_WORKSPACE`` environment
+variable.
+
+Free space is checked against the template's size before cloning, released
+directories are emptied and kept for reuse, and work trees are removed when
+the process exits or is terminated.
+"""
+
+import atexit
+import functools
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set
+
+from .cache import repo_basename
+from .mirrors import mirror_path
+from .registry import normalize_template_url
+from .watchdog import cancel_all, deadline, run_with_deadline
+
+logger = logging.getLogger(__name__)
+
+# Environment variable overriding the workspace root
+WORKSPACE_ROOT_ENV = "GITHUB_REPO_DUPLICATOR_WORKSPACE"
+
+# A clone needs room for the packed objects plus the checked-out files
+SPACE_FACTOR = 3
+
+# Free space always kept on the workspace disk
+MIN_FREE_BYTES = 256 * 1024 * 1024
+
+# Emptied directories kept for reuse per workspace root
+MAX_FREE_DIRS = 16
+
+_FREE_DIR = ".free"
+
+_active: Set[str] = set()
+_active_lock = threading.Lock()
+_managers: Dict[str, "WorkspaceManager"] = {}
+_managers_lock = threading.Lock()
+
+
+class WorkspaceError(Exception):
+    """Raised when a workspace cannot be created, e.g. for lack of space."""
+
+
+def default_workspace_root() -> str:
+    """Get the workspace root from the environment or the temp directory."""
+    return os.environ.get(WORKSPACE_ROOT_ENV) or os.path.join(
+        tempfile.gettempdir(), "github_repo_duplicator"
+    )
+
+
+def directory_size(path: str) -> int:
+    """Get the total size in bytes of the files below a directory."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def estimate_template_size(source: str) -> Optional[int]:
+    """
+    Estimate the on-disk size of a template repository.
+
+    Local repositories and bundles are measured directly, cached mirrors are
+    used when present, and GitHub repositories are looked up through GitHub
+    CLI.
+
+    Args:
+        source: The template URL, local path or bundle path.
+
+    Returns:
+        The estimated size in bytes, or None if it cannot be determined.
+    """
+    if os.path.isfile(source):
+        return os.path.getsize(source)
+    if os.path.isdir(source):
+        return directory_size(source)
+    mirror = mirror_path(normalize_template_url(source))
+    if os.path.isdir(mirror):
+        return directory_size(mirror)
+    if "github.com" in source:
+        owner = os.path.basename(os.path.dirname(source.replace(":", "/")))
+        return _github_repo_size(owner, repo_basename(source))
+    return None
+
+
+@functools.lru_cache(maxsize=256)
+def _github_repo_size(owner: str, name: str) -> Optional[int]:
+    """Look up a GitHub repository's size once per process."""
+    try:
+        with deadline("lookup", 30):
+            result = run_with_deadline(
+                ["gh", "api", f"repos/{owner}/{name}", "-q", ".size"],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        return int(result.stdout.strip()) * 1024
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+def check_free_space(root: str, required_bytes: int) -> None:
+    """
+    Make sure a workspace root has room for a clone.
+
+    Args:
+        root: The workspace root.
+        required_bytes: The space the clone needs.
+
+    Raises:
+        WorkspaceError: If the disk does not have enough free space.
+    """
+    free = shutil.disk_usage(root).free
+    if free - required_bytes < MIN_FREE_BYTES:
+        raise WorkspaceError(
+            f"Not enough free space in {root}: {required_bytes // 2**20} MiB "
+            f"needed, {free // 2**20} MiB free"
+        )
+
+
+def _empty_directory(path: str) -> None:
+    """Remove everything inside a directory, keeping the directory itself."""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+
+
+def _pid_alive(pid: int) -> bool:
+    """Check whether a process is still running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkspaceManager:
+    """Hands out unique work directories below a workspace root."""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.abspath(root or default_workspace_root())
+        self.free_dir = os.path.join(self.root, _FREE_DIR)
+        os.makedirs(self.free_dir, exist_ok=True)
+
+    def _new_path(self, name: str) -> str:
+        """Build a unique path; the pid lets stale directories be found."""
+        return os.path.join(self.root, f"{name}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+
+    def acquire(self, name: str, required_bytes: int = 0) -> str:
+        """
+        Create an empty work directory.
+
+        Args:
+            name: A readable name included in the directory name.
+            required_bytes: The space the work needs; checked before creating.
+
+        Returns:
+            The absolute path of the new, empty directory.
+
+        Raises:
+            WorkspaceError: If there is not enough free space or the directory
+                cannot be created.
+        """
+        check_free_space(self.root, required_bytes)
+        path = self._new_path(name)
+        try:
+            # Renaming is atomic, so concurrent processes never share a
+            # reused directory
+            for free in os.listdir(self.free_dir):
+                try:
+                    os.rename(os.path.join(self.free_dir, free), path)
+                    break
+                except OSError:
+                    continue
+            else:
+                os.mkdir(path)
+        except OSError as e:
+            raise WorkspaceError(
+                f"Could not create a workspace in {self.root}: {e}"
+            ) from e
+        with _active_lock:
+            _active.add(path)
+        logger.debug(f"Acquired workspace {path}")
+        return path
+
+    def release(self, path: str) -> None:
+        """
+        Empty a work directory and keep it for reuse.
+
+        Args:
+            path: A directory returned by ``acquire``.
+        """
+        with _active_lock:
+            _active.discard(path)
+        if not os.path.isdir(path):
+            return
+        _empty_directory(path)
+        try:
+            reusable = not os.listdir(path)
+            if reusable and len(os.listdir(self.free_dir)) < MAX_FREE_DIRS:
+                os.rename(path, os.path.join(self.free_dir, uuid.uuid4().hex))
+                return
+        except OSError:
+            pass
+        shutil.rmtree(path, ignore_errors=True)
+
+    @contextmanager
+    def workspace(self, name: str, required_bytes: int = 0) -> Iterator[str]:
+        """Acquire a work directory for the duration of a ``with`` block."""
+        path = self.acquire(name, required_bytes)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def reap_stale(self) -> int:
+        """
+        Remove work directories left behind by processes that have died.
+
+        Returns:
+            The number of directories removed.
+        """
+        removed = 0
+        for entry in os.listdir(self.root):
+            parts = entry.rsplit("-", 2)
+            if len(parts) != 3 or not parts[1].isdigit():
+                continue
+            if not _pid_alive(int(parts[1])):
+                shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+                removed += 1
+        return removed
+
+
+def get_workspace_manager(root: Optional[str] = None) -> WorkspaceManager:
+    """
+    Get the shared workspace manager for a root.
+
+    Args:
+        root: The workspace root; defaults to the configured one.
+
+    Returns:
+        The manager, created (and cleared of stale directories) on first use.
+    """
+    root = os.path.abspath(root or default_workspace_root())
+    with _managers_lock:
+        if root not in _managers:
+            manager = WorkspaceManager(root)
+            reaped = manager.reap_stale()
+            if reaped:
+                logger.info(f"Removed {reaped} stale workspaces from {root}")
+            _managers[root] = manager
+        return _managers[root]
+
+
+def cleanup_active_workspaces() -> None:
+    """Remove every work directory this process still holds."""
+    with _active_lock:
+        paths = list(_active)
+        _active.clear()
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _exit_on_signal(signum, frame):
+    """Turn a termination signal into SystemExit so cleanup code runs."""
+    cancel_all()
+    raise SystemExit(128 + signum)
+
+
+def _interrupt(signum, frame):
+    """Stop every running command before raising KeyboardInterrupt."""
+    cancel_all()
+    raise KeyboardInterrupt
+
+
+def install_signal_handlers() -> None:
+    """
+    Remove work directories when the process is terminated.
+
+    SIGTERM and SIGHUP are turned into ``SystemExit`` so ``finally`` blocks
+    and context managers run, and any directory still held at exit is
+    removed. On these signals and on Ctrl-C, every running command is
+    terminated first, since commands run in their own process groups and
+    worker threads would otherwise keep waiting on them. Must be called from
+    the main thread.
+    """
+    atexit.register(cleanup_active_workspaces)
+    for name in ("SIGTERM", "SIGHUP"):
+        signum = getattr(signal, name, None)
+        if signum is not None and signal.getsignal(signum) == signal.SIG_DFL:
+            signal.signal(signum, _exit_on_signal)
+    if signal.getsignal(signal.SIGINT) is signal.default_int_handler:
+        signal.signal(signal.SIGINT, _interrupt)
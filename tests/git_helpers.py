@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Helpers for building local git repositories in tests.
+"""
+
+import os
+import subprocess
+from unittest.mock import patch
+
+# Identity for commits made by the code under test
+GIT_IDENTITY = {
+    "GIT_AUTHOR_NAME": "Test",
+    "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_COMMITTER_NAME": "Test",
+    "GIT_COMMITTER_EMAIL": "test@example.com",
+}
+
+
+def without_identity():
+    """Patch the environment so git has no commit identity configured."""
+    env = {k: v for k, v in os.environ.items() if k not in GIT_IDENTITY}
+    env.update(GIT_CONFIG_GLOBAL=os.devnull, GIT_CONFIG_NOSYSTEM="1", EMAIL="")
+    return patch.dict(os.environ, env, clear=True)
+
+
+def git(*args, cwd=None):
+    """Run a git command for test setup and return its stripped output."""
+    result = subprocess.run(
+        ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com"]
+        + list(args),
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.strip()
+
+
+def make_repo(path, files=None, tag=None):
+    """
+    Create a repository on branch ``main`` with a single commit.
+
+    Args:
+        path: Where to create the repository.
+        files: Optional mapping of file name to content for the commit.
+        tag: Optional tag to create on the commit.
+
+    Returns:
+        The SHA of the commit.
+    """
+    git("init", "--quiet", "-b", "main", path)
+    for name, content in (files or {"README.md": "template\n"}).items():
+        full_path = os.path.join(path, name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(content)
+    git("add", "--all", cwd=path)
+    git("commit", "--quiet", "-m", "Initial commit", cwd=path)
+    if tag:
+        git("tag", tag, cwd=path)
+    return git("rev-parse", "HEAD", cwd=path)
+
+
+def make_bare(path):
+    """Create an empty bare repository and return its path."""
+    git("init", "--quiet", "--bare", path)
+    return path
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Tests for the programmatic Duplicator API.
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import (
+    api,
+    github_api,
+    mirrors,
+    precheck,
+    rollback,
+    settings,
+)
+from src.github_repo_duplicator.cache import CACHE_DIR_ENV
+from src.github_repo_duplicator.registry import REGISTRY_PATH_ENV, get_registry
+from src.github_repo_duplicator.sync import TEMPLATE_BASE_REF
+from tests.git_helpers import git, make_bare, make_repo
+
+REAL_RUN = api._run
+
+
+class TestDuplicator(unittest.TestCase):
+    """Test cases for duplicating through the Duplicator class."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.template = os.path.join(self.tmp, "template")
+        self.head = make_repo(self.template)
+        self.work_dir = os.path.join(self.tmp, "work")
+        os.makedirs(self.work_dir)
+        self.remotes = os.path.join(self.tmp, "remotes")
+        self.fail_create = False
+        self.existing = set()
+        self.gh_calls = []
+        env = patch.dict(
+            os.environ, {REGISTRY_PATH_ENV: os.path.join(self.tmp, "registry.db")}
+        )
+        env.start()
+        self.addCleanup(env.stop)
+        patcher = patch.object(api.shutil, "which", return_value="/usr/bin/gh")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(api, "_run", side_effect=self.fake_run)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(
+            github_api, "repository_metadata", side_effect=self.fake_metadata
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(precheck, "viewer_login", return_value="user")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(
+            precheck,
+            "find_existing_repositories",
+            side_effect=lambda names: self.existing.intersection(names),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def fake_run(self, args, kind, cwd=None):
+        """Run git for real and create local bare repos for gh commands."""
+        if args[0] != "gh":
+            return REAL_RUN(args, kind, cwd)
+        self.gh_calls.append(args[1:3])
+        if args[2] == "create":
+            if self.fail_create:
+                raise api.DuplicationError(kind, "name already exists")
+            make_bare(os.path.join(self.remotes, f"{args[3]}.git"))
+        # Unlike gh, print no URL, so the repository is looked up
+        return ""
+
+    def fake_metadata(self, name):
+        """Describe a local bare repo the way the GitHub lookup would."""
+        return github_api.RepoMetadata(
+            owner="user",
+            name=name,
+            ssh_url=os.path.join(self.remotes, f"{name}.git"),
+            https_url=f"https://github.com/user/{name}",
+        )
+
+    def work_trees(self):
+        """List work directories left in the workspace root."""
+        return [e for e in os.listdir(self.work_dir) if not e.startswith(".")]
+
+    def duplicator(self, **options):
+        return api.Duplicator(api.DuplicatorConfig(work_dir=self.work_dir, **options))
+
+    def test_duplicate_reports_structured_result(self):
+        """A successful duplication reports URLs, SHAs and phase timings."""
+        result = self.duplicator().duplicate(self.template, "new-repo")
+
+        self.assertTrue(result.success, result.error)
+        self.assertIsNone(result.error_kind)
+        self.assertEqual(result.repo_url, "https://github.com/user/new-repo")
+        self.assertEqual(result.branch, "main")
+        self.assertEqual(result.template_sha, self.head)
+        self.assertEqual(result.pushed_sha, self.head)
+        self.assertEqual(
+            git("--git-dir", result.ssh_url, "rev-parse", "main"), self.head
+        )
+        self.assertEqual(
+            git("--git-dir", result.ssh_url, "rev-parse", TEMPLATE_BASE_REF),
+            self.head,
+        )
+        for phase in ("clone", "create", "push", "verify", "total"):
+            self.assertIn(phase, result.timings)
+        self.assertEqual(result.verification.summary(), "2 refs match")
+        self.assertEqual(self.work_trees(), [])
+        self.assertEqual(self.gh_calls, [["repo", "create"]])
+
+        (entry,) = get_registry().history(repo_name="new-repo")
+        self.assertEqual(entry.outcome, "success")
+        self.assertEqual(entry.template_sha, self.head)
+        self.assertEqual(entry.template_commit_time, result.template_commit_time)
+        self.assertEqual(entry.visibility, "private")
+        self.assertIn("push", entry.timings)
+
+    def test_failures_are_returned_not_raised(self):
+        """Failures carry an error kind and leave no work tree behind."""
+        duplicator = self.duplicator()
+
+        invalid = duplicator.duplicate(self.template, "bad name")
+        self.assertEqual(invalid.error_kind, api.ErrorKind.INVALID_NAME)
+
+        missing = duplicator.duplicate(os.path.join(self.tmp, "missing"), "repo")
+        self.assertEqual(missing.error_kind, api.ErrorKind.CLONE_FAILED)
+
+        self.fail_create = True
+        taken = duplicator.duplicate(self.template, "taken")
+        self.assertFalse(taken.success)
+        self.assertEqual(taken.error_kind, api.ErrorKind.CREATE_FAILED)
+        self.assertEqual(taken.error, "name already exists")
+        self.assertEqual(self.work_trees(), [])
+
+    def test_taken_name_is_rejected_before_cloning(self):
+        """A name that already exists fails the precheck, not the create."""
+        self.existing = {"user/taken"}
+
+        with patch.object(api, "estimate_template_size") as mock_estimate:
+            result = self.duplicator().duplicate(self.template, "taken")
+
+        self.assertEqual(result.error_kind, api.ErrorKind.NAME_TAKEN)
+        self.assertEqual(result.error, "user/taken already exists")
+        self.assertNotIn("clone", result.timings)
+        mock_estimate.assert_not_called()
+        self.assertFalse(os.path.exists(self.remotes))
+
+    def test_phase_past_its_deadline_times_out(self):
+        """A phase that runs out of time fails cleanly with its own kind."""
+        result = self.duplicator(deadlines={"clone": 1e-9}).duplicate(
+            self.template, "slow"
+        )
+
+        self.assertEqual(result.error_kind, api.ErrorKind.TIMED_OUT)
+        self.assertIn("clone did not finish", result.error)
+        self.assertEqual(self.work_trees(), [])
+        self.assertFalse(os.path.exists(self.remotes))
+
+    def test_settings_are_applied_after_the_push(self):
+        """Post-create settings run last and report failures per setting."""
+        repo_settings = settings.RepoSettings(topics=["python"], labels=[{"name": "a"}])
+        outcomes = [
+            settings.SettingResult("topics", settings.UPDATED),
+            settings.SettingResult("label:a", settings.FAILED, "HTTP 422"),
+        ]
+
+        with patch.object(api, "apply_settings", return_value=outcomes) as mock_apply:
+            result = self.duplicator(settings=repo_settings).duplicate(
+                self.template, "configured"
+            )
+
+        mock_apply.assert_called_once_with("user/configured", repo_settings)
+        self.assertEqual(result.pushed_sha, self.head)
+        self.assertEqual(result.error_kind, api.ErrorKind.SETTINGS_FAILED)
+        self.assertEqual(result.error, "label:a: HTTP 422")
+        self.assertEqual(result.settings, outcomes)
+        self.assertIn("settings", result.timings)
+
+    def test_failed_push_rolls_back_the_new_repository(self):
+        """A repository left empty by a failed push is deleted again."""
+        unreachable = github_api.RepoMetadata(
+            owner="user",
+            name="half-made",
+            ssh_url=os.path.join(self.tmp, "unreachable.git"),
+            https_url="https://github.com/user/half-made",
+        )
+
+        with patch.object(
+            github_api, "repository_metadata", return_value=unreachable
+        ), patch.object(rollback, "delete_repository") as mock_delete:
+            result = self.duplicator().duplicate(self.template, "half-made")
+
+        self.assertEqual(result.error_kind, api.ErrorKind.PUSH_FAILED)
+        mock_delete.assert_called_once_with("half-made")
+        self.assertEqual(
+            [(r.kind, r.target, r.removed) for r in result.rollback],
+            [("repository", "half-made", True)],
+        )
+        self.assertEqual(rollback.find_orphans(min_age=0), [])
+
+    def test_warm_mirror_is_cloned_from(self):
+        """A mirror of the template is brought up to date and cloned from."""
+        with patch.dict(os.environ, {CACHE_DIR_ENV: os.path.join(self.tmp, "cache")}):
+            mirror = mirrors.ensure_mirror(self.template)
+            git("commit", "--quiet", "--allow-empty", "-m", "Later", cwd=self.template)
+            head = git("rev-parse", "HEAD", cwd=self.template)
+
+            with patch.object(
+                api, "current_mirror", wraps=mirrors.current_mirror
+            ) as lookup:
+                result = self.duplicator().duplicate(self.template, "warm")
+
+        self.assertTrue(result.success, result.error)
+        lookup.assert_called_once_with(self.template, self.template)
+        self.assertEqual(result.template_sha, head)
+        self.assertEqual(git("--git-dir", mirror, "rev-parse", "main"), head)
+
+    def test_duplicate_async(self):
+        """Concurrent async duplications each get their own result."""
+        duplicator = self.duplicator()
+
+        async def run_all():
+            return await asyncio.gather(
+                duplicator.duplicate_async(self.template, "first"),
+                duplicator.duplicate_async(self.template, "second"),
+            )
+
+        results = asyncio.run(run_all())
+
+        self.assertEqual([r.repo_name for r in results], ["first", "second"])
+        self.assertTrue(all(r.success for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for previewing templates through blobless partial clones.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import browse, mirrors
+from src.github_repo_duplicator.cache import CACHE_DIR_ENV
+from tests.git_helpers import git, make_repo
+
+FILES = {
+    "README.md": "# Template\n",
+    "src/app.py": "print('hello')\n" * 100,
+    "src/data/table.csv": "a,b\n1,2\n",
+}
+
+
+class TestBrowse(unittest.TestCase):
+    """Test cases for listing and reading templates without full clones."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        env = patch.dict(os.environ, {CACHE_DIR_ENV: os.path.join(self.tmp, "cache")})
+        env.start()
+        self.addCleanup(env.stop)
+        self.template_dir = os.path.join(self.tmp, "template")
+        make_repo(self.template_dir, FILES)
+        # Let the local "server" honour partial clone filters
+        git("config", "uploadpack.allowFilter", "true", cwd=self.template_dir)
+        self.template = f"file://{self.template_dir}"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def missing_blobs(self, repo_dir):
+        """List the objects a partial clone has not downloaded."""
+        output = git("rev-list", "--objects", "--missing=print", "--all", cwd=repo_dir)
+        return [line[1:] for line in output.splitlines() if line.startswith("?")]
+
+    def test_listing_downloads_no_file_contents(self):
+        """Trees are listed from a blobless clone without fetching files."""
+        entries = browse.list_tree(self.template)
+
+        self.assertEqual(
+            [(e.path, e.type) for e in entries],
+            [("README.md", "blob"), ("src", "tree")],
+        )
+        clone = browse.preview_path(self.template)
+        self.assertEqual(len(self.missing_blobs(clone)), 3)
+
+        nested = browse.list_tree(self.template, "src", recursive=True)
+        self.assertEqual([e.path for e in nested], ["app.py", "data/table.csv"])
+        # Not on GitHub, so sizes of files not downloaded are unknown
+        self.assertEqual([e.size for e in nested], [None, None])
+
+    def test_reading_fetches_only_that_file(self):
+        """Printing a file downloads it and nothing else."""
+        content = browse.read_file(self.template, "src/app.py")
+
+        self.assertEqual(content.decode(), FILES["src/app.py"])
+        clone = browse.preview_path(self.template)
+        self.assertEqual(len(self.missing_blobs(clone)), 2)
+        sizes = {e.path: e.size for e in browse.list_tree(self.template, "src")}
+        self.assertEqual(sizes["app.py"], len(FILES["src/app.py"]))
+        with self.assertRaises(browse.PreviewError):
+            browse.read_file(self.template, "src")
+        with self.assertRaises(browse.PreviewError):
+            browse.read_file(self.template, "missing.txt")
+
+    def test_sizes_of_github_templates_come_from_the_trees_api(self):
+        """Files not downloaded get their size from one API request."""
+        with patch.object(browse, "github_tree_sizes", return_value={"x": 1}) as lookup:
+            browse.list_tree(self.template)
+        lookup.assert_called_once()
+        self.assertEqual(
+            browse.github_tree_sizes("file:///somewhere/else", "sha", False), {}
+        )
+
+    def test_refresh_fetches_new_commits_and_tags(self):
+        """A refreshed preview shows what was pushed since it was cloned."""
+        browse.list_tree(self.template)
+        with open(os.path.join(self.template_dir, "NEW.md"), "w") as f:
+            f.write("new\n")
+        git("add", "NEW.md", cwd=self.template_dir)
+        git("commit", "--quiet", "-m", "Add NEW.md", cwd=self.template_dir)
+        git("tag", "v2", cwd=self.template_dir)
+
+        self.assertNotIn("NEW.md", [e.path for e in browse.list_tree(self.template)])
+        paths = [e.path for e in browse.list_tree(self.template, refresh=True)]
+        self.assertIn("NEW.md", paths)
+        tagged = browse.list_tree(self.template, rev="v2")
+        self.assertIn("NEW.md", [e.path for e in tagged])
+
+    def test_local_mirrors_and_repositories_are_used_as_is(self):
+        """A cached mirror or a local path needs no preview clone."""
+        mirror = mirrors.ensure_mirror(self.template)
+        self.assertEqual(browse.open_template(self.template), mirror)
+        self.assertEqual(browse.open_template(self.template_dir), self.template_dir)
+
+        sizes = {e.path: e.size for e in browse.list_tree(self.template_dir)}
+        self.assertEqual(sizes["README.md"], len(FILES["README.md"]))
+        self.assertFalse(os.path.exists(browse.preview_path(self.template)))
+
+    def test_format_size(self):
+        """Sizes are shown in bytes, K, M or G."""
+        self.assertEqual(browse.format_size(None), "-")
+        self.assertEqual(browse.format_size(512), "512B")
+        self.assertEqual(browse.format_size(1536), "1.5K")
+        self.assertEqual(browse.format_size(3 << 30), "3.0G")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for offline template bundles.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import bundles, watchdog
+from src.github_repo_duplicator.cache import CACHE_DIR_ENV
+from tests.git_helpers import git, make_repo
+
+
+class TestBundles(unittest.TestCase):
+    """Test cases for exporting, verifying and importing bundles."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.template = os.path.join(self.tmp, "Resume_CV_ATS-Friendly")
+        self.head = make_repo(self.template, tag="v1.0")
+        self.bundle = os.path.join(self.tmp, "out", "Resume_CV_ATS-Friendly.bundle")
+        env = patch.dict(os.environ, {CACHE_DIR_ENV: os.path.join(self.tmp, "cache")})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_export_writes_verified_bundle_and_metadata(self):
+        """Exported bundles carry the template URL, HEAD and refs."""
+        metadata = bundles.export_bundle(self.template, self.bundle)
+
+        self.assertEqual(metadata.template_url, self.template)
+        self.assertEqual(metadata.head, self.head)
+        self.assertEqual(metadata.refs["refs/heads/main"], self.head)
+        self.assertIn("refs/tags/v1.0", metadata.refs)
+        self.assertEqual(metadata.size, os.path.getsize(self.bundle))
+        self.assertEqual(bundles.verify_bundle(self.bundle), metadata)
+
+    def test_clone_from_bundle(self):
+        """A bundle can replace the template URL as the clone source."""
+        bundles.export_bundle(self.template, self.bundle)
+        clone = os.path.join(self.tmp, "clone")
+
+        git("clone", "--quiet", self.bundle, clone)
+
+        self.assertEqual(git("rev-parse", "HEAD", cwd=clone), self.head)
+
+    def test_verify_rejects_tampered_bundle(self):
+        """A bundle whose checksum no longer matches is rejected."""
+        bundles.export_bundle(self.template, self.bundle)
+        with open(self.bundle, "ab") as f:
+            f.write(b"garbage")
+
+        with self.assertRaises(bundles.BundleError):
+            bundles.verify_bundle(self.bundle)
+
+    def test_verify_rejects_missing_metadata(self):
+        """A bundle without its metadata sidecar is rejected."""
+        bundles.export_bundle(self.template, self.bundle)
+        os.remove(bundles.metadata_path(self.bundle))
+
+        with self.assertRaises(bundles.BundleError):
+            bundles.verify_bundle(self.bundle)
+
+    def test_export_runs_under_a_deadline(self):
+        """Bundle commands are stopped at the deadline and reported."""
+        with watchdog.deadline("bundle", 1e-9):
+            with self.assertRaisesRegex(bundles.BundleError, "did not finish"):
+                bundles.export_bundle(self.template, self.bundle)
+
+    def test_import_and_find_bundle(self):
+        """Imported bundles are found again by their template URL."""
+        bundles.export_bundle(self.template, self.bundle)
+
+        target = bundles.import_bundle(self.bundle)
+
+        self.assertTrue(target.startswith(bundles.get_bundle_store()))
+        self.assertEqual(bundles.find_bundle(self.template), target)
+        self.assertIsNone(bundles.find_bundle("https://github.com/user/other.git"))
+        with open(bundles.metadata_path(target)) as f:
+            self.assertEqual(json.load(f)["template_url"], self.template)
+
+    def test_same_name_from_other_owners_do_not_collide(self):
+        """Bundles of same-named templates are stored side by side."""
+        other = os.path.join(self.tmp, "other", "Resume_CV_ATS-Friendly")
+        other_head = make_repo(other, {"other.txt": "other\n"})
+        other_bundle = os.path.join(self.tmp, "out", "other.bundle")
+        bundles.export_bundle(self.template, self.bundle)
+        bundles.export_bundle(other, other_bundle)
+
+        first = bundles.import_bundle(self.bundle)
+        second = bundles.import_bundle(other_bundle)
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(bundles.find_bundle(self.template), first)
+        self.assertEqual(bundles.find_bundle(other), second)
+        self.assertEqual(bundles.read_metadata(second).head, other_head)
+
+
+if __name__ == "__main__":
+    unittest.main()
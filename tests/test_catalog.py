@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the searchable template catalog.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import catalog
+from src.github_repo_duplicator.github_api import GitHubApiError
+
+ORG_TEMPLATES = [
+    {
+        "name": "fastapi-service",
+        "url": "https://github.com/org/fastapi-service.git",
+        "description": "Python web API skeleton",
+        "topics": ["python", "docker"],
+    },
+    {
+        "name": "docker-base",
+        "url": "https://github.com/org/docker-base.git",
+        "description": "Minimal container image",
+        "topics": ["containers"],
+    },
+]
+
+
+class TestCatalog(unittest.TestCase):
+    """Test cases for loading and searching templates."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "catalog.json")
+        self.defaults = [
+            "https://github.com/me/ML_API_with_FastAPI_and_Docker.git",
+            "https://github.com/me/FORTRAN_Tutorial.git",
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def load(self, **kwargs):
+        return catalog.load_catalog(self.defaults, path=self.path, **kwargs)
+
+    @patch.object(catalog, "list_template_repositories", return_value=ORG_TEMPLATES)
+    def test_owner_templates_are_cached(self, mock_list):
+        """Owners are listed once, then served from the catalog file."""
+        entries = self.load(owners=["org"])
+        again = self.load(owners=["org"])
+
+        mock_list.assert_called_once_with("org")
+        self.assertEqual(
+            [e.name for e in again],
+            [
+                "ML_API_with_FastAPI_and_Docker",
+                "FORTRAN_Tutorial",
+                "fastapi-service",
+                "docker-base",
+            ],
+        )
+        self.assertEqual(entries, again)
+        self.assertEqual(again[2].owner, "org")
+
+        self.load(owners=["org"], refresh=True)
+        self.assertEqual(mock_list.call_count, 2)
+
+    def test_lookup_failure_keeps_cached_templates(self):
+        """An owner that cannot be listed keeps its cached templates."""
+        with open(self.path, "w") as f:
+            json.dump({"owners": {"org": 0}, "templates": ORG_TEMPLATES}, f)
+
+        with patch.object(
+            catalog,
+            "list_template_repositories",
+            side_effect=GitHubApiError("offline"),
+        ), self.assertLogs(catalog.logger, "WARNING"):
+            entries = self.load(owners=["org"])
+
+        self.assertEqual(len(entries), 4)
+
+    def test_search_ranks_name_matches_first(self):
+        """Name matches beat topic and description matches."""
+        with open(self.path, "w") as f:
+            json.dump(ORG_TEMPLATES, f)
+        index = catalog.TemplateIndex(self.load())
+
+        names = [r.entry.name for r in index.search("docker")]
+        self.assertEqual(names[0], "docker-base")
+        self.assertEqual(
+            set(names),
+            {"docker-base", "ML_API_with_FastAPI_and_Docker", "fastapi-service"},
+        )
+        # Every word must match, and words may be prefixes
+        self.assertEqual(
+            [r.entry.name for r in index.search("fast dock")],
+            ["ML_API_with_FastAPI_and_Docker", "fastapi-service"],
+        )
+        self.assertEqual(index.search("fortran docker"), [])
+        self.assertEqual(len(index.search("")), 4)
+
+    def test_search_tolerates_typos(self):
+        """Trigram matching finds templates despite small typos."""
+        index = catalog.TemplateIndex(self.load())
+
+        self.assertEqual(index.best_match("fortan").name, "FORTRAN_Tutorial")
+        self.assertEqual(index.best_match("tutorail").name, "FORTRAN_Tutorial")
+        self.assertIsNone(index.best_match("kubernetes"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for pushing duplicates to several destinations.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import destinations
+from src.github_repo_duplicator.registry import Registry
+from src.github_repo_duplicator.rollback import DIRECTORY, JobTransaction
+from tests.git_helpers import git, make_bare, make_repo
+
+
+class TestDestinations(unittest.TestCase):
+    """Test cases for destination drivers and concurrent pushes."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.template = os.path.join(self.tmp, "template")
+        self.head = make_repo(self.template)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_parse_destination(self):
+        """Destinations are parsed by kind, or guessed from their form."""
+        cases = {
+            "github": (destinations.GitHubDestination, ""),
+            "github:org": (destinations.GitHubDestination, "org"),
+            "git:https://gitea/{name}.git": (
+                destinations.GitRemoteDestination,
+                "https://gitea/{name}.git",
+            ),
+            "git@gitea.internal:team": (
+                destinations.GitRemoteDestination,
+                "git@gitea.internal:team",
+            ),
+            "bare:/srv/git": (destinations.LocalBareDestination, "/srv/git"),
+            "/mnt/backup": (destinations.LocalBareDestination, "/mnt/backup"),
+        }
+        for spec, (driver, location) in cases.items():
+            destination = destinations.parse_destination(spec)
+            self.assertIsInstance(destination, driver)
+            self.assertEqual(destination.location, location)
+        with self.assertRaises(ValueError):
+            destinations.parse_destination("bare:")
+
+        remote = destinations.parse_destination("git@gitea.internal:team")
+        self.assertEqual(remote.prepare("org/app"), "git@gitea.internal:team/app.git")
+
+    def test_push_to_every_destination(self):
+        """Each destination gets the objects and its own result."""
+        backups = os.path.join(self.tmp, "backups")
+        gitea = os.path.join(self.tmp, "gitea")
+        make_bare(os.path.join(gitea, "app.git"))
+        transaction = JobTransaction(
+            "duplicate:app", registry=Registry(os.path.join(self.tmp, "r.db"))
+        )
+        seen = []
+
+        results = destinations.push_to_destinations(
+            self.template,
+            "app",
+            [
+                destinations.parse_destination(f"bare:{backups}"),
+                destinations.parse_destination(f"git:{gitea}/{{name}}.git"),
+                destinations.parse_destination(f"git:{self.tmp}/missing"),
+            ],
+            ["main"],
+            description="The app",
+            transaction=transaction,
+            on_result=seen.append,
+        )
+
+        self.assertEqual([r.success for r in results], [True, True, False])
+        self.assertEqual(len(seen), 3)
+        self.assertTrue(results[2].error)
+        for result in results[:2]:
+            self.assertEqual(
+                git("--git-dir", result.url, "rev-parse", "main"), self.head
+            )
+        self.assertEqual(
+            [(r.kind, r.target) for r in transaction.resources],
+            [(DIRECTORY, os.path.join(backups, "app.git"))],
+        )
+        with open(os.path.join(backups, "app.git", "description")) as f:
+            self.assertEqual(f.read(), "The app\n")
+
+    def test_rollback_keeps_pushed_bare_destinations(self):
+        """A bare backup that got the push is kept like a pushed repository."""
+        backups = os.path.join(self.tmp, "backups")
+        transaction = JobTransaction(
+            "duplicate:app", registry=Registry(os.path.join(self.tmp, "r.db"))
+        )
+
+        results = destinations.push_to_destinations(
+            self.template,
+            "app",
+            [
+                destinations.parse_destination(f"bare:{backups}"),
+                destinations.parse_destination(f"git:{self.tmp}/missing"),
+            ],
+            ["main"],
+            transaction=transaction,
+        )
+        (kept,) = transaction.rollback()
+
+        self.assertEqual([r.success for r in results], [True, False])
+        self.assertEqual((kept.target, kept.removed), (results[0].url, False))
+        self.assertEqual(
+            git("--git-dir", results[0].url, "rev-parse", "main"), self.head
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
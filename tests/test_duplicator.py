@@ -11,6 +11,7 @@ from unittest.mock import MagicMock, patch
 # Add parent directory to path to import the package
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from src.github_repo_duplicator import duplicator
+from src.github_repo_duplicator.watchdog import deadline, time_left
 
 
 class TestDuplicator(unittest.TestCase):
@@ -52,7 +53,7 @@ class TestDuplicator(unittest.TestCase):
         self.assertFalse(duplicator.validate_repo_name("repo:name"))  # Contains colon
         self.assertFalse(duplicator.validate_repo_name(""))  # Empty string
 
-    @patch("subprocess.run")
+    @patch("src.github_repo_duplicator.duplicator.run_with_deadline")
     def test_execute_command_success(self, mock_run):
         """Test the execute_command function with a successful command."""
         # Setup the mock
@@ -67,7 +68,7 @@ class TestDuplicator(unittest.TestCase):
         self.assertTrue(result)
         mock_run.assert_called_once()
 
-    @patch("subprocess.run")
+    @patch("src.github_repo_duplicator.duplicator.run_with_deadline")
     def test_execute_command_failure(self, mock_run):
         """Test the execute_command function with a failed command."""
         # Setup the mock to raise an exception
@@ -83,6 +84,21 @@ class TestDuplicator(unittest.TestCase):
         self.assertFalse(result)
         mock_run.assert_called_once()
 
+    @patch("src.github_repo_duplicator.duplicator.run_with_deadline")
+    def test_execute_command_uses_the_phase_deadline(self, mock_run):
+        """Commands get the current phase's deadline unless given a timeout."""
+        phases = []
+        mock_run.side_effect = lambda *args, **kwargs: phases.append(time_left())
+
+        with deadline("clone_back", 1800):
+            duplicator.execute_command("true", "/bin/bash")
+            duplicator.execute_command("true", "/bin/bash", timeout=5)
+
+        self.assertEqual(
+            [(phase, seconds) for phase, seconds, _ in phases],
+            [("clone_back", 1800), ("command", 5)],
+        )
+
     def test_get_default_repositories(self):
         """Test the get_default_repositories function."""
         repos = duplicator.get_default_repositories()
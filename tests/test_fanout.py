@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Tests for fan-out duplication.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import fanout, precheck
+from src.github_repo_duplicator.bundles import export_bundle
+from src.github_repo_duplicator.destinations import parse_destination
+from src.github_repo_duplicator.registry import REGISTRY_PATH_ENV, get_registry
+from tests.git_helpers import git, make_bare, make_repo
+
+
+class TestFanOut(unittest.TestCase):
+    """Test cases for fanning one template out to several repositories."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.template = os.path.join(self.tmp, "template")
+        self.head = make_repo(self.template, tag="v1.0")
+        env = patch.dict(
+            os.environ, {REGISTRY_PATH_ENV: os.path.join(self.tmp, "registry.db")}
+        )
+        env.start()
+        self.addCleanup(env.stop)
+        patcher = patch.object(precheck, "viewer_login", return_value="user")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(
+            precheck, "find_existing_repositories", return_value=set()
+        )
+        self.mock_existing = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def make_remote(self, name):
+        """Create an empty bare repository standing in for a new GitHub repo."""
+        return make_bare(os.path.join(self.tmp, "remotes", f"{name}.git"))
+
+    @patch("src.github_repo_duplicator.fanout.create_new_repository")
+    @patch("src.github_repo_duplicator.fanout.get_remote_url")
+    def test_fan_out_pushes_to_every_target(self, mock_remote, mock_create):
+        """Every target receives all branches and tags of the template."""
+        mock_create.return_value = True
+        mock_remote.side_effect = self.make_remote
+        seen = []
+
+        results = fanout.fan_out(
+            self.template,
+            ["one", "two", "three"],
+            max_workers=2,
+            on_result=seen.append,
+        )
+
+        self.assertEqual([r.name for r in results], ["one", "two", "three"])
+        self.assertTrue(all(r.success for r in results))
+        self.assertEqual(len(seen), 3)
+        for result in results:
+            self.assertEqual(
+                git("--git-dir", result.remote_url, "rev-parse", "main"), self.head
+            )
+            self.assertEqual(
+                git("--git-dir", result.remote_url, "rev-parse", "v1.0^{commit}"),
+                self.head,
+            )
+
+    @patch("src.github_repo_duplicator.fanout.create_new_repository")
+    @patch("src.github_repo_duplicator.fanout.get_remote_url")
+    def test_fan_out_pushes_to_further_destinations(self, mock_remote, mock_create):
+        """Targets are also pushed to further destinations from one fetch."""
+        mock_create.return_value = True
+        mock_remote.side_effect = self.make_remote
+        backups = os.path.join(self.tmp, "backups")
+
+        results = fanout.fan_out(
+            self.template,
+            ["one", "two"],
+            destinations=[parse_destination(f"bare:{backups}")],
+        )
+
+        self.assertTrue(all(r.success for r in results))
+        for result in results:
+            (pushed,) = result.destinations
+            self.assertEqual(pushed.url, os.path.join(backups, f"{result.name}.git"))
+            self.assertEqual(
+                git("--git-dir", pushed.url, "rev-parse", "v1.0^{commit}"), self.head
+            )
+
+    @patch("src.github_repo_duplicator.fanout.create_new_repository")
+    @patch("src.github_repo_duplicator.fanout.get_remote_url")
+    def test_fan_out_from_a_bundle_records_the_template_url(
+        self, mock_remote, mock_create
+    ):
+        """Targets fetched from a bundle are recorded under the template URL."""
+        mock_create.return_value = True
+        mock_remote.side_effect = self.make_remote
+        bundle = os.path.join(self.tmp, "template.bundle")
+        export_bundle(self.template, bundle)
+        url = "https://github.com/org/template"
+
+        results = fanout.fan_out(url, ["one", "two"], bundle_path=bundle)
+
+        self.assertTrue(all(r.success for r in results), results)
+        self.assertEqual(
+            git("--git-dir", results[0].remote_url, "rev-parse", "main"), self.head
+        )
+        recorded = get_registry().history(template_url=url)
+        self.assertEqual(sorted(e.repo_name for e in recorded), ["one", "two"])
+
+    @patch("src.github_repo_duplicator.fanout.create_new_repository")
+    @patch("src.github_repo_duplicator.fanout.get_remote_url")
+    def test_fan_out_reports_per_target_failures(self, mock_remote, mock_create):
+        """A failing or invalid target does not stop the others."""
+        mock_create.side_effect = lambda name, *args: name != "broken"
+        mock_remote.side_effect = self.make_remote
+
+        results = fanout.fan_out(self.template, ["ok", "broken", "bad name", "ok"])
+
+        self.assertEqual([r.name for r in results], ["ok", "broken", "bad name"])
+        self.assertTrue(results[0].success)
+        self.assertEqual(results[1].error, "repository creation failed")
+        self.assertEqual(results[2].error, "invalid repository name")
+        self.assertEqual(mock_create.call_count, 2)
+
+    @patch("src.github_repo_duplicator.fanout.fetch_template")
+    @patch("src.github_repo_duplicator.fanout.create_new_repository")
+    def test_taken_names_are_rejected_before_fetching(self, mock_create, mock_fetch):
+        """Names that already exist are checked in one batch and skipped."""
+        self.mock_existing.return_value = {"user/taken", "org/other"}
+
+        results = fanout.fan_out(self.template, ["taken", "org/other", "Taken"])
+
+        self.mock_existing.assert_called_once_with(["user/taken", "org/other"])
+        self.assertEqual(results[0].error, "user/taken already exists")
+        self.assertEqual(results[1].error, "org/other already exists")
+        self.assertEqual(results[2].error, "duplicate name")
+        mock_fetch.assert_not_called()
+        mock_create.assert_not_called()
+
+    @patch("src.github_repo_duplicator.fanout.create_new_repository")
+    def test_fan_out_template_fetch_failure(self, mock_create):
+        """A template that cannot be fetched fails every target up front."""
+        missing = os.path.join(self.tmp, "missing")
+
+        results = fanout.fan_out(missing, ["one", "two"])
+
+        self.assertFalse(any(r.success for r in results))
+        self.assertTrue(all("template fetch failed" in r.error for r in results))
+        mock_create.assert_not_called()
+
+    @patch("src.github_repo_duplicator.fanout.create_new_repository")
+    def test_lfs_listing_failure_fails_every_target(self, mock_create):
+        """Without the LFS object list no target is created with broken pointers."""
+        with patch.object(
+            fanout, "list_lfs_objects", side_effect=fanout.LfsError("bad object")
+        ):
+            results = fanout.fan_out(
+                self.template, ["one", "two"], lfs_source_url=self.template
+            )
+
+        self.assertFalse(any(r.success for r in results))
+        self.assertTrue(all("LFS object listing failed" in r.error for r in results))
+        mock_create.assert_not_called()
+
+    def test_read_names_file(self):
+        """Names files skip comments and blank lines."""
+        path = os.path.join(self.tmp, "names.txt")
+        with open(path, "w") as f:
+            f.write("# students\nalice-cv\n\nbob-cv\n")
+
+        self.assertEqual(fanout.read_names_file(path), ["alice-cv", "bob-cv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests for the git backends.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import git_backend
+from tests.git_helpers import git, make_bare, make_repo
+
+
+class BackendTests:
+    """Behaviour every git backend must share."""
+
+    backend_name = ""
+
+    def setUp(self):
+        try:
+            self.backend = git_backend.get_backend(self.backend_name)
+        except git_backend.GitError as e:
+            self.skipTest(str(e))
+        self.tmp = tempfile.mkdtemp()
+        self.template = os.path.join(self.tmp, "template")
+        self.head = make_repo(self.template, tag="v1.0")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_clone_set_remote_and_push(self):
+        """A clone pushed to a new remote carries the current branch."""
+        work = os.path.join(self.tmp, "work")
+        remote = make_bare(os.path.join(self.tmp, "remote.git"))
+
+        self.backend.clone(self.template, work)
+        self.assertEqual(self.backend.rev_parse(work), self.head)
+        self.assertEqual(self.backend.current_branch(work), "main")
+
+        self.backend.set_remote(work, "origin", remote)
+        self.backend.push(work, "origin", ["main"], set_upstream=True)
+
+        self.assertEqual(git("remote", "get-url", "origin", cwd=work), remote)
+        self.assertEqual(git("--git-dir", remote, "rev-parse", "main"), self.head)
+        self.assertEqual(git("config", "branch.main.remote", cwd=work), "origin")
+
+    def test_bare_clone_pushes_glob_refspecs(self):
+        """Glob refspecs push every branch and tag of a bare clone."""
+        bare = os.path.join(self.tmp, "template.git")
+        remote = make_bare(os.path.join(self.tmp, "remote.git"))
+
+        self.backend.clone(self.template, bare, bare=True)
+        self.backend.push(
+            bare, remote, ["refs/heads/*:refs/heads/*", "refs/tags/*:refs/tags/*"]
+        )
+
+        self.assertEqual(git("--git-dir", remote, "rev-parse", "main"), self.head)
+        self.assertEqual(
+            git("--git-dir", remote, "rev-parse", "v1.0^{commit}"), self.head
+        )
+
+    def test_refs_and_trees(self):
+        """Local and remote refs list the same objects; trees resolve."""
+        git("tag", "-a", "v2.0", "-m", "Annotated", cwd=self.template)
+        tag = git("rev-parse", "v2.0", cwd=self.template)
+
+        local = self.backend.list_refs(self.template)
+        remote = self.backend.ls_remote(self.template)
+
+        self.assertEqual(local, remote)
+        self.assertEqual(local["refs/heads/main"], self.head)
+        self.assertEqual(local["refs/tags/v2.0"], tag)
+        self.assertEqual(
+            self.backend.tree_sha(self.template, "main"),
+            git("rev-parse", "main^{tree}", cwd=self.template),
+        )
+
+    def test_clone_failure_raises_git_error(self):
+        """Failures surface as GitError."""
+        with self.assertRaises(git_backend.GitError):
+            self.backend.clone(
+                os.path.join(self.tmp, "missing"), os.path.join(self.tmp, "out")
+            )
+
+    def test_errors_are_git_errors(self):
+        """Bad repositories and rejected pushes surface as GitError."""
+        missing = os.path.join(self.tmp, "missing")
+        for call in (
+            lambda: self.backend.rev_parse(missing),
+            lambda: self.backend.set_remote(missing, "origin", self.template),
+            lambda: self.backend.update_ref(missing, "refs/heads/x", self.head),
+            lambda: self.backend.current_branch(missing),
+            lambda: self.backend.list_refs(missing),
+            lambda: self.backend.push(missing, self.template, ["main"]),
+        ):
+            with self.assertRaises(git_backend.GitError):
+                call()
+
+        # A remote that moved on rejects a push that is not a fast-forward
+        work = os.path.join(self.tmp, "work")
+        remote = os.path.join(self.tmp, "remote.git")
+        self.backend.clone(self.template, work)
+        git("clone", "--quiet", "--bare", self.template, remote)
+        git("commit", "--quiet", "--allow-empty", "-m", "Local", cwd=work)
+        other = os.path.join(self.tmp, "other")
+        git("clone", "--quiet", remote, other)
+        git("commit", "--quiet", "--allow-empty", "-m", "Remote", cwd=other)
+        git("push", "--quiet", "origin", "main", cwd=other)
+        with self.assertRaises(git_backend.GitError):
+            self.backend.push(work, remote, ["main"])
+
+
+class TestSubprocessBackend(BackendTests, unittest.TestCase):
+    backend_name = "subprocess"
+
+
+class TestDulwichBackend(BackendTests, unittest.TestCase):
+    backend_name = "dulwich"
+
+
+class TestGetBackend(unittest.TestCase):
+    """Test cases for choosing a backend."""
+
+    def test_environment_selects_default(self):
+        """The environment variable picks the backend when none is named."""
+        with patch.dict(os.environ, {git_backend.GIT_BACKEND_ENV: "subprocess"}):
+            backend = git_backend.get_backend()
+        self.assertIsInstance(backend, git_backend.SubprocessBackend)
+
+    def test_unknown_backend(self):
+        """Unknown backend names are rejected."""
+        with self.assertRaises(git_backend.GitError):
+            git_backend.get_backend("libgit3")
+
+
+if __name__ == "__main__":
+    unittest.main()
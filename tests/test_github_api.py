@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tests for GitHub API lookups.
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import github_api, metrics
+
+
+def fake_graphql(existing):
+    """Answer aliased repository queries from a set of existing names."""
+
+    def graphql(query):
+        data = {}
+        for alias, owner, name in re.findall(
+            r'(r\d+): repository\(owner: "([^"]+)", name: "([^"]+)"\)', query
+        ):
+            data[alias] = {"id": "R"} if f"{owner}/{name}" in existing else None
+        return data
+
+    return graphql
+
+
+class TestGitHubApi(unittest.TestCase):
+    """Test cases for batched GraphQL lookups."""
+
+    def test_existing_repositories_are_found_in_batches(self):
+        """Names are looked up a batch at a time."""
+        names = [f"user/repo-{i}" for i in range(5)]
+        graphql = fake_graphql({"user/repo-1", "user/repo-4"})
+
+        with patch.object(github_api, "graphql", side_effect=graphql) as mock:
+            existing = github_api.find_existing_repositories(names, batch_size=2)
+
+        self.assertEqual(existing, {"user/repo-1", "user/repo-4"})
+        self.assertEqual(mock.call_count, 3)
+
+    @patch.object(github_api, "run_with_deadline")
+    def test_graphql_keeps_data_of_partial_errors(self, mock_run):
+        """Not-found errors still return the data gh printed."""
+        response = {"data": {"r0": None}, "errors": [{"type": "NOT_FOUND"}]}
+        mock_run.return_value = subprocess.CompletedProcess(
+            [], 1, stdout=json.dumps(response), stderr="gh: Could not resolve"
+        )
+
+        self.assertEqual(github_api.graphql("query { }"), {"r0": None})
+
+        mock_run.return_value = subprocess.CompletedProcess(
+            [], 1, stdout="", stderr="HTTP 401: Bad credentials"
+        )
+        with self.assertRaisesRegex(github_api.GitHubApiError, "Bad credentials"):
+            github_api.graphql("query { }")
+
+    @patch.object(github_api.time, "sleep")
+    @patch.object(github_api, "run_with_deadline")
+    def test_rate_limited_queries_are_retried(self, mock_run, mock_sleep):
+        """Rate limited queries wait, are counted and are sent again."""
+        limited = subprocess.CompletedProcess(
+            [], 1, stdout="", stderr="gh: API rate limit exceeded for user ID 1."
+        )
+        answered = subprocess.CompletedProcess(
+            [], 0, stdout=json.dumps({"data": {"viewer": {"login": "u"}}})
+        )
+        mock_run.side_effect = [limited, limited, answered]
+        retries = metrics.RETRIES.value(phase="graphql")
+        waited = metrics.RATE_LIMIT_WAIT.value()
+
+        self.assertEqual(github_api.graphql("query { }"), {"viewer": {"login": "u"}})
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(metrics.RETRIES.value(phase="graphql"), retries + 2)
+        self.assertGreater(metrics.RATE_LIMIT_WAIT.value(), waited)
+
+        mock_run.side_effect = [limited] * (github_api.MAX_RATE_LIMIT_RETRIES + 1)
+        with self.assertRaisesRegex(github_api.GitHubApiError, "rate limit"):
+            github_api.graphql("query { }")
+
+    def test_metadata_from_create_output(self):
+        """The URL printed by gh repo create is enough, without a request."""
+        metadata = github_api.metadata_from_url(
+            "✓ Created repository org/new-repo on GitHub\n"
+            "https://github.com/org/new-repo\n"
+        )
+
+        self.assertEqual(metadata.full_name, "org/new-repo")
+        self.assertEqual(metadata.ssh_url, "git@github.com:org/new-repo.git")
+        self.assertEqual(metadata.https_url, "https://github.com/org/new-repo")
+        self.assertIsNone(github_api.metadata_from_url(""))
+
+    @patch.object(github_api, "graphql")
+    def test_repository_metadata_is_one_cached_query(self, mock_graphql):
+        """The viewer's repository is resolved and cached in one round trip."""
+        github_api.repository_metadata.cache_clear()
+        self.addCleanup(github_api.repository_metadata.cache_clear)
+        mock_graphql.return_value = {
+            "viewer": {
+                "repository": {
+                    "name": "cv",
+                    "owner": {"login": "alice"},
+                    "sshUrl": "git@github.com:alice/cv.git",
+                    "url": "https://github.com/alice/cv",
+                    "defaultBranchRef": {"name": "main"},
+                }
+            }
+        }
+
+        first = github_api.repository_metadata("cv")
+        second = github_api.repository_metadata("cv")
+
+        self.assertIs(first, second)
+        self.assertEqual(first.full_name, "alice/cv")
+        self.assertEqual(first.default_branch, "main")
+        mock_graphql.assert_called_once()
+
+    @patch.object(github_api, "graphql")
+    def test_missing_repository_raises(self, mock_graphql):
+        """A repository that does not exist is an error, not cached."""
+        github_api.repository_metadata.cache_clear()
+        self.addCleanup(github_api.repository_metadata.cache_clear)
+        mock_graphql.return_value = {"repository": None}
+
+        with self.assertRaisesRegex(github_api.GitHubApiError, "not found"):
+            github_api.repository_metadata("org/missing")
+
+    @patch.object(github_api, "graphql")
+    def test_template_repositories_are_paged(self, mock_graphql):
+        """Templates of an owner are collected across pages."""
+
+        def page(nodes, cursor):
+            return {
+                "repositoryOwner": {
+                    "repositories": {
+                        "nodes": nodes,
+                        "pageInfo": {"hasNextPage": bool(cursor), "endCursor": cursor},
+                    }
+                }
+            }
+
+        template = {
+            "name": "api",
+            "url": "https://github.com/org/api",
+            "description": None,
+            "isTemplate": True,
+            "repositoryTopics": {"nodes": [{"topic": {"name": "python"}}]},
+        }
+        mock_graphql.side_effect = [
+            page([dict(template, isTemplate=False, name="app")], "c1"),
+            page([template], None),
+        ]
+
+        templates = github_api.list_template_repositories("org")
+
+        self.assertEqual(
+            templates,
+            [
+                {
+                    "name": "api",
+                    "url": "https://github.com/org/api.git",
+                    "description": "",
+                    "topics": ["python"],
+                }
+            ],
+        )
+        self.assertIn('after: "c1"', mock_graphql.call_args_list[1][0][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
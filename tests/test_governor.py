@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the host-wide git process governor.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import bundles, governor, metrics
+from src.github_repo_duplicator.watchdog import (
+    DeadlineExceeded,
+    deadline,
+    run_with_deadline,
+)
+from tests.git_helpers import make_repo
+
+
+@unittest.skipIf(governor.fcntl is None, "file locks are not available")
+class TestGovernor(unittest.TestCase):
+    """Test cases for slot budgets, queueing and classification."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        env = patch.dict(
+            os.environ,
+            {governor.GOVERNOR_DIR_ENV: self.tmp, governor.SLOTS_ENV: "push=1"},
+        )
+        env.start()
+        self.addCleanup(env.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def hold(self, kind, seconds):
+        """Hold a slot in another thread; returns once it is held."""
+        held = threading.Event()
+
+        def run():
+            with governor.slot(kind):
+                held.set()
+                time.sleep(seconds)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        held.wait()
+        self.addCleanup(thread.join)
+        return thread
+
+    def test_commands_are_classified(self):
+        """Clones, pushes and pack operations are governed; the rest is not."""
+        self.assertEqual(governor.command_kind(["git", "clone", "url"]), "clone")
+        self.assertEqual(
+            governor.command_kind(["git", "-C", "repo", "push", "origin"]), "push"
+        )
+        self.assertEqual(
+            governor.command_kind(["/usr/bin/git", "commit-graph", "write"]), "pack"
+        )
+        self.assertIsNone(governor.command_kind(["git", "rev-parse", "HEAD"]))
+        self.assertIsNone(governor.command_kind(["gh", "repo", "create"]))
+        self.assertIsNone(governor.command_kind("git push"))
+
+    def test_budget_follows_the_host(self):
+        """Memory caps the budget, and every kind keeps at least one slot."""
+        with patch.object(governor.os, "cpu_count", return_value=16), patch.object(
+            governor, "available_memory", return_value=1 << 30
+        ), patch.object(governor, "io_headroom", return_value=1.0):
+            self.assertEqual(governor.host_budget(), {"clone": 4, "push": 8, "pack": 1})
+        with patch.object(governor.os, "cpu_count", return_value=16), patch.object(
+            governor, "available_memory", return_value=None
+        ), patch.object(governor, "io_headroom", return_value=0.5):
+            self.assertEqual(
+                governor.host_budget(), {"clone": 8, "push": 16, "pack": 2}
+            )
+        self.assertEqual(
+            governor.parse_slots("clone=2, pack=0"), {"clone": 2, "pack": 0}
+        )
+        with self.assertRaises(ValueError):
+            governor.parse_slots("fetch=2")
+
+    def test_full_slots_queue_and_report_the_wait(self):
+        """A process waits for a busy slot, and the wait is recorded."""
+        before = metrics.QUEUE_WAIT.count(kind="push")
+        self.hold("push", 0.3)
+        self.assertEqual(governor.busy_slots("push"), [0])
+
+        started = time.monotonic()
+        with governor.slot("push"):
+            waited = time.monotonic() - started
+        self.assertGreaterEqual(waited, 0.2)
+        # One observation for the holder, one for the waiter
+        self.assertEqual(metrics.QUEUE_WAIT.count(kind="push"), before + 2)
+        self.assertEqual(governor.busy_slots("push"), [])
+
+    def test_waiting_counts_against_the_deadline(self):
+        """A command that cannot get a slot in time fails its deadline."""
+        self.hold("push", 0.5)
+
+        with self.assertRaises(governor.SlotTimeout):
+            with governor.slot("push", timeout=0.1):
+                pass
+        with self.assertRaises(DeadlineExceeded), deadline("push", 0.1):
+            run_with_deadline(["git", "push", "nowhere"], capture_output=True)
+
+    def test_bundle_creation_waits_for_a_pack_slot(self):
+        """Bundle exports are pack operations and queue like the others."""
+        template = os.path.join(self.tmp, "template")
+        make_repo(template)
+        before = metrics.QUEUE_WAIT.count(kind="pack")
+        with patch.dict(os.environ, {governor.SLOTS_ENV: "pack=1"}):
+            self.hold("pack", 0.3)
+            started = time.monotonic()
+            bundles.export_bundle(template, os.path.join(self.tmp, "t.bundle"))
+            waited = time.monotonic() - started
+
+        self.assertGreaterEqual(waited, 0.2)
+        self.assertGreaterEqual(metrics.QUEUE_WAIT.count(kind="pack"), before + 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Tests for Git LFS object duplication against a local LFS stand-in server.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import lfs, watchdog
+from tests.git_helpers import make_repo
+
+
+def pointer(content):
+    """Build the pointer file text and object for some LFS content."""
+    oid = hashlib.sha256(content).hexdigest()
+    text = (
+        "version https://git-lfs.github.com/spec/v1\n"
+        f"oid sha256:{oid}\nsize {len(content)}\n"
+    )
+    return text, lfs.LfsObject(oid=oid, size=len(content))
+
+
+class LfsStandIn(BaseHTTPRequestHandler):
+    """Serves the LFS batch and basic transfer API for in-memory stores."""
+
+    stores = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", lfs.LFS_MEDIA_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        repo, _, rest = self.path.strip("/").partition("/")
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if rest != "objects/batch":
+            self._json({})
+            return
+        base = f"http://{self.headers['Host']}/{repo}/objects"
+        store = self.stores[repo]
+        objects = []
+        for obj in request["objects"]:
+            entry = dict(obj)
+            href = {"href": f"{base}/{obj['oid']}"}
+            if request["operation"] == "upload" and obj["oid"] not in store:
+                entry["actions"] = {"upload": href}
+            elif request["operation"] == "download" and obj["oid"] in store:
+                entry["actions"] = {"download": href}
+            elif request["operation"] == "download":
+                entry["error"] = {"code": 404, "message": "Object does not exist"}
+            objects.append(entry)
+        self._json({"transfer": "basic", "objects": objects})
+
+    def do_GET(self):
+        repo, _, oid = self.path.strip("/").partition("/objects/")
+        body = self.stores[repo][oid]
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        repo, _, oid = self.path.strip("/").partition("/objects/")
+        self.stores[repo][oid] = self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class TestLfs(unittest.TestCase):
+    """Test cases for listing and transferring LFS objects."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), LfsStandIn)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.contents = [f"large file {i}\n".encode() * 1000 for i in range(5)]
+        files = {"README.md": "template\n"}
+        self.objects = []
+        for i, content in enumerate(self.contents):
+            text, obj = pointer(content)
+            files[f"data/file{i}.bin"] = text
+            self.objects.append(obj)
+        self.repo = os.path.join(self.tmp, "template")
+        make_repo(self.repo, files)
+        LfsStandIn.stores.clear()
+        LfsStandIn.stores["src"] = {
+            obj.oid: content for obj, content in zip(self.objects, self.contents)
+        }
+        LfsStandIn.stores["dst"] = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def client(self, repo):
+        return lfs.LfsClient(f"{self.base_url}/{repo}")
+
+    def test_parse_pointer(self):
+        """Only well-formed pointer files are recognised."""
+        text, obj = pointer(b"data")
+        self.assertEqual(lfs.parse_pointer(text.encode()), obj)
+        self.assertIsNone(lfs.parse_pointer(b"just a regular file\n"))
+
+    def test_list_lfs_objects(self):
+        """All pointer files in the repository are found."""
+        found = lfs.list_lfs_objects(self.repo)
+        self.assertEqual(
+            sorted(o.oid for o in found), sorted(o.oid for o in self.objects)
+        )
+
+    def test_list_lfs_objects_runs_under_a_deadline(self):
+        """Listing is stopped when the LFS phase runs out of time."""
+        with watchdog.deadline("lfs", 1e-9):
+            with self.assertRaises(watchdog.DeadlineExceeded):
+                lfs.list_lfs_objects(self.repo)
+
+    def test_lfs_endpoint(self):
+        """SSH and HTTPS remotes map to the same LFS endpoint."""
+        expected = "https://github.com/user/repo.git/info/lfs"
+        self.assertEqual(lfs.lfs_endpoint("git@github.com:user/repo.git"), expected)
+        self.assertEqual(lfs.lfs_endpoint("https://github.com/user/repo"), expected)
+
+    def test_transfer_skips_objects_destination_has(self):
+        """Objects already at the destination are not transferred again."""
+        present = self.objects[0]
+        LfsStandIn.stores["dst"][present.oid] = self.contents[0]
+        progress = []
+
+        result = lfs.transfer_lfs_objects(
+            self.objects,
+            self.client("src"),
+            self.client("dst"),
+            jobs=3,
+            store=os.path.join(self.tmp, "store"),
+            on_progress=progress.append,
+        )
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.skipped, 1)
+        self.assertEqual(result.transferred, 4)
+        self.assertEqual(result.bytes_transferred, sum(map(len, self.contents[1:])))
+        self.assertEqual(progress[-1].done, 4)
+        for obj, content in zip(self.objects, self.contents):
+            self.assertEqual(LfsStandIn.stores["dst"][obj.oid], content)
+
+    def test_transfer_reports_missing_source_objects(self):
+        """Objects the source does not have are reported as failed."""
+        missing = self.objects[1]
+        del LfsStandIn.stores["src"][missing.oid]
+
+        result = lfs.transfer_lfs_objects(
+            self.objects,
+            self.client("src"),
+            self.client("dst"),
+            store=os.path.join(self.tmp, "store"),
+        )
+
+        self.assertFalse(result.success)
+        self.assertEqual(list(result.failed), [missing.oid])
+        self.assertEqual(result.transferred, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for pack maintenance of local template repositories.
+"""
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import maintenance
+from src.github_repo_duplicator.cache import CACHE_DIR_ENV
+from src.github_repo_duplicator.mirrors import ensure_mirror
+from tests.git_helpers import git, make_repo
+
+
+class TestMaintenance(unittest.TestCase):
+    """Test cases for repacking repositories for repeated pushes."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.template = os.path.join(self.tmp, "template")
+        make_repo(self.template)
+        for i in range(3):
+            with open(os.path.join(self.template, f"file{i}.txt"), "w") as f:
+                f.write(f"revision {i}\n")
+            git("add", "--all", cwd=self.template)
+            git("commit", "--quiet", "-m", f"Revision {i}", cwd=self.template)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def assert_optimized(self, git_dir):
+        """Check for a single bitmapped pack, a commit-graph and a midx."""
+        pack = os.path.join(git_dir, "objects", "pack")
+        self.assertEqual(len(glob.glob(os.path.join(pack, "*.pack"))), 1)
+        self.assertTrue(glob.glob(os.path.join(pack, "*.bitmap")))
+        self.assertTrue(os.path.exists(os.path.join(pack, "multi-pack-index")))
+        self.assertTrue(
+            os.path.exists(os.path.join(git_dir, "objects", "info", "commit-graph"))
+        )
+
+    def test_optimize_repository(self):
+        """Loose objects are packed with a bitmap, graph and index."""
+        self.assertTrue(maintenance.needs_maintenance(self.template))
+
+        self.assertTrue(maintenance.optimize_repository(self.template, threads=2))
+
+        self.assert_optimized(os.path.join(self.template, ".git"))
+        self.assertFalse(maintenance.needs_maintenance(self.template))
+        self.assertEqual(git("config", "pack.threads", cwd=self.template), "2")
+        # Already maintained repositories are left alone
+        self.assertFalse(maintenance.optimize_repository(self.template, threads=2))
+        git("fsck", cwd=self.template)
+
+    def test_failure_is_only_logged(self):
+        """A repository that cannot be maintained does not fail the caller."""
+        missing = os.path.join(self.tmp, "missing")
+        with self.assertLogs(maintenance.logger, "WARNING"):
+            self.assertFalse(maintenance.optimize_repository(missing))
+
+    def test_mirror_is_optimized_after_fetch(self):
+        """Mirrors are maintained when created and after each fetch."""
+        cache = {CACHE_DIR_ENV: os.path.join(self.tmp, "cache")}
+        with patch.dict(os.environ, cache):
+            mirror = ensure_mirror(self.template)
+            self.assert_optimized(mirror)
+
+            with open(os.path.join(self.template, "new.txt"), "w") as f:
+                f.write("new\n")
+            git("add", "--all", cwd=self.template)
+            git("commit", "--quiet", "-m", "New", cwd=self.template)
+            ensure_mirror(self.template)
+
+        self.assert_optimized(mirror)
+        self.assertEqual(
+            git("rev-parse", "main", cwd=mirror),
+            git("rev-parse", "main", cwd=self.template),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
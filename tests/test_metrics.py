@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the metrics subsystem.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import urllib.request
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for metric collection and OpenMetrics export."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.registry = metrics.Registry()
+        self.outcomes = self.registry.register(
+            metrics.Counter("dup_duplications", "Duplications.", ["outcome"])
+        )
+        self.latency = self.registry.register(
+            metrics.Histogram("dup_phase_seconds", "Latency.", ["phase"], [1, 5])
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_render_openmetrics(self):
+        """Counters and histograms render in the OpenMetrics text format."""
+        self.outcomes.inc(outcome="success")
+        self.outcomes.inc(outcome="success")
+        self.latency.observe(0.5, phase="push")
+        self.latency.observe(3, phase="push")
+
+        text = self.registry.render()
+
+        self.assertIn("# TYPE dup_duplications counter", text)
+        self.assertIn('dup_duplications_total{outcome="success"} 2', text)
+        self.assertIn('dup_phase_seconds_bucket{phase="push",le="1"} 1', text)
+        self.assertIn('dup_phase_seconds_bucket{phase="push",le="5"} 2', text)
+        self.assertIn('dup_phase_seconds_bucket{phase="push",le="+Inf"} 2', text)
+        self.assertIn('dup_phase_seconds_count{phase="push"} 2', text)
+        self.assertIn('dup_phase_seconds_sum{phase="push"} 3.5', text)
+        self.assertTrue(text.endswith("# EOF\n"))
+
+    def test_textfile_accumulates_across_runs(self):
+        """Each write adds this run's values to those already in the file."""
+        path = os.path.join(self.tmp, "duplicator.prom")
+        self.outcomes.inc(outcome="failure")
+        metrics.write_textfile(path, self.registry)
+        metrics.write_textfile(path, self.registry)
+
+        with open(path) as f:
+            samples = metrics.parse_samples(f.read())
+
+        self.assertEqual(samples['dup_duplications_total{outcome="failure"}'], 2)
+
+    def test_time_phase_records_failures_too(self):
+        """A phase that raises is still timed."""
+        before = metrics.PHASE_DURATION.count(phase="test-phase")
+        with self.assertRaises(RuntimeError):
+            with metrics.time_phase("test-phase"):
+                raise RuntimeError("boom")
+        self.assertEqual(metrics.PHASE_DURATION.count(phase="test-phase"), before + 1)
+
+    def test_serve_metrics(self):
+        """The HTTP endpoint serves the current metrics."""
+        self.outcomes.inc(outcome="success")
+        server = metrics.serve_metrics(0, registry=self.registry)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode()
+            content_type = response.headers["Content-Type"]
+
+        self.assertEqual(content_type, metrics.CONTENT_TYPE)
+        self.assertIn('dup_duplications_total{outcome="success"} 1', body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for the target name pre-check.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import github_api, precheck
+
+
+class TestPrecheck(unittest.TestCase):
+    """Test cases for rejecting doomed targets up front."""
+
+    def setUp(self):
+        patcher = patch.object(precheck, "viewer_login", return_value="me")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_name_error(self):
+        """Names are checked against GitHub's rules without the network."""
+        self.assertIsNone(precheck.name_error("my-repo.v2"))
+        self.assertIsNone(precheck.name_error("my-org/my_repo"))
+        self.assertIsNotNone(precheck.name_error("bad name"))
+        self.assertIsNotNone(precheck.name_error(".."))
+        self.assertIsNotNone(precheck.name_error("x" * 101))
+        self.assertIsNotNone(precheck.name_error("-org/repo"))
+        self.assertIsNotNone(precheck.name_error("a/b/c"))
+
+    @patch.object(precheck, "find_existing_repositories")
+    def test_precheck_names(self, mock_existing):
+        """Invalid, duplicate and taken names are rejected; others pass."""
+        mock_existing.return_value = {"me/taken"}
+
+        results = precheck.precheck_names(
+            ["free", "taken", "bad name", "FREE", "org/free"]
+        )
+
+        mock_existing.assert_called_once_with(["me/free", "me/taken", "org/free"])
+        self.assertEqual(
+            [r.error for r in results],
+            [
+                "",
+                "me/taken already exists",
+                "invalid repository name",
+                "duplicate name",
+                "",
+            ],
+        )
+
+    @patch.object(precheck, "find_existing_repositories")
+    def test_lookup_failure_keeps_local_checks(self, mock_existing):
+        """If GitHub cannot be asked, only local checks apply."""
+        mock_existing.side_effect = github_api.GitHubApiError("offline")
+
+        with self.assertLogs(precheck.logger, "WARNING"):
+            results = precheck.precheck_names(["free", "bad name"])
+
+        self.assertEqual([r.ok for r in results], [True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
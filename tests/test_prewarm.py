@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Tests for usage-driven template prewarming and warm mirror lookups.
+"""
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import mirrors, prewarm, registry, sync, workspace
+from src.github_repo_duplicator.cache import CACHE_DIR_ENV
+from src.github_repo_duplicator.registry import Registry, RegistryEntry
+from tests.git_helpers import git, make_repo
+
+
+class TestPrewarm(unittest.TestCase):
+    """Test cases for ranking templates and refreshing their mirrors."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        env = patch.dict(os.environ, {CACHE_DIR_ENV: os.path.join(self.tmp, "cache")})
+        env.start()
+        self.addCleanup(env.stop)
+        self.registry = Registry(os.path.join(self.tmp, "registry.sqlite3"))
+        self.template_dir = os.path.join(self.tmp, "template")
+        make_repo(self.template_dir)
+        self.template = f"file://{self.template_dir}"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def record(self, template, count, kind="duplicate", age_days=0):
+        for i in range(count):
+            self.registry.record(
+                RegistryEntry(
+                    template_url=template,
+                    repo_name=f"{kind}-{i}",
+                    outcome="success",
+                    kind=kind,
+                    created_at=time.time() - age_days * 86400,
+                )
+            )
+
+    def test_templates_are_ranked_by_recent_use(self):
+        """Recent duplications count; syncs, old runs and local paths do not."""
+        self.record("https://github.com/org/popular", 3)
+        self.record("https://github.com/org/rare", 1)
+        self.record("https://github.com/org/rare", 5, kind="sync")
+        self.record("https://github.com/org/old", 9, age_days=60)
+        self.record("/srv/templates/local", 9)
+
+        self.assertEqual(
+            prewarm.popular_templates(registry=self.registry),
+            [("https://github.com/org/popular", 3), ("https://github.com/org/rare", 1)],
+        )
+        self.assertEqual(
+            len(prewarm.popular_templates(top=1, registry=self.registry)), 1
+        )
+
+    def test_prewarm_creates_and_refreshes_mirrors(self):
+        """The most used templates get mirrors, and failures are reported."""
+        self.record(self.template, 2)
+        self.record("file:///nowhere/missing", 1)
+        seen = []
+
+        results = prewarm.prewarm(registry=self.registry, on_result=seen.append)
+
+        self.assertEqual([r.success for r in results], [True, False])
+        self.assertEqual(len(seen), 2)
+        self.assertIsNone(results[0].age)
+        self.assertTrue(os.path.isdir(mirrors.mirror_path(self.template)))
+        self.assertLess(mirrors.mirror_age(self.template), 60)
+
+    def test_current_mirror_fetches_only_when_stale(self):
+        """A warm mirror is used as is; a stale one is fetched first."""
+        self.assertIsNone(mirrors.current_mirror(self.template))
+        path = mirrors.ensure_mirror(self.template)
+
+        with patch.object(mirrors, "ensure_mirror") as refresh:
+            self.assertEqual(mirrors.current_mirror(self.template), path)
+        refresh.assert_not_called()
+
+        git("commit", "--quiet", "--allow-empty", "-m", "Later", cwd=self.template_dir)
+        self.assertEqual(mirrors.current_mirror(self.template), path)
+        self.assertEqual(
+            git("--git-dir", path, "rev-parse", "main"),
+            git("rev-parse", "main", cwd=self.template_dir),
+        )
+
+    def test_new_tags_make_a_mirror_stale(self):
+        """A tag pushed upstream is fetched even when no branch moved."""
+        path = mirrors.ensure_mirror(self.template)
+        git("tag", "v1.0", cwd=self.template_dir)
+        self.assertEqual(mirrors.current_mirror(self.template), path)
+        self.assertEqual(
+            git("--git-dir", path, "rev-parse", "v1.0"),
+            git("rev-parse", "v1.0", cwd=self.template_dir),
+        )
+
+    def test_mirrors_are_fetched_from_the_given_url(self):
+        """Mirrors are named by the normalized URL but fetched from the given one."""
+        key = "https://github.com/org/ssh-only"
+        path = mirrors.ensure_mirror(key, fetch_url=self.template)
+        self.assertEqual(path, mirrors.mirror_path(key))
+        git("commit", "--quiet", "--allow-empty", "-m", "Later", cwd=self.template_dir)
+        self.assertEqual(mirrors.current_mirror(key, self.template), path)
+        self.assertEqual(
+            git("--git-dir", path, "rev-parse", "main"),
+            git("rev-parse", "main", cwd=self.template_dir),
+        )
+
+    def test_prewarmed_mirrors_serve_every_spelling(self):
+        """Syncs, inventories and size estimates reuse the prewarmed mirror."""
+        self.record(self.template + "/", 1)
+        (result,) = prewarm.prewarm(registry=self.registry)
+        self.assertTrue(result.success, result.error)
+        mirror = mirrors.mirror_path(self.template)
+        sha = git("rev-parse", "HEAD", cwd=self.template_dir)
+
+        with patch.object(sync, "ensure_mirror", wraps=mirrors.ensure_mirror) as fetch:
+            sync.sync_repositories(self.template + "/", [])
+        fetch.assert_called_once_with(self.template, fetch_url=self.template + "/")
+        clones = glob.glob(os.path.join(os.path.dirname(mirror), "*.git"))
+        self.assertEqual(clones, [mirror])
+        self.assertIsNotNone(registry._mirror_commit_time(self.template + "/", sha))
+        self.assertEqual(
+            workspace.estimate_template_size(self.template + "/"),
+            workspace.directory_size(mirror),
+        )
+
+    def test_spellings_of_a_template_are_ranked_together(self):
+        """SSH and HTTPS uses of one template share a mirror and a count."""
+        self.record("https://github.com/org/app", 1)
+        self.record("git@github.com:org/app.git", 2)
+        self.assertEqual(
+            prewarm.popular_templates(registry=self.registry),
+            [("git@github.com:org/app.git", 3)],
+        )
+        with patch.object(prewarm, "ensure_mirror") as refresh:
+            prewarm.prewarm(registry=self.registry)
+        refresh.assert_called_once_with(
+            "https://github.com/org/app", fetch_url="git@github.com:org/app.git"
+        )
+
+    def test_background_prewarmer_runs_rounds(self):
+        """The prewarmer refreshes in rounds until stopped."""
+        with patch.object(prewarm, "prewarm", return_value=[]) as run:
+            prewarmer = prewarm.Prewarmer(interval=0.01)
+            prewarmer.start()
+            time.sleep(0.1)
+            prewarmer.stop()
+        self.assertGreaterEqual(run.call_count, 2)
+        self.assertEqual(prewarmer.rounds, run.call_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
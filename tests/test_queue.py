@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for the durable job queue and its workers.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from collections import Counter
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import jobqueue, metrics
+from src.github_repo_duplicator.api import DuplicationResult, ErrorKind
+
+TEMPLATE = "https://github.com/org/template"
+
+
+class FakeDuplicator:
+    """Records the jobs it runs and fails the names it is told to."""
+
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.runs = Counter()
+        self.lock = threading.Lock()
+
+    def duplicate(self, template, name, **options):
+        with self.lock:
+            self.runs[name] += 1
+        time.sleep(0.01)
+        kind = self.failures.get(name)
+        return DuplicationResult(
+            template_url=template,
+            repo_name=name,
+            success=kind is None,
+            error_kind=kind,
+            error=kind or "",
+            repo_url=f"https://github.com/me/{name}",
+        )
+
+
+class TestJobQueue(unittest.TestCase):
+    """Test cases for enqueueing, leases and workers."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.queue = jobqueue.JobQueue(os.path.join(self.tmp, "queue.sqlite3"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_names_are_queued_once(self):
+        """Enqueueing a batch again adds only the new names."""
+        first = self.queue.enqueue(TEMPLATE, ["a", "b"], {"private": False})
+        again = self.queue.enqueue(TEMPLATE, ["b", "c"])
+
+        self.assertEqual(len([i for i in first if i]), 2)
+        self.assertIsNone(again[0])
+        self.assertEqual(self.queue.counts()[jobqueue.QUEUED], 3)
+        self.assertEqual(self.queue.jobs()[0].options, {"private": False})
+        with self.assertRaises(jobqueue.QueueError):
+            self.queue.enqueue(TEMPLATE, ["d"], {"work_dir": "/tmp"})
+
+    def test_expired_leases_are_reclaimed_and_fenced(self):
+        """A crashed worker's job moves on, and the old lease is useless."""
+        self.queue.enqueue(TEMPLATE, ["a"], max_attempts=2)
+        crashed = self.queue.claim("host1:1", lease=0.05)
+        self.assertIsNone(self.queue.claim("host2:1"))
+
+        time.sleep(0.1)
+        job = self.queue.claim("host2:1", lease=60)
+        self.assertEqual((job.repo_name, job.attempts), ("a", 2))
+        self.assertFalse(self.queue.heartbeat(crashed))
+        self.assertFalse(self.queue.finish(crashed, True))
+        self.assertTrue(self.queue.heartbeat(job))
+        self.assertTrue(self.queue.finish(job, True, result={"repo_url": "u"}))
+        done = self.queue.jobs([jobqueue.SUCCEEDED])[0]
+        self.assertEqual((done.worker, done.result), ("host2:1", {"repo_url": "u"}))
+
+    def test_attempts_are_limited(self):
+        """Retries and expired leases stop after the last attempt."""
+        self.queue.enqueue(TEMPLATE, ["a"], max_attempts=2)
+        job = self.queue.claim("w")
+        retries = metrics.RETRIES.value(phase="job")
+        self.assertTrue(self.queue.finish(job, False, "push failed", retry=True))
+        self.assertEqual(self.queue.counts()[jobqueue.QUEUED], 1)
+        self.assertEqual(metrics.RETRIES.value(phase="job"), retries + 1)
+
+        self.queue.claim("w", lease=0.01)
+        time.sleep(0.05)
+        self.assertIsNone(self.queue.claim("w"))
+        failed = self.queue.jobs([jobqueue.FAILED])[0]
+        self.assertIn("lease", failed.error)
+
+        self.assertEqual(self.queue.retry_failed(), 1)
+        job = self.queue.claim("w")
+        self.assertEqual(job.attempts, 1)
+        self.assertTrue(self.queue.release(job))
+        self.assertEqual(self.queue.claim("w").attempts, 1)
+
+    def test_workers_share_a_queue_without_running_a_job_twice(self):
+        """Several workers drain the queue, each job run exactly once."""
+        names = [f"repo-{i}" for i in range(40)]
+        self.queue.enqueue(TEMPLATE, names)
+        duplicator = FakeDuplicator({"repo-7": ErrorKind.NAME_TAKEN})
+        workers = [
+            jobqueue.Worker(
+                jobqueue.JobQueue(self.queue.path),
+                duplicator,
+                worker_id=f"host{i}:1",
+                max_jobs=3,
+            )
+            for i in range(3)
+        ]
+        threads = [
+            threading.Thread(target=w.run, kwargs={"exit_when_empty": True})
+            for w in workers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(set(duplicator.runs), set(names))
+        self.assertEqual(max(duplicator.runs.values()), 1)
+        self.assertEqual(sum(w.completed for w in workers), 40)
+        counts = self.queue.counts()
+        self.assertEqual((counts["succeeded"], counts["failed"]), (39, 1))
+
+    def test_cancelled_jobs_are_returned(self):
+        """A job cancelled by a stopping worker is queued for another."""
+        self.queue.enqueue(TEMPLATE, ["a"])
+        worker = jobqueue.Worker(
+            self.queue, FakeDuplicator({"a": ErrorKind.CANCELLED}), worker_id="w"
+        )
+        worker._run_job(self.queue.claim("w"))
+
+        job = self.queue.jobs()[0]
+        self.assertEqual((job.state, job.attempts), (jobqueue.QUEUED, 0))
+        self.assertEqual(worker.completed, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
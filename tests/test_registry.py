@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for the local duplication registry.
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator.registry import (
+    Registry,
+    RegistryEntry,
+    RegistryError,
+    normalize_repo_name,
+    normalize_template_url,
+)
+
+TEMPLATE = "https://github.com/org/template"
+
+
+class TestRegistry(unittest.TestCase):
+    """Test cases for recording and querying duplications."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.registry = Registry(os.path.join(self.tmp, "registry.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def record(self, repo, sha, commit_time, outcome="success", **fields):
+        """Record an entry for the test template."""
+        return self.registry.record(
+            RegistryEntry(
+                template_url=fields.pop("template_url", TEMPLATE),
+                repo_name=repo,
+                outcome=outcome,
+                template_sha=sha,
+                template_commit_time=commit_time,
+                **fields,
+            )
+        )
+
+    def test_history_is_newest_first_and_filtered(self):
+        """History lists entries newest first, by template or repository."""
+        self.record("alice", "a" * 40, 100, timings={"push": 1.5})
+        self.record("bob", "a" * 40, 100, outcome="failure", error="push failed")
+        self.record("carol", "c" * 40, 300, template_url="git@github.com:o/other")
+
+        history = self.registry.history()
+        self.assertEqual([e.repo_name for e in history], ["carol", "bob", "alice"])
+        self.assertEqual(history[2].timings, {"push": 1.5})
+        self.assertEqual(history[1].error, "push failed")
+
+        from_template = self.registry.history(template_url=TEMPLATE + ".git")
+        self.assertEqual([e.repo_name for e in from_template], ["bob", "alice"])
+        self.assertEqual(len(self.registry.history(repo_name="alice")), 1)
+        self.assertEqual(len(self.registry.history(limit=1)), 1)
+
+    def test_inventory_uses_latest_successful_entry(self):
+        """A later sync moves a repository to the new template commit."""
+        self.record("alice", "a" * 40, 100)
+        self.record("bob", "a" * 40, 100)
+        self.record("alice", "b" * 40, 200, kind="sync")
+        self.record("bob", "b" * 40, 200, outcome="conflict", kind="sync")
+
+        inventory = {e.repo_name: e.template_sha for e in self.registry.inventory()}
+
+        self.assertEqual(inventory, {"alice": "b" * 40, "bob": "a" * 40})
+
+    def test_inventory_older_than(self):
+        """Only repositories based on older template commits are listed."""
+        self.record("old", "a" * 40, 100)
+        self.record("new", "b" * 40, 200)
+
+        stale = self.registry.inventory(TEMPLATE, older_than="bbbbbbb")
+
+        self.assertEqual([e.repo_name for e in stale], ["old"])
+        with self.assertRaises(RegistryError):
+            self.registry.inventory(TEMPLATE, older_than="1234567")
+
+    def test_normalize_template_url(self):
+        """SSH and HTTPS spellings of a template are the same template."""
+        for url in (
+            "https://github.com/org/template",
+            "https://github.com/org/template.git",
+            "https://github.com/org/template/",
+            "git@github.com:org/template.git",
+        ):
+            self.assertEqual(normalize_template_url(url), TEMPLATE)
+
+    def test_registries_from_older_releases_are_upgraded(self):
+        """Missing columns are added, and old entries rank by their key."""
+        path = os.path.join(self.tmp, "old.db")
+        with sqlite3.connect(path) as db:
+            db.execute(
+                "CREATE TABLE duplications (id INTEGER PRIMARY KEY,"
+                " created_at REAL NOT NULL, kind TEXT NOT NULL,"
+                " template_url TEXT NOT NULL, template_sha TEXT NOT NULL DEFAULT '',"
+                " template_commit_time INTEGER, repo_name TEXT NOT NULL,"
+                " repo_url TEXT NOT NULL DEFAULT '', visibility TEXT NOT NULL"
+                " DEFAULT '', outcome TEXT NOT NULL, error TEXT NOT NULL DEFAULT '',"
+                " duration REAL, timings TEXT NOT NULL DEFAULT '{}')"
+            )
+            db.execute(
+                "INSERT INTO duplications (created_at, kind, template_url,"
+                " repo_name, outcome) VALUES (1, 'duplicate', ?, 'old', 'success')",
+                (TEMPLATE,),
+            )
+        db.close()
+
+        registry = Registry(path)
+
+        self.assertEqual(registry.template_usage(), [(TEMPLATE, 1)])
+        self.assertEqual([e.repo_name for e in registry.history()], ["old"])
+
+    def test_normalize_repo_name(self):
+        """GitHub repositories are named as owner/name however they were given."""
+        cases = [
+            ("app", "https://github.com/org/app", "org/app"),
+            ("git@github.com:org/app.git", "", "org/app"),
+            ("https://github.com/org/app.git", "", "org/app"),
+            ("org/app", "", "org/app"),
+            ("/srv/repos/app.git", "/srv/repos/app.git", "/srv/repos/app.git"),
+        ]
+        for repo, url, expected in cases:
+            self.assertEqual(normalize_repo_name(repo, url), expected, repo)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests for transactional rollback and orphan cleanup.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import rollback
+from src.github_repo_duplicator.registry import CreatedResource, Registry
+
+
+class TestRollback(unittest.TestCase):
+    """Test cases for rolling back failed jobs and cleaning up orphans."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.registry = Registry(os.path.join(self.tmp, "registry.db"))
+        self.deleted = []
+        patcher = patch.object(
+            rollback, "delete_repository", side_effect=self.deleted.append
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def transaction(self, policy="auto"):
+        return rollback.JobTransaction("fan-out:test", policy, self.registry)
+
+    def states(self):
+        return {
+            r.target: r.state
+            for r in self.registry.resources(
+                [rollback.PENDING, rollback.COMMITTED, rollback.ORPHANED]
+                + [rollback.ROLLED_BACK]
+            )
+        }
+
+    def test_auto_keeps_repositories_with_pushed_content(self):
+        """Empty repositories and directories go; pushed ones become orphans."""
+        directory = os.path.join(self.tmp, "clone")
+        os.makedirs(directory)
+        transaction = self.transaction()
+        transaction.created_repository("empty")
+        transaction.created_repository("pushed")
+        transaction.pushed("pushed")
+        transaction.created_directory(directory)
+
+        results = transaction.rollback()
+
+        self.assertEqual(
+            [(r.target, r.removed) for r in results],
+            [(directory, True), ("pushed", False), ("empty", True)],
+        )
+        self.assertEqual(self.deleted, ["empty"])
+        self.assertFalse(os.path.exists(directory))
+        self.assertEqual(
+            self.states(),
+            {
+                "empty": rollback.ROLLED_BACK,
+                "pushed": rollback.ORPHANED,
+                directory: rollback.ROLLED_BACK,
+            },
+        )
+
+    def test_policies(self):
+        """Each policy removes what it promises; committed jobs keep everything."""
+        always = self.transaction("always")
+        always.created_repository("a")
+        always.pushed("a")
+        never = self.transaction("never")
+        never.created_repository("b")
+        done = self.transaction()
+        done.created_repository("c")
+
+        always.rollback()
+        never.rollback()
+        done.commit()
+
+        self.assertEqual(self.deleted, ["a"])
+        self.assertEqual(
+            self.states(),
+            {
+                "a": rollback.ROLLED_BACK,
+                "b": rollback.ORPHANED,
+                "c": rollback.COMMITTED,
+            },
+        )
+        with self.assertRaises(ValueError):
+            self.transaction("sometimes")
+
+    def test_failed_delete_is_journaled_as_orphan(self):
+        """A repository that cannot be deleted stays an orphan with the error."""
+        transaction = self.transaction()
+        transaction.created_repository("stuck")
+
+        with patch.object(
+            rollback,
+            "delete_repository",
+            side_effect=rollback.RollbackError("needs delete_repo"),
+        ), self.assertLogs(rollback.logger, "WARNING"):
+            (result,) = transaction.rollback()
+
+        self.assertFalse(result.removed)
+        (orphan,) = rollback.find_orphans(registry=self.registry)
+        self.assertEqual((orphan.target, orphan.error), ("stuck", "needs delete_repo"))
+
+    def test_cleanup_removes_orphans_and_stale_pending(self):
+        """Cleanup finds orphans and abandoned jobs, and removes them."""
+        for target, state, age in [
+            ("orphan", rollback.ORPHANED, 0),
+            ("abandoned", rollback.PENDING, 3600),
+            ("running", rollback.PENDING, 0),
+            ("kept", rollback.COMMITTED, 3600),
+        ]:
+            self.registry.add_resource(
+                CreatedResource(
+                    job="fan-out:test",
+                    kind=rollback.REPOSITORY,
+                    target=target,
+                    state=state,
+                    created_at=time.time() - age,
+                )
+            )
+
+        orphans = rollback.find_orphans(min_age=60, registry=self.registry)
+        self.assertEqual([o.target for o in orphans], ["orphan", "abandoned"])
+
+        seen = []
+        results = rollback.cleanup_orphans(
+            orphans, max_workers=2, on_result=seen.append, registry=self.registry
+        )
+
+        self.assertTrue(all(r.removed for r in results))
+        self.assertEqual(len(seen), 2)
+        self.assertEqual(sorted(self.deleted), ["abandoned", "orphan"])
+        self.assertEqual(rollback.find_orphans(min_age=60, registry=self.registry), [])
+
+    def test_cleanup_keeps_repositories_with_pushed_content(self):
+        """Repositories kept for their content are removed only on request."""
+        for target, pushed in [("empty", False), ("pushed", True)]:
+            self.registry.add_resource(
+                CreatedResource(
+                    job="fan-out:test",
+                    kind=rollback.REPOSITORY,
+                    target=target,
+                    state=rollback.ORPHANED,
+                    pushed=pushed,
+                )
+            )
+        orphans = rollback.find_orphans(registry=self.registry)
+
+        results = rollback.cleanup_orphans(orphans, registry=self.registry)
+        self.assertEqual([r.target for r in results], ["empty"])
+        self.assertEqual(self.deleted, ["empty"])
+
+        orphans = rollback.find_orphans(registry=self.registry)
+        self.assertEqual([o.target for o in orphans], ["pushed"])
+        rollback.cleanup_orphans(orphans, registry=self.registry, include_pushed=True)
+        self.assertEqual(self.deleted, ["empty", "pushed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
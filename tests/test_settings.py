@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Tests for declarative post-create repository settings.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import settings
+from src.github_repo_duplicator.fanout import read_names_file
+
+SETTINGS = {
+    "repository": {"default_branch": "main", "has_wiki": False},
+    "topics": ["Python", "template"],
+    "branch_protection": {"main": {"enforce_admins": True}},
+    "collaborators": {"alice": "push"},
+    "labels": [{"name": "bug", "color": "d73a4a"}],
+}
+
+
+class FakeGitHub(BaseHTTPRequestHandler):
+    """Just enough of the GitHub REST API for one repository."""
+
+    protocol_version = "HTTP/1.1"
+    state = {}
+    connections = set()
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def handle_request(self):
+        FakeGitHub.connections.add(self.client_address)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        state, path = FakeGitHub.state, self.path
+        if path == "/repos/me/app":
+            if self.command == "PATCH":
+                state["repo"].update(body)
+            return self.reply(200, state["repo"])
+        if path == "/repos/me/app/topics":
+            if self.command == "PUT":
+                state["topics"] = body["names"]
+            return self.reply(200, {"names": state["topics"]})
+        if path == "/repos/me/app/branches/main/protection":
+            if self.command == "PUT":
+                # Read back the way GitHub reports it
+                state["protection"] = {
+                    k: {"enabled": v} if isinstance(v, bool) else v
+                    for k, v in body.items()
+                }
+            elif "protection" not in state:
+                return self.reply(404, {"message": "Branch not protected"})
+            return self.reply(200, state["protection"])
+        if path == "/repos/me/app/collaborators/alice/permission":
+            # The repository is public: everyone can read it
+            role = state["collaborators"].get("alice", "read")
+            return self.reply(200, {"role_name": role})
+        if path == "/repos/me/app/collaborators/alice":
+            if self.command == "PUT":
+                state["collaborators"]["alice"] = {"pull": "read"}.get(
+                    body["permission"], "write"
+                )
+                return self.reply(201, {})
+            return self.reply(204 if "alice" in state["collaborators"] else 404)
+        if path == "/repos/me/app/labels" and self.command == "POST":
+            state["labels"][body["name"]] = body
+            return self.reply(201, body)
+        if path.startswith("/repos/me/app/labels/"):
+            label = state["labels"].get(path.rsplit("/", 1)[1])
+            if label and self.command == "PATCH":
+                label.update(body)
+            return self.reply(200 if label else 404, label or {"message": "Not Found"})
+        return self.reply(404, {"message": "Not Found"})
+
+    do_GET = do_PATCH = do_PUT = do_POST = handle_request
+
+
+class TestSettings(unittest.TestCase):
+    """Test cases for applying settings idempotently and concurrently."""
+
+    def setUp(self):
+        FakeGitHub.state = {
+            "repo": {"default_branch": "main", "has_wiki": True},
+            "topics": [],
+            "collaborators": {},
+            "labels": {"bug": {"name": "bug", "color": "ffffff"}},
+        }
+        FakeGitHub.connections = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGitHub)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = settings.ApiClient(
+            "token", f"http://127.0.0.1:{self.server.server_port}"
+        )
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_settings_are_applied_once(self):
+        """Only differing settings are written; a second run changes nothing."""
+        repo_settings = settings.RepoSettings.from_dict(SETTINGS)
+
+        first = settings.apply_settings("me/app", repo_settings, self.client)
+        second = settings.apply_settings("me/app", repo_settings, self.client)
+
+        self.assertEqual(
+            {r.setting: r.status for r in first},
+            {
+                "repository": "updated",
+                "topics": "updated",
+                "branch_protection:main": "updated",
+                "collaborator:alice": "created",
+                "label:bug": "updated",
+            },
+        )
+        self.assertEqual([r.status for r in second], ["unchanged"] * 5)
+        state = FakeGitHub.state
+        self.assertFalse(state["repo"]["has_wiki"])
+        self.assertEqual(state["topics"], ["python", "template"])
+        self.assertEqual(state["labels"]["bug"]["color"], "d73a4a")
+        # All the requests share a handful of pooled connections
+        self.assertLessEqual(len(FakeGitHub.connections), 5)
+
+    def test_read_access_of_public_repositories_is_not_membership(self):
+        """A user who can only read a public repository is still added."""
+        repo_settings = settings.RepoSettings(collaborators={"alice": "pull"})
+
+        (first,) = settings.apply_settings("me/app", repo_settings, self.client)
+        (second,) = settings.apply_settings("me/app", repo_settings, self.client)
+
+        self.assertEqual((first.status, second.status), ("created", "unchanged"))
+
+    def test_protection_left_out_counts_as_a_change(self):
+        """Protection differing in a setting the rules omit is written again."""
+        rules = {"main": {"enforce_admins": True}}
+        repo_settings = settings.RepoSettings(branch_protection=rules)
+        settings.apply_settings("me/app", repo_settings, self.client)
+        FakeGitHub.state["protection"]["allow_force_pushes"] = {"enabled": True}
+
+        (result,) = settings.apply_settings("me/app", repo_settings, self.client)
+
+        self.assertEqual(result.status, "updated")
+        self.assertNotIn("allow_force_pushes", FakeGitHub.state["protection"])
+
+    def test_failed_setting_does_not_stop_others(self):
+        """Each setting reports its own outcome."""
+        repo_settings = settings.RepoSettings(
+            topics=["python"], collaborators={"ghost": "push"}
+        )
+
+        results = settings.apply_settings("me/app", repo_settings, self.client)
+
+        self.assertEqual([r.ok for r in results], [True, False])
+        self.assertIn("HTTP 404", results[1].error)
+
+    def test_unknown_settings_are_rejected(self):
+        """Typos in settings files are errors, not silently ignored."""
+        path = os.path.join(self.tmp, "settings.json")
+        with open(path, "w") as f:
+            json.dump({"topic": ["python"]}, f)
+
+        with self.assertRaisesRegex(settings.SettingsError, "topic"):
+            settings.load_settings(path)
+
+    def test_manifest_columns(self):
+        """Manifest columns become per-repository settings."""
+        path = os.path.join(self.tmp, "manifest.csv")
+        with open(path, "w") as f:
+            f.write("# targets\n")
+            f.write("Name,topics,collaborators,description\n")
+            f.write("alice-cv,cv resume,alice:admin bob,Alice's CV\n")
+            f.write("bob-cv,,,\n")
+
+        manifest = settings.read_manifest_settings(path)
+
+        self.assertEqual(read_names_file(path), ["alice-cv", "bob-cv"])
+        self.assertEqual(manifest["alice-cv"].topics, ["cv", "resume"])
+        self.assertEqual(
+            manifest["alice-cv"].collaborators, {"alice": "admin", "bob": "push"}
+        )
+        self.assertEqual(manifest["alice-cv"].repository["description"], "Alice's CV")
+        self.assertFalse(manifest["bob-cv"])
+        merged = settings.RepoSettings(topics=["x"], labels=[{"name": "a"}]).merged(
+            manifest["alice-cv"]
+        )
+        self.assertEqual(
+            (merged.topics, merged.labels), (["cv", "resume"], [{"name": "a"}])
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
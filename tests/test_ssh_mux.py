@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for SSH connection multiplexing.
+"""
+
+import os
+import shlex
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import ssh_mux
+
+
+@unittest.skipUnless(ssh_mux.multiplexing_supported(), "ssh is not available")
+class TestSshMultiplexer(unittest.TestCase):
+    """Test cases for sharing SSH connections through a control socket."""
+
+    def setUp(self):
+        env = patch.dict(os.environ)
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop("GIT_SSH_COMMAND", None)
+
+    @patch.object(ssh_mux.subprocess, "run")
+    def test_git_uses_control_socket_while_active(self, mock_run):
+        """GIT_SSH_COMMAND points at a private socket until stopped."""
+        with ssh_mux.SshMultiplexer(control_persist="30s") as mux:
+            control_dir = mux.control_dir
+            command = shlex.split(os.environ["GIT_SSH_COMMAND"])
+            self.assertEqual(command[0], "ssh")
+            self.assertIn("ControlMaster=auto", command)
+            self.assertIn("ControlPersist=30s", command)
+            self.assertIn(f"ControlPath={control_dir}/%C", command)
+            self.assertEqual(os.stat(control_dir).st_mode & 0o777, 0o700)
+            self.assertEqual(ssh_mux.ssh_command_args(), command)
+
+        self.assertNotIn("GIT_SSH_COMMAND", os.environ)
+        self.assertFalse(os.path.exists(control_dir))
+        exit_args = mock_run.call_args[0][0]
+        self.assertEqual(exit_args[-3:], ["-O", "exit", "git@github.com"])
+
+    @patch.object(ssh_mux.subprocess, "run")
+    def test_existing_ssh_command_is_extended(self, mock_run):
+        """A user-configured ssh command keeps its options."""
+        os.environ["GIT_SSH_COMMAND"] = "ssh -i /keys/deploy"
+
+        with ssh_mux.SshMultiplexer():
+            command = os.environ["GIT_SSH_COMMAND"]
+            self.assertTrue(command.startswith("ssh -i /keys/deploy -o"))
+
+        self.assertEqual(os.environ["GIT_SSH_COMMAND"], "ssh -i /keys/deploy")
+
+    def test_inactive_multiplexer_adds_no_options(self):
+        """Without start, nothing changes."""
+        mux = ssh_mux.SshMultiplexer()
+
+        self.assertEqual(mux.ssh_options(), [])
+        mux.stop()
+        self.assertNotIn("GIT_SSH_COMMAND", os.environ)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for submodule handling.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import submodules
+from src.github_repo_duplicator.cache import CACHE_DIR_ENV
+from src.github_repo_duplicator.git_backend import FALLBACK_IDENTITY
+from src.github_repo_duplicator.mirrors import mirror_path
+from tests.git_helpers import GIT_IDENTITY, git, make_repo, without_identity
+
+# Local submodule URLs are refused by default since git 2.38.1
+ALLOW_FILE_PROTOCOL = {
+    "GIT_CONFIG_COUNT": "1",
+    "GIT_CONFIG_KEY_0": "protocol.file.allow",
+    "GIT_CONFIG_VALUE_0": "always",
+}
+
+
+class TestSubmodules(unittest.TestCase):
+    """Test cases for checking out and rewriting submodules."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        env = patch.dict(
+            os.environ,
+            dict(
+                ALLOW_FILE_PROTOCOL,
+                **GIT_IDENTITY,
+                **{CACHE_DIR_ENV: os.path.join(self.tmp, "cache")},
+            ),
+        )
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.library = os.path.join(self.tmp, "library")
+        self.library_head = make_repo(self.library, {"lib.py": "VALUE = 1\n"})
+        self.template = os.path.join(self.tmp, "template")
+        make_repo(self.template)
+        git("submodule", "--quiet", "add", self.library, "lib", cwd=self.template)
+        git("commit", "--quiet", "-m", "Add library", cwd=self.template)
+        self.clone = os.path.join(self.tmp, "clone")
+        git("clone", "--quiet", self.template, self.clone)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_list_submodules(self):
+        """Submodules are read from .gitmodules."""
+        self.assertEqual(
+            submodules.list_submodules(self.clone),
+            [submodules.Submodule(name="lib", path="lib", url=self.library)],
+        )
+
+    def test_relative_urls_resolve_against_origin(self):
+        """Relative submodule URLs are resolved like git does."""
+        with patch.object(submodules, "_git", return_value="git@github.com:o/a.git"):
+            resolve = submodules._resolve_relative_url
+            self.assertEqual(resolve(self.clone, "../b.git"), "git@github.com:o/b.git")
+            self.assertEqual(resolve(self.clone, "./b"), "git@github.com:o/a.git/b")
+
+    def test_update_submodules(self):
+        """Submodules are checked out at the recorded commit."""
+        checked_out = submodules.update_submodules(self.clone, jobs=2)
+
+        self.assertEqual([s.name for s in checked_out], ["lib"])
+        lib = os.path.join(self.clone, "lib")
+        self.assertEqual(git("rev-parse", "HEAD", cwd=lib), self.library_head)
+
+    def test_update_submodules_from_mirror_cache(self):
+        """Mirrored submodules end up pointing at their real URL."""
+        submodules.update_submodules(self.clone, use_mirror_cache=True)
+
+        lib = os.path.join(self.clone, "lib")
+        self.assertTrue(os.path.isdir(mirror_path(self.library)))
+        self.assertEqual(git("rev-parse", "HEAD", cwd=lib), self.library_head)
+        self.assertEqual(git("remote", "get-url", "origin", cwd=lib), self.library)
+        self.assertEqual(
+            git("config", "submodule.lib.url", cwd=self.clone), self.library
+        )
+
+    def test_github_owner_rewriter(self):
+        """GitHub URLs move to the new owner; other hosts are left alone."""
+        rewrite = submodules.github_owner_rewriter("students")
+        self.assertEqual(
+            rewrite("git@github.com:upstream/lib.git"),
+            "https://github.com/students/lib.git",
+        )
+        self.assertEqual(
+            rewrite("https://github.com/upstream/lib"),
+            "https://github.com/students/lib.git",
+        )
+        self.assertIsNone(rewrite("https://gitlab.com/upstream/lib.git"))
+
+    def test_rewrite_submodule_urls_commits_change(self):
+        """Rewritten URLs are committed to .gitmodules."""
+        new_url = "https://github.com/students/library.git"
+
+        changed = submodules.rewrite_submodule_urls(self.clone, lambda url: new_url)
+
+        self.assertEqual(changed, {"lib": new_url})
+        self.assertEqual(
+            git("config", "-f", ".gitmodules", "submodule.lib.url", cwd=self.clone),
+            new_url,
+        )
+        self.assertEqual(git("status", "--porcelain", cwd=self.clone), "")
+
+    def test_rewrite_commits_without_a_configured_identity(self):
+        """Hosts without a git identity still get the rewrite committed."""
+        new_url = "https://github.com/students/library.git"
+
+        with without_identity():
+            submodules.rewrite_submodule_urls(self.clone, lambda url: new_url)
+
+        self.assertEqual(
+            git("log", "-1", "--format=%an", cwd=self.clone),
+            FALLBACK_IDENTITY["user.name"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Tests for syncing template updates into downstream repositories.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import sync
+from src.github_repo_duplicator.cache import CACHE_DIR_ENV
+from src.github_repo_duplicator.registry import RegistryEntry, get_registry
+from src.github_repo_duplicator.workspace import WORKSPACE_ROOT_ENV
+from tests.git_helpers import (
+    GIT_IDENTITY,
+    git,
+    make_bare,
+    make_repo,
+    without_identity,
+)
+
+
+def commit_file(repo, name, content, message):
+    """Write a file in a work tree and commit it."""
+    with open(os.path.join(repo, name), "w") as f:
+        f.write(content)
+    git("add", name, cwd=repo)
+    git("commit", "--quiet", "-m", message, cwd=repo)
+    return git("rev-parse", "HEAD", cwd=repo)
+
+
+class TestSync(unittest.TestCase):
+    """Test cases for propagating template changes downstream."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        env = patch.dict(
+            os.environ,
+            dict(
+                GIT_IDENTITY,
+                **{
+                    CACHE_DIR_ENV: os.path.join(self.tmp, "cache"),
+                    WORKSPACE_ROOT_ENV: os.path.join(self.tmp, "work"),
+                },
+            ),
+        )
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.template = os.path.join(self.tmp, "template")
+        self.base = make_repo(
+            self.template, {"README.md": "template\n", "config.txt": "a = 1\n"}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def duplicate(self, name, record_base=True):
+        """Create a downstream repository the way a duplication does."""
+        remote = make_bare(os.path.join(self.tmp, f"{name}.git"))
+        refspecs = ["main"]
+        if record_base:
+            refspecs.append(f"HEAD:{sync.TEMPLATE_BASE_REF}")
+        git("push", "--quiet", remote, *refspecs, cwd=self.template)
+        git("--git-dir", remote, "symbolic-ref", "HEAD", "refs/heads/main")
+        clone = os.path.join(self.tmp, f"{name}-clone")
+        git("clone", "--quiet", remote, clone)
+        return remote, clone
+
+    def test_sync_merges_template_changes(self):
+        """Template changes merge next to downstream changes."""
+        remote, clone = self.duplicate("student")
+        commit_file(clone, "notes.md", "mine\n", "Add notes")
+        git("push", "--quiet", "origin", "main", cwd=clone)
+        new_sha = commit_file(self.template, "config.txt", "a = 2\n", "Fix config")
+
+        (result,) = sync.sync_repositories(self.template, [remote])
+
+        self.assertEqual(result.status, "updated", result.error)
+        self.assertEqual(result.base, self.base)
+        self.assertEqual(result.template_sha, new_sha)
+        self.assertEqual(
+            git("--git-dir", remote, "rev-parse", sync.TEMPLATE_BASE_REF), new_sha
+        )
+        files = git("--git-dir", remote, "ls-tree", "--name-only", "main")
+        self.assertIn("notes.md", files.splitlines())
+        self.assertEqual(git("--git-dir", remote, "show", "main:config.txt"), "a = 2")
+
+    def test_sync_patch_strategy_and_up_to_date(self):
+        """Patches apply as one commit; a second sync finds nothing to do."""
+        remote, _ = self.duplicate("patched")
+        commit_file(self.template, "config.txt", "a = 3\n", "Fix config")
+
+        (first,) = sync.sync_repositories(self.template, [remote], strategy="patch")
+        (second,) = sync.sync_repositories(self.template, [remote], strategy="patch")
+
+        self.assertEqual(first.status, "updated", first.error)
+        message = git("--git-dir", remote, "log", "-1", "--format=%s", "main")
+        self.assertTrue(message.startswith("Apply template changes"))
+        self.assertEqual(second.status, "up-to-date")
+
+    def test_patch_keeps_trailing_context(self):
+        """A diff ending in context lines applies as it was generated."""
+        commit_file(self.template, "lines.txt", "l1\nl2\nl3\n\n", "Add lines")
+        remote, _ = self.duplicate("context")
+        commit_file(self.template, "lines.txt", "l1\nL2\nl3\n\n", "Edit line 2")
+
+        (result,) = sync.sync_repositories(self.template, [remote], strategy="patch")
+
+        self.assertEqual(result.status, "updated", result.conflicts)
+        self.assertEqual(
+            git("--git-dir", remote, "show", "main:lines.txt"), "l1\nL2\nl3"
+        )
+
+    def test_sync_without_a_configured_identity(self):
+        """Merges and patch commits work on hosts without a git identity."""
+        merged, clone = self.duplicate("merged")
+        commit_file(clone, "notes.md", "mine\n", "Add notes")
+        git("push", "--quiet", "origin", "main", cwd=clone)
+        patched, _ = self.duplicate("patched")
+        commit_file(self.template, "config.txt", "a = 2\n", "Fix config")
+
+        with without_identity():
+            (merge,) = sync.sync_repositories(self.template, [merged])
+            (patch_result,) = sync.sync_repositories(
+                self.template, [patched], strategy="patch"
+            )
+
+        self.assertEqual(merge.status, "updated", merge.error)
+        self.assertEqual(patch_result.status, "updated", patch_result.error)
+
+    def test_conflicts_are_reported_per_repository(self):
+        """A conflicting repository is left alone while others update."""
+        clean, _ = self.duplicate("clean")
+        conflicting, clone = self.duplicate("conflicting")
+        commit_file(clone, "config.txt", "a = 10\n", "Local config")
+        git("push", "--quiet", "origin", "main", cwd=clone)
+        local_head = git("--git-dir", conflicting, "rev-parse", "main")
+        commit_file(self.template, "config.txt", "a = 2\n", "Fix config")
+
+        results = sync.sync_repositories(
+            self.template, [clean, conflicting], max_workers=2
+        )
+
+        self.assertEqual([r.status for r in results], ["updated", "conflict"])
+        self.assertEqual(results[1].conflicts, ["config.txt"])
+        self.assertEqual(git("--git-dir", conflicting, "rev-parse", "main"), local_head)
+
+    def test_missing_base_needs_explicit_base(self):
+        """Repositories without a recorded base fail unless one is given."""
+        remote, _ = self.duplicate("old", record_base=False)
+        commit_file(self.template, "config.txt", "a = 2\n", "Fix config")
+
+        (missing,) = sync.sync_repositories(self.template, [remote])
+        (explicit,) = sync.sync_repositories(self.template, [remote], base=self.base)
+
+        self.assertEqual(missing.status, "failed")
+        self.assertIn("no template base", missing.error)
+        self.assertEqual(explicit.status, "updated", explicit.error)
+
+    def test_sync_after_duplication_leaves_one_inventory_entry(self):
+        """A sync by URL replaces the duplication recorded under a bare name."""
+        remote, _ = self.duplicate("student")
+        registry = get_registry()
+        registry.record(
+            RegistryEntry(
+                template_url=self.template,
+                repo_name="student",
+                outcome="success",
+                template_sha=self.base,
+                template_commit_time=1,
+                repo_url="https://github.com/me/student",
+            )
+        )
+        new_sha = commit_file(self.template, "config.txt", "a = 2\n", "Fix config")
+
+        with patch.object(sync, "resolve_remote", return_value=remote):
+            (result,) = sync.sync_repositories(
+                self.template, ["git@github.com:me/student.git"]
+            )
+
+        self.assertEqual(result.status, "updated", result.error)
+        inventory = registry.inventory(self.template)
+        self.assertEqual(
+            [(e.repo_name, e.template_sha) for e in inventory],
+            [("me/student", new_sha)],
+        )
+        self.assertEqual(len(registry.history(repo_name="student")), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for the GitHub credential pool and request routing.
+"""
+
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import tokens
+from src.github_repo_duplicator.watchdog import run_with_deadline
+
+
+def fresh(credential, remaining, bucket=tokens.CORE, reset=0.0):
+    """Give a credential a known, current quota."""
+    quota = credential.quota(bucket)
+    quota.remaining, quota.reset, quota.checked = remaining, reset, time.time()
+    return credential
+
+
+class TestTokens(unittest.TestCase):
+    """Test cases for loading, choosing and routing credentials."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.primary = tokens.Credential("primary", token="t-primary")
+        self.org_a1 = tokens.Credential("a1", token="t-a1", owners=["org-a"])
+        self.org_a2 = tokens.Credential("a2", token="t-a2", owners=["Org-A"])
+        self.pool = tokens.TokenPool([self.primary, self.org_a1, self.org_a2])
+        for credential in self.pool.credentials:
+            fresh(credential, 1000)
+            fresh(credential, 1000, tokens.GRAPHQL)
+        self.addCleanup(tokens.set_pool, None)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_load_tokens(self):
+        """Credentials are read from a JSON list with one token source each."""
+        path = os.path.join(self.tmp, "tokens.json")
+        with open(path, "w") as f:
+            json.dump(
+                [
+                    {"token": "abc"},
+                    {"name": "bot", "token_env": "BOT_TOKEN", "owners": ["org"]},
+                ],
+                f,
+            )
+        pool = tokens.load_tokens(path)
+        self.assertEqual([c.name for c in pool.credentials], ["token-1", "bot"])
+        self.assertEqual(pool.credentials[1].owners, ["org"])
+        with patch.dict(os.environ, {"BOT_TOKEN": "from-env"}):
+            self.assertEqual(pool.credentials[1].get_token(), "from-env")
+
+        with open(path, "w") as f:
+            json.dump([{"token": "abc", "token_env": "X"}], f)
+        with self.assertRaises(tokens.TokenError):
+            tokens.load_tokens(path)
+
+    def test_commands_are_routed_by_target(self):
+        """The owner a gh command acts on is read from its arguments."""
+        cases = [
+            (["gh", "repo", "create", "org-a/app", "--private"], "org-a"),
+            (["gh", "repo", "delete", "app", "--yes"], tokens.OWN_ACCOUNT),
+            (["gh", "api", "repos/org-b/app", "-q", ".size"], "org-b"),
+            (["gh", "api", "/orgs/org-c/repos"], "org-c"),
+            (["gh", "auth", "status"], tokens.OWN_ACCOUNT),
+            (
+                ["gh", "api", "graphql", "-f", 'query=query { repository(owner: "o", '],
+                "o",
+            ),
+            (["gh", "api", "graphql", "-f", "query=query { viewer { login } }"], ""),
+            (["gh", "api", "graphql", "-f", "query=query { search }"], None),
+        ]
+        for args, owner in cases:
+            self.assertEqual(tokens.target_owner(args), owner, args)
+
+    def test_choose_spreads_by_owner_and_quota(self):
+        """Owned requests use the owner's credentials, fullest quota first."""
+        fresh(self.org_a1, 10)
+        picks = [self.pool.choose("org-a").name for _ in range(3)]
+        self.assertEqual(picks, ["a2", "a2", "a2"])
+        self.assertEqual(self.org_a2.quota(tokens.CORE).remaining, 997)
+
+        self.assertIs(self.pool.choose(tokens.OWN_ACCOUNT), self.primary)
+        self.assertIs(self.pool.choose("someone-else"), self.primary)
+        self.assertIn(self.pool.choose(None), self.pool.credentials)
+
+        fresh(self.org_a1, 0, reset=time.time() + 60)
+        fresh(self.org_a2, 0, reset=time.time() + 30)
+        with self.assertLogs(tokens.logger, "WARNING"):
+            self.assertIs(self.pool.choose("org-a"), self.org_a2)
+
+    def test_stale_quotas_are_looked_up(self):
+        """A quota older than the TTL is refreshed before choosing."""
+        self.org_a1.quota(tokens.CORE).checked = 0
+
+        def refresh(credential):
+            fresh(credential, 4000)
+
+        with patch.object(self.pool, "refresh_quota", side_effect=refresh) as lookup:
+            self.assertIs(self.pool.choose("org-a"), self.org_a1)
+        lookup.assert_called_once_with(self.org_a1)
+
+        self.org_a1.observe(tokens.CORE, "12", "1700000000", "5000")
+        quota = self.org_a1.quota(tokens.CORE)
+        self.assertEqual((quota.remaining, quota.limit), (12, 5000))
+
+    def test_token_commands_are_cached(self):
+        """Minted tokens are reused until they get old."""
+        credential = tokens.Credential("app", token_command="mint")
+        with patch.object(tokens.subprocess, "run") as run:
+            run.return_value.stdout = "minted\n"
+            self.assertEqual(credential.get_token(), "minted")
+            self.assertEqual(credential.get_token(), "minted")
+        run.assert_called_once()
+
+    def test_gh_commands_run_with_the_routed_token(self):
+        """Commands started through the watchdog get GH_TOKEN from the pool."""
+        bin_dir = os.path.join(self.tmp, "bin")
+        os.makedirs(bin_dir)
+        fake_gh = os.path.join(bin_dir, "gh")
+        with open(fake_gh, "w") as f:
+            f.write('#!/bin/sh\necho "$GH_TOKEN"\n')
+        os.chmod(fake_gh, os.stat(fake_gh).st_mode | stat.S_IEXEC)
+        tokens.set_pool(self.pool)
+        fresh(self.org_a2, 5)
+
+        path = bin_dir + os.pathsep + os.environ.get("PATH", "")
+        with patch.dict(os.environ, {"PATH": path}):
+            owned = run_with_deadline(
+                ["gh", "repo", "create", "org-a/app"], capture_output=True, text=True
+            )
+            own = run_with_deadline(
+                ["gh", "repo", "create", "app"], capture_output=True, text=True
+            )
+        self.assertEqual(owned.stdout.strip(), "t-a1")
+        self.assertEqual(own.stdout.strip(), "t-primary")
+        self.assertIsNone(tokens.gh_env(["git", "push"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for post-push verification by ref comparison.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import verify
+from src.github_repo_duplicator.git_backend import get_backend
+from tests.git_helpers import git, make_bare, make_repo
+
+REFSPECS = ["refs/heads/*:refs/heads/*", "refs/tags/*:refs/tags/*"]
+
+
+class TestVerify(unittest.TestCase):
+    """Test cases for comparing pushed refs with a destination."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.template = os.path.join(self.tmp, "template")
+        self.head = make_repo(self.template, tag="v1.0")
+        git("branch", "develop", cwd=self.template)
+        self.remote = make_bare(os.path.join(self.tmp, "remote.git"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def push(self, *refspecs):
+        get_backend("subprocess").push(self.template, self.remote, list(refspecs))
+
+    def test_complete_push_matches(self):
+        """Every pushed branch and tag is found on the remote."""
+        self.push(*REFSPECS)
+
+        result = verify.verify_push(self.template, self.remote, REFSPECS)
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.refs_checked, 3)
+        self.assertEqual(result.summary(), "3 refs match")
+
+    def test_missing_and_moved_refs_are_reported(self):
+        """Refs the remote lacks or has elsewhere are mismatches."""
+        self.push("main", "develop")
+        git("commit", "--quiet", "--allow-empty", "-m", "Later", cwd=self.template)
+
+        result = verify.verify_push(self.template, self.remote, REFSPECS)
+
+        self.assertFalse(result.ok)
+        self.assertEqual(
+            [(m.ref, m.actual) for m in result.mismatches],
+            [("refs/heads/main", self.head), ("refs/tags/v1.0", "")],
+        )
+        self.assertEqual(
+            result.summary(),
+            "2 of 3 refs differ: refs/heads/main (differs), refs/tags/v1.0 (missing)",
+        )
+
+    def test_tree_of_the_default_branch(self):
+        """The branch tree is compared with what GitHub reports."""
+        self.push(*REFSPECS)
+        tree = git("rev-parse", "main^{tree}", cwd=self.template)
+
+        with patch.object(verify, "branch_tree", return_value=tree) as mock_tree:
+            result = verify.verify_push(
+                self.template,
+                self.remote,
+                REFSPECS,
+                github_repo="me/app",
+                branch="main",
+            )
+        mock_tree.assert_called_once_with("me/app", "main")
+        self.assertTrue(result.ok)
+        self.assertEqual(result.summary(), "3 refs match, tree of main matches")
+
+        with patch.object(verify, "branch_tree", return_value=None):
+            result = verify.verify_push(
+                self.template,
+                self.remote,
+                REFSPECS,
+                github_repo="me/app",
+                branch="main",
+            )
+        self.assertFalse(result.ok)
+        self.assertIn("tree of main differs", result.summary())
+
+    def test_unreachable_remote_is_an_error_not_an_exception(self):
+        """Failing to list the remote's refs fails the verification."""
+        with self.assertLogs(verify.logger, "WARNING"):
+            result = verify.verify_push(
+                self.template, os.path.join(self.tmp, "missing.git"), REFSPECS
+            )
+
+        self.assertFalse(result.ok)
+        self.assertTrue(result.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
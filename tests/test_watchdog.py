@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for phase deadlines and process-group cancellation.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import watchdog
+
+
+def pid_alive(pid):
+    """Check whether a process exists, waiting briefly for it to go away."""
+    for _ in range(50):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@unittest.skipUnless(os.name == "posix", "process groups are POSIX only")
+class TestWatchdog(unittest.TestCase):
+    """Test cases for killing commands that outlive their phase."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(watchdog.reset_cancellation)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_expired_deadline_kills_the_process_group(self):
+        """A helper started by the command dies with it."""
+        pid_file = os.path.join(self.tmp, "pid")
+        script = f"sleep 30 & echo $! > {pid_file}; wait"
+
+        started = time.monotonic()
+        with self.assertRaises(watchdog.DeadlineExceeded) as raised:
+            with watchdog.deadline("push", 0.5):
+                watchdog.run_with_deadline(["sh", "-c", script])
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(raised.exception.phase, "push")
+        self.assertIn("push did not finish within 0.5s", str(raised.exception))
+        with open(pid_file) as f:
+            self.assertFalse(pid_alive(int(f.read())))
+
+    def test_nested_deadline_cannot_outlive_outer(self):
+        """An inner phase inherits an earlier outer expiry."""
+        with watchdog.deadline("job", 10):
+            with watchdog.deadline("push", 1000):
+                phase, seconds, remaining = watchdog.time_left()
+            with watchdog.deadline("push", 1):
+                inner = watchdog.time_left()
+
+        self.assertEqual((phase, seconds), ("job", 10))
+        self.assertLessEqual(remaining, 10)
+        self.assertEqual(inner[:2], ("push", 1))
+
+    def test_run_behaves_like_subprocess_run(self):
+        """Output, input and check work as with subprocess.run."""
+        result = watchdog.run_with_deadline(
+            ["cat"], input="hello", capture_output=True, text=True
+        )
+        self.assertEqual(result.stdout, "hello")
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            watchdog.run_with_deadline(["false"], check=True)
+
+    def test_cancel_all_stops_running_commands(self):
+        """Cancelling stops commands in other threads and refuses new ones."""
+        results = []
+        worker = threading.Thread(
+            target=lambda: results.append(
+                watchdog.run_with_deadline(["sleep", "30"]).returncode
+            )
+        )
+        worker.start()
+        for _ in range(50):
+            if watchdog._processes:
+                break
+            time.sleep(0.05)
+
+        watchdog.cancel_all()
+        worker.join(5)
+
+        self.assertFalse(worker.is_alive())
+        self.assertNotEqual(results, [0])
+        with self.assertRaises(watchdog.Cancelled):
+            watchdog.run_with_deadline(["true"])
+
+    def test_deadline_configuration(self):
+        """Deadlines come from defaults, the environment and overrides."""
+        env = {watchdog.DEADLINES_ENV: "push=60, clone=0"}
+        with patch.dict(os.environ, env), patch.dict(watchdog._overrides):
+            self.assertEqual(watchdog.phase_deadline("push"), 60)
+            self.assertIsNone(watchdog.phase_deadline("clone"))
+            watchdog.set_deadlines({"push": 5})
+            self.assertEqual(watchdog.phase_deadline("push"), 5)
+        self.assertEqual(
+            watchdog.phase_deadline("unknown"), watchdog.DEFAULT_DEADLINES["command"]
+        )
+        with self.assertRaises(ValueError):
+            watchdog.parse_deadlines("push")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for workspace management.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# Add parent directory to path to import the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.github_repo_duplicator import workspace
+from tests.git_helpers import make_repo
+
+
+class TestWorkspaceManager(unittest.TestCase):
+    """Test cases for acquiring and releasing work directories."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.manager = workspace.WorkspaceManager(os.path.join(self.tmp, "root"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_concurrent_acquires_are_unique(self):
+        """Parallel duplications of one template get separate directories."""
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            paths = list(pool.map(lambda _: self.manager.acquire("same"), range(32)))
+
+        self.assertEqual(len(set(paths)), 32)
+        self.assertTrue(all(os.path.isdir(p) and not os.listdir(p) for p in paths))
+
+    def test_released_directories_are_emptied_and_reused(self):
+        """A released directory comes back empty for the next acquire."""
+        with self.manager.workspace("repo") as path:
+            os.makedirs(os.path.join(path, "clone", ".git"))
+            inode = os.stat(path).st_ino
+        self.assertFalse(os.path.exists(path))
+
+        reused = self.manager.acquire("repo")
+
+        self.assertEqual(os.stat(reused).st_ino, inode)
+        self.assertEqual(os.listdir(reused), [])
+
+    def test_insufficient_space_is_refused(self):
+        """Work that needs more than the free space is refused up front."""
+        free = shutil.disk_usage(self.manager.root).free
+        with self.assertRaises(workspace.WorkspaceError):
+            self.manager.acquire("huge", required_bytes=free)
+
+    def test_stale_directories_of_dead_processes_are_reaped(self):
+        """Directories left by a crashed process are removed."""
+        stale = os.path.join(self.manager.root, "repo-999999999-deadbeef")
+        os.makedirs(os.path.join(stale, "clone"))
+        live = self.manager.acquire("repo")
+
+        with patch.object(
+            workspace, "_pid_alive", side_effect=lambda pid: pid != 999999999
+        ):
+            self.assertEqual(self.manager.reap_stale(), 1)
+
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.isdir(live))
+
+    def test_cleanup_active_workspaces(self):
+        """Directories still held at exit are removed."""
+        path = self.manager.acquire("repo")
+
+        workspace.cleanup_active_workspaces()
+
+        self.assertFalse(os.path.exists(path))
+
+    def test_estimate_template_size(self):
+        """Local templates are measured from disk."""
+        template = os.path.join(self.tmp, "template")
+        make_repo(template, {"data.txt": "x" * 10000})
+
+        self.assertGreaterEqual(workspace.estimate_template_size(template), 10000)
+
+
+if __name__ == "__main__":
+    unittest.main()